@@ -1,12 +1,16 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask import Flask, render_template, request, jsonify, redirect, url_for, Response, stream_with_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
 from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime, timedelta, timezone, date
+import csv
+import io
 import logging
 import os
 import time
 
+import numpy as np
+
 # Wersja systemu - import z config.py
 from config import __version__, VERSION_INFO
 
@@ -18,13 +22,28 @@ from utils import utc_to_cet
 from models import db, SystemLog
 from services.database_service import DatabaseService
 from services.api_service import APIService
+from services.storage_service import StorageService
+from services.series_cache import series_cache
+from services.series_store import create_series_store
+from services.data_version_service import DataVersionService
+from services.response_service import init_responses, wants_columnar
+from services.panel_service import create_panel_service
+from services.analytics_service import AnalyticsService, AnalyticsError, DEFAULT_MIN_PERIODS
+from services.screener_service import ScreenerService, ScreenerError, parse_screener_query, DEFAULT_LIMIT
+from services.backtest_service import BacktestService, BacktestError, parse_month
+from services.sweep_service import SweepService, SweepError
+from services.event_stream import EventStreamService, StreamCapacityError, EVENT_TYPES
+from services.metrics_service import request_metrics
+from services.logging_service import configure_logging, get_sampled_logger
+from services.job_trace_service import JobTraceService, count as job_count, span as job_span
+from services.chart_data_service import (ChartDataService, SectionError, SECTIONS as CHART_SECTIONS, DateWindow,
+                                         requested_points, requested_window)
 
-# Konfiguracja logowania
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Konfiguracja logowania - zapis w tle, poziomy modułów z DEBUG_LEVEL
+configure_logging(Config)
 logger = logging.getLogger(__name__)
+# Zdarzenia per ETF / per cena w zadaniach schedulera
+sampled_logger = get_sampled_logger(__name__)
 
 def create_app():
     app = Flask(__name__)
@@ -49,6 +68,31 @@ def create_app():
     db.init_app(app)
     CORS(app)
     
+    # Metryki żądań (czas, zapytania SQL, N+1) - przed hookami zwracającymi 304 bez wywołania endpointu
+    request_metrics.init_app(app)
+    
+    # Serializacja JSON (orjson + NumPy) i kompresja gzip/brotli
+    init_responses(app, Config)
+    
+    # Profil SQLite (WAL, PRAGMA, pula odczytów, pojedynczy pisarz dla zadań)
+    storage_service = StorageService(Config)
+    storage_service.init_app(app, db)
+    
+    # Magazyn szeregów cen mapowanych w pamięci (współdzielony przez workery)
+    series_store = create_series_store(app, Config)
+    
+    # Wersje danych ETF - ETag/304 dla GET /api/etfs/<ticker>/... przed zapytaniami do bazy
+    data_versions = DataVersionService(Config)
+    data_versions.init_app(app, db)
+    
+    # Strumień zdarzeń SSE (zmiany cen, postęp zadań) - jedno zapytanie na worker zamiast odpytywania przez klientów
+    event_stream = EventStreamService(Config)
+    event_stream.init_app(app, db)
+    
+    # Śledzenie zadań schedulera (ticker -> etap -> dostawca/commit), jeden zapis na przebieg
+    job_traces = JobTraceService(Config)
+    job_traces.init_app(app, db)
+    
     # Dodanie własnego filtra Jinja2 do formatowania liczb z przecinkiem
     @app.template_filter('comma_format')
     def comma_format_filter(value, decimals=2):
@@ -78,9 +122,38 @@ def create_app():
     # Inicjalizacja serwisu bazy danych (używa współdzielonego APIService)
     db_service = DatabaseService(api_service=api_service)
     
+    # Dane wykresów strony ETF (wspólne dla endpointów sekcji i /bundle)
+    chart_data_service = ChartDataService(db_service)
+    
+    # Wyrównane panele cen całego uniwersum (okresy x tickery) dla analiz przekrojowych
+    panel_service = create_panel_service(app, Config, db_service, data_versions)
+    
+    # Backtest portfeli DCA (wektorowo dla wielu portfeli naraz)
+    backtest_service = BacktestService(db_service, panel_service, Config.BACKTEST_MAX_PORTFOLIOS)
+    
+    # Korelacje/kowariancje uniwersum (cache do następnego ingestu)
+    analytics_service = AnalyticsService(panel_service)
+    
+    # Sweep parametrów wskaźników (pula procesów dla całego uniwersum)
+    sweep_service = SweepService(db_service, Config.SWEEP_MAX_COMBINATIONS, Config.SWEEP_PROCESSES)
+    
+    # Migawki wskaźników wszystkich ETF dla screenera
+    screener_service = ScreenerService(db_service, api_service)
+    
+    # Po każdym zadaniu schedulera zmienione szeregi trafiają do magazynu (workery nie czytają ich z bazy),
+    # a nieaktualne panele i migawki wskaźników są przeliczane
+    if series_store is not None:
+        storage_service.after_writer_job(db_service.publish_price_series)
+    storage_service.after_writer_job(panel_service.refresh)
+    storage_service.after_writer_job(screener_service.refresh)
+    
     # Inicjalizacja bazy danych
     with app.app_context():
         db.create_all()
+        # Agregaty roczne dywidend dla baz sprzed tabeli etf_dividend_yearly
+        db_service.ensure_dividend_yearly()
+        # Migawki wskaźników dla baz sprzed tabeli etf_indicator_snapshots
+        screener_service.ensure()
         logger.info("Database initialized")
     
     # Scheduler dla zadań cyklicznych
@@ -94,7 +167,8 @@ def create_app():
     def update_all_timeframes():
         """Zadanie schedulera do codziennej aktualizacji wszystkich ETF (1M, 1W, 1D) - Aktualizacja wszystkich ram czasowych"""
         start_time = time.time()
-        with app.app_context():
+        with (app.app_context(), storage_service.writer_job('update_all_timeframes'),
+              job_traces.trace('update_all_timeframes') as trace):
             try:
                 etfs = db_service.get_all_etfs()
                 updated_count = 0
@@ -108,29 +182,35 @@ def create_app():
                     'api_calls_used_total': 0
                 }
                 
+                progress = event_stream.job_progress('update_all_timeframes', len(etfs))
                 for etf in etfs:
-                    logger.info(f"Processing ETF {etf.ticker} for daily update (all timeframes)")
-                    
-                    # Standardowa aktualizacja (nowe ceny, dywidendy)
-                    if db_service.update_etf_data(etf.ticker):
-                        updated_count += 1
-                    
-                    # Inteligentne uzupełnianie historii (raz dziennie) - 1M, 1W, 1D
-                    logger.info(f"Checking history completion for ETF {etf.ticker} (1M, 1W, 1D)")
-                    completion_result = db_service.smart_history_completion(etf.id, etf.ticker)
-                    
-                    # Aktualizacja statystyk
-                    if (completion_result['prices_complete'] and 
-                        completion_result['dividends_complete'] and
-                        completion_result['weekly_prices_complete'] and
-                        completion_result['daily_prices_complete']):
-                        history_completion_stats['etfs_with_complete_history'] += 1
-                    
-                    history_completion_stats['prices_filled_total'] += completion_result['prices_filled']
-                    history_completion_stats['dividends_filled_total'] += completion_result['dividends_filled']
-                    history_completion_stats['weekly_prices_filled_total'] += completion_result['weekly_prices_filled']
-                    history_completion_stats['daily_prices_filled_total'] += completion_result['daily_prices_filled']
-                    history_completion_stats['api_calls_used_total'] += completion_result['api_calls_used']
+                    with job_span('ticker', ticker=etf.ticker):
+                        logger.info("Processing ETF %s for daily update (all timeframes)", etf.ticker)
+                        
+                        # Standardowa aktualizacja (nowe ceny, dywidendy)
+                        with job_span('update_etf_data'):
+                            if db_service.update_etf_data(etf.ticker):
+                                updated_count += 1
+                        
+                        # Inteligentne uzupełnianie historii (raz dziennie) - 1M, 1W, 1D
+                        logger.info("Checking history completion for ETF %s (1M, 1W, 1D)", etf.ticker)
+                        with job_span('smart_history_completion'):
+                            completion_result = db_service.smart_history_completion(etf.id, etf.ticker)
+                        job_count('api_calls_used', completion_result['api_calls_used'])
+                        
+                        # Aktualizacja statystyk
+                        if (completion_result['prices_complete'] and 
+                            completion_result['dividends_complete'] and
+                            completion_result['weekly_prices_complete'] and
+                            completion_result['daily_prices_complete']):
+                            history_completion_stats['etfs_with_complete_history'] += 1
+                        
+                        history_completion_stats['prices_filled_total'] += completion_result['prices_filled']
+                        history_completion_stats['dividends_filled_total'] += completion_result['dividends_filled']
+                        history_completion_stats['weekly_prices_filled_total'] += completion_result['weekly_prices_filled']
+                        history_completion_stats['daily_prices_filled_total'] += completion_result['daily_prices_filled']
+                        history_completion_stats['api_calls_used_total'] += completion_result['api_calls_used']
+                        progress.step(etf.ticker)
                 
                 execution_time_ms = int((time.time() - start_time) * 1000)
                 total_records = (history_completion_stats['prices_filled_total'] + 
@@ -138,6 +218,8 @@ def create_app():
                                history_completion_stats['weekly_prices_filled_total'] +
                                history_completion_stats['daily_prices_filled_total'])
                 
+                progress.finish(True, total_records)
+                
                 # Logowanie sukcesu zadania
                 job_log = SystemLog.create_job_log(
                     job_name="update_all_timeframes",
@@ -153,29 +235,38 @@ def create_app():
                         'weekly_prices_filled': history_completion_stats['weekly_prices_filled_total'],
                         'daily_prices_filled': history_completion_stats['daily_prices_filled_total'],
                         'api_calls_used': history_completion_stats['api_calls_used_total'],
-                        'etfs_with_complete_history': history_completion_stats['etfs_with_complete_history']
+                        'etfs_with_complete_history': history_completion_stats['etfs_with_complete_history'],
+                        'trace_run_id': trace.run_id if trace else None
                     }
                 )
                 db.session.add(job_log)
                 db.session.commit()
                 
-                logger.info(f"Daily update completed: {updated_count} out of {len(etfs)} ETFs updated")
-                logger.info(f"History completion: {history_completion_stats['etfs_with_complete_history']}/{history_completion_stats['total_etfs']} ETFs have complete history")
-                logger.info(f"Data filled: {history_completion_stats['prices_filled_total']} prices 1M, {history_completion_stats['weekly_prices_filled_total']} prices 1W, {history_completion_stats['daily_prices_filled_total']} prices 1D, {history_completion_stats['dividends_filled_total']} dividends")
-                logger.info(f"API calls used for history completion: {history_completion_stats['api_calls_used_total']}")
+                logger.info("Daily update completed: %s out of %s ETFs updated", updated_count, len(etfs))
+                logger.info("History completion: %s/%s ETFs have complete history",
+                            history_completion_stats['etfs_with_complete_history'], history_completion_stats['total_etfs'])
+                logger.info("Data filled: %s prices 1M, %s prices 1W, %s prices 1D, %s dividends",
+                            history_completion_stats['prices_filled_total'], history_completion_stats['weekly_prices_filled_total'],
+                            history_completion_stats['daily_prices_filled_total'], history_completion_stats['dividends_filled_total'])
+                logger.info("API calls used for history completion: %s", history_completion_stats['api_calls_used_total'])
                 
                 # Czyszczenie starych logów i cen dziennych
-                db_service.cleanup_old_data()
-                # Rolling window z konfiguracji
-                from config import Config
-                config = Config()
-                db_service.cleanup_old_daily_prices(config.DAILY_PRICES_WINDOW_DAYS)
+                with job_span('cleanup'):
+                    db_service.cleanup_old_data()
+                    # Rolling window z konfiguracji
+                    from config import Config
+                    config = Config()
+                    db_service.cleanup_old_daily_prices(config.DAILY_PRICES_WINDOW_DAYS)
                 
             except Exception as e:
                 execution_time_ms = int((time.time() - start_time) * 1000)
                 error_msg = f"Error in scheduled update: {str(e)}"
                 logger.error(error_msg)
                 
+                event_stream.publish_job('update_all_timeframes', 'finished', success=False)
+                if trace:
+                    trace.success = False
+                
                 # Logowanie błędu zadania
                 job_log = SystemLog.create_job_log(
                     job_name="update_all_timeframes",
@@ -183,7 +274,8 @@ def create_app():
                     execution_time_ms=execution_time_ms,
                     records_processed=0,
                     details="Błąd podczas aktualizacji wszystkich ram czasowych ETF",
-                    error_message=error_msg
+                    error_message=error_msg,
+                    metadata={'trace_run_id': trace.run_id if trace else None}
                 )
                 db.session.add(job_log)
                 db.session.commit()
@@ -191,45 +283,56 @@ def create_app():
     def update_etf_prices():
         """Zadanie schedulera do aktualizacji cen ETF co 15 minut w dni robocze (Aktualizacja cen ETF)"""
         start_time = time.time()
-        with app.app_context():
+        with app.app_context(), storage_service.writer_job('update_etf_prices'):
             try:
                 etfs = db_service.get_all_etfs()
-                logger.info(f"Starting scheduled ETF price update for {len(etfs)} ETFs...")
+                logger.info("Starting scheduled ETF price update for %s ETFs...", len(etfs))
                 
                 updated_count = 0
                 error_count = 0
+                progress = event_stream.job_progress('update_etf_prices', len(etfs))
                 for etf in etfs:
                     try:
-                        logger.info(f"Updating price for ETF {etf.ticker}...")
+                        logger.debug("Updating price for ETF %s...", etf.ticker)
                         
                         # Sprawdzenie czy nie przekroczyliśmy czasu (maksymalnie 10 minut)
                         elapsed_time = time.time() - start_time
                         if elapsed_time > 600:  # 10 minut
-                            logger.warning(f"Price update taking too long ({elapsed_time:.1f}s), stopping early")
+                            logger.warning("Price update taking too long (%.1fs), stopping early", elapsed_time)
                             break
                         
                         # Pobieranie aktualnej ceny
                         current_price = api_service.get_current_price(etf.ticker)
                         
                         if current_price:
+                            previous_price = etf.current_price
+                            
                             # Aktualizacja ceny w tabeli ETF
                             db_service.update_etf_price(etf.id, current_price)
                             
                             # Dodanie rekordu do historii cen
                             db_service.add_price_history_record(etf.id, current_price)
                             
+                            # Zdarzenie SSE tylko przy zmianie ceny (zatwierdzane razem z ceną)
+                            if current_price != previous_price:
+                                event_stream.publish_price(etf.ticker, current_price, previous_price)
+                            
                             updated_count += 1
-                            logger.info(f"Successfully updated price for {etf.ticker}: ${current_price}")
+                            progress.step(etf.ticker)
+                            sampled_logger.info("Successfully updated price for %s: $%s", etf.ticker, current_price)
                         else:
-                            logger.warning(f"Failed to get current price for {etf.ticker}")
+                            logger.warning("Failed to get current price for %s", etf.ticker)
                             error_count += 1
+                            progress.step(etf.ticker, 'error')
                             
                     except Exception as e:
-                        logger.error(f"Error updating price for ETF {etf.ticker}: {str(e)}")
+                        logger.error("Error updating price for ETF %s: %s", etf.ticker, e)
                         error_count += 1
+                        progress.step(etf.ticker, 'error')
                         continue
                 
                 execution_time_ms = int((time.time() - start_time) * 1000)
+                progress.finish(error_count == 0, updated_count)
                 
                 # Logowanie sukcesu zadania
                 job_log = SystemLog.create_job_log(
@@ -248,7 +351,7 @@ def create_app():
                 db.session.add(job_log)
                 db.session.commit()
                 
-                logger.info(f"Price update completed: {updated_count} out of {len(etfs)} ETFs updated")
+                logger.info("Price update completed: %s out of %s ETFs updated", updated_count, len(etfs))
                 
                 # UWAGA: cleanup_old_price_history() został usunięty - niszczył historyczne ceny miesięczne!
                 # Retencja cen historycznych: NIEKONIECZNA - dane historyczne są zachowywane na zawsze
@@ -258,6 +361,8 @@ def create_app():
                 error_msg = f"Error in scheduled price update: {str(e)}"
                 logger.error(error_msg)
                 
+                event_stream.publish_job('update_etf_prices', 'finished', success=False)
+                
                 # Logowanie błędu zadania
                 job_log = SystemLog.create_job_log(
                     job_name="update_etf_prices",
@@ -273,105 +378,123 @@ def create_app():
     def scheduled_daily_price_update():
         """Inteligentna aktualizacja cen dziennych ETF - sprawdza braki i uzupełnia dane"""
         start_time = time.time()
-        with app.app_context():
+        with (app.app_context(), storage_service.writer_job('scheduled_daily_price_update'),
+              job_traces.trace('scheduled_daily_price_update') as trace):
             try:
                 etfs = db_service.get_all_etfs()
-                logger.info(f"Starting intelligent daily price update for {len(etfs)} ETFs...")
+                logger.info("Starting intelligent daily price update for %s ETFs...", len(etfs))
                 
                 total_updated = 0
                 total_added = 0
                 total_cleaned = 0
                 total_completeness_improved = 0
                 error_count = 0
+                progress = event_stream.job_progress('scheduled_daily_price_update', len(etfs))
                 
                 for etf in etfs:
-                    try:
-                        logger.info(f"Processing ETF {etf.ticker}...")
+                    with job_span('ticker', ticker=etf.ticker):
+                        try:
+                            logger.info("Processing ETF %s...", etf.ticker)
                         
-                        # Sprawdzenie czy nie przekroczyliśmy czasu (maksymalnie 15 minut)
-                        elapsed_time = time.time() - start_time
-                        if elapsed_time > 900:  # 15 minut
-                            logger.warning(f"Daily price update taking too long ({elapsed_time:.1f}s), stopping early")
-                            break
+                            # Sprawdzenie czy nie przekroczyliśmy czasu (maksymalnie 15 minut)
+                            elapsed_time = time.time() - start_time
+                            if elapsed_time > 900:  # 15 minut
+                                logger.warning("Daily price update taking too long (%.1fs), stopping early", elapsed_time)
+                                break
                         
-                        # Sprawdź kompletność danych przed aktualizacją
-                        completeness_before = db_service.check_historical_completeness(etf.id, days_back=365)
-                        if completeness_before:
-                            logger.info(f"Kompletność {etf.ticker} przed aktualizacją: {completeness_before['completeness_percentage']:.1f}% ({completeness_before['actual_business_days']}/{completeness_before['expected_business_days']})")
+                            # Sprawdź kompletność danych przed aktualizacją
+                            completeness_before = db_service.check_historical_completeness(etf.id, days_back=365)
+                            if completeness_before:
+                                logger.info("Kompletność %s przed aktualizacją: %.1f%% (%s/%s)", etf.ticker,
+                                            completeness_before['completeness_percentage'],
+                                            completeness_before['actual_business_days'], completeness_before['expected_business_days'])
                         
-                        # 1. Sprawdź jakie ceny dzienne mamy w bazie (rozszerzone do 365 dni)
-                        missing_dates = db_service.get_missing_daily_prices(etf.id, days_back=365)
+                            # 1. Sprawdź jakie ceny dzienne mamy w bazie (rozszerzone do 365 dni)
+                            missing_dates = db_service.get_missing_daily_prices(etf.id, days_back=365)
                         
-                        if missing_dates:
-                            logger.info(f"Found {len(missing_dates)} missing dates for {etf.ticker}")
+                            if missing_dates:
+                                logger.info("Found %s missing dates for %s", len(missing_dates), etf.ticker)
                             
-                            # 2. Pobierz brakujące ceny historyczne inteligentnie (rozszerzone do 365 dni)
-                            try:
-                                logger.info(f"Pobieram brakujące ceny historyczne dla {etf.ticker} (365 dni)...")
-                                historical_data = db_service.get_historical_daily_prices_intelligent(etf.ticker, days=365)
+                                # 2. Pobierz brakujące ceny historyczne inteligentnie (rozszerzone do 365 dni)
+                                try:
+                                    logger.info("Pobieram brakujące ceny historyczne dla %s (365 dni)...", etf.ticker)
+                                    historical_data = db_service.get_historical_daily_prices_intelligent(etf.ticker, days=365)
                                 
-                                if historical_data:
-                                    logger.info(f"Pobrano {len(historical_data)} cen historycznych dla {etf.ticker}")
+                                    if historical_data:
+                                        logger.info("Pobrano %s cen historycznych dla %s", len(historical_data), etf.ticker)
                                     
-                                    # Dodaj brakujące ceny
-                                    for missing_date in missing_dates:
-                                        price_for_date = None
-                                        for price_data in historical_data:
-                                            if price_data['date'] == missing_date:
-                                                price_for_date = price_data['close']
-                                                break
+                                        # Dodaj brakujące ceny
+                                        with job_span('add_missing_prices', missing=len(missing_dates)):
+                                            for missing_date in missing_dates:
+                                                price_for_date = None
+                                                for price_data in historical_data:
+                                                    if price_data['date'] == missing_date:
+                                                        price_for_date = price_data['close']
+                                                        break
                                         
-                                        if price_for_date:
-                                            db_service.add_daily_price_record(etf.id, price_for_date)
-                                            total_added += 1
-                                            logger.info(f"Added missing price for {etf.ticker} {missing_date}: ${price_for_date}")
-                                        else:
-                                            logger.warning(f"Price not found in API for {etf.ticker} {missing_date}")
-                                else:
-                                    logger.warning(f"Failed to get historical data for {etf.ticker} from all API sources")
+                                                if price_for_date:
+                                                    db_service.add_daily_price_record(etf.id, price_for_date)
+                                                    total_added += 1
+                                                    job_count('prices_added')
+                                                    sampled_logger.info("Added missing price for %s %s: $%s",
+                                                                        etf.ticker, missing_date, price_for_date)
+                                                else:
+                                                    logger.warning("Price not found in API for %s %s", etf.ticker, missing_date)
+                                    else:
+                                        logger.warning("Failed to get historical data for %s from all API sources", etf.ticker)
                                     
-                            except Exception as e:
-                                logger.error(f"Error fetching historical prices for {etf.ticker}: {str(e)}")
-                                continue
-                        else:
-                            logger.info(f"All daily prices are up to date for {etf.ticker}")
+                                except Exception as e:
+                                    logger.error("Error fetching historical prices for %s: %s", etf.ticker, e)
+                                    progress.step(etf.ticker, 'error')
+                                    continue
+                            else:
+                                logger.info("All daily prices are up to date for %s", etf.ticker)
                         
-                        # Sprawdź kompletność danych po aktualizacji
-                        completeness_after = db_service.check_historical_completeness(etf.id, days_back=365)
-                        if completeness_after and completeness_before:
-                            improvement = completeness_after['completeness_percentage'] - completeness_before['completeness_percentage']
-                            if improvement > 0:
-                                total_completeness_improved += 1
-                                logger.info(f"✅ Kompletność {etf.ticker} poprawiona o {improvement:.1f}%: {completeness_after['completeness_percentage']:.1f}%")
+                            # Sprawdź kompletność danych po aktualizacji
+                            completeness_after = db_service.check_historical_completeness(etf.id, days_back=365)
+                            if completeness_after and completeness_before:
+                                improvement = completeness_after['completeness_percentage'] - completeness_before['completeness_percentage']
+                                if improvement > 0:
+                                    total_completeness_improved += 1
+                                    logger.info("✅ Kompletność %s poprawiona o %.1f%%: %.1f%%", etf.ticker, improvement, completeness_after['completeness_percentage'])
                         
-                        # 3. Pobierz aktualną cenę i zaktualizuj
-                        current_price = api_service.get_current_price(etf.ticker)
-                        if current_price:
-                            db_service.update_etf_price(etf.id, current_price)
-                            db_service.add_daily_price_record(etf.id, current_price)
-                            total_updated += 1
-                            logger.info(f"Updated current price for {etf.ticker}: ${current_price}")
-                        else:
-                            logger.warning(f"Failed to get current price for {etf.ticker}")
-                            error_count += 1
+                            # 3. Pobierz aktualną cenę i zaktualizuj
+                            current_price = api_service.get_current_price(etf.ticker)
+                            if current_price:
+                                previous_price = etf.current_price
+                                with job_span('price_write'):
+                                    db_service.update_etf_price(etf.id, current_price)
+                                    db_service.add_daily_price_record(etf.id, current_price)
+                                if current_price != previous_price:
+                                    event_stream.publish_price(etf.ticker, current_price, previous_price)
+                                total_updated += 1
+                                progress.step(etf.ticker)
+                                logger.info("Updated current price for %s: $%s", etf.ticker, current_price)
+                            else:
+                                logger.warning("Failed to get current price for %s", etf.ticker)
+                                error_count += 1
+                                progress.step(etf.ticker, 'error')
                             
-                    except Exception as e:
-                        logger.error(f"Error processing ETF {etf.ticker}: {str(e)}")
-                        error_count += 1
-                        continue
+                        except Exception as e:
+                            logger.error("Error processing ETF %s: %s", etf.ticker, e)
+                            error_count += 1
+                            progress.step(etf.ticker, 'error')
+                            continue
                 
                 # 4. Wyczyść stare ceny dzienne (starsze niż 250 dni roboczych)
                 logger.info("Cleaning up old daily prices...")
-                for etf in etfs:
-                    try:
-                        cleaned_count = db_service.cleanup_old_daily_prices(days_back=250)
-                        total_cleaned += cleaned_count
-                        if cleaned_count > 0:
-                            logger.info(f"Cleaned {cleaned_count} old prices for {etf.ticker}")
-                    except Exception as e:
-                        logger.error(f"Error cleaning up prices for {etf.ticker}: {str(e)}")
+                with job_span('cleanup'):
+                    for etf in etfs:
+                        try:
+                            cleaned_count = db_service.cleanup_old_daily_prices(days_back=250)
+                            total_cleaned += cleaned_count
+                            if cleaned_count > 0:
+                                logger.info("Cleaned %s old prices for %s", cleaned_count, etf.ticker)
+                        except Exception as e:
+                            logger.error("Error cleaning up prices for %s: %s", etf.ticker, e)
                 
                 execution_time_ms = int((time.time() - start_time) * 1000)
+                progress.finish(error_count == 0, total_updated + total_added)
                 
                 # Logowanie sukcesu zadania
                 job_log = SystemLog.create_job_log(
@@ -388,19 +511,25 @@ def create_app():
                         'completeness_improved': total_completeness_improved,
                         'total_etfs': len(etfs),
                         'errors': error_count,
-                        'update_type': 'intelligent_daily_sync_with_backfill'
+                        'update_type': 'intelligent_daily_sync_with_backfill',
+                        'trace_run_id': trace.run_id if trace else None
                     }
                 )
                 db.session.add(job_log)
                 db.session.commit()
                 
-                logger.info(f"Intelligent daily price update completed: {total_updated} updated, {total_added} added, {total_cleaned} cleaned, {total_completeness_improved} ETFs improved")
+                logger.info("Intelligent daily price update completed: %s updated, %s added, %s cleaned, %s ETFs improved",
+                            total_updated, total_added, total_cleaned, total_completeness_improved)
                 
             except Exception as e:
                 execution_time_ms = int((time.time() - start_time) * 1000)
                 error_msg = f"Error in intelligent daily price update: {str(e)}"
                 logger.error(error_msg)
                 
+                event_stream.publish_job('scheduled_daily_price_update', 'finished', success=False)
+                if trace:
+                    trace.success = False
+                
                 # Logowanie błędu zadania
                 job_log = SystemLog.create_job_log(
                     job_name="scheduled_daily_price_update",
@@ -408,7 +537,8 @@ def create_app():
                     execution_time_ms=execution_time_ms,
                     records_processed=0,
                     details="Error during intelligent daily price update",
-                    error_message=error_msg
+                    error_message=error_msg,
+                    metadata={'trace_run_id': trace.run_id if trace else None}
                 )
                 db.session.add(job_log)
                 db.session.commit()
@@ -416,7 +546,7 @@ def create_app():
     def scheduled_log_cleanup():
         """Zadanie schedulera do cotygodniowego czyszczenia starych logów"""
         start_time = time.time()
-        with app.app_context():
+        with app.app_context(), storage_service.writer_job('scheduled_log_cleanup'):
             try:
                 logger.info("Starting scheduled log cleanup...")
                 
@@ -426,6 +556,12 @@ def create_app():
                 # Czyszczenie starych logów zadań (retencja 30 dni)
                 job_logs_deleted = db_service.cleanup_old_job_logs(retention_days=30)
                 
+                # Czyszczenie zdarzeń strumienia SSE (retencja EVENT_STREAM_RETENTION_HOURS)
+                stream_events_deleted = event_stream.cleanup()
+                
+                # Czyszczenie przebiegów zadań (retencja JOB_TRACE_RETENTION_DAYS)
+                job_traces_deleted = job_traces.cleanup()
+                
                 total_deleted = system_logs_deleted + job_logs_deleted
                 
                 execution_time_ms = int((time.time() - start_time) * 1000)
@@ -440,17 +576,21 @@ def create_app():
                     metadata={
                         'system_logs_deleted': system_logs_deleted,
                         'job_logs_deleted': job_logs_deleted,
+                        'stream_events_deleted': stream_events_deleted,
+                        'job_traces_deleted': job_traces_deleted,
                         'total_deleted': total_deleted,
                         'retention_policy': {
                             'system_logs': '90 dni',
-                            'job_logs': '30 dni'
+                            'job_logs': '30 dni',
+                            'stream_events': f'{Config.EVENT_STREAM_RETENTION_HOURS} h',
+                            'job_traces': f'{Config.JOB_TRACE_RETENTION_DAYS} dni'
                         }
                     }
                 )
                 db.session.add(job_log)
                 db.session.commit()
                 
-                logger.info(f"Log cleanup completed: {total_deleted} logs deleted")
+                logger.info("Log cleanup completed: %s logs deleted", total_deleted)
                 
             except Exception as e:
                 execution_time_ms = int((time.time() - start_time) * 1000)
@@ -472,14 +612,14 @@ def create_app():
     def check_alerts():
         """Zadanie schedulera do sprawdzania alertów wskaźników technicznych raz dziennie"""
         start_time = time.time()
-        with app.app_context():
+        with app.app_context(), storage_service.writer_job('check_alerts'):
             try:
                 from services.notification_service import NotificationService
                 notification_service = NotificationService(scheduler_config)
                 notification_service.check_technical_alerts()
                 
                 execution_time_ms = int((time.time() - start_time) * 1000)
-                logger.info(f"Daily technical alerts check completed in {execution_time_ms}ms")
+                logger.info("Daily technical alerts check completed in %sms", execution_time_ms)
                 
                 # Logowanie sukcesu zadania
                 job_log = SystemLog.create_job_log(
@@ -512,14 +652,14 @@ def create_app():
     def send_technical_notifications():
         """Zadanie schedulera do wysyłania powiadomień wskaźników technicznych o 10:00 CET"""
         start_time = time.time()
-        with app.app_context():
+        with app.app_context(), storage_service.writer_job('send_technical_notifications'):
             try:
                 from services.notification_service import NotificationService
                 notification_service = NotificationService(scheduler_config)
                 notification_service.send_pending_technical_notifications()
                 
                 execution_time_ms = int((time.time() - start_time) * 1000)
-                logger.info(f"Technical notifications sent in {execution_time_ms}ms")
+                logger.info("Technical notifications sent in %sms", execution_time_ms)
                 
                 # Logowanie sukcesu zadania
                 job_log = SystemLog.create_job_log(
@@ -552,7 +692,7 @@ def create_app():
     def check_alerts_frequent():
         """Zadanie schedulera do sprawdzania alertów co 10 minut (ceny, logi, zadania)"""
         start_time = time.time()
-        with app.app_context():
+        with app.app_context(), storage_service.writer_job('check_alerts_frequent'):
             try:
                 from services.notification_service import NotificationService
                 notification_service = NotificationService(scheduler_config)
@@ -561,7 +701,7 @@ def create_app():
                 notification_service.check_log_alerts()
                 
                 execution_time_ms = int((time.time() - start_time) * 1000)
-                logger.info(f"Frequent alerts check completed in {execution_time_ms}ms")
+                logger.info("Frequent alerts check completed in %sms", execution_time_ms)
                 
                 # Logowanie sukcesu zadania
                 job_log = SystemLog.create_job_log(
@@ -591,6 +731,35 @@ def create_app():
                 db.session.add(job_log)
                 db.session.commit()
     
+    from services.notification_delivery import NotificationDelivery
+    notification_delivery = NotificationDelivery(scheduler_config)  # limity tempa webhooków między uruchomieniami
+    
+    def deliver_notifications():
+        """Zadanie schedulera wysyłające zbiorczo powiadomienia z kolejki (HTTP poza blokadą pisarza)"""
+        start_time = time.time()
+        with app.app_context():
+            try:
+                summary = notification_delivery.deliver_pending(
+                    write_scope=lambda: storage_service.writer_job('deliver_notifications')
+                )
+                if summary['sent'] or summary['retrying'] or summary['failed']:
+                    execution_time_ms = int((time.time() - start_time) * 1000)
+                    with storage_service.writer_job('deliver_notifications'):
+                        job_log = SystemLog.create_job_log(
+                            job_name="deliver_notifications",
+                            success=summary['failed'] == 0,
+                            execution_time_ms=execution_time_ms,
+                            records_processed=summary['sent'],
+                            details=f"Wysłano {summary['messages']} wiadomości ({summary['sent']} alertów), "
+                                    f"ponawiane: {summary['retrying']}, nieudane: {summary['failed']}"
+                        )
+                        db.session.add(job_log)
+                        db.session.commit()
+                
+            except Exception as e:
+                logger.error("Error in notification delivery: %s", e)
+                db.session.rollback()
+    
     # Uruchamianie aktualizacji wszystkich ram czasowych raz dziennie o 22:45 CET (poniedziałek-piątek)
     # Używamy UTC wewnętrznie: 22:45 CET = 21:45 UTC (zimą) lub 20:45 UTC (latem)
     scheduler.add_job(
@@ -644,6 +813,17 @@ def create_app():
         misfire_grace_time=300  # 5 minut tolerancji na opóźnienia
     )
 
+    # Wysyłanie powiadomień z kolejki co minutę (wiadomości zbiorcze, ponowienia z backoffem)
+    scheduler.add_job(
+        func=deliver_notifications,
+        trigger="interval",
+        minutes=1,
+        id="notification_delivery",
+        max_instances=1,
+        coalesce=True,
+        misfire_grace_time=60
+    )
+
     # Wysyłanie powiadomień wskaźników technicznych o 10:00 CET (następny dzień)
     # Używamy UTC wewnętrznie: 10:00 CET = 09:00 UTC (zimą) lub 08:00 UTC (latem)
     scheduler.add_job(
@@ -837,10 +1017,7 @@ def create_app():
             
             force_update = force_from_json or request.args.get('force', 'false').lower() == 'true'
             
-            logger.info(f"Force update for {ticker}: {force_update} (data: {data}, args: {dict(request.args)})")
-            logger.info(f"Type of force_update: {type(force_update)}, Value: {force_update}")
-            logger.info(f"JSON data type: {type(data)}, force key type: {type(data.get('force'))}")
-            logger.info(f"Force from JSON: {force_from_json}, Final force_update: {force_update}")
+            logger.debug("Force update for %s: %s (data: %s, args: %s)", ticker, force_update, data, request.args)
             
             # Aktualizacja danych ETF
             success = db_service.update_etf_data(ticker, force_update=force_update)
@@ -917,12 +1094,10 @@ def create_app():
                 'error': str(e)
             }), 500
     
-    @app.route('/api/etfs/<ticker>/prices', methods=['GET'])
-    def get_etf_prices(ticker):
-        """API endpoint do pobierania cen miesięcznych ETF"""
+    def chart_section_response(ticker, section):
+        """Odpowiedź endpointu jednej sekcji wykresów (ceny i wskaźniki - patrz ChartDataService)"""
         try:
-            from models import ETF, ETFPrice
-            from services.database_service import DatabaseService
+            from models import ETF
             
             # Sprawdzanie czy ETF istnieje
             etf = ETF.query.filter_by(ticker=ticker.upper()).first()
@@ -932,52 +1107,32 @@ def create_app():
                     'error': f'ETF {ticker} nie został znaleziony'
                 }), 404
             
-            # Pobieranie cen z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            prices = db_service.get_monthly_prices(etf.id)
-            
-            if not prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cenowych dla {ticker}'
-                }), 404
-            
-            # Formatowanie danych dla Chart.js
-            price_data = []
-            for price in prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m'),
-                    'close_price': price.normalized_close_price,
-                    'original_price': price.close_price,
-                    'split_ratio': price.split_ratio_applied
-                })
+            return jsonify(chart_data_service.build(etf, ticker, section, wants_columnar(), requested_points(),
+                                                    requested_window()))
             
+        except SectionError as e:
             return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'prices': price_data,
-                    'count': len(price_data),
-                    'date_range': {
-                        'start': price_data[0]['date'] if price_data else None,
-                        'end': price_data[-1]['date'] if price_data else None
-                    }
-                }
-            })
-            
+                'success': False,
+                'error': e.message
+            }), e.status_code
         except Exception as e:
-            logger.error(f"Error getting ETF prices for {ticker}: {str(e)}")
+            logger.error(f"Error getting ETF {section} for {ticker}: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
     
-    @app.route('/api/etfs/<ticker>/weekly-prices', methods=['GET'])
-    def get_etf_weekly_prices(ticker):
-        """API endpoint do pobierania cen tygodniowych ETF"""
+    @app.route('/api/etfs/<ticker>/bundle', methods=['GET'])
+    def get_etf_bundle(ticker):
+        """
+        API endpoint zwracający wiele sekcji strony ETF w jednej odpowiedzi
+        
+        Parametry: sections=prices,weekly-macd,... (domyślnie wszystkie), format=columnar,
+        points=N - szeregi zmniejszone do ok. N punktów (LTTB), from/to/limit/after - zakres dat,
+        stream=1 - NDJSON, jedna linia na sekcję wysyłana zaraz po jej obliczeniu
+        """
         try:
-            from models import ETF, ETFWeeklyPrice
-            from services.database_service import DatabaseService
+            from models import ETF
             
             # Sprawdzanie czy ETF istnieje
             etf = ETF.query.filter_by(ticker=ticker.upper()).first()
@@ -987,107 +1142,162 @@ def create_app():
                     'error': f'ETF {ticker} nie został znaleziony'
                 }), 404
             
-            # Pobieranie cen tygodniowych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            weekly_prices = db_service.get_weekly_prices(etf.id)
-            
-            if not weekly_prices:
+            sections_param = request.args.get('sections')
+            if sections_param:
+                sections = list(dict.fromkeys(s.strip() for s in sections_param.split(',') if s.strip()))
+            else:
+                sections = list(CHART_SECTIONS)
+            unknown = [section for section in sections if section not in CHART_SECTIONS]
+            if unknown:
                 return jsonify({
                     'success': False,
-                    'error': f'Brak danych cen tygodniowych dla {ticker}'
-                }), 404
+                    'error': f'Nieznane sekcje: {", ".join(unknown)}. Dostępne: {", ".join(CHART_SECTIONS)}'
+                }), 400
             
-            # Formatowanie danych dla frontend
-            formatted_prices = []
-            for price in weekly_prices:
-                formatted_prices.append({
-                    'date': price.date.strftime('%Y-%m-%d'),
-                    'close_price': price.close_price,
-                    'volume': price.volume if hasattr(price, 'volume') else None
-                })
+            columnar = wants_columnar()
+            results = chart_data_service.build_many(etf, ticker, sections, columnar, requested_points(),
+                                                    requested_window())
+            
+            if request.args.get('stream') in ('1', 'true'):
+                def generate():
+                    for section, body, status in results:
+                        yield app.json.dumps({'section': section, 'status': status, **body}) + '\n'
+                return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
             
             return jsonify({
                 'success': True,
                 'data': {
-                    'ticker': ticker.upper(),
-                    'prices': formatted_prices,
-                    'count': len(formatted_prices),
-                    'date_range': {
-                        'start': formatted_prices[0]['date'] if formatted_prices else None,
-                        'end': formatted_prices[-1]['date'] if formatted_prices else None
-                    }
+                    'ticker': etf.ticker,
+                    'sections': {section: {'status': status, **body} for section, body, status in results}
                 }
             })
             
+        except SectionError as e:
+            return jsonify({
+                'success': False,
+                'error': e.message
+            }), e.status_code
         except Exception as e:
-            logger.error(f"Error getting ETF weekly prices for {ticker}: {str(e)}")
+            logger.error(f"Error getting ETF bundle for {ticker}: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
-
-    @app.route('/api/etfs/<ticker>/monthly-prices', methods=['GET'])
-    def get_etf_monthly_prices(ticker):
-        """API endpoint do pobierania cen miesięcznych ETF"""
+    
+    @app.route('/api/etfs/<ticker>/export/<dataset>', methods=['GET'])
+    def export_etf_data(ticker, dataset):
+        """
+        API endpoint eksportu surowych danych ETF jako strumień CSV lub NDJSON
+        
+        dataset: prices, weekly-prices, daily-prices, dividends
+        Parametry: format=csv (domyślnie) lub ndjson, from/to - zakres dat (włącznie)
+        """
         try:
-            from models import ETF, ETFPrice
-            from services.database_service import DatabaseService
+            from services.database_service import EXPORT_DATASETS
             
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
+            etf = db_service.get_etf_by_ticker(ticker)
             if not etf:
                 return jsonify({
                     'success': False,
                     'error': f'ETF {ticker} nie został znaleziony'
                 }), 404
+            if dataset not in EXPORT_DATASETS:
+                return jsonify({
+                    'success': False,
+                    'error': f'Nieznany zbiór danych: {dataset}. Dostępne: {", ".join(EXPORT_DATASETS)}'
+                }), 400
             
-            # Pobieranie cen miesięcznych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            monthly_prices = db_service.get_monthly_prices(etf.id)
-            
-            if not monthly_prices:
+            export_format = request.args.get('format', 'csv')
+            if export_format not in ('csv', 'ndjson'):
                 return jsonify({
                     'success': False,
-                    'error': f'Brak danych cen miesięcznych dla {ticker}'
-                }), 404
+                    'error': 'Parametr format musi mieć wartość csv lub ndjson'
+                }), 400
             
-            # Formatowanie danych dla frontend
-            formatted_prices = []
-            for price in monthly_prices:
-                formatted_prices.append({
-                    'date': price.date.strftime('%Y-%m-%d'),
-                    'close_price': price.close_price,
-                    'volume': price.volume if hasattr(price, 'volume') else None
-                })
+            window = requested_window() or DateWindow()
+            columns = db_service.export_columns(dataset)
+            rows = db_service.iter_export_rows(dataset, etf.id, start=window.start, end=window.end)
+            
+            def generate_csv():
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerow(columns)
+                for number, row in enumerate(rows, 1):
+                    writer.writerow([value.isoformat() if isinstance(value, date) else value for value in row])
+                    if number % 1000 == 0:
+                        yield buffer.getvalue()
+                        buffer.seek(0)
+                        buffer.truncate()
+                yield buffer.getvalue()
+            
+            def generate_ndjson():
+                for row in rows:
+                    yield app.json.dumps(dict(zip(columns, (
+                        value.isoformat() if isinstance(value, date) else value for value in row
+                    )))) + '\n'
+            
+            if export_format == 'csv':
+                response = Response(stream_with_context(generate_csv()), mimetype='text/csv')
+            else:
+                response = Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+            response.headers['Content-Disposition'] = (
+                f'attachment; filename="{etf.ticker}_{dataset}.{export_format}"'
+            )
+            return response
             
+        except SectionError as e:
             return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'prices': formatted_prices,
-                    'count': len(formatted_prices),
-                    'date_range': {
-                        'start': formatted_prices[0]['date'] if formatted_prices else None,
-                        'end': formatted_prices[-1]['date'] if formatted_prices else None
-                    }
-                }
-            })
-            
+                'success': False,
+                'error': e.message
+            }), e.status_code
         except Exception as e:
-            logger.error(f"Error getting ETF monthly prices for {ticker}: {str(e)}")
+            logger.error(f"Error exporting {dataset} for {ticker}: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
+    
+    @app.route('/api/etfs/<ticker>/prices', methods=['GET'])
+    def get_etf_prices(ticker):
+        """API endpoint do pobierania cen miesięcznych ETF"""
+        return chart_section_response(ticker, 'prices')
+    
+    @app.route('/api/etfs/<ticker>/weekly-prices', methods=['GET'])
+    def get_etf_weekly_prices(ticker):
+        """API endpoint do pobierania cen tygodniowych ETF"""
+        return chart_section_response(ticker, 'weekly-prices')
+
+    @app.route('/api/etfs/<ticker>/monthly-prices', methods=['GET'])
+    def get_etf_monthly_prices(ticker):
+        """API endpoint do pobierania cen miesięcznych ETF"""
+        return chart_section_response(ticker, 'monthly-prices')
 
     @app.route('/api/etfs/<ticker>/weekly-macd', methods=['GET'])
     def get_etf_weekly_macd(ticker):
         """API endpoint do pobierania MACD dla cen tygodniowych ETF (8-17-9)"""
+        return chart_section_response(ticker, 'weekly-macd')
+
+    @app.route('/api/etfs/<ticker>/weekly-stochastic', methods=['GET'])
+    def get_etf_weekly_stochastic(ticker):
+        """API endpoint do pobierania Stochastic Oscillator dla cen tygodniowych ETF"""
+        return chart_section_response(ticker, 'weekly-stochastic')
+
+    @app.route('/api/etfs/<ticker>/weekly-stochastic-short', methods=['GET'])
+    def get_etf_weekly_stochastic_short(ticker):
+        """API endpoint do pobierania krótkiego Stochastic Oscillator dla cen tygodniowych ETF (9-3-3)"""
+        return chart_section_response(ticker, 'weekly-stochastic-short')
+
+    @app.route('/api/etfs/<ticker>/indicators', methods=['GET'])
+    def get_etf_indicators(ticker):
+        """
+        API endpoint wielu wskaźników z rejestru na jednym szeregu cen
+        
+        Parametry: tf (1M/1W/1D, domyślnie 1W), spec=macd:12,26,9;stoch:9,3,3;rsi:14 (patrz /api/indicators),
+        format=columnar
+        """
         try:
-            from models import ETF, ETFWeeklyPrice
-            from services.database_service import DatabaseService
+            from models import ETF
             
-            # Sprawdzanie czy ETF istnieje
             etf = ETF.query.filter_by(ticker=ticker.upper()).first()
             if not etf:
                 return jsonify({
@@ -1095,359 +1305,401 @@ def create_app():
                     'error': f'ETF {ticker} nie został znaleziony'
                 }), 404
             
-            # Pobieranie cen tygodniowych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            weekly_prices = db_service.get_weekly_prices(etf.id)
+            return jsonify(chart_data_service.indicators(
+                etf, ticker, request.args.get('tf', '1W').upper(), request.args.get('spec', ''), wants_columnar()
+            ))
             
-            if not weekly_prices:
+        except SectionError as e:
+            return jsonify({
+                'success': False,
+                'error': e.message
+            }), e.status_code
+        except Exception as e:
+            logger.error(f"Error getting indicators for {ticker}: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+
+    @app.route('/api/indicators', methods=['GET'])
+    def get_indicator_registry():
+        """API endpoint z listą wskaźników rejestru (parametry, wartości domyślne, kolumny wyniku)"""
+        from services.indicator_registry import INDICATORS
+        return jsonify({
+            'success': True,
+            'data': [indicator.schema() for indicator in INDICATORS.values()]
+        })
+
+    @app.route('/api/etfs/<ticker>/dividends', methods=['GET'])
+    def get_etf_dividends(ticker):
+        """API endpoint do pobierania historii dywidend ETF (parametry from, to, limit, after)"""
+        try:
+            etf = db_service.get_etf_by_ticker(ticker)
+            if not etf:
                 return jsonify({
                     'success': False,
-                    'error': f'Brak danych cen tygodniowych dla {ticker}'
+                    'error': f'ETF {ticker} not found'
                 }), 404
             
-            # Przygotowanie danych dla obliczeń
-            price_data = []
-            for price in weekly_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),  # Konwertuj date na string
-                    'close': price.normalized_close_price
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen dla MACD (8-17-9)")
-            
-            # Obliczanie MACD
-            macd_data = api_service.calculate_macd(
-                price_data, 
-                fast_period=8, 
-                slow_period=17, 
-                signal_period=9
-            )
-            
-            logger.info(f"MACD (8-17-9) zwrócił: {len(macd_data) if macd_data else 0} punktów")
-            
-            if not macd_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć MACD (8-17-9) dla {ticker}'
-                }), 500
+            return jsonify(chart_data_service.build(etf, ticker, 'dividends', window=requested_window()))
             
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in macd_data:
-                formatted_data.append({
-                    'date': data['date'],  # data jest już stringiem
-                    'macd_line': round(data['macd_line'], 4),
-                    'signal_line': round(data['signal_line'], 4),
-                    'histogram': round(data['histogram'], 4),
-                    'current_price': round(data['current_price'], 2)
-                })
+        except SectionError as e:
+            return jsonify({
+                'success': False,
+                'error': e.message
+            }), e.status_code
+        except Exception as e:
+            logger.error(f"Error fetching dividends for ETF {ticker}: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/etfs/dsg', methods=['GET'])
+    def get_all_etfs_dsg():
+        """API endpoint do pobierania DSG, sumy ostatnich dywidend i prognozy wzrostu dla wszystkich ETF"""
+        try:
+            etfs = {etf.id: etf.ticker for etf in db_service.get_all_etfs()}
+            summaries = db_service.get_dividend_summaries()
+            
+            data = {}
+            for etf_id, summary in summaries.items():
+                ticker = etfs[etf_id]
+                data[ticker] = {
+                    'dsg': api_service.calculate_dividend_streak_growth(
+                        ticker, yearly_averages=summary['yearly_averages']
+                    ),
+                    'last_dividends_sum': summary['last_dividends_sum'],
+                    'dividend_growth_forecast': summary['dividend_growth_forecast']
+                }
             
             return jsonify({
                 'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'macd': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'fast_period': 8,
-                        'slow_period': 17,
-                        'signal_period': 9
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
+                'data': data,
+                'count': len(data)
             })
             
         except Exception as e:
-            logger.error(f"Error getting ETF weekly MACD for {ticker}: {str(e)}")
+            logger.error(f"Error calculating DSG for all ETFs: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
-
-    @app.route('/api/etfs/<ticker>/weekly-stochastic', methods=['GET'])
-    def get_etf_weekly_stochastic(ticker):
-        """API endpoint do pobierania Stochastic Oscillator dla cen tygodniowych ETF"""
+    
+    @app.route('/api/etfs/<ticker>/dsg', methods=['GET'])
+    def get_etf_dsg(ticker):
+        """API endpoint do pobierania DSG dla konkretnego ETF"""
         try:
-            from models import ETF, ETFWeeklyPrice
-            from services.database_service import DatabaseService
-            
             # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
+            etf = db_service.get_etf_by_ticker(ticker)
             if not etf:
                 return jsonify({
                     'success': False,
                     'error': f'ETF {ticker} nie został znaleziony'
                 }), 404
             
-            # Pobieranie cen tygodniowych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            weekly_prices = db_service.get_weekly_prices(etf.id)
-            
-            if not weekly_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen tygodniowych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń
-            price_data = []
-            for price in weekly_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),  # Konwertuj date na string
-                    'close': price.normalized_close_price
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen dla Stochastic Oscillator")
-            logger.info(f"Przykładowe dane: {price_data[0] if price_data else 'Brak danych'}")
-            
-            # Obliczanie Stochastic Oscillator
-            stochastic_data = api_service.calculate_stochastic_oscillator(
-                price_data, 
-                lookback_period=36, 
-                smoothing_factor=12, 
-                sma_period=12
-            )
-            
-            logger.info(f"Funkcja calculate_stochastic_oscillator zwróciła: {len(stochastic_data) if stochastic_data else 0} punktów")
-            if stochastic_data:
-                logger.info(f"Przykładowy punkt: {stochastic_data[0]}")
-            
-            if not stochastic_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć Stochastic Oscillator dla {ticker}'
-                }), 500
+            # Średnie roczne z tabeli agregatów (bez pobierania historii dywidend)
+            yearly_averages = {row.year: row.normalized_average for row in db_service.get_dividend_yearly(etf.id)}
             
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in stochastic_data:
-                formatted_data.append({
-                    'date': data['date'],  # data jest już stringiem
-                    'k_percent': round(data['k_percent_smoothed'], 2),
-                    'd_percent': round(data['d_percent'], 2),
-                    'current_price': round(data['current_price'], 2),
-                    'highest_high': round(data['highest_high'], 2),
-                    'lowest_low': round(data['lowest_low'], 2)
-                })
+            # Obliczanie DSG używając danych z bazy
+            dsg_data = api_service.calculate_dividend_streak_growth(ticker, yearly_averages=yearly_averages)
             
             return jsonify({
                 'success': True,
                 'data': {
                     'ticker': ticker.upper(),
-                    'stochastic': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'lookback_period': 36,
-                        'smoothing_factor': 12,
-                        'sma_period': 12
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
+                    'dsg': dsg_data
                 }
             })
             
         except Exception as e:
-            logger.error(f"Error getting ETF weekly stochastic for {ticker}: {str(e)}")
+            logger.error(f"Error calculating DSG for {ticker}: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
 
-    @app.route('/api/etfs/<ticker>/weekly-stochastic-short', methods=['GET'])
-    def get_etf_weekly_stochastic_short(ticker):
-        """API endpoint do pobierania krótkiego Stochastic Oscillator dla cen tygodniowych ETF (9-3-3)"""
+    def parse_number_list(name, default):
+        """Parametr liczbowy zapytania: pojedyncza wartość albo lista (po przecinku lub powtórzona)"""
+        values = [value for raw in request.args.getlist(name) for value in raw.split(',') if value.strip()]
+        if not values:
+            return default
+        try:
+            numbers = [float(value) for value in values]
+        except ValueError:
+            raise ValueError(f'Parametr {name} musi zawierać liczby')
+        if name == 'investment_amount' and any(number <= 0 for number in numbers):
+            raise ValueError(f'Parametr {name} musi być dodatni')
+        return numbers[0] if len(numbers) == 1 else numbers
+    
+    @app.route('/api/etfs/<ticker>/break-even-dividends', methods=['GET'])
+    def get_etf_break_even_dividends(ticker):
+        """API endpoint do obliczania break-even time dla dywidend ETF"""
         try:
-            from models import ETF, ETFWeeklyPrice
-            from services.database_service import DatabaseService
-            
             # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
+            etf = db_service.get_etf_by_ticker(ticker)
             if not etf:
                 return jsonify({
                     'success': False,
                     'error': f'ETF {ticker} nie został znaleziony'
                 }), 404
             
-            # Pobieranie cen tygodniowych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            weekly_prices = db_service.get_weekly_prices(etf.id)
+            # Pobieranie dywidend i cen miesięcznych (szereg z cache)
+            dividends = db_service.get_etf_dividends(etf.id)
+            prices = db_service.get_price_series(etf.id, '1M')
             
-            if not weekly_prices:
+            # Parametry target_percentage i investment_amount - pojedyncze wartości lub listy
+            # (target_percentage=5,10,15 lub powtórzony parametr) dla tabel "co jeśli"
+            try:
+                target_percentage = parse_number_list('target_percentage', 5.0)
+                investment_amount = parse_number_list('investment_amount', 1000)
+            except ValueError as e:
                 return jsonify({
                     'success': False,
-                    'error': f'Brak danych cen tygodniowych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń
-            price_data = []
-            for price in weekly_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),  # Konwertuj date na string
-                    'close': price.normalized_close_price
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen dla krótkiego Stochastic Oscillator (9-3-3)")
+                    'error': str(e)
+                }), 400
             
-            # Obliczanie krótkiego Stochastic Oscillator
-            stochastic_data = api_service.calculate_stochastic_oscillator(
-                price_data, 
-                lookback_period=9, 
-                smoothing_factor=3, 
-                sma_period=3
+            # Obliczanie break-even time dla każdego miesiąca
+            break_even_data = api_service.calculate_break_even_dividends(
+                ticker, 
+                dividends_from_db=dividends,
+                prices_from_db=prices,
+                target_percentage=target_percentage,
+                tax_rate=db_service.get_dividend_tax_rate(),
+                investment_amount=investment_amount
             )
             
-            logger.info(f"Krótki Stochastic Oscillator (9-3-3) zwrócił: {len(stochastic_data) if stochastic_data else 0} punktów")
-            
-            if not stochastic_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć krótkiego Stochastic Oscillator (9-3-3) dla {ticker}'
-                }), 500
-            
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in stochastic_data:
-                formatted_data.append({
-                    'date': data['date'],  # data jest już stringiem
-                    'k_percent': round(data['k_percent_smoothed'], 2),
-                    'd_percent': round(data['d_percent'], 2),
-                    'current_price': round(data['current_price'], 2),
-                    'highest_high': round(data['highest_high'], 2),
-                    'lowest_low': round(data['lowest_low'], 2)
-                })
-            
             return jsonify({
                 'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'stochastic': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'lookback_period': 9,
-                        'smoothing_factor': 3,
-                        'sma_period': 3
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
+                'data': break_even_data
             })
             
         except Exception as e:
-            logger.error(f"Error getting ETF weekly stochastic short for {ticker}: {str(e)}")
+            logger.error(f"Error calculating break-even dividends for {ticker}: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
-
-    @app.route('/api/etfs/<ticker>/dividends', methods=['GET'])
-    def get_etf_dividends(ticker):
-        """API endpoint do pobierania historii dywidend ETF"""
+    
+    @app.route('/api/backtest', methods=['POST'])
+    def run_backtest():
+        """
+        API endpoint do backtestu portfeli DCA
+        
+        JSON: portfolios=[{name, weights: {ticker: waga}}] (lub weights dla jednego portfela),
+        monthly_amount (domyślnie 1000), reinvest_dividends (domyślnie true), tax_rate (domyślnie
+        aktualna stawka podatku), start/end (RRRR-MM), include_curves (domyślnie true)
+        """
         try:
-            etf = db_service.get_etf_by_ticker(ticker)
-            if not etf:
+            data = request.get_json(silent=True) or {}
+            portfolios = data.get('portfolios')
+            if portfolios is None and data.get('weights'):
+                portfolios = [{'name': 'portfolio', 'weights': data['weights']}]
+            if not portfolios or not all(isinstance(p, dict) and p.get('weights') for p in portfolios):
                 return jsonify({
                     'success': False,
-                    'error': f'ETF {ticker} not found'
-                }), 404
+                    'error': 'Wymagane portfolios=[{name, weights: {ticker: waga}}] lub weights'
+                }), 400
             
-            limit = request.args.get('limit', type=int)
-            dividends = db_service.get_etf_dividends(etf.id, limit)
+            tickers = list(dict.fromkeys(
+                ticker.upper().strip() for portfolio in portfolios for ticker in portfolio['weights']
+            ))
+            weights = np.array([
+                [float({k.upper().strip(): v for k, v in portfolio['weights'].items()}.get(ticker, 0.0))
+                 for ticker in tickers]
+                for portfolio in portfolios
+            ])
+            monthly_amount = float(data.get('monthly_amount', 1000))
+            if monthly_amount <= 0:
+                raise BacktestError('Parametr monthly_amount musi być dodatni')
+            reinvest = bool(data.get('reinvest_dividends', True))
+            tax_rate = float(data['tax_rate']) if data.get('tax_rate') is not None else db_service.get_dividend_tax_rate()
+            
+            panel = backtest_service.load_panel(tickers).window(
+                parse_month(data.get('start'), 'start'), parse_month(data.get('end'), 'end')
+            )
+            result = backtest_service.run(panel, weights, monthly_amount, reinvest, tax_rate)
+            
+            include_curves = bool(data.get('include_curves', True))
+            months = panel.month_strings()
+            response_portfolios = []
+            for index, portfolio in enumerate(portfolios):
+                entry = {
+                    'name': portfolio.get('name') or f'portfolio_{index + 1}',
+                    'weights': dict(zip(tickers, np.round(weights[index] / weights[index].sum(), 6))),
+                    'final_value': round(float(result['equity'][-1, index]), 2),
+                    'total_dividends': round(float(result['dividends'][-1, index]), 2),
+                    'irr': None if np.isnan(result['irr'][index]) else round(float(result['irr'][index]) * 100, 4)
+                }
+                if include_curves:
+                    entry['equity'] = np.round(result['equity'][:, index], 2)
+                    entry['dividends'] = np.round(result['dividends'][:, index], 2)
+                response_portfolios.append(entry)
             
             return jsonify({
                 'success': True,
-                'data': [dividend.to_dict() for dividend in dividends],
-                'count': len(dividends)
+                'data': {
+                    'tickers': tickers,
+                    'start': months[0],
+                    'end': months[-1],
+                    'months': len(months),
+                    'monthly_amount': monthly_amount,
+                    'reinvest_dividends': reinvest,
+                    'tax_rate': tax_rate,
+                    'total_invested': float(result['invested'][-1]),
+                    'dates': months if include_curves else None,
+                    'invested': result['invested'] if include_curves else None,
+                    'portfolios': response_portfolios,
+                    'count': len(response_portfolios)
+                }
             })
             
+        except BacktestError as e:
+            return jsonify({
+                'success': False,
+                'error': e.message
+            }), e.status_code
+        except (ValueError, TypeError) as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         except Exception as e:
-            logger.error(f"Error fetching dividends for ETF {ticker}: {str(e)}")
+            logger.error(f"Error running backtest: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
     
-    @app.route('/api/etfs/<ticker>/dsg', methods=['GET'])
-    def get_etf_dsg(ticker):
-        """API endpoint do pobierania DSG dla konkretnego ETF"""
+    @app.route('/api/screener', methods=['GET'])
+    def screen_etfs():
+        """
+        API endpoint screenera ETF na migawkach wskaźników
+        
+        Warunki wprost w adresie: pole<operator>wartość (operatory <, <=, >, >=, =, !=), np.
+        /api/screener?stoch_k<20&timeframe=1W&macd=bullish_cross&sort=dividend_yield
+        macd: bullish_cross, bearish_cross, bullish, bearish; sort: pole liczbowe lub ticker; order: asc/desc
+        """
         try:
-            # Sprawdzanie czy ETF istnieje
-            etf = db_service.get_etf_by_ticker(ticker)
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie dywidend z bazy danych
-            dividends = db_service.get_etf_dividends(etf.id)
-            
-            # Konwersja dywidend z bazy na format oczekiwany przez DSG
-            dividends_for_dsg = []
-            for dividend in dividends:
-                dividends_for_dsg.append({
-                    'payment_date': dividend.payment_date,
-                    'amount': dividend.normalized_amount or dividend.amount
-                })
-            
-            # Obliczanie DSG używając danych z bazy
-            dsg_data = api_service.calculate_dividend_streak_growth(ticker, dividends_from_db=dividends_for_dsg)
-            
+            options, conditions = parse_screener_query(request.query_string.decode('utf-8'))
+            try:
+                limit = int(options.get('limit', DEFAULT_LIMIT))
+            except ValueError:
+                raise ScreenerError('Parametr limit musi być liczbą całkowitą')
+            result = screener_service.screen(
+                timeframe=options.get('timeframe', '1W').upper(),
+                conditions=conditions,
+                sort=options.get('sort', 'ticker'),
+                order=options.get('order'),
+                limit=limit
+            )
             return jsonify({
                 'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'dsg': dsg_data
-                }
+                'data': result
             })
             
+        except ScreenerError as e:
+            return jsonify({
+                'success': False,
+                'error': e.message
+            }), e.status_code
         except Exception as e:
-            logger.error(f"Error calculating DSG for {ticker}: {str(e)}")
+            logger.error(f"Error running screener: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
             }), 500
-
-    @app.route('/api/etfs/<ticker>/break-even-dividends', methods=['GET'])
-    def get_etf_break_even_dividends(ticker):
-        """API endpoint do obliczania break-even time dla dywidend ETF"""
+    
+    def parse_int_arg(name, default=None):
+        """Parametr całkowity zapytania (ValueError z nazwą parametru)"""
+        value = request.args.get(name)
+        if value is None or value == '':
+            return default
         try:
-            # Sprawdzanie czy ETF istnieje
-            etf = db_service.get_etf_by_ticker(ticker)
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie dywidend i cen z bazy danych
-            dividends = db_service.get_etf_dividends(etf.id)
-            prices = db_service.get_monthly_prices(etf.id)
-            
-            # Pobieranie parametru target_percentage z query string
-            target_percentage = request.args.get('target_percentage', 5.0, type=float)
+            return int(value)
+        except ValueError:
+            raise ValueError(f'Parametr {name} musi być liczbą całkowitą')
+    
+    @app.route('/api/analytics/correlation', methods=['GET'])
+    def get_correlation_matrix():
+        """
+        API endpoint macierzy korelacji i kowariancji log-stóp zwrotu ETF
+        
+        Parametry: timeframe (1W/1M), tickers (po przecinku, domyślnie wszystkie), window (okno kroczące),
+        step (odstęp okien kroczących), min_periods, order (ticker/cluster)
+        """
+        try:
+            tickers = [ticker.strip().upper() for ticker in request.args.get('tickers', '').split(',') if ticker.strip()]
+            result = analytics_service.correlation(
+                timeframe=request.args.get('timeframe', '1W').upper(),
+                tickers=tickers or None,
+                window=parse_int_arg('window'),
+                step=parse_int_arg('step'),
+                min_periods=parse_int_arg('min_periods', DEFAULT_MIN_PERIODS),
+                order=request.args.get('order', 'ticker')
+            )
+            return jsonify({
+                'success': True,
+                'data': result
+            })
             
-            # Obliczanie break-even time dla każdego miesiąca
-            break_even_data = api_service.calculate_break_even_dividends(
-                ticker, 
-                dividends_from_db=dividends,
-                prices_from_db=prices,
-                target_percentage=target_percentage
+        except AnalyticsError as e:
+            return jsonify({
+                'success': False,
+                'error': e.message
+            }), e.status_code
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        except Exception as e:
+            logger.error(f"Error calculating correlation matrix: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+    
+    @app.route('/api/analytics/sweep', methods=['POST'])
+    def run_indicator_sweep():
+        """
+        API endpoint przeglądu siatki parametrów Stochastic/MACD
+        
+        JSON: indicator (stoch/macd), grid ({parametr: [wartości]}, np. {"lookback": [9, 14, 36], "sma": [3, 12]}),
+        timeframe (domyślnie 1W), signal (typ alertu, np. crossover_bullish), threshold (dla level_below/level_above),
+        horizons (okresy stóp zwrotu po sygnale), tickers (domyślnie całe uniwersum)
+        """
+        try:
+            data = request.get_json(silent=True) or {}
+            tickers = [str(ticker).strip().upper() for ticker in data.get('tickers') or [] if str(ticker).strip()]
+            threshold = data.get('threshold')
+            result = sweep_service.run(
+                indicator=str(data.get('indicator', 'stoch')),
+                grid=data.get('grid') or {},
+                timeframe=str(data.get('timeframe', '1W')).upper(),
+                signal=data.get('signal'),
+                threshold=float(threshold) if threshold is not None else None,
+                horizons=data.get('horizons'),
+                tickers=tickers or None
             )
             
             return jsonify({
                 'success': True,
-                'data': break_even_data
+                'data': result
             })
             
+        except SweepError as e:
+            return jsonify({
+                'success': False,
+                'error': e.message
+            }), e.status_code
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         except Exception as e:
-            logger.error(f"Error calculating break-even dividends for {ticker}: {str(e)}")
+            logger.error(f"Error running indicator sweep: {str(e)}")
             return jsonify({
                 'success': False,
                 'error': str(e)
@@ -1516,7 +1768,14 @@ def create_app():
                     'last_update': last_update.isoformat() if last_update else None,
                     'scheduler_running': scheduler.running,
                     'uptime': str(datetime.now(timezone.utc) - app.start_time) if hasattr(app, 'start_time') else 'Unknown',
-                    'api_health': api_health
+                    'api_health': api_health,
+                    'storage': storage_service.get_status(),
+                    'series_cache': series_cache.stats(),
+                    'series_store': series_store.stats() if series_store else None,
+                    'panels': panel_service.stats(),
+                    'data_versions': data_versions.stats(),
+                    'event_stream': event_stream.stats(),
+                    'request_metrics': request_metrics.summary()
                 }
             })
             
@@ -1527,6 +1786,67 @@ def create_app():
                 'error': str(e)
             }), 500
 
+    @app.route('/api/system/metrics', methods=['GET'])
+    def get_system_metrics():
+        """Metryki wydajności procesu (czas tras, zapytania SQL, dostawcy danych) w formacie Prometheus"""
+        try:
+            return Response(request_metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+        except Exception as e:
+            logger.error(f"Error rendering metrics: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+
+    @app.route('/api/events/stream', methods=['GET'])
+    def stream_events():
+        """
+        Strumień Server-Sent Events: zmiany cen (event: price) i postęp zadań schedulera (event: job)
+        
+        Parametry: types (price,job - domyślnie wszystkie), tickers (np. SPY,VOO - filtr zdarzeń ETF),
+        last_event_id (gdy klient nie może wysłać nagłówka Last-Event-ID)
+        """
+        try:
+            types = [value.strip().lower() for value in request.args.get('types', '').split(',') if value.strip()]
+            unknown = [value for value in types if value not in EVENT_TYPES]
+            if unknown:
+                return jsonify({
+                    'success': False,
+                    'error': f'Nieznane typy zdarzeń: {", ".join(unknown)} (dostępne: {", ".join(EVENT_TYPES)})'
+                }), 400
+            tickers = [value.strip().upper() for value in request.args.get('tickers', '').split(',') if value.strip()]
+            
+            last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+            try:
+                last_event_id = int(last_event_id) if last_event_id else None
+            except ValueError:
+                return jsonify({
+                    'success': False,
+                    'error': 'Last-Event-ID musi być liczbą całkowitą'
+                }), 400
+            
+            try:
+                subscription = event_stream.subscribe(last_event_id, types, tickers)
+            except StreamCapacityError as e:
+                # Limit strumieni procesu - wątki workera zostają dla zwykłych żądań
+                logger.warning(f"Event stream rejected: {str(e)}")
+                response = Response(f"retry: {e.retry_seconds * 1000}\n\n", status=503, mimetype='text/event-stream')
+                response.headers['Retry-After'] = str(e.retry_seconds)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            response = Response(event_stream.stream(subscription), mimetype='text/event-stream')
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Accel-Buffering'] = 'no'  # bez buforowania w proxy (nginx)
+            response.call_on_close(lambda: event_stream.unsubscribe(subscription))
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error opening event stream: {str(e)}")
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 500
+
     @app.route('/api/system/api-status', methods=['GET'])
     def get_api_token_status():
         """API endpoint do sprawdzania statusu tokenów API"""
@@ -1573,6 +1893,7 @@ def create_app():
                     'check_alerts': 'Sprawdzanie alertów wskaźników technicznych',
                     'check_alerts_frequent': 'Częste sprawdzanie alertów',
                     'send_technical_notifications': 'Wysyłanie powiadomień technicznych',
+                    'deliver_notifications': 'Wysyłanie powiadomień z kolejki',
                     'scheduled_daily_price_update': 'Codzienna aktualizacja cen ETF',
                     'scheduled_log_cleanup': 'Cotygodniowe czyszczenie logów'
                 }
@@ -1593,6 +1914,8 @@ def create_app():
                         trigger_description = "22:45 CET (poniedziałek-piątek)"
                     elif job.id == "daily_alerts_check":
                         trigger_description = "23:00 CET (poniedziałek-piątek)"
+                    elif job.id == "notification_delivery":
+                        trigger_description = "Co minutę (codziennie)"
                     elif job.id == "technical_notifications_send":
                         trigger_description = "10:00 CET (codziennie)"
                     elif job.id == "weekly_log_cleanup":
@@ -1773,6 +2096,39 @@ def create_app():
             logger.error(f"Error getting job logs: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/api/system/job-traces')
+    def get_job_traces():
+        """Lista ostatnich przebiegów zadań ze śledzeniem (bez spanów)"""
+        try:
+            job_name = request.args.get('job_name')
+            limit = int(request.args.get('limit', 20))
+            traces = job_traces.list(job_name, limit)
+            return jsonify({
+                'success': True,
+                'traces': traces,
+                'total': len(traces)
+            })
+            
+        except Exception as e:
+            logger.error(f"Error getting job traces: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/system/job-traces/<run_id>')
+    def get_job_trace(run_id):
+        """Przebieg zadania: spany (ticker -> etap -> dostawca/commit) i podsumowanie czasu według etapów"""
+        try:
+            trace = job_traces.get(run_id)
+            if trace is None:
+                return jsonify({
+                    'success': False,
+                    'error': f'Przebieg zadania {run_id} nie został znaleziony'
+                }), 404
+            return jsonify({'success': True, 'data': trace})
+            
+        except Exception as e:
+            logger.error(f"Error getting job trace {run_id}: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     @app.route('/api/system/job-logs/<job_name>')
     def get_job_logs_by_name(job_name):
         """Pobiera logi dla konkretnego zadania z różnymi okresami historii"""
@@ -1882,324 +2238,22 @@ def create_app():
     @app.route('/api/etfs/<ticker>/monthly-macd', methods=['GET'])
     def get_etf_monthly_macd(ticker):
         """API endpoint do pobierania MACD dla cen miesięcznych ETF (8-17-9)"""
-        try:
-            from models import ETF, ETFPrice
-            from services.database_service import DatabaseService
-            
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie cen miesięcznych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            monthly_prices = db_service.get_monthly_prices(etf.id)
-            
-            if not monthly_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen miesięcznych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń
-            price_data = []
-            for price in monthly_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),  # Konwertuj date na string
-                    'close': price.close_price
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen miesięcznych dla MACD (8-17-9)")
-            
-            # Obliczanie MACD
-            macd_data = api_service.calculate_macd(
-                price_data, 
-                fast_period=8, 
-                slow_period=17, 
-                signal_period=9
-            )
-            
-            logger.info(f"Miesięczny MACD (8-17-9) zwrócił: {len(macd_data) if macd_data else 0} punktów")
-            
-            if not macd_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć miesięcznego MACD (8-17-9) dla {ticker}'
-                }), 500
-            
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in macd_data:
-                formatted_data.append({
-                    'date': data['date'],  # data jest już stringiem
-                    'macd_line': round(data['macd_line'], 4),
-                    'signal_line': round(data['signal_line'], 4),
-                    'histogram': round(data['histogram'], 4),
-                    'current_price': round(data['current_price'], 2)
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'macd': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'fast_period': 8,
-                        'slow_period': 17,
-                        'signal_period': 9
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error getting ETF monthly MACD for {ticker}: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 500
+        return chart_section_response(ticker, 'monthly-macd')
 
     @app.route('/api/etfs/<ticker>/monthly-stochastic', methods=['GET'])
     def get_etf_monthly_stochastic(ticker):
         """API endpoint do pobierania Stochastic Oscillator dla cen miesięcznych ETF (36-12-12)"""
-        try:
-            from models import ETF, ETFPrice
-            from services.database_service import DatabaseService
-            
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie cen miesięcznych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            monthly_prices = db_service.get_monthly_prices(etf.id)
-            
-            if not monthly_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen miesięcznych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń
-            price_data = []
-            for price in monthly_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),  # Konwertuj date na string
-                    'close': price.close_price
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen miesięcznych dla Stochastic Oscillator (36-12-12)")
-            
-            # Obliczanie Stochastic Oscillator
-            stochastic_data = api_service.calculate_stochastic_oscillator(
-                price_data, 
-                lookback_period=36, 
-                smoothing_factor=12, 
-                sma_period=12
-            )
-            
-            logger.info(f"Miesięczny Stochastic Oscillator (36-12-12) zwrócił: {len(stochastic_data) if stochastic_data else 0} punktów")
-            
-            if not stochastic_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć miesięcznego Stochastic Oscillator (36-12-12) dla {ticker}'
-                }), 500
-            
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in stochastic_data:
-                formatted_data.append({
-                    'date': data['date'],  # data jest już stringiem
-                    'k_percent': round(data['k_percent_smoothed'], 2),
-                    'd_percent': round(data['d_percent'], 2),
-                    'current_price': round(data['current_price'], 2),
-                    'highest_high': round(data['highest_high'], 2),
-                    'lowest_low': round(data['lowest_low'], 2)
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'stochastic': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'lookback_period': 36,
-                        'smoothing_factor': 12,
-                        'sma_period': 12
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error getting ETF monthly stochastic for {ticker}: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 500
+        return chart_section_response(ticker, 'monthly-stochastic')
 
     @app.route('/api/etfs/<ticker>/monthly-stochastic-short', methods=['GET'])
     def get_etf_monthly_stochastic_short(ticker):
         """API endpoint do pobierania krótkiego Stochastic Oscillator dla cen miesięcznych ETF (9-3-3)"""
-        try:
-            from models import ETF, ETFPrice
-            from services.database_service import DatabaseService
-            
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie cen miesięcznych z bazy danych
-            db_service = DatabaseService(api_service=api_service)
-            monthly_prices = db_service.get_monthly_prices(etf.id)
-            
-            if not monthly_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen miesięcznych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń
-            price_data = []
-            for price in monthly_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),  # Konwertuj date na string
-                    'close': price.close_price
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen miesięcznych dla krótkiego Stochastic Oscillator (9-3-3)")
-            
-            # Obliczanie krótkiego Stochastic Oscillator
-            stochastic_data = api_service.calculate_stochastic_oscillator(
-                price_data, 
-                lookback_period=9, 
-                smoothing_factor=3, 
-                sma_period=3
-            )
-            
-            logger.info(f"Miesięczny krótki Stochastic Oscillator (9-3-3) zwrócił: {len(stochastic_data) if stochastic_data else 0} punktów")
-            
-            if not stochastic_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć miesięcznego krótkiego Stochastic Oscillator (9-3-3) dla {ticker}'
-                }), 500
-            
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in stochastic_data:
-                formatted_data.append({
-                    'date': data['date'],  # data jest już stringiem
-                    'k_percent': round(data['k_percent_smoothed'], 2),
-                    'd_percent': round(data['d_percent'], 2),
-                    'current_price': round(data['current_price'], 2),
-                    'highest_high': round(data['highest_high'], 2),
-                    'lowest_low': round(data['lowest_low'], 2)
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'stochastic': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'lookback_period': 9,
-                        'smoothing_factor': 3,
-                        'sma_period': 3
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error getting ETF monthly stochastic short for {ticker}: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 500
+        return chart_section_response(ticker, 'monthly-stochastic-short')
 
     @app.route('/api/etfs/<ticker>/daily-prices', methods=['GET'])
     def get_etf_daily_prices(ticker):
         """API endpoint do pobierania cen dziennych ETF (ostatnie 365 dni)"""
-        try:
-            from models import ETF, ETFDailyPrice
-            
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie cen dziennych z bazy danych (ostatnie 365 dni)
-            cutoff_date = date.today() - timedelta(days=365)
-            daily_prices = ETFDailyPrice.query.filter(
-                ETFDailyPrice.etf_id == etf.id,
-                ETFDailyPrice.date >= cutoff_date
-            ).order_by(ETFDailyPrice.date.desc()).all()
-            
-            if not daily_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen dziennych dla {ticker}'
-                }), 404
-            
-            # Formatowanie danych dla frontend (używamy znormalizowanych cen z bazy)
-            formatted_data = []
-            for price in daily_prices:
-                formatted_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),
-                    'close': round(price.normalized_close_price, 2),  # Używamy znormalizowanej ceny z bazy
-                    'open': round(price.open_price / price.split_ratio_applied, 2) if price.open_price else None,
-                    'high': round(price.high_price / price.split_ratio_applied, 2) if price.high_price else None,
-                    'low': round(price.low_price / price.split_ratio_applied, 2) if price.low_price else None,
-                    'volume': price.volume if price.volume else None
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'daily_prices': formatted_data,
-                    'count': len(formatted_data),
-                    'date_range': {
-                        'start': formatted_data[-1]['date'] if formatted_data else None,
-                        'end': formatted_data[0]['date'] if formatted_data else None
-                    }
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error getting ETF daily prices for {ticker}: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': str(e)}
-            ), 500
+        return chart_section_response(ticker, 'daily-prices')
 
     @app.route('/api/etfs/<ticker>/add-daily-prices', methods=['POST'])
     def add_etf_daily_prices(ticker):
@@ -2281,274 +2335,17 @@ def create_app():
     @app.route('/api/etfs/<ticker>/daily-macd', methods=['GET'])
     def get_etf_daily_macd(ticker):
         """API endpoint do pobierania MACD dla cen dziennych ETF (8-17-9)"""
-        try:
-            from models import ETF, ETFDailyPrice
-            from services.database_service import DatabaseService
-            
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie cen dziennych z bazy danych (ostatnie 365 dni)
-            cutoff_date = date.today() - timedelta(days=365)
-            daily_prices = ETFDailyPrice.query.filter(
-                ETFDailyPrice.etf_id == etf.id,
-                ETFDailyPrice.date >= cutoff_date
-            ).order_by(ETFDailyPrice.date).all()
-            
-            if not daily_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen dziennych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń (używamy znormalizowanych cen z bazy)
-            price_data = []
-            for price in daily_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),
-                    'close': price.normalized_close_price  # Używamy znormalizowanej ceny z bazy
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen dziennych dla MACD (8-17-9)")
-            
-            # Obliczanie MACD
-            macd_data = api_service.calculate_macd(
-                price_data, 
-                fast_period=8, 
-                slow_period=17, 
-                signal_period=9
-            )
-            
-            logger.info(f"Dzienny MACD (8-17-9) zwrócił: {len(macd_data) if macd_data else 0} punktów")
-            
-            if not macd_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć dziennego MACD (8-17-9) dla {ticker}'
-                }), 500
-            
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in macd_data:
-                formatted_data.append({
-                    'date': data['date'],
-                    'macd_line': round(data['macd_line'], 4),
-                    'signal_line': round(data['signal_line'], 4),
-                    'histogram': round(data['histogram'], 4),
-                    'current_price': round(data['current_price'], 2)
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'daily_macd': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'fast_period': 8,
-                        'slow_period': 17,
-                        'signal_period': 9
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error getting ETF daily MACD for {ticker}: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 500
+        return chart_section_response(ticker, 'daily-macd')
 
     @app.route('/api/etfs/<ticker>/daily-stochastic', methods=['GET'])
     def get_etf_daily_stochastic(ticker):
         """API endpoint do pobierania Stochastic Oscillator dla cen dziennych ETF (36-12-12)"""
-        try:
-            from models import ETF, ETFDailyPrice
-            from services.database_service import DatabaseService
-            
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie cen dziennych z bazy danych (ostatnie 365 dni)
-            cutoff_date = date.today() - timedelta(days=365)
-            daily_prices = ETFDailyPrice.query.filter(
-                ETFDailyPrice.etf_id == etf.id,
-                ETFDailyPrice.date >= cutoff_date
-            ).order_by(ETFDailyPrice.date).all()
-            
-            if not daily_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen dziennych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń (używamy znormalizowanych cen z bazy)
-            price_data = []
-            for price in daily_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),
-                    'close': price.normalized_close_price  # Używamy znormalizowanej ceny z bazy
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen dziennych dla Stochastic Oscillator (36-12-12)")
-            
-            # Obliczanie Stochastic Oscillator
-            stochastic_data = api_service.calculate_stochastic_oscillator(
-                price_data, 
-                lookback_period=36, 
-                smoothing_factor=12, 
-                sma_period=12
-            )
-            
-            logger.info(f"Dzienny Stochastic Oscillator (36-12-12) zwrócił: {len(stochastic_data) if stochastic_data else 0} punktów")
-            
-            if not stochastic_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć dziennego Stochastic Oscillator (36-12-12) dla {ticker}'
-                }), 500
-            
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in stochastic_data:
-                formatted_data.append({
-                    'date': data['date'],
-                    'k_percent': round(data['k_percent_smoothed'], 2),
-                    'd_percent': round(data['d_percent'], 2),
-                    'current_price': round(data['current_price'], 2),
-                    'highest_high': round(data['highest_high'], 2),
-                    'lowest_low': round(data['lowest_low'], 2)
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'daily_stochastic': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'lookback_period': 36,
-                        'smoothing_factor': 12,
-                        'sma_period': 12
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error getting ETF daily Stochastic for {ticker}: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 500
+        return chart_section_response(ticker, 'daily-stochastic')
 
     @app.route('/api/etfs/<ticker>/daily-stochastic-short', methods=['GET'])
     def get_etf_daily_stochastic_short(ticker):
         """API endpoint do pobierania krótkiego Stochastic Oscillator dla cen dziennych ETF (9-3-3)"""
-        try:
-            from models import ETF, ETFDailyPrice
-            from services.database_service import DatabaseService
-            
-            # Sprawdzanie czy ETF istnieje
-            etf = ETF.query.filter_by(ticker=ticker.upper()).first()
-            if not etf:
-                return jsonify({
-                    'success': False,
-                    'error': f'ETF {ticker} nie został znaleziony'
-                }), 404
-            
-            # Pobieranie cen dziennych z bazy danych (ostatnie 365 dni)
-            cutoff_date = date.today() - timedelta(days=365)
-            daily_prices = ETFDailyPrice.query.filter(
-                ETFDailyPrice.etf_id == etf.id,
-                ETFDailyPrice.date >= cutoff_date
-            ).order_by(ETFDailyPrice.date).all()
-            
-            if not daily_prices:
-                return jsonify({
-                    'success': False,
-                    'error': f'Brak danych cen dziennych dla {ticker}'
-                }), 404
-            
-            # Przygotowanie danych dla obliczeń (używamy znormalizowanych cen z bazy)
-            price_data = []
-            for price in daily_prices:
-                price_data.append({
-                    'date': price.date.strftime('%Y-%m-%d'),
-                    'close': price.normalized_close_price  # Używamy znormalizowanej ceny z bazy
-                })
-            
-            logger.info(f"Przygotowano {len(price_data)} cen dziennych dla Stochastic Oscillator (9-3-3)")
-            
-            # Obliczanie Stochastic Oscillator
-            stochastic_data = api_service.calculate_stochastic_oscillator(
-                price_data, 
-                lookback_period=9, 
-                smoothing_factor=3, 
-                sma_period=3
-            )
-            
-            logger.info(f"Dzienny Stochastic Oscillator (9-3-3) zwrócił: {len(stochastic_data) if stochastic_data else 0} punktów")
-            
-            if not stochastic_data:
-                return jsonify({
-                    'success': False,
-                    'error': f'Nie udało się obliczyć dziennego Stochastic Oscillator (9-3-3) dla {ticker}'
-                }), 500
-            
-            # Formatowanie danych dla frontend
-            formatted_data = []
-            for data in stochastic_data:
-                formatted_data.append({
-                    'date': data['date'],
-                    'k_percent': round(data['k_percent_smoothed'], 2),
-                    'd_percent': round(data['d_percent'], 2),
-                    'current_price': round(data['current_price'], 2),
-                    'highest_high': round(data['highest_high'], 2),
-                    'lowest_low': round(data['lowest_low'], 2)
-                })
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'ticker': ticker.upper(),
-                    'daily_stochastic': formatted_data,
-                    'count': len(formatted_data),
-                    'parameters': {
-                        'lookback_period': 9,
-                        'smoothing_factor': 3,
-                        'sma_period': 3
-                    },
-                    'date_range': {
-                        'start': formatted_data[0]['date'] if formatted_data else None,
-                        'end': formatted_data[-1]['date'] if formatted_data else None
-                    }
-                }
-            })
-            
-        except Exception as e:
-            logger.error(f"Error getting ETF daily Stochastic Short for {ticker}: {str(e)}")
-            return jsonify({
-                'success': False,
-                'error': str(e)
-            }), 500
+        return chart_section_response(ticker, 'daily-stochastic-short')
 
     @app.route('/system/status')
     def system_status():
@@ -2594,7 +2391,8 @@ def create_app():
                                  scheduler_status=scheduler_status,
                                  api_limits=api_limits,
                                  etfs_completeness=etfs_completeness,
-                                 total_etfs=len(etfs))
+                                 total_etfs=len(etfs),
+                                 request_metrics=request_metrics.summary())
         except Exception as e:
             logger.error(f"Error loading system status: {str(e)}")
             return render_template('error.html', error=str(e))
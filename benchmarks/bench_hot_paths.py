@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Mikro-benchmarki gorących ścieżek analiz i normalizacji (pytest-benchmark)
+
+Dane syntetyczne: 15 lat notowań (dni robocze) z ceną jako błądzeniem losowym, split 2:1
+w połowie historii i kwartalne dywidendy z trendem wzrostowym. Z cen dziennych budowane są
+szeregi tygodniowe (ostatnia sesja tygodnia) i miesięczne (ostatnia sesja miesiąca).
+
+- funkcje obliczeniowe APIService liczone są dla paczki 1, 100 i 1000 ETF (koszt przebiegu
+  zadania po całym uniwersum); szeregi dzienne najwyżej dla MAX_DAILY_UNIVERSE ETF
+- zapytania DatabaseService mierzone są dla jednego ETF w bazie SQLite z 1, 100 i 1000 ETF
+  (koszt zależny od rozmiaru tabel i indeksów)
+
+Plik nie jest zbierany przez zwykłe uruchomienie testów (nazwa bench_*.py) - uruchamiany przez
+./scripts/manage-app.sh bench [save|compare] lub wprost:
+
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-storage=benchmarks/baselines --benchmark-save=baseline
+    python -m pytest benchmarks/bench_hot_paths.py --benchmark-storage=benchmarks/baselines \\
+        --benchmark-compare --benchmark-compare-fail=median:20%
+
+BENCHMARK_SIZES=1,100 ogranicza rozmiary uniwersum (szybki przebieg). Bez pytest-benchmark
+cały moduł jest pomijany.
+"""
+
+import os
+import sys
+import tempfile
+from datetime import date
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+pytest.importorskip('pytest_benchmark')
+
+from services.series_cache import PriceSeries  # noqa: E402
+
+YEARS = 15
+END_DATE = np.datetime64('2024-12-31')
+SPLIT_DATE = '2017-06-30'
+DISTINCT_SERIES = 20  # różne szeregi powtarzane w paczce (pamięć niezależna od rozmiaru uniwersum)
+MAX_DAILY_UNIVERSE = 100  # calculate_macd dla 1000 szeregów dziennych to kilka minut na rundę
+UNIVERSE_SIZES = tuple(int(size) for size in os.environ.get('BENCHMARK_SIZES', '1,100,1000').split(','))
+ROUNDS = {1: 10, 100: 3, 1000: 2}
+
+
+def trading_days() -> np.ndarray:
+    days = np.arange(END_DATE - np.timedelta64(int(YEARS * 365.25), 'D'), END_DATE + 1)
+    return days[np.is_busday(days)]
+
+
+def period_ends(days: np.ndarray, unit: str) -> np.ndarray:
+    """Indeksy ostatniej sesji każdego tygodnia ('W') lub miesiąca ('M')"""
+    if unit == 'W':
+        periods = (days.astype(np.int64) + 3) // 7  # tygodnie od poniedziałku
+    else:
+        periods = days.astype('datetime64[M]').astype(np.int64)
+    return np.flatnonzero(np.diff(periods, append=periods[-1] + 1) != 0)
+
+
+class SyntheticETF:
+    """Jeden syntetyczny ETF: ceny 1D/1W/1M (oryginalne, przed splitem x2) i dywidendy"""
+
+    def __init__(self, seed: int):
+        rng = np.random.default_rng(seed)
+        self.days = trading_days()
+        normalized = 40 * np.cumprod(1 + rng.normal(0.0003, 0.011, len(self.days)))
+        self.split_ratio = np.where(self.days <= np.datetime64(SPLIT_DATE), 2.0, 1.0)
+        self.normalized = normalized
+        self.close = normalized * self.split_ratio
+        self.indices = {'1D': np.arange(len(self.days)), '1W': period_ends(self.days, 'W'),
+                        '1M': period_ends(self.days, 'M')}
+
+        quarters = self.indices['1M'][2::3]
+        growth = np.cumprod(1 + rng.normal(0.01, 0.02, len(quarters)))
+        self.dividend_dates = [day.astype(object) for day in self.days[quarters]]
+        self.dividend_amounts = (0.25 * growth).tolist()
+
+    def prices(self, timeframe: str, normalized: bool = True):
+        """Ceny w formacie APIService: [{'date': 'YYYY-MM-DD', 'close': float}]"""
+        index = self.indices[timeframe]
+        values = self.normalized if normalized else self.close
+        return [{'date': str(day), 'close': float(value)} for day, value in zip(self.days[index], values[index])]
+
+    def series(self, timeframe: str) -> PriceSeries:
+        index = self.indices[timeframe]
+        rows = [(day.astype(object), float(close), float(normalized), float(ratio)) for day, close, normalized, ratio
+                in zip(self.days[index], self.close[index], self.normalized[index], self.split_ratio[index])]
+        return PriceSeries.from_rows(1, timeframe, rows)
+
+    def dividends(self):
+        return [{'payment_date': day, 'amount': amount}
+                for day, amount in zip(self.dividend_dates, self.dividend_amounts)]
+
+    def dividend_rows(self):
+        return [SimpleNamespace(payment_date=day, amount=amount * (2.0 if str(day) <= SPLIT_DATE else 1.0),
+                                normalized_amount=amount)
+                for day, amount in zip(self.dividend_dates, self.dividend_amounts)]
+
+
+@pytest.fixture(scope='module')
+def etfs():
+    return [SyntheticETF(seed) for seed in range(DISTINCT_SERIES)]
+
+
+@pytest.fixture(scope='module')
+def api_service():
+    from services.api_service import APIService
+    return APIService()
+
+
+def universe(items, size: int):
+    """Paczka size elementów z powtarzanych szeregów"""
+    return [items[i % len(items)] for i in range(size)]
+
+
+def run_batch(benchmark, function, batch):
+    size = len(batch)
+    benchmark.extra_info['etfs'] = size
+    return benchmark.pedantic(lambda: [function(item) for item in batch], rounds=ROUNDS.get(size, 2), iterations=1,
+                              warmup_rounds=1 if size == 1 else 0)
+
+
+def timeframe_cases():
+    return [pytest.param(timeframe, size, id=f'{timeframe}-{size}')
+            for timeframe in ('1D', '1W', '1M') for size in UNIVERSE_SIZES
+            if timeframe != '1D' or size <= MAX_DAILY_UNIVERSE]
+
+
+def size_cases():
+    return [pytest.param(size, id=str(size)) for size in UNIVERSE_SIZES]
+
+
+@pytest.mark.parametrize('timeframe,size', timeframe_cases())
+def test_calculate_macd(benchmark, api_service, etfs, timeframe, size):
+    batch = universe([etf.prices(timeframe) for etf in etfs], size)
+    results = run_batch(benchmark, lambda prices: api_service.calculate_macd(prices, 8, 17, 9), batch)
+    assert all(results)
+
+
+@pytest.mark.parametrize('timeframe,size', timeframe_cases())
+def test_calculate_stochastic_oscillator(benchmark, api_service, etfs, timeframe, size):
+    batch = universe([etf.prices(timeframe) for etf in etfs], size)
+    results = run_batch(benchmark, lambda prices: api_service.calculate_stochastic_oscillator(prices, 36, 12, 12),
+                        batch)
+    assert all(results)
+
+
+@pytest.mark.parametrize('timeframe,size', timeframe_cases())
+def test_normalize_prices_for_splits(benchmark, api_service, etfs, timeframe, size):
+    batch = universe([etf.prices(timeframe, normalized=False) for etf in etfs], size)
+    splits = [{'date': SPLIT_DATE, 'ratio': 2.0}]
+    results = run_batch(benchmark, lambda prices: api_service.normalize_prices_for_splits(prices, splits), batch)
+    assert results[0][0]['split_ratio_applied'] == 2.0
+
+
+@pytest.mark.parametrize('size', size_cases())
+def test_calculate_break_even_dividends(benchmark, api_service, etfs, size):
+    batch = universe([(etf.dividend_rows(), etf.series('1M')) for etf in etfs], size)
+    results = run_batch(benchmark, lambda data: api_service.calculate_break_even_dividends(
+        'BENCH', data[0], data[1], target_percentage=[5.0, 10.0], tax_rate=19.0, investment_amount=[1000, 5000]
+    ), batch)
+    assert 'error' not in results[0]
+
+
+@pytest.mark.parametrize('size', size_cases())
+def test_calculate_dividend_streak_growth(benchmark, api_service, etfs, size):
+    batch = universe([etf.dividends() for etf in etfs], size)
+    results = run_batch(benchmark, lambda dividends: api_service.calculate_dividend_streak_growth(
+        'BENCH', dividends_from_db=dividends
+    ), batch)
+    assert results[0]['total_years'] > 0
+
+
+@pytest.fixture(scope='module', params=UNIVERSE_SIZES, ids=lambda size: f'db{size}')
+def database(request, etfs):
+    """Baza SQLite z size ETF: ceny na koniec miesiąca + sesje ostatniego roku, ceny 1W, dywidendy"""
+    from flask import Flask
+    from models import db, ETF, ETFPrice, ETFWeeklyPrice, ETFDividend
+    from services.database_service import DatabaseService
+
+    size = request.param
+    directory = tempfile.TemporaryDirectory()
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory.name, 'bench.db')}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    context = app.app_context()
+    context.push()
+    db.create_all()
+
+    db.session.execute(ETF.__table__.insert(), [
+        {'id': i + 1, 'ticker': f'B{i:04d}', 'name': f'Benchmark ETF {i}',
+         'inception_date': etfs[0].days[0].astype(object)} for i in range(size)
+    ])
+    for i in range(size):
+        etf = etfs[i % len(etfs)]
+        recent = np.flatnonzero(etf.days > END_DATE - np.timedelta64(365, 'D'))
+        monthly = np.union1d(etf.indices['1M'], recent)
+        db.session.execute(ETFPrice.__table__.insert(), [
+            {'etf_id': i + 1, 'date': etf.days[k].astype(object), 'close_price': float(etf.close[k]),
+             'normalized_close_price': float(etf.normalized[k]), 'split_ratio_applied': float(etf.split_ratio[k])}
+            for k in monthly
+        ])
+        db.session.execute(ETFWeeklyPrice.__table__.insert(), [
+            {'etf_id': i + 1, 'date': etf.days[k].astype(object), 'close_price': float(etf.close[k]),
+             'normalized_close_price': float(etf.normalized[k]), 'split_ratio_applied': float(etf.split_ratio[k]),
+             'year': etf.days[k].astype(object).isocalendar()[0], 'week_of_year': etf.days[k].astype(object).isocalendar()[1]}
+            for k in etf.indices['1W']
+        ])
+        db.session.execute(ETFDividend.__table__.insert(), [
+            {'etf_id': i + 1, 'payment_date': row.payment_date, 'ex_date': row.payment_date, 'amount': row.amount,
+             'normalized_amount': row.normalized_amount, 'split_ratio_applied': row.amount / row.normalized_amount}
+            for row in etf.dividend_rows()
+        ])
+    db.session.commit()
+
+    # ETF ze środka tabeli (nie pierwszy wiersz indeksu)
+    yield SimpleNamespace(service=DatabaseService(), size=size, etf_id=size // 2 + 1, ticker=f'B{size // 2:04d}')
+
+    db.session.remove()
+    context.pop()
+    directory.cleanup()
+
+
+def test_get_monthly_prices(benchmark, database):
+    benchmark.extra_info['etfs_in_database'] = database.size
+    prices = benchmark.pedantic(database.service.get_monthly_prices, args=(database.etf_id,), rounds=10,
+                                iterations=1, warmup_rounds=1)
+    assert len(prices) >= YEARS * 12 - 1
+
+
+def test_verify_data_completeness(benchmark, database):
+    benchmark.extra_info['etfs_in_database'] = database.size
+    result = benchmark.pedantic(database.service.verify_data_completeness, args=(database.etf_id, database.ticker),
+                                rounds=3, iterations=1, warmup_rounds=1)
+    assert result['years_of_price_data'] > YEARS - 1
+
+
+if __name__ == '__main__':
+    sys.exit(pytest.main([__file__, '--benchmark-only'] + sys.argv[1:]))
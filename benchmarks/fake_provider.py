@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Lokalny serwer udający API dostawców danych (FMP, EODHD, Tiingo) - testy end-to-end i obciążeniowe
+
+Odpowiada na endpointy wywoływane przez APIService, w formacie dostawców:
+- FMP (/fmp/api/v3): profile, quote, historical-price-full (dzienne, serietype=weekly - tygodniowe),
+  historical-price-full/stock_dividend, stock-split-calendar
+- EODHD (/eodhd/api): eod (period d/w/m, from/to, order, limit), div, real-time
+- Tiingo (/tiingo/tiingo/daily): <ticker>/prices (bez startDate - ostatnia sesja)
+
+Dane są syntetyczne i deterministyczne: każdy ticker ma własne ziarno (crc32), więc ten sam
+ticker daje te same notowania od debiutu (2000-2012) do dziś, część tickerów ma split
+(2:1, 3:1 lub 4:1) i ceny sprzed splitu w wartościach nominalnych, większość wypłaca
+dywidendy miesięczne lub kwartalne.
+
+Wstrzykiwanie opóźnień i błędów (--latency-ms, --jitter-ms, --error-rate, --rate-limit-rate):
+decyzja zależy od ziarna, adresu zapytania i numeru próby dla tego adresu, więc powtórzone
+uruchomienie daje te same błędy niezależnie od kolejności wątków (ponowienie po 429/500 ma
+inny numer próby i zwykle przechodzi).
+
+GET /_stats - liczba zapytań według dostawcy, endpointu i statusu; POST /_reset - zerowanie.
+
+    python benchmarks/fake_provider.py --port 8765 --latency-ms 50 --rate-limit-rate 0.02
+
+Aplikację kieruje się na serwer zmiennymi FMP_BASE_URL, EODHD_BASE_URL, TIINGO_BASE_URL
+(patrz env.example) - klucze API mogą mieć dowolną niepustą wartość.
+"""
+
+import argparse
+import logging
+import threading
+import time
+import zlib
+from collections import defaultdict
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+from flask import Flask, jsonify, request
+
+logger = logging.getLogger(__name__)
+
+ORIGIN = np.datetime64('2000-01-03')
+PROVIDERS = ('fmp', 'eodhd', 'tiingo')
+SPLIT_RATIOS = (2.0, 3.0, 4.0)
+
+
+class TickerData:
+    """Notowania (ceny nominalne i znormalizowane), splity i dywidendy jednego tickera"""
+
+    def __init__(self, ticker: str, today: date):
+        # Osobne strumienie losowań: kolejny dzień dopisuje wartości, nie zmienia historii
+        params, returns, gaps, ranges, volumes, growth = (
+            np.random.default_rng(stream) for stream in np.random.SeedSequence(zlib.crc32(ticker.encode())).spawn(6)
+        )
+        inception = ORIGIN + np.timedelta64(int(params.integers(0, 365 * 12)), 'D')
+        days = np.arange(inception, np.datetime64(today) + 1)
+        self.ticker = ticker
+        self.days = days[np.is_busday(days)]
+        count = len(self.days)
+
+        split_date = np.busday_offset(inception + np.timedelta64(int(params.integers(700, 5000)), 'D'), 0,
+                                      roll='forward')
+        has_split = bool(params.random() < 0.3 and count and split_date <= self.days[-1])
+        self.split_date = split_date if has_split else None
+        self.split_ratio = SPLIT_RATIOS[int(params.integers(0, len(SPLIT_RATIOS)))] if has_split else 1.0
+        pays_dividends = params.random() < 0.85
+        monthly = params.random() < 0.3
+        dividend_yield = params.uniform(0.015, 0.06)
+        start_price = params.uniform(20, 120)
+
+        self.normalized = start_price * np.cumprod(1 + returns.normal(0.0002, 0.012, count))
+        # Ceny nominalne: przed dniem splitu wyższe o split_ratio
+        close = self.normalized * np.where(self.before_split(self.days), self.split_ratio, 1.0)
+        previous = np.concatenate((close[:1], close[:-1]))
+        spread = np.abs(ranges.normal(0.0, 0.006, (count, 2)))
+        self.close = close
+        self.open = previous * (1 + gaps.normal(0.0, 0.003, count))
+        self.high = np.maximum(self.open, close) * (1 + spread[:, 0])
+        self.low = np.minimum(self.open, close) * (1 - spread[:, 1])
+        self.volume = volumes.integers(50_000, 5_000_000, count)
+
+        self.dividends = self._dividends(growth, pays_dividends, monthly, dividend_yield)
+
+    def before_split(self, days: np.ndarray) -> np.ndarray:
+        if self.split_date is None:
+            return np.zeros(len(days), dtype=bool)
+        return days < self.split_date
+
+    def _dividends(self, rng, pays: bool, monthly: bool, dividend_yield: float) -> List[Dict]:
+        """Dywidendy: ex-date w połowie miesiąca, wypłata 7 dni roboczych później (tylko wypłacone)"""
+        if not pays or not len(self.days):
+            return []
+        months = self.days.astype('datetime64[M]')
+        step = 1 if monthly else 3
+        dividends, level = [], 1.0
+        for month in np.unique(months)[1::step]:
+            ex_date = np.busday_offset(month.astype('datetime64[D]') + 14, 0, roll='forward')
+            payment_date = np.busday_offset(ex_date, 7)
+            if payment_date > self.days[-1]:
+                break
+            base = self.normalized[0] * dividend_yield * step / 12
+            level *= 1 + rng.normal(0.004 * step, 0.02)
+            normalized = round(float(base * level), 4)
+            ratio = self.split_ratio if self.before_split(np.array([ex_date]))[0] else 1.0
+            dividends.append({
+                'ex_date': str(ex_date),
+                'payment_date': str(payment_date),
+                'declaration_date': str(np.busday_offset(ex_date, -10)),
+                'record_date': str(np.busday_offset(ex_date, 1)),
+                'amount': round(normalized * ratio, 4),
+                'adjusted': normalized
+            })
+        return dividends
+
+    def window(self, start: Optional[str], end: Optional[str]) -> np.ndarray:
+        """Indeksy sesji z zakresu dat (włącznie)"""
+        lower = np.searchsorted(self.days, np.datetime64(start)) if start else 0
+        upper = np.searchsorted(self.days, np.datetime64(end), side='right') if end else len(self.days)
+        return np.arange(lower, upper)
+
+    def bars(self, index: np.ndarray, period: str = 'd', label: str = 'first') -> List[Dict]:
+        """Świece OHLCV sesji index zagregowane do okresu 'd', 'w' lub 'm' (data - pierwsza/ostatnia sesja)"""
+        if not len(index):
+            return []
+        days = self.days[index]
+        if period == 'd':
+            starts = np.arange(len(index))
+        else:
+            keys = ((days.astype(np.int64) + 3) // 7 if period == 'w'
+                    else days.astype('datetime64[M]').astype(np.int64))
+            starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 1))
+        ends = np.append(starts[1:], len(index)) - 1
+        opens, closes = self.open[index][starts], self.close[index][ends]
+        highs = np.maximum.reduceat(self.high[index], starts)
+        lows = np.minimum.reduceat(self.low[index], starts)
+        volumes = np.add.reduceat(self.volume[index], starts)
+        adjusted = self.normalized[index][ends]
+        dates = days[starts] if label == 'first' else days[ends]
+        return [{'date': str(day), 'open': round(float(o), 4), 'high': round(float(h), 4),
+                 'low': round(float(lo), 4), 'close': round(float(c), 4), 'adjClose': round(float(a), 4),
+                 'volume': int(v)}
+                for day, o, h, lo, c, a, v in zip(dates, opens, highs, lows, closes, adjusted, volumes)]
+
+
+class SyntheticMarket:
+    """Dane tickerów generowane przy pierwszym zapytaniu (cache na czas działania serwera)"""
+
+    def __init__(self, today: Optional[date] = None):
+        self.today = today
+        self._tickers: Dict[str, TickerData] = {}
+        self._lock = threading.Lock()
+
+    def get(self, ticker: str) -> TickerData:
+        ticker = ticker.upper()
+        today = self.today or date.today()
+        with self._lock:
+            data = self._tickers.get(ticker)
+            if data is None or (self.today is None and data.days[-1] < np.datetime64(today) - 3):
+                data = self._tickers[ticker] = TickerData(ticker, today)
+            return data
+
+
+class FaultInjector:
+    """Opóźnienia, błędy 500 i 429 zależne od ziarna, adresu i numeru próby"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0, seed: int = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.seed = seed
+        self._attempts = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _draw(self, key: str, salt: str) -> float:
+        return zlib.crc32(f'{self.seed}:{salt}:{key}'.encode()) / 2 ** 32
+
+    def apply(self, key: str) -> Optional[int]:
+        """Czeka (opóźnienie) i zwraca status błędu do wstrzyknięcia lub None"""
+        with self._lock:
+            self._attempts[key] += 1
+            key = f'{key}#{self._attempts[key]}'
+        delay = self.latency_ms + self.jitter_ms * self._draw(key, 'jitter')
+        if delay > 0:
+            time.sleep(delay / 1000)
+        draw = self._draw(key, 'fault')
+        if draw < self.rate_limit_rate:
+            return 429
+        if draw < self.rate_limit_rate + self.error_rate:
+            return 500
+        return None
+
+    def reset(self):
+        with self._lock:
+            self._attempts.clear()
+
+
+class ProviderStats:
+    """Liczniki zapytań: dostawca -> zapytania, endpointy, statusy"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counts = {provider: {'requests': 0, 'endpoints': defaultdict(int), 'status': defaultdict(int)}
+                            for provider in PROVIDERS}
+
+    def record(self, provider: str, endpoint: str, status: int):
+        with self._lock:
+            counts = self._counts[provider]
+            counts['requests'] += 1
+            counts['endpoints'][endpoint] += 1
+            counts['status'][str(status)] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            providers = {provider: {'requests': counts['requests'], 'endpoints': dict(counts['endpoints']),
+                                    'status': dict(counts['status'])}
+                         for provider, counts in self._counts.items()}
+        return {'total': sum(counts['requests'] for counts in providers.values()), 'providers': providers}
+
+
+def _authorized(provider: str) -> bool:
+    if provider == 'fmp':
+        return bool(request.args.get('apikey'))
+    if provider == 'eodhd':
+        return bool(request.args.get('api_token'))
+    return bool(request.args.get('token') or request.headers.get('Authorization', '').startswith('Token '))
+
+
+def create_fake_provider(market: Optional[SyntheticMarket] = None, faults: Optional[FaultInjector] = None) -> Flask:
+    """Aplikacja Flask serwera dostawców (market i faults - domyślnie bez opóźnień i błędów)"""
+    market = market or SyntheticMarket()
+    faults = faults or FaultInjector()
+    stats = ProviderStats()
+    app = Flask(__name__)
+    app.extensions['fake_provider'] = {'market': market, 'faults': faults, 'stats': stats}
+
+    @app.before_request
+    def inject_faults():
+        provider = request.path.strip('/').split('/', 1)[0]
+        if provider not in PROVIDERS or request.url_rule is None:
+            return None
+        if not _authorized(provider):
+            return jsonify({'Error Message': 'Invalid API KEY.'}), 401
+        status = faults.apply(request.full_path)
+        if status == 429:
+            return jsonify({'Error Message': 'Limit Reach. Please upgrade your plan.'}), 429
+        if status:
+            return jsonify({'Error Message': 'Internal server error (injected)'}), status
+        return None
+
+    @app.after_request
+    def count_request(response):
+        provider = request.path.strip('/').split('/', 1)[0]
+        if provider in PROVIDERS:
+            endpoint = request.url_rule.rule if request.url_rule is not None else 'unknown'
+            stats.record(provider, endpoint, response.status_code)
+        return response
+
+    # FMP
+
+    @app.route('/fmp/api/v3/profile/<ticker>')
+    def fmp_profile(ticker):
+        data = market.get(ticker)
+        last = data.dividends[-1]['amount'] if data.dividends else 0.0
+        annual = last * (12 if _months_apart(data.dividends) == 1 else 4)
+        return jsonify([{
+            'symbol': data.ticker, 'price': round(float(data.close[-1]), 4), 'beta': 1.0,
+            'volAvg': int(data.volume[-60:].mean()), 'mktCap': int(data.close[-1] * 50_000_000),
+            'lastDiv': round(annual, 4), 'changes': round(float(data.close[-1] - data.close[-2]), 4),
+            'companyName': f'{data.ticker} Synthetic ETF', 'currency': 'USD', 'exchange': 'NYSE Arca',
+            'exchangeShortName': 'AMEX', 'industry': 'Asset Management', 'sector': 'Financial Services',
+            'country': 'US', 'ipoDate': str(data.days[0]), 'isEtf': True, 'isActivelyTrading': True
+        }])
+
+    @app.route('/fmp/api/v3/quote/<ticker>')
+    def fmp_quote(ticker):
+        data = market.get(ticker)
+        return jsonify([{
+            'symbol': data.ticker, 'name': f'{data.ticker} Synthetic ETF', 'price': round(float(data.close[-1]), 4),
+            'previousClose': round(float(data.close[-2]), 4), 'volume': int(data.volume[-1]),
+            'open': round(float(data.open[-1]), 4), 'dayHigh': round(float(data.high[-1]), 4),
+            'dayLow': round(float(data.low[-1]), 4), 'timestamp': int(time.time())
+        }])
+
+    @app.route('/fmp/api/v3/historical-price-full/<ticker>')
+    def fmp_prices(ticker):
+        data = market.get(ticker)
+        index = data.window(request.args.get('from'), request.args.get('to'))
+        period = 'w' if request.args.get('serietype') == 'weekly' else 'd'
+        historical = data.bars(index, period, label='last')[::-1]
+        if request.args.get('timeseries'):
+            historical = historical[:int(request.args['timeseries'])]
+        return jsonify({'symbol': data.ticker, 'historical': historical})
+
+    @app.route('/fmp/api/v3/historical-price-full/stock_dividend/<ticker>')
+    def fmp_dividends(ticker):
+        data = market.get(ticker)
+        return jsonify({'symbol': data.ticker, 'historical': [{
+            'date': dividend['ex_date'], 'label': dividend['ex_date'], 'adjDividend': dividend['adjusted'],
+            'dividend': dividend['amount'], 'recordDate': dividend['record_date'],
+            'paymentDate': dividend['payment_date'], 'declarationDate': dividend['declaration_date']
+        } for dividend in reversed(data.dividends)]})
+
+    @app.route('/fmp/api/v3/stock-split-calendar/<ticker>')
+    def fmp_splits(ticker):
+        data = market.get(ticker)
+        historical = []
+        if data.split_date is not None:
+            # 'ratio' - pole czytane przez APIService (jak Config.KNOWN_SPLITS)
+            historical.append({'date': str(data.split_date), 'label': str(data.split_date),
+                               'numerator': data.split_ratio, 'denominator': 1.0, 'ratio': data.split_ratio})
+        return jsonify({'symbol': data.ticker, 'historical': historical})
+
+    # EODHD
+
+    @app.route('/eodhd/api/eod/<ticker>')
+    def eodhd_prices(ticker):
+        data = market.get(ticker)
+        index = data.window(request.args.get('from'), request.args.get('to'))
+        period = request.args.get('period', 'd')
+        if period not in ('d', 'w', 'm'):
+            return jsonify({'error': f'Invalid period: {period}'}), 422
+        bars = [{'date': bar['date'], 'open': bar['open'], 'high': bar['high'], 'low': bar['low'],
+                 'close': bar['close'], 'adjusted_close': bar['adjClose'], 'volume': bar['volume']}
+                for bar in data.bars(index, period, label='first')]
+        if request.args.get('limit'):
+            bars = bars[-int(request.args['limit']):]
+        return jsonify(bars[::-1] if request.args.get('order') == 'd' else bars)
+
+    @app.route('/eodhd/api/div/<ticker>')
+    def eodhd_dividends(ticker):
+        data = market.get(ticker)
+        return jsonify([{
+            'date': dividend['ex_date'], 'declarationDate': dividend['declaration_date'],
+            'recordDate': dividend['record_date'], 'paymentDate': dividend['payment_date'],
+            'period': 'Monthly' if _months_apart(data.dividends) == 1 else 'Quarterly',
+            'value': dividend['adjusted'], 'unadjustedValue': dividend['amount'], 'currency': 'USD'
+        } for dividend in data.dividends])
+
+    @app.route('/eodhd/api/real-time/<ticker>')
+    def eodhd_real_time(ticker):
+        data = market.get(ticker)
+        return jsonify({
+            'code': f'{data.ticker}.US', 'timestamp': int(time.time()), 'gmtoffset': 0,
+            'open': round(float(data.open[-1]), 4), 'high': round(float(data.high[-1]), 4),
+            'low': round(float(data.low[-1]), 4), 'close': round(float(data.close[-1]), 4),
+            'volume': int(data.volume[-1]), 'previousClose': round(float(data.close[-2]), 4),
+            'change': round(float(data.close[-1] - data.close[-2]), 4),
+            'change_p': round(float(data.close[-1] / data.close[-2] - 1) * 100, 4)
+        })
+
+    # Tiingo
+
+    @app.route('/tiingo/tiingo/daily/<ticker>/prices')
+    def tiingo_prices(ticker):
+        data = market.get(ticker)
+        start, end = request.args.get('startDate'), request.args.get('endDate')
+        index = data.window(start, end) if start else np.arange(len(data.days))[-1:]
+        split_days = data.days[index] == data.split_date if data.split_date is not None else np.zeros(len(index))
+        dividends = {dividend['ex_date']: dividend['amount'] for dividend in data.dividends}
+        return jsonify([{
+            'date': f"{bar['date']}T00:00:00.000Z", 'close': bar['close'], 'high': bar['high'], 'low': bar['low'],
+            'open': bar['open'], 'volume': bar['volume'], 'adjClose': bar['adjClose'],
+            'divCash': dividends.get(bar['date'], 0.0), 'splitFactor': data.split_ratio if is_split else 1.0
+        } for bar, is_split in zip(data.bars(index), split_days)])
+
+    # Statystyki
+
+    @app.route('/_stats')
+    def provider_stats():
+        return jsonify(stats.snapshot())
+
+    @app.route('/_reset', methods=['POST'])
+    def reset_stats():
+        stats.reset()
+        faults.reset()
+        return jsonify({'success': True})
+
+    return app
+
+
+def _months_apart(dividends: List[Dict]) -> int:
+    if len(dividends) < 2:
+        return 3
+    last, previous = date.fromisoformat(dividends[-1]['ex_date']), date.fromisoformat(dividends[-2]['ex_date'])
+    return (last.year - previous.year) * 12 + last.month - previous.month
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Lokalny serwer API dostawców danych (FMP, EODHD, Tiingo)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='opóźnienie każdej odpowiedzi')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='dodatkowe opóźnienie 0..jitter')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='odsetek odpowiedzi 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='odsetek odpowiedzi 429')
+    parser.add_argument('--seed', type=int, default=0, help='ziarno wstrzykiwanych błędów')
+    parser.add_argument('--today', type=date.fromisoformat, default=None,
+                        help='ostatni dzień notowań (YYYY-MM-DD, domyślnie dziś)')
+    args = parser.parse_args()
+
+    from werkzeug.serving import make_server
+    app = create_fake_provider(SyntheticMarket(args.today),
+                               FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate, args.rate_limit_rate,
+                                             args.seed))
+    server = make_server(args.host, args.port, app, threaded=True)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    print(f'Fake provider listening on http://{args.host}:{server.port}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
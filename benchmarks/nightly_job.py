@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Test obciążeniowy zadań nocnych na lokalnym serwerze dostawców (benchmarks/fake_provider.py)
+
+Przebieg:
+1. serwer dostawców startuje w osobnym procesie (jego pamięć nie wlicza się do RSS aplikacji),
+2. aplikacja (create_app) dostaje pustą bazę SQLite i magazyny w katalogu tymczasowym, klucze API
+   i adresy dostawców wskazujące na serwer; scheduler jest wstrzymany,
+3. faza add_etf - N tickerów dodawanych przez POST /api/etfs,
+4. zadania nocne update_all_timeframes i scheduled_daily_price_update wywoływane wprost
+   (te same funkcje co w schedulerze), --runs razy - drugi przebieg to stan ustalony bez braków.
+
+Dla każdej fazy raport: czas, zapytania do dostawców (według dostawcy i statusu - w tym
+wstrzyknięte 429/500), zapisy w bazie (instrukcje INSERT/UPDATE/DELETE, wiersze, commity)
+oraz szczytowe RSS procesu.
+
+Limity dzienne tokenów API są podnoszone (--keep-api-limits - limity aplikacji); minutowy
+limit FMP (5/min) działa jak w produkcji, więc dla wielu ETF część zapytań trafia do EODHD/Tiingo.
+
+    python benchmarks/nightly_job.py --tickers 50 --latency-ms 30 --rate-limit-rate 0.02 --json report.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Tuple
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NIGHTLY_JOBS = (('update_all_timeframes', 'daily_timeframes_update'),
+                ('scheduled_daily_price_update', 'daily_price_update'))
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+class WriteCounter:
+    """
+    Zapisy w bazie ze wszystkich silników SQLAlchemy (pisarz, pula odczytów). Wiersze SQLite
+    liczone przy commicie z total_changes połączenia (rowcount nie obejmuje INSERT ... RETURNING).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.statements = 0
+        self.rows = 0
+        self.commits = 0
+
+    def install(self):
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        event.listen(Engine, 'commit', self._commit)
+        event.listen(Engine, 'rollback', self._rollback)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            return
+        with self._lock:
+            self.statements += 1
+            if not hasattr(cursor.connection, 'total_changes'):
+                self.rows += max(cursor.rowcount, 0)
+
+    @staticmethod
+    def _changes(conn) -> int:
+        """Zmienione wiersze od poprzedniego commitu/rollbacku połączenia (0 poza SQLite)"""
+        dbapi_connection = conn.connection.dbapi_connection
+        total = getattr(dbapi_connection, 'total_changes', None)
+        if total is None:
+            return 0
+        changes = total - conn.connection.info.get('changes_seen', 0)
+        conn.connection.info['changes_seen'] = total
+        return changes
+
+    def _commit(self, conn):
+        changes = self._changes(conn)
+        with self._lock:
+            self.commits += 1
+            self.rows += changes
+
+    def _rollback(self, conn):
+        self._changes(conn)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {'statements': self.statements, 'rows': self.rows, 'commits': self.commits}
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux: KB
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_provider(args) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'fake_provider.py'), '--port', str(port),
+               '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+               '--error-rate', str(args.error_rate), '--rate-limit-rate', str(args.rate_limit_rate),
+               '--seed', str(args.seed)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f'{url}/_stats', timeout=1)
+            return process, url
+        except requests.RequestException:
+            if process.poll() is not None:
+                break
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('Fake provider did not start')
+
+
+def provider_calls(url: str) -> Dict:
+    return requests.get(f'{url}/_stats', timeout=10).json()
+
+
+def calls_delta(before: Dict, after: Dict) -> Dict:
+    providers = {}
+    for provider, counts in after['providers'].items():
+        previous = before['providers'][provider]
+        status = {code: count - previous['status'].get(code, 0) for code, count in counts['status'].items()}
+        providers[provider] = {'requests': counts['requests'] - previous['requests'],
+                               'status': {code: count for code, count in status.items() if count}}
+    return {'total': after['total'] - before['total'], 'providers': providers}
+
+
+def run_phase(name: str, function, provider_url: str, writes: WriteCounter) -> Dict:
+    calls_before, writes_before = provider_calls(provider_url), writes.snapshot()
+    started = time.perf_counter()
+    result = function()
+    wall = time.perf_counter() - started
+    writes_after = writes.snapshot()
+    phase = {
+        'phase': name,
+        'wall_seconds': round(wall, 3),
+        'api_calls': calls_delta(calls_before, provider_calls(provider_url)),
+        'db_writes': {key: writes_after[key] - writes_before[key] for key in writes_after},
+        'peak_rss_mb': round(peak_rss_mb(), 1)
+    }
+    if result is not None:
+        phase['result'] = result
+    print(format_phase(phase), flush=True)
+    return phase
+
+
+def format_phase(phase: Dict) -> str:
+    calls = phase['api_calls']
+    by_provider = ', '.join(
+        f"{provider} {counts['requests']}" + (f" ({' '.join(f'{code}:{n}' for code, n in sorted(counts['status'].items()) if code != '200')})"
+                                              if set(counts['status']) - {'200'} else '')
+        for provider, counts in calls['providers'].items() if counts['requests']
+    ) or '-'
+    writes = phase['db_writes']
+    line = (f"{phase['phase']:<32} {phase['wall_seconds']:>9.2f} s  api {calls['total']:>6} [{by_provider}]  "
+            f"db {writes['statements']} stmt / {writes['rows']} rows / {writes['commits']} commits  "
+            f"rss {phase['peak_rss_mb']:.0f} MB")
+    if 'result' in phase:
+        line += f"  {phase['result']}"
+    return line
+
+
+def configure_environment(args, directory: str, provider_url: str):
+    """Zmienne środowiska aplikacji - przed importem config.py"""
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'nightly.db')}",
+        'SERIES_STORE_DIR': os.path.join(directory, 'series_store'),
+        'PANEL_STORE_DIR': os.path.join(directory, 'panels'),
+        'FMP_API_KEY': 'fake', 'EODHD_API_KEY': 'fake', 'TIINGO_API_KEY': 'fake',
+        'FMP_BASE_URL': f'{provider_url}/fmp/api/v3',
+        'EODHD_BASE_URL': f'{provider_url}/eodhd/api',
+        'TIINGO_BASE_URL': f'{provider_url}/tiingo/tiingo/daily',
+        'SWEEP_PROCESSES': '0'
+    })
+    os.environ.pop('SLACK_WEBHOOK_URL', None)
+
+
+def raise_api_limits(app, limit: int):
+    from models import db, APILimit
+    with app.app_context():
+        now = datetime.now()
+        for api_type in ('fmp', 'eodhd', 'tiingo'):
+            db.session.add(APILimit(api_type=api_type, current_count=0, daily_limit=limit, last_reset=now))
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Zadania nocne na lokalnym serwerze dostawców danych')
+    parser.add_argument('--tickers', type=int, default=20, help='liczba ETF')
+    parser.add_argument('--runs', type=int, default=1, help='przebiegi zadań nocnych')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--keep-api-limits', action='store_true', help='dzienne limity API aplikacji (500/100/50)')
+    parser.add_argument('--log-level', default='ERROR', help='poziom logów aplikacji (INFO - jak w produkcji)')
+    parser.add_argument('--json', help='zapis raportu do pliku JSON')
+    args = parser.parse_args()
+    report_path = os.path.abspath(args.json) if args.json else None
+
+    provider, provider_url = start_provider(args)
+    directory = tempfile.TemporaryDirectory(prefix='nightly_job_')
+    app = None
+    try:
+        configure_environment(args, directory.name, provider_url)
+        # Logi i pliki względne aplikacji w katalogu tymczasowym
+        os.chdir(directory.name)
+        sys.path.insert(0, ROOT)
+        writes = WriteCounter()
+        writes.install()
+
+        from app import create_app
+        logging.getLogger().setLevel(args.log_level)
+        app = create_app()
+        app.scheduler.pause()
+        if not args.keep_api_limits:
+            raise_api_limits(app, 10 ** 9)
+
+        tickers = [f'FK{i:04d}' for i in range(args.tickers)]
+        client = app.test_client()
+
+        def add_etfs():
+            added = sum(client.post('/api/etfs', json={'ticker': ticker}).status_code == 200 for ticker in tickers)
+            return f'added {added}/{len(tickers)}'
+
+        print(f'Fake provider {provider_url}, {len(tickers)} tickers, database {directory.name}', flush=True)
+        phases = [run_phase('add_etf', add_etfs, provider_url, writes)]
+        for run in range(1, args.runs + 1):
+            for name, job_id in NIGHTLY_JOBS:
+                phases.append(run_phase(f'{name} #{run}', app.scheduler.get_job(job_id).func, provider_url, writes))
+
+        report = {
+            'tickers': len(tickers),
+            'settings': {key: getattr(args, key) for key in ('latency_ms', 'jitter_ms', 'error_rate',
+                                                               'rate_limit_rate', 'seed', 'keep_api_limits')},
+            'phases': phases,
+            'total_wall_seconds': round(sum(phase['wall_seconds'] for phase in phases), 3),
+            'peak_rss_mb': round(peak_rss_mb(), 1)
+        }
+        print(f"Total {report['total_wall_seconds']:.2f} s, peak RSS {report['peak_rss_mb']:.0f} MB")
+        if report_path:
+            with open(report_path, 'w') as handle:
+                json.dump(report, handle, indent=2)
+    finally:
+        if app is not None:
+            app.scheduler.shutdown(wait=False)
+        provider.terminate()
+        provider.wait(timeout=10)
+        os.chdir(ROOT)
+        directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -16,8 +16,30 @@ VERSION_INFO = {
 
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
-    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///etf_analyzer.db'
+    SQLALCHEMY_DATABASE_URI = (os.environ.get('DATABASE_URL') or 'sqlite:///etf_analyzer.db').replace('postgres://', 'postgresql://', 1)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # PostgreSQL - pula połączeń (ignorowana dla SQLite)
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 10))
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 20))
+    DATABASE_POOL_RECYCLE_SECONDS = int(os.environ.get('DATABASE_POOL_RECYCLE_SECONDS', 1800))
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DATABASE_POOL_SIZE,
+        'max_overflow': DATABASE_MAX_OVERFLOW,
+        'pool_recycle': DATABASE_POOL_RECYCLE_SECONDS,
+        'pool_pre_ping': True
+    } if SQLALCHEMY_DATABASE_URI.startswith('postgresql') else {}
+
+    # SQLite storage profile (PRAGMA ustawiane przy każdym połączeniu)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 268435456))  # 256 MB
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 65536))  # 64 MB na połączenie
+    SQLITE_TEMP_STORE = os.environ.get('SQLITE_TEMP_STORE', 'MEMORY')
+    SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 8))  # 0 = bez puli tylko do odczytu
+    SQLITE_WRITER_BATCH_SIZE = int(os.environ.get('SQLITE_WRITER_BATCH_SIZE', 200))  # commity na paczkę
+    SQLITE_WRITER_BATCH_MAX_AGE_SECONDS = float(os.environ.get('SQLITE_WRITER_BATCH_MAX_AGE_SECONDS', 2.0))
+    SQLITE_LOCK_WAIT_WARN_MS = int(os.environ.get('SQLITE_LOCK_WAIT_WARN_MS', 250))
     
     # Port settings
     PORT = 5005
@@ -32,6 +54,35 @@ class Config:
     SLACK_WEBHOOK_URL = os.environ.get('SLACK_WEBHOOK_URL')
     SLACK_CHANNEL = os.environ.get('SLACK_CHANNEL', '#etf-analyzer')
     SLACK_USERNAME = os.environ.get('SLACK_USERNAME', 'ETF Analyzer Bot')
+    
+    # Notification outbox (zbiorcza wysyłka powiadomień)
+    NOTIFICATION_DIGEST_MAX_ALERTS = int(os.environ.get('NOTIFICATION_DIGEST_MAX_ALERTS', 20))  # alertów w jednej wiadomości
+    NOTIFICATION_BATCH_SIZE = int(os.environ.get('NOTIFICATION_BATCH_SIZE', 500))  # wpisów kolejki na jedno uruchomienie
+    NOTIFICATION_MAX_ATTEMPTS = int(os.environ.get('NOTIFICATION_MAX_ATTEMPTS', 5))
+    NOTIFICATION_RETRY_BASE_SECONDS = float(os.environ.get('NOTIFICATION_RETRY_BASE_SECONDS', 60))  # backoff: base * 2^(próba-1)
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 4))  # równoległe webhooki
+    NOTIFICATION_TIMEOUT_SECONDS = float(os.environ.get('NOTIFICATION_TIMEOUT_SECONDS', 10))
+    NOTIFICATION_CLAIM_TIMEOUT_SECONDS = float(os.environ.get('NOTIFICATION_CLAIM_TIMEOUT_SECONDS', 300))  # po tym czasie wpis 'sending' wraca do wysyłki
+    SLACK_MIN_INTERVAL_SECONDS = float(os.environ.get('SLACK_MIN_INTERVAL_SECONDS', 1.0))  # limit Slack: 1 wiadomość/s na webhook
+    
+    # Strumień zdarzeń SSE (/api/events/stream)
+    EVENT_STREAM_POLL_SECONDS = float(os.environ.get('EVENT_STREAM_POLL_SECONDS', 1.0))  # jedno zapytanie na worker, nie na klienta
+    EVENT_STREAM_HEARTBEAT_SECONDS = float(os.environ.get('EVENT_STREAM_HEARTBEAT_SECONDS', 15))
+    EVENT_STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_MAX_SECONDS', 300))  # potem klient łączy się ponownie z Last-Event-ID
+    EVENT_STREAM_QUEUE_SIZE = int(os.environ.get('EVENT_STREAM_QUEUE_SIZE', 1000))  # zdarzeń w kolejce wolnego klienta
+    EVENT_STREAM_REPLAY_LIMIT = int(os.environ.get('EVENT_STREAM_REPLAY_LIMIT', 1000))  # zdarzeń odtwarzanych po Last-Event-ID
+    EVENT_STREAM_RETENTION_HOURS = int(os.environ.get('EVENT_STREAM_RETENTION_HOURS', 24))
+    EVENT_STREAM_MAX_SUBSCRIBERS = int(os.environ.get('EVENT_STREAM_MAX_SUBSCRIBERS', 4))  # strumieni na proces gunicorna (każdy zajmuje wątek gthread)
+    EVENT_STREAM_BUSY_RETRY_SECONDS = int(os.environ.get('EVENT_STREAM_BUSY_RETRY_SECONDS', 30))  # Retry-After odpowiedzi 503 po osiągnięciu limitu
+
+    # Metryki wydajności żądań (/api/system/metrics, format Prometheus)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_N_PLUS_ONE_THRESHOLD = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', 10))  # powtórzeń tego samego SELECT w żądaniu
+
+    # Śledzenie zadań schedulera (/api/system/job-traces/<run_id>)
+    JOB_TRACE_ENABLED = os.environ.get('JOB_TRACE_ENABLED', 'true').lower() == 'true'
+    JOB_TRACE_MAX_SPANS = int(os.environ.get('JOB_TRACE_MAX_SPANS', 50000))  # spanów na przebieg; ponad limit - tylko liczniki rodzica
+    JOB_TRACE_RETENTION_DAYS = int(os.environ.get('JOB_TRACE_RETENTION_DAYS', 30))
 
     # Technical Indicators Configuration
     TECHNICAL_INDICATORS = {
@@ -91,10 +142,10 @@ class Config:
         }
     }
 
-    # Base URLs
-    FMP_BASE_URL = 'https://financialmodelingprep.com/api/v3'
-    EODHD_BASE_URL = 'https://eodhistoricaldata.com/api'
-    TIINGO_BASE_URL = 'https://api.tiingo.com/tiingo/daily'
+    # Base URLs (nadpisywane np. przez lokalny serwer benchmarks/fake_provider.py)
+    FMP_BASE_URL = os.environ.get('FMP_BASE_URL', 'https://financialmodelingprep.com/api/v3')
+    EODHD_BASE_URL = os.environ.get('EODHD_BASE_URL', 'https://eodhistoricaldata.com/api')
+    TIINGO_BASE_URL = os.environ.get('TIINGO_BASE_URL', 'https://api.tiingo.com/tiingo/daily')
 
     # Scheduler settings
     SCHEDULER_API_ENABLED = True
@@ -125,9 +176,28 @@ class Config:
     
     # Cache settings
     CACHE_TTL_SECONDS = 3600  # 1 godzina
+    SERIES_CACHE_MAX_BYTES = int(os.environ.get('SERIES_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # cache szeregów cen (LRU)
+    SERIES_CACHE_TTL_SECONDS = int(os.environ.get('SERIES_CACHE_TTL_SECONDS', 300))  # limit dla zmian z innych procesów
+    SERIES_STORE_ENABLED = os.environ.get('SERIES_STORE_ENABLED', 'true').lower() == 'true'  # pliki mmap współdzielone przez workery
+    SERIES_STORE_DIR = os.environ.get('SERIES_STORE_DIR')  # domyślnie instance/series_store
+    
+    PANEL_STORE_DIR = os.environ.get('PANEL_STORE_DIR')  # panele cen uniwersum (npz), domyślnie instance/panels
+    
+    DATA_VERSION_TTL_SECONDS = int(os.environ.get('DATA_VERSION_TTL_SECONDS', 10))  # odświeżanie wersji danych ETF (ETag)
+    
+    BACKTEST_MAX_PORTFOLIOS = int(os.environ.get('BACKTEST_MAX_PORTFOLIOS', 500))  # portfele w jednym zapytaniu /api/backtest
+    
+    SWEEP_MAX_COMBINATIONS = int(os.environ.get('SWEEP_MAX_COMBINATIONS', 500))  # kombinacje parametrów w /api/analytics/sweep
+    SWEEP_PROCESSES = int(os.environ.get('SWEEP_PROCESSES', min(4, os.cpu_count() or 1)))  # pula procesów (uniwersum); < 2 - bez puli
+    
+    # Response compression settings (gzip, brotli gdy zainstalowane)
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', 1024))  # mniejsze odpowiedzi bez kompresji
+    COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+    COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
     
     # Logging settings
-    DEBUG_LEVEL = os.environ.get('DEBUG_LEVEL', 'INFO')  # DEBUG, INFO, WARNING, ERROR
+    DEBUG_LEVEL = os.environ.get('DEBUG_LEVEL', 'INFO')  # np. INFO,services.api_service=WARNING (logger=POZIOM)
     ENABLE_DEBUG_LOGS = os.environ.get('ENABLE_DEBUG_LOGS', 'False').lower() == 'true'
     
     # Retry settings
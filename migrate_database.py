@@ -76,6 +76,55 @@ def migrate_system_logs_table():
             print(f"❌ Błąd podczas migracji: {e}")
             raise
 
+def migrate_notification_outbox_table():
+    """Dodaje kolumnę claimed_at (przejmowanie wpisów przez worker) do tabeli notification_outbox"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            if 'notification_outbox' not in inspector.get_table_names():
+                print("✅ Tabela notification_outbox zostanie utworzona przy starcie aplikacji - migracja nie jest potrzebna")
+                return
+            
+            existing_columns = [col['name'] for col in inspector.get_columns('notification_outbox')]
+            if 'claimed_at' in existing_columns:
+                print("✅ Kolumna notification_outbox.claimed_at już istnieje - migracja nie jest potrzebna")
+                return
+            
+            db.session.execute(text("ALTER TABLE notification_outbox ADD COLUMN claimed_at TIMESTAMP"))
+            db.session.commit()
+            print("  ✅ Dodano kolumnę: notification_outbox.claimed_at")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Błąd podczas migracji notification_outbox: {e}")
+            raise
+
+def migrate_price_tables():
+    """Dodaje kolumnę last_updated (aktualizacja ceny dnia przez upsert) do tabel etf_prices i etf_daily_prices"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            existing_tables = inspector.get_table_names()
+            for table in ('etf_prices', 'etf_daily_prices'):
+                if table not in existing_tables:
+                    continue
+                existing_columns = [col['name'] for col in inspector.get_columns(table)]
+                if 'last_updated' in existing_columns:
+                    print(f"✅ Kolumna {table}.last_updated już istnieje - migracja nie jest potrzebna")
+                    continue
+                db.session.execute(text(f"ALTER TABLE {table} ADD COLUMN last_updated TIMESTAMP"))
+                print(f"  ✅ Dodano kolumnę: {table}.last_updated")
+            db.session.commit()
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Błąd podczas migracji tabel cen: {e}")
+            raise
+
 def main():
     """Główna funkcja migracji"""
     print("🚀 ETF Analyzer - Migracja bazy danych")
@@ -83,6 +132,8 @@ def main():
     
     try:
         migrate_system_logs_table()
+        migrate_notification_outbox_table()
+        migrate_price_tables()
         print("\n🎉 Migracja zakończona pomyślnie!")
         print("Możesz teraz uruchomić aplikację z nowymi funkcjami logowania zadań.")
         
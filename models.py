@@ -1,12 +1,12 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime, timezone
-from sqlalchemy.dialects.sqlite import JSON
 import pytz
 
 # Import funkcji utc_to_cet z wspólnego modułu
 from utils import utc_to_cet
+from services.storage_service import StorageSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': StorageSession})
 
 class ETF(db.Model):
     __tablename__ = 'etfs'
@@ -54,6 +54,7 @@ class ETFPrice(db.Model):
     normalized_close_price = db.Column(db.Float, nullable=False)  # Znormalizowana cena
     split_ratio_applied = db.Column(db.Float, default=1.0)  # Współczynnik splitu
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    last_updated = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))  # Ostatnia aktualizacja ceny dnia
     
     __table_args__ = (db.UniqueConstraint('etf_id', 'date', name='_etf_date_uc'),)
     
@@ -119,6 +120,7 @@ class ETFDailyPrice(db.Model):
     low_price = db.Column(db.Float)   # Najniższa cena
     volume = db.Column(db.Integer)    # Wolumen
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    last_updated = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))  # Ostatnia aktualizacja ceny dnia
     
     __table_args__ = (db.UniqueConstraint('etf_id', 'date', name='_etf_daily_date_uc'),)
     
@@ -202,7 +204,7 @@ class SystemLog(db.Model):
     action = db.Column(db.String(100), nullable=False)
     details = db.Column(db.Text)
     level = db.Column(db.String(20), default='INFO')  # INFO, WARNING, ERROR
-    metadata_json = db.Column(JSON)
+    metadata_json = db.Column(db.JSON)  # Przenośny typ JSON (SQLite i PostgreSQL)
     
     # Nowe pola dla logowania zadań schedulera
     job_name = db.Column(db.String(100), index=True)  # Nazwa zadania (np. "update_all_etfs", "update_etf_prices")
@@ -291,6 +293,107 @@ class DividendTaxRate(db.Model):
             'updated_at': utc_to_cet(self.updated_at).isoformat() if self.updated_at else None
         }
 
+class ETFDataVersion(db.Model):
+    """Wersja danych ETF - zwiększana przy każdej zmianie cen, dywidend, splitów lub usunięciu ETF (ETag API)"""
+    __tablename__ = 'etf_data_versions'
+    
+    ticker = db.Column(db.String(20), primary_key=True)  # Ticker, nie FK - wersja przeżywa usunięcie ETF
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    def __repr__(self):
+        return f'<ETFDataVersion {self.ticker}: {self.version}>'
+
+class ETFDividendYearly(db.Model):
+    """Roczne agregaty dywidend ETF - przeliczane przy zapisie dywidend i renormalizacji po splitach"""
+    __tablename__ = 'etf_dividend_yearly'
+    
+    etf_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Bez FK - wiersze znikają razem z dywidendami ETF
+    year = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    dividend_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_sum = db.Column(db.Float, nullable=False, default=0.0)  # Suma kwot oryginalnych
+    normalized_sum = db.Column(db.Float, nullable=False, default=0.0)  # Suma kwot znormalizowanych
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    @property
+    def amount_average(self):
+        return self.amount_sum / self.dividend_count if self.dividend_count else 0.0
+    
+    @property
+    def normalized_average(self):
+        return self.normalized_sum / self.dividend_count if self.dividend_count else 0.0
+    
+    def __repr__(self):
+        return f'<ETFDividendYearly {self.etf_id} {self.year}: {self.dividend_count} x {self.normalized_average}>'
+    
+    def to_dict(self):
+        return {
+            'etf_id': self.etf_id,
+            'year': self.year,
+            'dividend_count': self.dividend_count,
+            'amount_sum': self.amount_sum,
+            'normalized_sum': self.normalized_sum,
+            'amount_average': self.amount_average,
+            'normalized_average': self.normalized_average
+        }
+
+class ETFIndicatorSnapshot(db.Model):
+    """Ostatnie wartości wskaźników ETF w danym timeframe - odświeżane po ingeście (screener)"""
+    __tablename__ = 'etf_indicator_snapshots'
+    
+    etf_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Bez FK - usuwane przy odświeżaniu
+    timeframe = db.Column(db.String(2), primary_key=True, autoincrement=False)  # 1M, 1W, 1D
+    ticker = db.Column(db.String(20), nullable=False, index=True)
+    as_of = db.Column(db.Date)  # Data ostatniej ceny
+    close_price = db.Column(db.Float)
+    macd_line = db.Column(db.Float)  # MACD (8-17-9)
+    signal_line = db.Column(db.Float)
+    histogram = db.Column(db.Float)
+    macd_trend = db.Column(db.String(10))  # bullish (MACD nad sygnałem) / bearish
+    macd_cross = db.Column(db.String(20))  # bullish_cross / bearish_cross na ostatniej świecy
+    stoch_k = db.Column(db.Float)  # Stochastic (36-12-12)
+    stoch_d = db.Column(db.Float)
+    stoch_short_k = db.Column(db.Float)  # Stochastic (9-3-3)
+    stoch_short_d = db.Column(db.Float)
+    high_52w = db.Column(db.Float)  # Najwyższa cena znormalizowana z 52 tygodni
+    distance_from_high = db.Column(db.Float)  # % od najwyższej ceny z 52 tygodni (<= 0)
+    dividend_yield = db.Column(db.Float)
+    dsg_streak = db.Column(db.Integer)  # Aktualny Dividend Streak Growth
+    data_version = db.Column(db.Integer, nullable=False, default=0)  # Wersja danych ETF użyta do obliczeń
+    built_on = db.Column(db.Date, nullable=False)  # Dzień obliczeń (1M/1W zależą od dnia)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    
+    __table_args__ = (
+        db.Index('ix_indicator_snapshots_timeframe_stoch_k', 'timeframe', 'stoch_k'),
+        db.Index('ix_indicator_snapshots_timeframe_macd_cross', 'timeframe', 'macd_cross'),
+        db.Index('ix_indicator_snapshots_timeframe_yield', 'timeframe', 'dividend_yield'),
+    )
+    
+    def __repr__(self):
+        return f'<ETFIndicatorSnapshot {self.ticker} {self.timeframe}: {self.as_of}>'
+    
+    def to_dict(self):
+        return {
+            'ticker': self.ticker,
+            'timeframe': self.timeframe,
+            'as_of': self.as_of.isoformat() if self.as_of else None,
+            'close_price': self.close_price,
+            'macd_line': self.macd_line,
+            'signal_line': self.signal_line,
+            'histogram': self.histogram,
+            'macd_trend': self.macd_trend,
+            'macd_cross': self.macd_cross,
+            'stoch_k': self.stoch_k,
+            'stoch_d': self.stoch_d,
+            'stoch_short_k': self.stoch_short_k,
+            'stoch_short_d': self.stoch_short_d,
+            'high_52w': self.high_52w,
+            'distance_from_high': self.distance_from_high,
+            'dividend_yield': self.dividend_yield,
+            'dsg_streak': self.dsg_streak,
+            'updated_at': utc_to_cet(self.updated_at).isoformat() if self.updated_at else None
+        }
+
 class AlertConfig(db.Model):
     """Konfiguracja alertów do monitorowania"""
     __tablename__ = 'alerts_config'
@@ -346,3 +449,72 @@ class Notification(db.Model):
     
     def __repr__(self):
         return f'<Notification {self.channel}: {self.status}>'
+
+class NotificationOutbox(db.Model):
+    """Kolejka powiadomień do wysłania - dostarczane zbiorczo przez worker (NotificationDelivery)"""
+    __tablename__ = 'notification_outbox'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    alert_id = db.Column(db.Integer, db.ForeignKey('alerts_history.id'), nullable=False)
+    channel = db.Column(db.String(50), nullable=False, default='slack')  # slack
+    message = db.Column(db.Text, nullable=False)
+    severity = db.Column(db.String(20), default='info')
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))  # Kolejna próba (backoff)
+    claimed_at = db.Column(db.DateTime, nullable=True)  # Przejęcie wpisu do wysyłki przez worker (status sending)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    sent_at = db.Column(db.DateTime, nullable=True)
+    error_message = db.Column(db.Text, nullable=True)
+    
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    # Relacje
+    alert = db.relationship('AlertHistory')
+    
+    def __repr__(self):
+        return f'<NotificationOutbox {self.channel} {self.alert_id}: {self.status}>'
+
+class StreamEvent(db.Model):
+    """Zdarzenia strumienia SSE (zmiany cen, postęp zadań) - wspólne dla wszystkich workerów"""
+    __tablename__ = 'stream_events'
+    
+    id = db.Column(db.Integer, primary_key=True)  # Kursor klientów (Last-Event-ID)
+    event_type = db.Column(db.String(20), nullable=False)  # price, job
+    ticker = db.Column(db.String(20), nullable=True)
+    payload = db.Column(db.JSON, nullable=False)  # Przenośny typ JSON (SQLite i PostgreSQL)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+    
+    def __repr__(self):
+        return f'<StreamEvent {self.id} {self.event_type}>'
+
+class JobTraceRecord(db.Model):
+    """Przebieg zadania schedulera - drzewo spanów (ticker -> etap -> dostawca/commit) skompresowane zlib"""
+    __tablename__ = 'job_traces'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.String(32), nullable=False, unique=True, index=True)
+    job_name = db.Column(db.String(100), nullable=False, index=True)
+    started_at = db.Column(db.DateTime, nullable=False, index=True)
+    duration_ms = db.Column(db.Integer, nullable=False)
+    success = db.Column(db.Boolean, default=True)
+    span_count = db.Column(db.Integer, nullable=False, default=0)
+    dropped_spans = db.Column(db.Integer, nullable=False, default=0)  # Ponad JOB_TRACE_MAX_SPANS
+    payload = db.Column(db.LargeBinary, nullable=False)  # JSON spanów (układ kolumnowy) po kompresji zlib
+    
+    def __repr__(self):
+        return f'<JobTraceRecord {self.run_id} {self.job_name}>'
+    
+    def to_dict(self):
+        return {
+            'run_id': self.run_id,
+            'job_name': self.job_name,
+            'started_at': utc_to_cet(self.started_at).isoformat() if self.started_at else None,
+            'duration_ms': self.duration_ms,
+            'success': self.success,
+            'span_count': self.span_count,
+            'dropped_spans': self.dropped_spans,
+            'payload_bytes': len(self.payload) if self.payload is not None else 0
+        }
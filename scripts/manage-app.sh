@@ -23,7 +23,7 @@ fi
 echo "📁 Przejście do głównego katalogu projektu: $(pwd)"
 # 
 # Użycie:
-#   ./manage-app.sh [start|stop|restart|status|logs|test|deploy|version]
+#   ./manage-app.sh [start|stop|restart|status|logs|test|bench|loadtest|deploy|version]
 # 
 # Przykłady:
 #   ./manage-app.sh start      # Uruchomienie aplikacji
@@ -32,6 +32,8 @@ echo "📁 Przejście do głównego katalogu projektu: $(pwd)"
 #   ./manage-app.sh status     # Status aplikacji
 #   ./manage-app.sh logs       # Wyświetlenie logów
 #   ./manage-app.sh test       # Uruchomienie testów
+#   ./manage-app.sh bench      # Benchmarki i porównanie z wzorcem (bench save - zapis wzorca)
+#   ./manage-app.sh loadtest 50 # Zadania nocne dla 50 ETF na lokalnym serwerze dostawców
 #   ./manage-app.sh deploy     # Wdrożenie nowej wersji
 #   ./manage-app.sh version    # Informacje o wersji
 # =============================================================================
@@ -378,6 +380,67 @@ run_tests() {
     $PYTHON_CMD test_stochastic.py
 }
 
+# Benchmarki gorących ścieżek (pytest-benchmark)
+# Wzorce zapisywane są w benchmarks/baselines/<maszyna>/ - porównanie ma sens tylko na tej samej maszynie
+BENCH_FILE="benchmarks/bench_hot_paths.py"
+BENCH_STORAGE="benchmarks/baselines"
+BENCH_THRESHOLD="${BENCHMARK_THRESHOLD:-20}"  # dopuszczalny wzrost mediany w %
+
+run_benchmarks() {
+    local mode="${1:-compare}"
+    print_step "Uruchamianie benchmarków $APP_NAME ($mode)..."
+    
+    check_venv
+    activate_venv
+    check_dependencies
+    
+    # Wersje pytest-benchmark przypięte w requirements-dev.txt (porównywalne wyniki bench save|compare)
+    if ! pip show pytest-benchmark > /dev/null 2>&1; then
+        print_warning "pytest-benchmark nie jest zainstalowany. Instalowanie z requirements-dev.txt..."
+        pip install -r requirements-dev.txt
+    fi
+    
+    case "$mode" in
+        save)
+            $PYTHON_CMD -m pytest "$BENCH_FILE" --benchmark-only --benchmark-storage="$BENCH_STORAGE" \
+                --benchmark-save=baseline --benchmark-sort=name
+            ;;
+        compare)
+            if [ -z "$(find "$BENCH_STORAGE" -name '*.json' 2>/dev/null)" ]; then
+                print_warning "Brak zapisanego wzorca. Zapisz go poleceniem: $0 bench save"
+                return 1
+            fi
+            # Tabela porównania z ostatnim wzorcem; błąd, gdy mediana wzrosła o więcej niż próg
+            $PYTHON_CMD -m pytest "$BENCH_FILE" --benchmark-only --benchmark-storage="$BENCH_STORAGE" \
+                --benchmark-compare --benchmark-compare-fail="median:${BENCH_THRESHOLD}%" --benchmark-sort=name
+            if [ $? -eq 0 ]; then
+                print_success "Brak regresji powyżej ${BENCH_THRESHOLD}%"
+            else
+                print_error "Regresja wydajności powyżej ${BENCH_THRESHOLD}% (lub błąd benchmarku)"
+                return 1
+            fi
+            ;;
+        *)
+            print_error "Nieznany tryb benchmarków: $mode (dostępne: save, compare)"
+            return 1
+            ;;
+    esac
+}
+
+# Test obciążeniowy zadań nocnych na lokalnym serwerze dostawców (bez kluczy API)
+# Dodatkowe opcje przekazywane są do benchmarks/nightly_job.py, np. --latency-ms 50 --rate-limit-rate 0.02
+run_loadtest() {
+    local tickers="${1:-20}"
+    [ $# -gt 0 ] && shift
+    print_step "Test obciążeniowy zadań nocnych $APP_NAME ($tickers ETF)..."
+    
+    check_venv
+    activate_venv
+    check_dependencies
+    
+    $PYTHON_CMD benchmarks/nightly_job.py --tickers "$tickers" "$@"
+}
+
 # Wdrożenie nowej wersji
 deploy_app() {
     print_step "Wdrażanie nowej wersji $APP_NAME..."
@@ -433,6 +496,8 @@ show_version() {
     echo "  status   - Status aplikacji"
     echo "  logs     - Wyświetlenie logów"
     echo "  test     - Uruchomienie testów"
+    echo "  bench    - Benchmarki: compare (domyślnie) lub save (zapis wzorca)"
+    echo "  loadtest - Zadania nocne dla N ETF na lokalnym serwerze dostawców"
     echo "  deploy   - Wdrożenie nowej wersji"
     echo "  version  - Informacje o wersji"
 }
@@ -463,6 +528,15 @@ case "$1" in
         print_header
         run_tests
         ;;
+    bench)
+        print_header
+        run_benchmarks "$2" || exit 1
+        ;;
+    loadtest)
+        print_header
+        shift
+        run_loadtest "$@" || exit 1
+        ;;
     deploy)
         print_header
         deploy_app
@@ -475,7 +549,7 @@ case "$1" in
         echo
         print_error "Nieznana komenda: $1"
         echo
-        print_info "Użycie: $0 [start|stop|restart|status|logs|test|deploy|version]"
+        print_info "Użycie: $0 [start|stop|restart|status|logs|test|bench|loadtest|deploy|version]"
         exit 1
         ;;
 esac
@@ -0,0 +1,224 @@
+"""
+Analizy przekrojowe uniwersum ETF na panelach cen (PanelService)
+
+Macierze korelacji i kowariancji logarytmicznych stóp zwrotu liczone są jednym przebiegiem
+(trzy iloczyny macierzowe) z uwzględnieniem par obserwacji wspólnych - ETF o krótszej
+historii korelowany jest z innymi tylko na okresie, w którym oba mają ceny.
+Korelacje kroczące liczone są dla okien kończących się co step okresów.
+
+Kolejność klastrowa (do heatmapy) wyznaczana jest hierarchicznym grupowaniem average-linkage
+na odległości sqrt((1 - korelacja) / 2).
+
+Wyniki trzymane są w cache procesu z kluczem zawierającym wersję panelu - nowy ingest
+zmienia wersję, więc wyniki są liczone ponownie dopiero po aktualizacji danych.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.panel_service import PanelError
+from services.series_cache import nan_to_none
+
+logger = logging.getLogger(__name__)
+
+CORRELATION_TIMEFRAMES = ('1W', '1M')
+DEFAULT_MIN_PERIODS = 12
+MAX_ROLLING_POINTS = 260
+
+
+class AnalyticsError(Exception):
+    """Błąd parametrów analizy zwracany klientowi jako {'success': False, 'error': ...}"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class AnalyticsService:
+    """Korelacje i kowariancje stóp zwrotu ETF (cache do następnego ingestu)"""
+
+    def __init__(self, panel_service, cache_size: int = 32):
+        self.panel_service = panel_service
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def correlation(self, timeframe: str = '1W', tickers: Optional[List[str]] = None, window: Optional[int] = None,
+                    step: Optional[int] = None, min_periods: int = DEFAULT_MIN_PERIODS,
+                    order: str = 'ticker') -> Dict:
+        """
+        Macierze korelacji/kowariancji log-stóp zwrotu (pełna próba i ostatnie okno kroczące).
+
+        Args:
+            timeframe: '1W' lub '1M'
+            tickers: tickery (domyślnie wszystkie ETF z cenami)
+            window: długość okna kroczącego w okresach (None - bez korelacji kroczących)
+            step: odstęp końców okien kroczących (domyślnie window // 4)
+            min_periods: minimalna liczba wspólnych stóp zwrotu pary (mniej - null)
+            order: 'ticker' lub 'cluster' (kolejność z grupowania hierarchicznego)
+        """
+        if timeframe not in CORRELATION_TIMEFRAMES:
+            raise AnalyticsError(f'Nieobsługiwany timeframe: {timeframe} (dostępne: {", ".join(CORRELATION_TIMEFRAMES)})')
+        if order not in ('ticker', 'cluster'):
+            raise AnalyticsError('Parametr order musi mieć wartość ticker lub cluster')
+        if window is not None and window < 3:
+            raise AnalyticsError('Parametr window musi wynosić co najmniej 3')
+        if step is not None and step < 1:
+            raise AnalyticsError('Parametr step musi być dodatni')
+        min_periods = max(int(min_periods), 2)
+
+        panel = self.panel_service.get(timeframe)
+        key = (panel.version, timeframe, tuple(tickers) if tickers else None, window, step, min_periods, order)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        result = self._compute(panel, tickers, window, step, min_periods, order)
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def _compute(self, panel, tickers, window, step, min_periods, order) -> Dict:
+        try:
+            columns = panel.columns(tickers) if tickers else np.flatnonzero(panel.first >= 0)
+            if tickers:
+                panel.common_range(columns)  # błąd dla tickerów bez cen
+        except PanelError as e:
+            raise AnalyticsError(str(e), 404)
+        if len(columns) < 2:
+            raise AnalyticsError('Do korelacji potrzebne są co najmniej dwa ETF z cenami')
+
+        start = int(panel.first[columns].min())
+        stop = int(panel.last[columns].max()) + 1
+        returns = log_returns(np.asarray(panel.close[start:stop][:, columns]))
+        # Po ostatniej cenie ETF (np. wycofanego) panel powtarza cenę - to nie są zerowe stopy zwrotu
+        rows = np.arange(start + 1, stop)[:, None]
+        returns[rows > panel.last[columns][None, :]] = np.nan
+        dates = panel.date_strings('%Y-%m' if panel.timeframe == '1M' else '%Y-%m-%d')[start + 1:stop]
+        if len(returns) < min_periods:
+            raise AnalyticsError(f'Za mało okresów do korelacji ({len(returns)} < {min_periods})')
+
+        correlation, covariance, observations = correlation_matrices(returns, min_periods)
+        names = [panel.tickers[column] for column in columns]
+        permutation = cluster_order(correlation) if order == 'cluster' else np.arange(len(names))
+
+        rolling = None
+        if window is not None:
+            rolling = self._rolling(returns, dates, window, step, min(min_periods, window), permutation)
+
+        ordered = np.ix_(permutation, permutation)
+        return {
+            'timeframe': panel.timeframe,
+            'order': order,
+            'tickers': [names[i] for i in permutation],
+            'start': dates[0],
+            'end': dates[-1],
+            'periods': len(returns),
+            'min_periods': min_periods,
+            'correlation': _matrix(correlation[ordered], 4),
+            'covariance': _matrix(covariance[ordered], 8),
+            'observations': observations[ordered].astype(np.int64).tolist(),
+            'rolling': rolling
+        }
+
+    def _rolling(self, returns: np.ndarray, dates: List[str], window: int, step: Optional[int],
+                 min_periods: int, permutation: np.ndarray) -> Dict:
+        """Średnia korelacja par w oknach kroczących i macierze ostatniego okna"""
+        count = len(returns)
+        if window > count:
+            raise AnalyticsError(f'Okno ({window}) dłuższe niż liczba okresów ({count})')
+        step = step or max(1, window // 4)
+        step = max(step, -(-(count - window + 1) // MAX_ROLLING_POINTS))
+        ends = np.arange(count, window - 1, -step)[::-1]
+
+        upper = np.triu_indices(returns.shape[1], k=1)
+        average = []
+        for end in ends:
+            correlation, _, _ = correlation_matrices(returns[end - window:end], min_periods)
+            pairs = correlation[upper]
+            average.append(float(np.nanmean(pairs)) if not np.all(np.isnan(pairs)) else np.nan)
+
+        correlation, covariance, _ = correlation_matrices(returns[count - window:], min_periods)
+        ordered = np.ix_(permutation, permutation)
+        return {
+            'window': window,
+            'step': int(step),
+            'dates': [dates[end - 1] for end in ends],
+            'average_correlation': nan_to_none(np.round(np.array(average), 4)),
+            'correlation': _matrix(correlation[ordered], 4),
+            'covariance': _matrix(covariance[ordered], 8)
+        }
+
+
+def log_returns(prices: np.ndarray) -> np.ndarray:
+    """Logarytmiczne stopy zwrotu kolumn (NaN przed pierwszą ceną i dla cen niedodatnich)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        logs = np.log(np.where(prices > 0, prices, np.nan))
+    return np.diff(logs, axis=0)
+
+
+def correlation_matrices(returns: np.ndarray, min_periods: int = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Korelacja, kowariancja (próbkowa) i liczba wspólnych obserwacji dla wszystkich par kolumn.
+    Dla pary liczone są tylko wiersze, w których obie kolumny mają wartość.
+    """
+    valid = ~np.isnan(returns)
+    x = np.where(valid, returns, 0.0)
+    mask = valid.astype(np.float64)
+
+    n = mask.T @ mask            # [i, j] - wspólne obserwacje
+    sum_x = x.T @ mask           # [i, j] - suma x_i po wspólnych wierszach
+    sum_xx = (x * x).T @ mask    # [i, j] - suma x_i^2 po wspólnych wierszach
+    sum_xy = x.T @ x
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        centered = sum_xy - sum_x * sum_x.T / n
+        variance = sum_xx - sum_x ** 2 / n
+        covariance = centered / (n - 1)
+        correlation = np.clip(centered / np.sqrt(variance * variance.T), -1.0, 1.0)
+
+    insufficient = n < min_periods
+    covariance[insufficient] = np.nan
+    correlation[insufficient] = np.nan
+    return correlation, covariance, n
+
+
+def cluster_order(correlation: np.ndarray) -> np.ndarray:
+    """Kolejność liści grupowania hierarchicznego average-linkage (odległość sqrt((1 - corr) / 2))"""
+    count = len(correlation)
+    if count < 3:
+        return np.arange(count)
+
+    distance = np.sqrt(np.clip((1.0 - np.nan_to_num(correlation, nan=0.0)) / 2, 0.0, None))
+    np.fill_diagonal(distance, np.inf)
+    sizes = np.ones(count)
+    leaves = [[i] for i in range(count)]
+
+    for _ in range(count - 1):
+        i, j = np.unravel_index(np.argmin(distance), distance.shape)
+        i, j = min(i, j), max(i, j)
+        # Lance-Williams dla average-linkage: średnia ważona liczebnością klastrów
+        merged = (sizes[i] * distance[i] + sizes[j] * distance[j]) / (sizes[i] + sizes[j])
+        distance[i, :] = merged
+        distance[:, i] = merged
+        distance[i, i] = np.inf
+        distance[j, :] = np.inf
+        distance[:, j] = np.inf
+        sizes[i] += sizes[j]
+        leaves[i] = leaves[i] + leaves[j]
+        leaves[j] = []
+
+    return np.array(leaves[0], dtype=np.int64)
+
+
+def _matrix(values: np.ndarray, decimals: int) -> List[List[Optional[float]]]:
+    rounded = np.round(values, decimals)
+    return [nan_to_none(row) for row in rounded]
@@ -1,4 +1,5 @@
 import requests
+import numpy as np
 import pandas as pd
 import os
 from datetime import datetime, timedelta, date
@@ -8,8 +9,13 @@ import time
 import json
 from config import Config
 from models import db
+from services.metrics_service import MeteredSession
+from services.job_trace_service import traced
+from services.logging_service import get_sampled_logger
 
 logger = logging.getLogger(__name__)
+# Zdarzenia per cena/dywidenda w pętlach normalizacji
+sampled_logger = get_sampled_logger(__name__)
 
 class APIQueueManager:
     """
@@ -132,7 +138,9 @@ class APIQueueManager:
 class APIService:
     def __init__(self):
         self.config = Config()
-        self.session = requests.Session()
+        # Czas zapytań do dostawców według endpointu (/api/system/metrics)
+        self.session = MeteredSession(lambda: {'fmp': self.config.FMP_BASE_URL, 'eodhd': self.config.EODHD_BASE_URL,
+                                               'tiingo': self.config.TIINGO_BASE_URL})
         self.session.headers.update({'User-Agent': 'ETF-Analyzer/1.0'})
         
         # Rate limiting - oszczędność tokenów API (ładowanie z bazy danych)
@@ -223,7 +231,7 @@ class APIService:
                 logger.warning(f"FMP rate limit exceeded for {ticker}")
                 return None
             
-            url = f"https://financialmodelingprep.com/api/v3/quote/{ticker}"
+            url = f"{self.config.FMP_BASE_URL}/quote/{ticker}"
             params = {'apikey': self.config.FMP_API_KEY}
             
             response = self.session.get(url, params=params, timeout=5)
@@ -259,7 +267,7 @@ class APIService:
                 logger.warning(f"EODHD rate limit exceeded for {ticker}")
                 return None
             
-            url = f"https://eodhistoricaldata.com/api/real-time/{ticker}"
+            url = f"{self.config.EODHD_BASE_URL}/real-time/{ticker}"
             params = {'api_token': self.config.EODHD_API_KEY, 'fmt': 'json'}
             
             response = self.session.get(url, params=params, timeout=5)
@@ -294,7 +302,7 @@ class APIService:
                 logger.warning(f"FMP rate limit exceeded for {ticker}")
                 return {}
             
-            url = f"https://financialmodelingprep.com/api/v3/profile/{ticker}"
+            url = f"{self.config.FMP_BASE_URL}/profile/{ticker}"
             params = {'apikey': self.config.FMP_API_KEY}
             
             response = self.session.get(url, params=params, timeout=5)
@@ -335,7 +343,7 @@ class APIService:
                 logger.warning(f"Tiingo rate limit exceeded for {ticker}")
                 return None
             
-            url = f"https://api.tiingo.com/tiingo/daily/{ticker}/prices"
+            url = f"{self.config.TIINGO_BASE_URL}/{ticker}/prices"
             params = {'token': self.config.TIINGO_API_KEY, 'format': 'json'}
             
             response = self.session.get(url, params=params, timeout=5)
@@ -601,6 +609,7 @@ class APIService:
             'can_continue': len(critical_apis) == 0
         }
     
+    @traced()
     def get_etf_data(self, ticker: str) -> Dict:
         """
         Pobiera kompletne dane ETF z różnych źródeł w kolejności priorytetu
@@ -702,8 +711,8 @@ class APIService:
                 if profile_data and len(profile_data) > 0:
                     profile = profile_data[0]
                     
-                    # Logowanie wszystkich dostępnych pól z profilu FMP
-                    logger.info(f"FMP profile data for {ticker}: {profile}")
+                    # Pełny profil FMP tylko na poziomie DEBUG (słownik formatowany dopiero w wątku zapisu logów)
+                    logger.debug("FMP profile data for %s: %s", ticker, profile)
                     
                     fmp_data = {
                         'ticker': ticker,
@@ -720,7 +729,7 @@ class APIService:
                     }
                     
                     # Logowanie inception_date (IPO date)
-                    logger.info(f"FMP inception_date for {ticker}: {profile.get('ipoDate')}")
+                    logger.debug("FMP inception_date for %s: %s", ticker, profile.get('ipoDate'))
                     
                     # 2. Historia dywidend
                     dividend_url = f"{self.config.FMP_BASE_URL}/historical-price-full/stock_dividend/{ticker}"
@@ -827,7 +836,7 @@ class APIService:
             headers = {'Authorization': f'Token {self.config.TIINGO_API_KEY}'}
             
             # Ostatnia cena
-            price_url = f"{self.config.TIINGO_BASE_URL}/daily/{ticker}/prices"
+            price_url = f"{self.config.TIINGO_BASE_URL}/{ticker}/prices"
             price_response = self._make_request_with_retry(price_url, headers=headers)
             
             if price_response and price_response.status_code == 200:
@@ -940,6 +949,7 @@ class APIService:
             logger.warning(f"Error determining dividend frequency: {str(e)}")
             return 'unknown'
     
+    @traced()
     def get_historical_prices(self, ticker: str, years: int = 15, normalize_splits: bool = True) -> List[Dict]:
         """
         Pobiera historyczne ceny ETF z FMP lub EODHD z opcjonalną normalizacją splitu
@@ -1000,6 +1010,7 @@ class APIService:
         
         return []
     
+    @traced()
     def get_historical_weekly_prices(self, ticker: str, years: int = 15, normalize_splits: bool = True) -> List[Dict]:
         """
         Pobiera historyczne ceny tygodniowe ETF z FMP z opcjonalną normalizacją splitu
@@ -1159,6 +1170,7 @@ class APIService:
         
         return weekly_data
     
+    @traced()
     def get_dividend_history(self, ticker: str, years: int = 15, normalize_splits: bool = True, since_date: date = None) -> List[Dict]:
         """
         Pobiera historię dywidend ETF z FMP z opcjonalną normalizacją splitu
@@ -1241,13 +1253,15 @@ class APIService:
         
         return []
 
-    def calculate_dividend_streak_growth(self, ticker: str, dividends_from_db: List = None) -> Dict:
+    def calculate_dividend_streak_growth(self, ticker: str, dividends_from_db: List = None,
+                                         yearly_averages: Dict[int, float] = None) -> Dict:
         """
         Oblicza aktualny Dividend Streak Growth dla ETF
         
         Args:
             ticker: Ticker ETF
             dividends_from_db: Lista dywidend z bazy danych (opcjonalna)
+            yearly_averages: Średnie roczne dywidend {rok: średnia} (z tabeli agregatów - bez historii dywidend)
         
         Returns:
             Dict z informacjami o DSG:
@@ -1260,16 +1274,30 @@ class APIService:
             }
         """
         try:
-            # Użyj danych z bazy jeśli podane, w przeciwnym razie pobierz z API
-            if dividends_from_db:
-                dividends = dividends_from_db
-                logger.info(f"Using {len(dividends)} dividends from database for {ticker} DSG calculation")
-            else:
-                # Fallback do API (tylko gdy konieczne)
-                logger.info(f"No database dividends provided for {ticker}, fetching from API")
-                dividends = self.get_dividend_history(ticker, years=20)
+            if yearly_averages is None:
+                # Użyj danych z bazy jeśli podane, w przeciwnym razie pobierz z API
+                if dividends_from_db:
+                    dividends = dividends_from_db
+                    logger.info(f"Using {len(dividends)} dividends from database for {ticker} DSG calculation")
+                else:
+                    # Fallback do API (tylko gdy konieczne)
+                    logger.info(f"No database dividends provided for {ticker}, fetching from API")
+                    dividends = self.get_dividend_history(ticker, years=20)
+                
+                # Grupowanie dywidend według roku i obliczanie średniej rocznej
+                yearly_dividends = {}
+                for dividend in dividends or []:
+                    year = dividend['payment_date'].year
+                    if year not in yearly_dividends:
+                        yearly_dividends[year] = []
+                    yearly_dividends[year].append(dividend['amount'])
+                
+                # Obliczanie średniej rocznej dla każdego roku
+                yearly_averages = {}
+                for year, amounts in yearly_dividends.items():
+                    yearly_averages[year] = sum(amounts) / len(amounts)
             
-            if not dividends or len(dividends) == 0:
+            if not yearly_averages:
                 return {
                     'current_streak': 0,
                     'total_years': 0,
@@ -1278,19 +1306,6 @@ class APIService:
                     'calculation_method': 'no dividends'
                 }
             
-            # Grupowanie dywidend według roku i obliczanie średniej rocznej
-            yearly_dividends = {}
-            for dividend in dividends:
-                year = dividend['payment_date'].year
-                if year not in yearly_dividends:
-                    yearly_dividends[year] = []
-                yearly_dividends[year].append(dividend['amount'])
-            
-            # Obliczanie średniej rocznej dla każdego roku
-            yearly_averages = {}
-            for year, amounts in yearly_dividends.items():
-                yearly_averages[year] = sum(amounts) / len(amounts)
-            
             # Sortowanie lat rosnąco
             years = sorted(yearly_averages.keys())
             
@@ -1374,6 +1389,7 @@ class APIService:
                 'calculation_method': 'error'
             }
 
+    @traced()
     def get_stock_splits(self, ticker: str) -> List[Dict]:
         """
         Pobiera informacje o splitach akcji z FMP API
@@ -1477,7 +1493,8 @@ class APIService:
             normalized_dividend['split_ratio_applied'] = split_ratio
             
             if split_ratio > 1.0:
-                logger.info(f"Normalized dividend: {original_amount} -> {normalized_dividend['normalized_amount']} (split ratio: {split_ratio})")
+                sampled_logger.debug("Normalized dividend: %s -> %s (split ratio: %s)",
+                                     original_amount, normalized_dividend['normalized_amount'], split_ratio)
             
             normalized_dividends.append(normalized_dividend)
         
@@ -1523,12 +1540,14 @@ class APIService:
             normalized_price['split_ratio_applied'] = split_ratio
             
             if split_ratio > 1.0:
-                logger.info(f"Normalized price: {original_close} -> {normalized_price['normalized_close']} (split ratio: {split_ratio})")
+                sampled_logger.debug("Normalized price: %s -> %s (split ratio: %s)",
+                                     original_close, normalized_price['normalized_close'], split_ratio)
             
             normalized_prices.append(normalized_price)
         
         return normalized_prices
     
+    @traced()
     def get_current_price(self, ticker: str) -> Optional[float]:
         """
         Pobiera aktualną cenę ETF z dostępnych źródeł API
@@ -1621,7 +1640,7 @@ class APIService:
     def _get_tiingo_current_price(self, ticker: str) -> Optional[float]:
         """Pobiera aktualną cenę z Tiingo API"""
         try:
-            url = f"{self.config.TIINGO_BASE_URL}/tiingo/daily/{ticker}/prices"
+            url = f"{self.config.TIINGO_BASE_URL}/{ticker}/prices"
             params = {'token': self.config.TIINGO_API_KEY}
             
             response = self.session.get(url, params=params, timeout=5)
@@ -1637,119 +1656,104 @@ class APIService:
             logger.warning(f"Tiingo current price fetch error for {ticker}: {str(e)}")
             return None
 
-    def calculate_break_even_dividends(self, ticker: str, dividends_from_db: List = None, prices_from_db: List = None, target_percentage: float = 5.0) -> Dict:
+    def calculate_break_even_dividends(self, ticker: str, dividends_from_db: List, prices_from_db,
+                                       target_percentage=5.0, tax_rate: float = 0.0, investment_amount=1000) -> Dict:
         """
         Oblicza break-even time dla dywidend dla każdego miesiąca inwestycji
         
+        Wszystkie miesiące startu liczone są naraz: sumy skumulowane dywidend netto na jednostkę
+        i searchsorted progu (cel / liczba jednostek) - zamiast symulacji miesiąc po miesiącu.
+        
         Args:
             ticker: Symbol ETF
             dividends_from_db: Lista dywidend z bazy danych
-            prices_from_db: Lista cen miesięcznych z bazy danych
-            target_percentage: Docelowy procent ROI (domyślnie 5.0%)
+            prices_from_db: Szereg cen miesięcznych (PriceSeries '1M')
+            target_percentage: Docelowy procent ROI lub lista wartości (domyślnie 5.0%)
+            tax_rate: Stawka podatku od dywidend w procentach
+            investment_amount: Kwota inwestycji lub lista kwot (domyślnie $1000 miesięcznie)
             
         Returns:
-            Słownik z danymi break-even dla każdego miesiąca
+            Słownik z danymi break-even dla każdego miesiąca (pierwszy cel i kwota);
+            dla list celów/kwot dodatkowo 'scenarios' - wyniki każdej kombinacji
         """
         try:
-            from models import db
-            from services.database_service import DatabaseService
-            
-            db_service = DatabaseService()
-            
-            # Pobieranie danych jeśli nie podano
-            if dividends_from_db is None:
-                etf = db_service.get_etf_by_ticker(ticker)
-                if not etf:
-                    return {'error': f'ETF {ticker} not found'}
-                dividends_from_db = db_service.get_etf_dividends(etf.id)
-            
-            if prices_from_db is None:
-                etf = db_service.get_etf_by_ticker(ticker)
-                if not etf:
-                    return {'error': f'ETF {ticker} not found'}
-                prices_from_db = db_service.get_monthly_prices(etf.id)
-            
-            # Pobieranie stawki podatku
-            tax_rate = db_service.get_dividend_tax_rate()
-            
-            # Przygotowanie danych
-            investment_amount = 1000  # $1000 miesięcznie
-            target_return = investment_amount * (target_percentage / 100)  # Dynamiczny cel ROI
-            
-            # Grupowanie dywidend po miesiącach
-            dividends_by_month = {}
-            for dividend in dividends_from_db:
-                month_key = f"{dividend.payment_date.year}-{dividend.payment_date.month:02d}"
-                if month_key not in dividends_by_month:
-                    dividends_by_month[month_key] = []
-                dividends_by_month[month_key].append(dividend.normalized_amount or dividend.amount)
-            
-            # Grupowanie cen po miesiącach
-            prices_by_month = {}
-            for price in prices_from_db:
-                month_key = f"{price.date.year}-{price.date.month:02d}"
-                prices_by_month[month_key] = price.close_price
-            
-            # Obliczanie break-even time dla każdego miesiąca
-            break_even_results = []
-            
-            for month_key in sorted(prices_by_month.keys()):
-                if month_key not in prices_by_month:
-                    continue
-                
-                price = prices_by_month[month_key]
-                year, month = month_key.split('-')
-                
-                # Obliczanie liczby jednostek (2 miejsca po przecinku)
-                units = round(investment_amount / price, 2)
-                
-                # Symulacja portfela - śledzenie dywidend netto
-                cumulative_dividends = 0
-                months_to_break_even = 0
-                break_even_achieved = False
-                
-                # Sprawdzanie kolejnych miesięcy po inwestycji
-                for future_month_key in sorted(dividends_by_month.keys()):
-                    if future_month_key < month_key:
-                        continue
-                    
-                    if future_month_key in dividends_by_month:
-                        # Suma dywidend netto z tego miesiąca dla naszych jednostek
-                        monthly_dividend = sum(dividends_by_month[future_month_key])
-                        net_dividend = monthly_dividend * units * (1 - tax_rate / 100)
-                        cumulative_dividends += net_dividend
-                        
-                        if cumulative_dividends >= target_return:
-                            months_to_break_even = months_to_break_even
-                            break_even_achieved = True
-                            break
-                    
-                    months_to_break_even += 1
-                
-                # Jeśli nie osiągnięto break-even, ustawiamy None
-                if not break_even_achieved:
-                    months_to_break_even = None
-                
-                break_even_results.append({
-                    'month': month_key,
-                    'year': int(year),
-                    'month_num': int(month),
-                    'price': round(price, 4),
-                    'units': units,
-                    'months_to_break_even': months_to_break_even,
-                    'cumulative_dividends': round(cumulative_dividends, 4)
-                })
-            
-            return {
+            targets = list(target_percentage) if isinstance(target_percentage, (list, tuple)) else [target_percentage]
+            amounts = list(investment_amount) if isinstance(investment_amount, (list, tuple)) else [investment_amount]
+            
+            # Miesiące jako liczby (rok * 12 + miesiąc - 1)
+            prices = np.asarray(prices_from_db.close, dtype=np.float64)
+            price_months = prices_from_db.dates().astype('datetime64[M]').astype(np.int64)
+            
+            # Sumy dywidend w miesiącach wypłaty (rosnąco)
+            dividend_months = np.array(
+                [(d.payment_date.year - 1970) * 12 + d.payment_date.month - 1 for d in dividends_from_db], dtype=np.int64
+            )
+            dividend_values = np.array(
+                [d.normalized_amount or d.amount for d in dividends_from_db], dtype=np.float64
+            )
+            months, inverse = np.unique(dividend_months, return_inverse=True)
+            monthly_dividends = np.bincount(inverse, weights=dividend_values, minlength=len(months))
+            
+            # Dywidendy netto na jednostkę skumulowane od początku historii (cumulative[0] = 0)
+            cumulative = np.concatenate(([0.0], np.cumsum(monthly_dividends * (1 - tax_rate / 100))))
+            
+            # Pierwszy miesiąc z dywidendą nie wcześniejszy niż miesiąc inwestycji
+            first = np.searchsorted(months, price_months, side='left')
+            base = cumulative[first]
+            
+            # Liczba jednostek (2 miejsca po przecinku jak round() - tablica kwoty x miesiące)
+            units = np.array([[round(amount / price, 2) for price in prices] for amount in amounts], dtype=np.float64)
+            target_returns = np.array([[amount * (target / 100) for amount in amounts] for target in targets])
+            
+            # Pierwszy miesiąc, w którym dywidendy netto jednostek osiągają cel
+            with np.errstate(divide='ignore', invalid='ignore'):
+                thresholds = base + target_returns[:, :, None] / units[None, :, :]
+            thresholds = np.where(np.isnan(thresholds), np.inf, thresholds)
+            reached = np.maximum(np.searchsorted(cumulative[1:], thresholds, side='left'), first)
+            achieved = reached < len(months)
+            end = np.where(achieved, reached + 1, len(months))
+            months_to_break_even = reached - first
+            cumulative_dividends = units[None, :, :] * (cumulative[end] - base)
+            
+            month_labels = np.datetime_as_string(price_months.astype('datetime64[M]'), unit='M').tolist()
+            
+            def scenario_months(t, a):
+                return [int(m) if ok else None for m, ok in zip(months_to_break_even[t, a], achieved[t, a])]
+            
+            break_even_results = [{
+                'month': month_key,
+                'year': int(month_key[:4]),
+                'month_num': int(month_key[5:]),
+                'price': round(float(price), 4),
+                'units': float(unit),
+                'months_to_break_even': months_value,
+                'cumulative_dividends': round(float(cumulative_value), 4)
+            } for month_key, price, unit, months_value, cumulative_value in zip(
+                month_labels, prices, units[0], scenario_months(0, 0), cumulative_dividends[0, 0]
+            )]
+            
+            result = {
                 'ticker': ticker.upper(),
-                'investment_amount': investment_amount,
-                'target_percentage': target_percentage,
-                'target_return': target_return,
+                'investment_amount': amounts[0],
+                'target_percentage': targets[0],
+                'target_return': amounts[0] * (targets[0] / 100),
                 'tax_rate': tax_rate,
                 'data': break_even_results,
                 'count': len(break_even_results)
             }
             
+            if len(targets) > 1 or len(amounts) > 1:
+                # Tabela "co jeśli" - kolumny zgodne z kolejnością miesięcy w 'data'
+                result['scenarios'] = [{
+                    'target_percentage': target,
+                    'investment_amount': amount,
+                    'target_return': amount * (target / 100),
+                    'months_to_break_even': scenario_months(t, a),
+                    'cumulative_dividends': np.round(cumulative_dividends[t, a], 4).tolist()
+                } for t, target in enumerate(targets) for a, amount in enumerate(amounts)]
+            
+            return result
+            
         except Exception as e:
             logger.error(f"Error calculating break-even dividends for {ticker}: {str(e)}")
             return {'error': str(e)}
@@ -1810,8 +1814,7 @@ class APIService:
             
             logger.info(f"MACD obliczony: {len(macd_data)} punktów z {len(df)} cen")
             if macd_data:
-                logger.info(f"Przykład MACD data[0]: {macd_data[0]}")
-                logger.info(f"Pola w MACD data[0]: {list(macd_data[0].keys())}")
+                logger.debug("Przykład MACD data[0]: %s", macd_data[0])
             
             return macd_data
             
@@ -1837,19 +1840,10 @@ class APIService:
             logger.info(f"Rozpoczynam obliczanie Stochastic Oscillator: {len(prices)} cen, lookback={lookback_period}, smoothing={smoothing_factor}, sma={sma_period}")
             
             # Sprawdź format danych
-            if prices and len(prices) > 0:
+            if prices and logger.isEnabledFor(logging.DEBUG):
                 sample_price = prices[0]
-                logger.info(f"Przykładowa cena: {sample_price}")
-                logger.info(f"Typ date: {type(sample_price['date'])}, Typ close: {type(sample_price['close'])}")
-            
-            # Sample data for testing
-            if len(prices) >= 3:
-                sample_prices = [
-                    {'date': '2020-01-01', 'close': 10.0},
-                    {'date': '2020-01-08', 'close': 12.0},
-                    {'date': '2020-01-15', 'close': 11.0}
-                ]
-                logger.info(f"Using sample data for testing: {sample_prices}")
+                logger.debug("Przykładowa cena: %s (typ date: %s, typ close: %s)",
+                             sample_price, type(sample_price['date']), type(sample_price['close']))
             
             if len(prices) < lookback_period:
                 logger.warning(f"Za mało danych dla Stochastic Oscillator: {len(prices)} < {lookback_period}")
@@ -1857,7 +1851,8 @@ class APIService:
             
             # Sortowanie cen od najstarszych do najnowszych
             sorted_prices = sorted(prices, key=lambda x: datetime.strptime(x['date'], '%Y-%m-%d').date() if isinstance(x['date'], str) else x['date'])
-            logger.info(f"Ceny posortowane: {len(sorted_prices)} punktów od {sorted_prices[0]['date']} do {sorted_prices[-1]['date']}")
+            logger.debug("Ceny posortowane: %d punktów od %s do %s",
+                         len(sorted_prices), sorted_prices[0]['date'], sorted_prices[-1]['date'])
             
             stochastic_data = []
             
@@ -1887,7 +1882,7 @@ class APIService:
                     'current_price': current_price
                 })
             
-            logger.info(f"Obliczono %K dla {len(stochastic_data)} punktów")
+            logger.debug("Obliczono %%K dla %d punktów", len(stochastic_data))
             
             # Wygładzanie %K (SMA)
             if len(stochastic_data) >= smoothing_factor:
@@ -1900,7 +1895,7 @@ class APIService:
                 for i in range(smoothing_factor - 1):
                     stochastic_data[i]['k_percent_smoothed'] = stochastic_data[i]['k_percent']
                 
-                logger.info(f"Wygładzono %K dla {len(stochastic_data)} punktów")
+                logger.debug("Wygładzono %%K dla %d punktów", len(stochastic_data))
             else:
                 logger.warning(f"Za mało danych dla wygładzania %K: {len(stochastic_data)} < {smoothing_factor}")
                 # Jeśli nie ma wystarczająco danych, użyj surowych wartości %K
@@ -1918,7 +1913,7 @@ class APIService:
                 for i in range(sma_period - 1):
                     stochastic_data[i]['d_percent'] = stochastic_data[i]['k_percent_smoothed']
                 
-                logger.info(f"Obliczono %D dla {len(stochastic_data)} punktów")
+                logger.debug("Obliczono %%D dla %d punktów", len(stochastic_data))
             else:
                 logger.warning(f"Za mało danych dla obliczenia %D: {len(stochastic_data)} < {sma_period}")
                 # Jeśli nie ma wystarczająco danych, użyj wygładzonych wartości %K jako %D
@@ -1930,15 +1925,9 @@ class APIService:
             
             logger.info(f"Stochastic Oscillator obliczony: {len(final_data)} punktów z {len(prices)} cen")
             
-            # Data validation
-            if stochastic_data:
-                logger.info(f"Sample stochastic_data[0]: {stochastic_data[0]}")
-                logger.info(f"Fields in stochastic_data[0]: {list(stochastic_data[0].keys())}")
-            
             # Data verification
             if final_data:
-                logger.info(f"PIERWSZY PUNKT: {final_data[0]}")
-                logger.info(f"OSTATNI PUNKT: {final_data[-1]}")
+                logger.debug("PIERWSZY PUNKT: %s, OSTATNI PUNKT: %s", final_data[0], final_data[-1])
             else:
                 logger.warning("BRAK DANYCH W FINAL_DATA!")
                 logger.warning(f"stochastic_data ma {len(stochastic_data)} punktów")
@@ -1951,6 +1940,7 @@ class APIService:
             logger.error(f"Error calculating Stochastic Oscillator: {str(e)}")
             return []
 
+    @traced()
     def get_historical_daily_prices(self, ticker: str, days: int = 365, normalize_splits: bool = True) -> List[Dict]:
         """
         Pobiera historyczne ceny dzienne ETF z EODHD lub FMP z opcjonalną normalizacją splitu
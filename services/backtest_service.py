@@ -0,0 +1,187 @@
+"""
+Backtest portfeli ETF - miesięczne DCA (dollar-cost averaging) z dywidendami
+
+Ceny miesięczne (znormalizowane po splitach) wybranych ETF wycinane są z panelu uniwersum
+(PanelService), a dywidendy na jednostkę sumowane w tej samej macierzy miesiące x tickery.
+Symulacja liczona jest wektorowo dla wielu portfeli naraz (miesiące x portfele x tickery):
+
+- co miesiąc kwota dzielona jest wg wag i kupowane są jednostki po cenie zamknięcia miesiąca,
+- dywidendy z miesiąca t należą się jednostkom posiadanym na koniec miesiąca t-1
+  i pomniejszane są o podatek (DividendTaxRate),
+- bez reinwestycji dywidendy netto trafiają do gotówki; z reinwestycją kupują jednostki po cenie
+  z miesiąca wypłaty - rekurencja u[t] = u[t-1] * (1 + r[t]) + b[t] rozwiązywana jest przez
+  iloczyn skumulowany G[t] = prod(1 + r): u[t] = G[t] * cumsum(b / G)[t].
+
+IRR liczone jest bisekcją (wektorowo dla wszystkich portfeli) z przepływów: wpłata co miesiąc,
+wartość portfela na końcu okresu.
+"""
+
+import logging
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.panel_service import PanelError
+
+logger = logging.getLogger(__name__)
+
+IRR_ITERATIONS = 60
+
+
+class BacktestError(Exception):
+    """Błąd parametrów backtestu zwracany klientowi jako {'success': False, 'error': ...}"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class PricePanel:
+    """Wyrównane miesięczne ceny i dywidendy na jednostkę (miesiące x tickery)"""
+
+    __slots__ = ('tickers', 'months', 'prices', 'dividends')
+
+    def __init__(self, tickers: List[str], months: np.ndarray, prices: np.ndarray, dividends: np.ndarray):
+        self.tickers = tickers
+        self.months = months        # int64 - miesiące od 1970-01
+        self.prices = prices        # float64 (miesiące x tickery), uzupełnione wprzód
+        self.dividends = dividends  # float64 (miesiące x tickery), suma dywidend na jednostkę w miesiącu
+
+    def __len__(self):
+        return len(self.months)
+
+    def month_strings(self) -> List[str]:
+        return np.datetime_as_string(self.months.astype('datetime64[M]'), unit='M').tolist()
+
+    def window(self, start: Optional[date] = None, end: Optional[date] = None) -> 'PricePanel':
+        """Fragment panelu od miesiąca start do miesiąca end (włącznie)"""
+        low = 0 if start is None else np.searchsorted(self.months, _month_number(start), side='left')
+        high = len(self.months) if end is None else np.searchsorted(self.months, _month_number(end), side='right')
+        return PricePanel(self.tickers, self.months[low:high], self.prices[low:high], self.dividends[low:high])
+
+
+class BacktestService:
+    """Backtest portfeli DCA na danych z bazy (ceny z cache szeregów, dywidendy jednym zapytaniem)"""
+
+    def __init__(self, db_service, panel_service, max_portfolios: int = 500):
+        self.db_service = db_service
+        self.panel_service = panel_service
+        self.max_portfolios = max_portfolios
+
+    def load_panel(self, tickers: List[str]) -> PricePanel:
+        """
+        Wycina z miesięcznego panelu uniwersum kolumny tickerów - okres wspólny
+        (od pierwszej ceny najmłodszego ETF), luki uzupełnione ostatnią znaną ceną.
+        """
+        universe = self.panel_service.get('1M')
+        try:
+            columns = universe.columns(tickers)
+            rows = universe.common_range(columns)
+        except PanelError as e:
+            raise BacktestError(str(e), 404)
+
+        months = np.asarray(universe.periods[rows])
+        prices = np.asarray(universe.close[rows][:, columns])
+        dividends = np.zeros_like(prices)
+        if len(months):
+            first = months[0]
+            column_by_etf = {int(universe.etf_ids[column]): index for index, column in enumerate(columns)}
+            dividend_rows = self.db_service.get_dividends_for_etfs(list(column_by_etf))
+            if dividend_rows:
+                etf_ids, payment_dates, amounts = zip(*dividend_rows)
+                div_months = np.array([_month_number(d) for d in payment_dates], dtype=np.int64) - first
+                div_columns = np.array([column_by_etf[etf_id] for etf_id in etf_ids], dtype=np.int64)
+                inside = (div_months >= 0) & (div_months < len(months))
+                np.add.at(dividends, (div_months[inside], div_columns[inside]),
+                          np.asarray(amounts, dtype=np.float64)[inside])
+
+        return PricePanel(list(tickers), months, prices, dividends)
+
+    def run(self, panel: PricePanel, weights: np.ndarray, monthly_amount: float = 1000.0,
+            reinvest_dividends: bool = True, tax_rate: float = 0.0) -> Dict:
+        """
+        Symuluje DCA dla portfeli (wiersze weights, kolumny wg panel.tickers - normalizowane do 1).
+
+        Returns:
+            Słownik tablic NumPy: equity, invested, dividends (miesiące x portfele) i irr (portfele)
+        """
+        weights = np.atleast_2d(np.asarray(weights, dtype=np.float64))
+        if weights.shape[1] != len(panel.tickers):
+            raise BacktestError('Liczba wag nie odpowiada liczbie tickerów')
+        if np.any(weights < 0) or np.any(weights.sum(axis=1) <= 0):
+            raise BacktestError('Wagi muszą być nieujemne i niezerowe')
+        if len(weights) > self.max_portfolios:
+            raise BacktestError(f'Maksymalnie {self.max_portfolios} portfeli w jednym zapytaniu')
+        if len(panel) == 0:
+            raise BacktestError('Brak danych w wybranym okresie')
+        weights = weights / weights.sum(axis=1, keepdims=True)
+
+        prices = panel.prices                                  # (T, K)
+        net_dividends = panel.dividends * (1 - tax_rate / 100)  # (T, K)
+
+        # Jednostki kupowane co miesiąc (T, P, K)
+        bought = monthly_amount * weights[None, :, :] / prices[:, None, :]
+
+        if reinvest_dividends:
+            growth = np.cumprod(1 + net_dividends / prices, axis=0)  # (T, K) - wspólne dla portfeli
+            units = growth[:, None, :] * np.cumsum(bought / growth[:, None, :], axis=0)
+        else:
+            units = np.cumsum(bought, axis=0)
+
+        # Dywidendy netto z jednostek posiadanych na koniec poprzedniego miesiąca
+        held = np.concatenate((np.zeros_like(units[:1]), units[:-1]), axis=0)
+        paid = (held * net_dividends[:, None, :]).sum(axis=2)    # (T, P)
+        dividends = np.cumsum(paid, axis=0)
+
+        equity = (units * prices[:, None, :]).sum(axis=2)
+        if not reinvest_dividends:
+            equity = equity + dividends
+        invested = monthly_amount * np.arange(1, len(panel) + 1, dtype=np.float64)
+
+        return {
+            'equity': equity,
+            'invested': invested,
+            'dividends': dividends,
+            'irr': dca_irr(monthly_amount, equity[-1], len(panel))
+        }
+
+
+def dca_irr(monthly_amount: float, final_values: np.ndarray, months: int) -> np.ndarray:
+    """
+    Roczne IRR dla wpłat monthly_amount w miesiącach 0..months-1 i wartości końcowych
+    (wektor portfeli) w miesiącu months-1. Bisekcja stopy miesięcznej w (-99%, 100%).
+    """
+    final_values = np.asarray(final_values, dtype=np.float64)
+    if months < 2:
+        return np.full(final_values.shape, np.nan)
+    t = np.arange(months, dtype=np.float64)
+
+    def npv(rate):
+        discount = (1 + rate)[:, None] ** -t[None, :]
+        return final_values * discount[:, -1] - monthly_amount * discount.sum(axis=1)
+
+    low = np.full(final_values.shape, -0.99)
+    high = np.full(final_values.shape, 1.0)
+    for _ in range(IRR_ITERATIONS):
+        mid = (low + high) / 2
+        positive = npv(mid) > 0  # NPV maleje ze stopą - pierwiastek powyżej mid
+        low = np.where(positive, mid, low)
+        high = np.where(positive, high, mid)
+    rate = (low + high) / 2
+    return np.where(final_values > 0, (1 + rate) ** 12 - 1, np.nan)
+
+
+def parse_month(value: Optional[str], name: str) -> Optional[date]:
+    """Miesiąc z parametru 'RRRR-MM' lub 'RRRR-MM-DD' (None gdy brak)"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(f"{value}-01" if len(value) == 7 else value[:10])
+    except ValueError:
+        raise BacktestError(f'Nieprawidłowa data w parametrze {name}: {value} (oczekiwano RRRR-MM)')
+
+
+def _month_number(value: date) -> int:
+    return (value.year - 1970) * 12 + value.month - 1
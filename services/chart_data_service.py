@@ -0,0 +1,396 @@
+"""
+Dane wykresów strony ETF (ceny, MACD, Stochastic, dywidendy)
+
+Każda sekcja odpowiada jednemu endpointowi /api/etfs/<ticker>/<sekcja>. Endpoint /bundle
+buduje wiele sekcji naraz - każdy timeframe jest ładowany raz, a wskaźniki liczone
+są ze wspólnych tablic szeregu.
+
+Parametr points=N zmniejsza szeregi do ok. N punktów (LTTB, patrz services/downsampling.py) -
+wskaźniki liczone są zawsze z pełnej historii, zmniejszana jest tylko odpowiedź.
+
+Parametry from/to (daty włącznie), limit i after (kursor keyset - ostatnia data poprzedniej
+strony, next_after w odpowiedzi) wycinają fragment szeregu przed zmniejszaniem. Szeregi cen
+pochodzą z cache (całe), więc zakres wycinany jest z tablic; dywidendy - zapytaniem zakresowym.
+"""
+
+import calendar
+import logging
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from flask import request
+
+from services.downsampling import downsample_columns, MIN_POINTS
+from services.indicator_registry import (IndicatorError, KernelCache, compute_indicators, get_indicator, make_spec,
+                                         parse_indicator_spec)
+from services.series_cache import PriceSeries, nan_to_none
+from services.response_service import columns_to_records, MACD_FIELDS, STOCHASTIC_FIELDS
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAME_LABELS = {'1M': 'miesięcznych', '1W': 'tygodniowych', '1D': 'dziennych'}
+
+# Ceny miesięczne liczone są z cen oryginalnych, tygodniowe i dzienne - ze znormalizowanych
+INDICATOR_PRICE_COLUMN = {'1M': 'close', '1W': 'normalized', '1D': 'normalized'}
+
+PRICE_SECTIONS = {
+    'prices': '1M',
+    'weekly-prices': '1W',
+    'monthly-prices': '1M',
+    'daily-prices': '1D'
+}
+
+# sekcja -> (timeframe, wskaźnik, parametry, klucz w odpowiedzi, nazwa w komunikacie błędu)
+INDICATOR_SECTIONS = {
+    'weekly-macd': ('1W', 'macd', (8, 17, 9), 'macd', 'MACD (8-17-9)'),
+    'monthly-macd': ('1M', 'macd', (8, 17, 9), 'macd', 'miesięcznego MACD (8-17-9)'),
+    'daily-macd': ('1D', 'macd', (8, 17, 9), 'daily_macd', 'dziennego MACD (8-17-9)'),
+    'weekly-stochastic': ('1W', 'stochastic', (36, 12, 12), 'stochastic', 'Stochastic Oscillator'),
+    'weekly-stochastic-short': ('1W', 'stochastic', (9, 3, 3), 'stochastic', 'krótkiego Stochastic Oscillator (9-3-3)'),
+    'monthly-stochastic': ('1M', 'stochastic', (36, 12, 12), 'stochastic', 'miesięcznego Stochastic Oscillator (36-12-12)'),
+    'monthly-stochastic-short': ('1M', 'stochastic', (9, 3, 3), 'stochastic',
+                                 'miesięcznego krótkiego Stochastic Oscillator (9-3-3)'),
+    'daily-stochastic': ('1D', 'stochastic', (36, 12, 12), 'daily_stochastic', 'dziennego Stochastic Oscillator (36-12-12)'),
+    'daily-stochastic-short': ('1D', 'stochastic', (9, 3, 3), 'daily_stochastic', 'dziennego Stochastic Oscillator (9-3-3)')
+}
+
+# Kolumna wyznaczająca kształt przy zmniejszaniu i para kolumn, których przecięcia są zachowywane
+DOWNSAMPLE_COLUMNS = {
+    'prices': ('close_price', None),
+    'daily-prices': ('close', None),
+    'macd': ('macd_line', ('macd_line', 'signal_line')),
+    'stochastic': ('k_percent', ('k_percent', 'd_percent'))
+}
+
+SECTIONS = tuple(PRICE_SECTIONS) + tuple(INDICATOR_SECTIONS) + ('dividends',)
+
+
+class DateWindow(NamedTuple):
+    """Zakres dat i stronicowanie sekcji (parametry from, to, after, limit)"""
+    start: Optional[date] = None
+    end: Optional[date] = None
+    after: Optional[date] = None
+    limit: Optional[int] = None
+
+
+class SectionError(Exception):
+    """Błąd sekcji zwracany klientowi jako {'success': False, 'error': ...}"""
+
+    def __init__(self, message: str, status_code: int = 404):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class ChartDataService:
+    """Buduje odpowiedzi sekcji wykresów ze wspólnych szeregów cen"""
+
+    def __init__(self, db_service):
+        self.db_service = db_service
+
+    def build(self, etf, ticker: str, section: str, columnar: bool = False, points: Optional[int] = None,
+              window: Optional[DateWindow] = None) -> Dict:
+        """Buduje pojedynczą sekcję (treść odpowiedzi endpointu)"""
+        return self._build(etf, ticker, section, columnar, {}, points, window)
+
+    def build_many(self, etf, ticker: str, sections: Iterable[str], columnar: bool = False,
+                   points: Optional[int] = None, window: Optional[DateWindow] = None) -> Iterator[Tuple[str, Dict, int]]:
+        """
+        Buduje kolejne sekcje ze wspólnymi szeregami (każdy timeframe ładowany raz).
+        Zwraca (sekcja, treść, status HTTP) - błąd jednej sekcji nie przerywa pozostałych.
+        """
+        shared = {}
+        for section in sections:
+            try:
+                yield section, self._build(etf, ticker, section, columnar, shared, points, window), 200
+            except SectionError as e:
+                yield section, {'success': False, 'error': e.message}, e.status_code
+            except Exception as e:
+                logger.error(f"Error building section {section} for {ticker}: {str(e)}")
+                yield section, {'success': False, 'error': str(e)}, 500
+
+    def _build(self, etf, ticker: str, section: str, columnar: bool, shared: Dict,
+               points: Optional[int] = None, window: Optional[DateWindow] = None) -> Dict:
+        if section in PRICE_SECTIONS:
+            data = self._prices(etf, ticker, section, self._series(etf, ticker, PRICE_SECTIONS[section], shared, section))
+        elif section in INDICATOR_SECTIONS:
+            data = self._indicator(etf, ticker, section, shared)
+        elif section == 'dividends':
+            return self._dividends(etf, window)
+        else:
+            raise SectionError(f'Nieznana sekcja: {section}', 400)
+
+        if window is not None:
+            self._apply_window(section, data, window)
+        if points is not None:
+            self._downsample(section, data, points)
+        if not columnar:
+            for key, value in data.items():
+                if isinstance(value, dict) and 'dates' in value:
+                    data[key] = columns_to_records(value)
+        return {'success': True, 'data': data}
+
+    def _dividends(self, etf, window: Optional[DateWindow]) -> Dict:
+        """Dywidendy (od najnowszych) - zakres i kursor przekazywane do zapytania"""
+        if window is None:
+            dividends = self.db_service.get_etf_dividends(etf.id)
+            return {'success': True, 'data': [dividend.to_dict() for dividend in dividends], 'count': len(dividends)}
+
+        # limit + 1 - czy jest następna strona
+        limit = window.limit + 1 if window.limit else None
+        dividends = self.db_service.get_etf_dividends(etf.id, limit, start=window.start, end=window.end,
+                                                      after=window.after)
+        next_after = None
+        if window.limit and len(dividends) > window.limit:
+            dividends = dividends[:window.limit]
+            next_after = dividends[-1].payment_date.isoformat()
+        return {'success': True, 'data': [dividend.to_dict() for dividend in dividends], 'count': len(dividends),
+                'next_after': next_after}
+
+    def _apply_window(self, section: str, data: Dict, window: DateWindow):
+        """Wycina zakres dat kolumn sekcji w miejscu (ceny dzienne są od najnowszej)"""
+        descending = section == 'daily-prices'
+        for key, value in list(data.items()):
+            if not (isinstance(value, dict) and 'dates' in value):
+                continue
+            begin, stop, next_after = _window_slice(value['dates'], window, descending)
+            data[key] = {column: values[begin:stop] for column, values in value.items()}
+            dates = data[key]['dates']
+            data['count'] = len(dates)
+            data['date_range'] = {
+                'start': min(dates[0], dates[-1]) if dates else None,
+                'end': max(dates[0], dates[-1]) if dates else None
+            }
+            data['next_after'] = next_after
+
+    def _downsample(self, section: str, data: Dict, points: int):
+        """Zmniejsza kolumny sekcji w miejscu (count - po zmniejszeniu, original_count - przed)"""
+        kind = section if section in DOWNSAMPLE_COLUMNS else (
+            INDICATOR_SECTIONS[section][1] if section in INDICATOR_SECTIONS else 'prices')
+        value_key, crossover = DOWNSAMPLE_COLUMNS[kind]
+        for key, value in list(data.items()):
+            if isinstance(value, dict) and 'dates' in value and len(value['dates']) > points:
+                data[key] = downsample_columns(value, points, value_key, crossover)
+                data['original_count'] = data['count']
+                data['count'] = len(data[key]['dates'])
+
+    def _series(self, etf, ticker: str, timeframe: str, shared: Dict, section: str) -> PriceSeries:
+        key = ('series', timeframe)
+        if key not in shared:
+            shared[key] = self.db_service.get_price_series(etf.id, timeframe)
+        series = shared[key]
+        if len(series) == 0:
+            if section == 'prices':
+                raise SectionError(f'Brak danych cenowych dla {ticker}')
+            raise SectionError(f'Brak danych cen {TIMEFRAME_LABELS[timeframe]} dla {ticker}')
+        return series
+
+    def _prices(self, etf, ticker: str, section: str, series: PriceSeries) -> Dict:
+        if section == 'prices':
+            columns = {
+                'dates': series.date_strings('%Y-%m'),
+                'close_price': series.values('normalized'),
+                'original_price': series.values('close'),
+                'split_ratio': series.values('split_ratio')
+            }
+            key = 'prices'
+        elif section == 'daily-prices':
+            # Znormalizowane ceny od najnowszej; open/high/low dzielone przez współczynnik splitu, 0 = brak danych
+            ohlc = {}
+            for column in ('open', 'high', 'low'):
+                raw = series.extra[column]
+                ohlc[column] = np.where(raw > 0, np.round(raw / series.split_ratio, 2), np.nan)[::-1]
+            volume = np.where(series.extra['volume'] > 0, series.extra['volume'], np.nan)[::-1]
+            columns = {
+                'dates': series.date_strings()[::-1],
+                'close': nan_to_none(np.round(series.normalized, 2)[::-1]),
+                'open': nan_to_none(ohlc['open']),
+                'high': nan_to_none(ohlc['high']),
+                'low': nan_to_none(ohlc['low']),
+                'volume': [int(v) if v is not None else None for v in nan_to_none(volume)]
+            }
+            return {
+                'ticker': etf.ticker,
+                'daily_prices': columns,
+                'count': len(columns['dates']),
+                'date_range': {
+                    'start': columns['dates'][-1] if columns['dates'] else None,
+                    'end': columns['dates'][0] if columns['dates'] else None
+                }
+            }
+        else:
+            # Ceny tygodniowe i miesięczne (bez wolumenu)
+            columns = {
+                'dates': series.date_strings(),
+                'close_price': series.values('close'),
+                'volume': [None] * len(series)
+            }
+            key = 'prices'
+
+        return {
+            'ticker': etf.ticker,
+            key: columns,
+            'count': len(columns['dates']),
+            'date_range': _date_range(columns['dates'])
+        }
+
+    def _indicator(self, etf, ticker: str, section: str, shared: Dict) -> Dict:
+        timeframe, indicator, params, key, label = INDICATOR_SECTIONS[section]
+        series = self._series(etf, ticker, timeframe, shared, section)
+
+        # Ceny i obliczenia pośrednie rejestru (EMA, ekstrema okna) wspólne dla wszystkich sekcji timeframe
+        kernel_key = ('kernels', timeframe)
+        if kernel_key not in shared:
+            close = getattr(series, INDICATOR_PRICE_COLUMN[timeframe])
+            valid = ~np.isnan(close)  # okresy bez ceny pomijane (jak dropna w APIService)
+            dates = [value for value, keep in zip(series.date_strings(), valid.tolist()) if keep]
+            shared[kernel_key] = (dates, KernelCache(close[valid]))
+        dates, cache = shared[kernel_key]
+
+        values = compute_indicators(cache.close, [make_spec(get_indicator(indicator), params)], cache)
+        values = next(iter(values.values()))
+        if indicator == 'macd':
+            arrays = {**values, 'current_price': cache.close}
+            fields = MACD_FIELDS
+            parameters = {'fast_period': params[0], 'slow_period': params[1], 'signal_period': params[2]}
+        else:
+            highest, lowest = cache.extremes(params[0])
+            arrays = {**values, 'current_price': cache.close, 'highest_high': highest, 'lowest_low': lowest}
+            fields = STOCHASTIC_FIELDS
+            parameters = {'lookback_period': params[0], 'smoothing_factor': params[1], 'sma_period': params[2]}
+
+        # Punkty od pierwszego okresu z pełnym oknem wskaźnika
+        defined = np.flatnonzero(~np.isnan(arrays[next(iter(fields))]))
+        first = int(defined[0]) if len(defined) else len(dates)
+        logger.info(f"{section} for {etf.ticker}: {len(dates)} prices -> {len(dates) - first} points")
+        if first == len(dates):
+            raise SectionError(f'Nie udało się obliczyć {label} dla {ticker}', 500)
+
+        columns = {'dates': dates[first:]}
+        for field, (_, decimals) in fields.items():
+            columns[field] = nan_to_none(np.round(arrays[field][first:], decimals))
+        return {
+            'ticker': etf.ticker,
+            key: columns,
+            'count': len(columns['dates']),
+            'parameters': parameters,
+            'date_range': _date_range(columns['dates'])
+        }
+
+    def indicators(self, etf, ticker: str, timeframe: str, spec: str, columnar: bool = False) -> Dict:
+        """
+        Wiele wskaźników z rejestru (services/indicator_registry.py) na jednym szeregu cen,
+        np. spec='macd:12,26,9;stoch:9,3,3;rsi:14'. Szereg każdego wskaźnika zaczyna się
+        od pierwszego okresu z wartością.
+        """
+        if timeframe not in TIMEFRAME_LABELS:
+            raise SectionError(f'Nieznany timeframe: {timeframe} (dostępne: {", ".join(TIMEFRAME_LABELS)})', 400)
+        try:
+            specs = parse_indicator_spec(spec)
+        except IndicatorError as e:
+            raise SectionError(e.message, e.status_code)
+
+        series = self._series(etf, ticker, timeframe, {}, 'indicators')
+        dates = series.date_strings()
+        results = compute_indicators(getattr(series, INDICATOR_PRICE_COLUMN[timeframe]), specs)
+
+        indicators = {}
+        for spec_item in specs:
+            values = results[spec_item.label]
+            defined = np.flatnonzero(~np.all(np.isnan(np.vstack(list(values.values()))), axis=0))
+            first = int(defined[0]) if len(defined) else len(dates)
+            columns = {'dates': dates[first:]}
+            for column, decimals in spec_item.indicator.outputs.items():
+                columns[column] = nan_to_none(np.round(values[column][first:], decimals))
+            indicators[spec_item.label] = {
+                'name': spec_item.indicator.name,
+                'parameters': spec_item.parameters(),
+                'count': len(columns['dates']),
+                'values': columns if columnar else columns_to_records(columns)
+            }
+
+        logger.info(f"Indicators {', '.join(indicators)} for {etf.ticker} {timeframe}: {len(series)} prices")
+        return {
+            'success': True,
+            'data': {
+                'ticker': etf.ticker,
+                'timeframe': timeframe,
+                'count': len(series),
+                'date_range': _date_range(dates),
+                'indicators': indicators
+            }
+        }
+
+
+def requested_points() -> Optional[int]:
+    """Parametr points=N zapytania (None gdy brak)"""
+    value = request.args.get('points')
+    if value in (None, ''):
+        return None
+    try:
+        points = int(value)
+    except ValueError:
+        points = 0
+    if points < MIN_POINTS:
+        raise SectionError(f'Parametr points musi być liczbą całkowitą >= {MIN_POINTS}', 400)
+    return points
+
+
+def requested_window() -> Optional[DateWindow]:
+    """Parametry from/to/after/limit zapytania (None gdy żadnego nie podano)"""
+    values = {}
+    for name, field in (('from', 'start'), ('to', 'end'), ('after', 'after')):
+        value = request.args.get(name)
+        if value:
+            try:
+                if len(value) == 7:  # RRRR-MM - cały miesiąc (kursor sekcji miesięcznej)
+                    month_start = date.fromisoformat(f"{value}-01")
+                    days = calendar.monthrange(month_start.year, month_start.month)[1]
+                    values[field] = month_start.replace(day=days) if field == 'end' else month_start
+                else:
+                    values[field] = date.fromisoformat(value[:10])
+            except ValueError:
+                raise SectionError(f'Nieprawidłowa data w parametrze {name}: {value} (oczekiwano RRRR-MM-DD)', 400)
+    limit = request.args.get('limit')
+    if limit:
+        if not limit.isdigit() or int(limit) < 1:
+            raise SectionError('Parametr limit musi być dodatnią liczbą całkowitą', 400)
+        values['limit'] = int(limit)
+    return DateWindow(**values) if values else None
+
+
+def _window_slice(dates: List[str], window: DateWindow, descending: bool = False) -> Tuple[int, int, Optional[str]]:
+    """
+    Zakres indeksów [begin, stop) listy posortowanych dat w zakresie okna i kursor następnej strony.
+    Daty miesięczne ('RRRR-MM') porównywane są z granicami obciętymi do miesiąca.
+    """
+    count = len(dates)
+    ordered = dates[::-1] if descending else dates
+    width = len(dates[0]) if dates else 10
+    low, high = 0, count
+    if window.start is not None:
+        low = bisect_left(ordered, window.start.isoformat()[:width])
+    if window.end is not None:
+        high = bisect_right(ordered, window.end.isoformat()[:width])
+    if window.after is not None:
+        # Kursor w kierunku odpowiedzi: rosnąco - daty późniejsze, od najnowszej - wcześniejsze
+        if descending:
+            high = min(high, bisect_left(ordered, window.after.isoformat()[:width]))
+        else:
+            low = max(low, bisect_right(ordered, window.after.isoformat()[:width]))
+    high = max(low, high)
+
+    begin, stop = (count - high, count - low) if descending else (low, high)
+    if window.limit is not None and stop - begin > window.limit:
+        stop = begin + window.limit
+        return begin, stop, dates[stop - 1]
+    return begin, stop, None
+
+
+def _date_range(dates: List[str]) -> Dict:
+    return {
+        'start': dates[0] if dates else None,
+        'end': dates[-1] if dates else None
+    }
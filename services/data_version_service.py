@@ -0,0 +1,241 @@
+"""
+Wersje danych ETF i warunkowe odpowiedzi (ETag / Last-Modified) dla endpointów /api/etfs/<ticker>/...
+
+Wersja ETF zwiększana jest w tej samej transakcji co zmiana danych (ingest cen i dywidend,
+renormalizacja po splitach, usunięcie ETF). Endpointy GET liczą ETag z wersji, ścieżki,
+parametrów zapytania i bieżącego dnia (szeregi 1M/1W kończą się na ostatnim zakończonym okresie),
+a na If-None-Match odpowiadają 304 zanim dotkną bazy lub przeliczą wskaźniki.
+
+Wersje trzymane są w pamięci procesu i odświeżane jednym zapytaniem co DATA_VERSION_TTL_SECONDS
+(zmiany z innych workerów są widoczne najpóźniej po tym czasie).
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, date, time as dt_time, timezone
+from typing import Dict, Optional, Tuple
+
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event, inspect, select
+from sqlalchemy.sql.expression import UpdateBase
+
+from config import __version__
+from services.storage_service import StorageSession, dialect_insert, register_transaction_markers
+
+logger = logging.getLogger(__name__)
+
+# Tabele, których zmiana zmienia odpowiedzi endpointów ETF
+VERSIONED_TABLES = ('etfs', 'etf_prices', 'etf_weekly_prices', 'etf_daily_prices', 'etf_dividends', 'etf_splits')
+
+# Rollback SAVEPOINT przywraca znaczniki z jego początku (commity paczki writer_job zostają)
+register_transaction_markers('data_version_dirty', 'data_version_bumped')
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+class DataVersionService:
+    """Wersje danych ETF (cache procesu) i obsługa warunkowych GET"""
+
+    def __init__(self, config):
+        self.ttl_seconds = config.DATA_VERSION_TTL_SECONDS
+        self._lock = threading.Lock()
+        self._versions = {}  # ticker -> (version, updated_at)
+        self._loaded_at = None
+        self._db = None
+        self._stats = {'not_modified': 0, 'reloads': 0, 'bumps': 0}
+
+    def init_app(self, app, db):
+        self._db = db
+        app.extensions['etf_data_versions'] = self
+        app.before_request(self._answer_not_modified)
+        app.after_request(self._set_validators)
+
+    def get(self, ticker: str) -> Tuple[int, Optional[datetime]]:
+        """Zwraca (wersja, czas zmiany) dla tickera; 0 gdy ETF nigdy nie był zmieniany"""
+        now = time.monotonic()
+        with self._lock:
+            fresh = self._loaded_at is not None and now - self._loaded_at < self.ttl_seconds
+            if fresh:
+                return self._versions.get(ticker, (0, None))
+
+        from models import ETFDataVersion
+        rows = self._db.session.execute(
+            select(ETFDataVersion.ticker, ETFDataVersion.version, ETFDataVersion.updated_at)
+        ).all()
+        with self._lock:
+            self._versions = {row.ticker: (row.version, row.updated_at) for row in rows}
+            self._loaded_at = now
+            self._stats['reloads'] += 1
+            return self._versions.get(ticker, (0, None))
+
+    def apply(self, versions: Dict[str, Tuple[int, datetime]]):
+        """Uwzględnia wersje zatwierdzone przez ten proces (bez czekania na TTL)"""
+        with self._lock:
+            self._versions.update(versions)
+            self._stats['bumps'] += len(versions)
+
+    def universe_version(self) -> str:
+        """Skrót wersji danych wszystkich ETF - zmienia się po zmianie danych dowolnego ETF"""
+        self.get('')  # odświeżenie wersji po TTL
+        with self._lock:
+            versions = sorted((ticker, version) for ticker, (version, _) in self._versions.items())
+        return hashlib.blake2b(repr(versions).encode('utf-8'), digest_size=12).hexdigest()
+    
+    def etag(self, ticker: str, today: Optional[date] = None) -> Tuple[str, Optional[datetime]]:
+        version, updated_at = self.get(ticker)
+        today = today or utc_today()
+        query = '&'.join(f"{key}={value}" for key, value in sorted(request.args.items(multi=True)))
+        key = f"{request.path}?{query}|{ticker}:{version}|{today.isoformat()}|{__version__}"
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest(), updated_at
+
+    def _is_versioned_request(self) -> bool:
+        return (request.method in ('GET', 'HEAD') and request.path.startswith('/api/etfs/')
+                and bool(request.view_args) and 'ticker' in request.view_args)
+
+    def _answer_not_modified(self):
+        if not self._is_versioned_request():
+            return None
+
+        # Ten sam dzień UTC w ETag i Last-Modified
+        today = utc_today()
+        etag, updated_at = self.etag(request.view_args['ticker'].upper(), today)
+        # Dane 1M/1W zależą od dnia - Last-Modified nie wcześniej niż początek dnia
+        start_of_day = datetime.combine(today, dt_time.min, tzinfo=timezone.utc)
+        if updated_at is not None and updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        last_modified = max(updated_at, start_of_day) if updated_at else start_of_day
+        g.data_version_validators = (etag, last_modified)
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = (request.if_modified_since is not None
+                            and last_modified.replace(microsecond=0) <= request.if_modified_since)
+        if not not_modified:
+            return None
+
+        with self._lock:
+            self._stats['not_modified'] += 1
+        response = current_app.response_class(status=304)
+        self._apply_headers(response, etag, last_modified)
+        return response
+
+    def _set_validators(self, response):
+        validators = g.pop('data_version_validators', None)
+        if validators is not None and response.status_code == 200:
+            self._apply_headers(response, *validators)
+        return response
+
+    @staticmethod
+    def _apply_headers(response, etag: str, last_modified: datetime):
+        response.set_etag(etag, weak=True)  # słaby ETag - treść może być różnie skompresowana
+        response.last_modified = last_modified
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._stats, 'tracked_etfs': len(self._versions), 'ttl_seconds': self.ttl_seconds}
+
+
+def get_data_versions() -> Optional[DataVersionService]:
+    """Zwraca DataVersionService bieżącej aplikacji (jeśli skonfigurowany)"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('etf_data_versions')
+
+
+def _mark(session, kind: str, value=None):
+    session.info.setdefault('data_version_dirty', set()).add((kind, value))
+
+
+@event.listens_for(StorageSession, 'after_flush')
+def _collect_changed_etfs(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        if table not in VERSIONED_TABLES:
+            continue
+        # Tylko załadowane atrybuty - obiekt usunięty nie może być odświeżany z bazy
+        values = inspect(instance).dict
+        if table == 'etfs' and values.get('ticker'):
+            _mark(session, 'ticker', values['ticker'])
+        elif table != 'etfs' and values.get('etf_id') is not None:
+            _mark(session, 'id', values['etf_id'])
+        else:
+            _mark(session, 'all')
+
+
+@event.listens_for(StorageSession, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    statement = orm_execute_state.statement
+    if not isinstance(statement, UpdateBase):
+        return
+    table = getattr(statement, 'table', None)
+    if table is None or getattr(table, 'name', None) not in VERSIONED_TABLES:
+        return
+    # Upserty niosą etf_id w parametrach; Query.delete()/update() - nie wiadomo, których ETF dotyczą
+    parameters = orm_execute_state.parameters
+    rows = parameters if isinstance(parameters, (list, tuple)) else [parameters or {}]
+    etf_ids = {row.get('etf_id') for row in rows if isinstance(row, dict)}
+    if orm_execute_state.is_insert and etf_ids and None not in etf_ids:
+        for etf_id in etf_ids:
+            _mark(orm_execute_state.session, 'id', etf_id)
+    else:
+        _mark(orm_execute_state.session, 'all')
+
+
+@event.listens_for(StorageSession, 'before_commit')
+def _bump_versions(session):
+    if session.info.get('data_version_dirty') is None and not (session.new or session.dirty or session.deleted):
+        return
+    session.flush()
+    dirty = session.info.pop('data_version_dirty', None)
+    if not dirty:
+        return
+
+    from models import ETF, ETFDataVersion
+    engine = session.get_bind(mapper=ETFDataVersion, clause=ETFDataVersion.__table__.insert())
+    bind_arguments = {'bind': engine}
+
+    tickers = {value for kind, value in dirty if kind == 'ticker'}
+    if any(kind == 'all' for kind, _ in dirty):
+        tickers.update(session.execute(select(ETF.ticker), bind_arguments=bind_arguments).scalars())
+    else:
+        etf_ids = {value for kind, value in dirty if kind == 'id' and value is not None}
+        if etf_ids:
+            tickers.update(session.execute(
+                select(ETF.ticker).where(ETF.id.in_(etf_ids)), bind_arguments=bind_arguments
+            ).scalars())
+    tickers.discard(None)
+    if not tickers:
+        return
+
+    # Inkrementacja w SQL (nowy ticker - wersja 1): równoległe commity nie zapiszą tej samej wersji
+    now = datetime.now(timezone.utc)
+    table = ETFDataVersion.__table__
+    statement = dialect_insert(session, ETFDataVersion).values(
+        [{'ticker': ticker, 'version': 1, 'updated_at': now} for ticker in sorted(tickers)]
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=['ticker'],
+        set_={'version': table.c.version + 1, 'updated_at': statement.excluded.updated_at}
+    ).returning(table.c.ticker, table.c.version)
+    bumped = session.execute(statement, bind_arguments=bind_arguments).all()
+
+    session.info.setdefault('data_version_bumped', {}).update(
+        {ticker: (version, now) for ticker, version in bumped}
+    )
+
+
+@event.listens_for(StorageSession, 'after_commit')
+def _publish_versions(session):
+    bumped = session.info.pop('data_version_bumped', None)
+    service = get_data_versions()
+    if bumped and service is not None:
+        service.apply(bumped)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Data versions bumped: %s", ', '.join(sorted(bumped)))
@@ -1,12 +1,31 @@
 from datetime import datetime, date, timedelta, timezone
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from sqlalchemy.exc import IntegrityError
 import logging
-from models import db, ETF, ETFPrice, ETFWeeklyPrice, ETFDailyPrice, ETFDividend, ETFSplit, SystemLog, DividendTaxRate
+from models import (db, ETF, ETFPrice, ETFWeeklyPrice, ETFDailyPrice, ETFDividend, ETFDividendYearly, ETFSplit, SystemLog,
+                    DividendTaxRate)
 from services.api_service import APIService
+from services.storage_service import upsert_rows
+from services.series_cache import series_cache, PriceSeries, TIMEFRAMES
+from services.series_store import get_series_store
+from services.dividend_aggregates import rebuild_dividend_yearly
+from services.job_trace_service import traced
+from services.logging_service import get_sampled_logger
+from sqlalchemy import select, func, extract
+from config import Config
 import re
 
 logger = logging.getLogger(__name__)
+# Zdarzenia per wiersz przy zapisie historii cen i dywidend
+sampled_logger = get_sampled_logger(__name__)
+
+# Zbiory danych eksportu: nazwa -> (model, kolumna daty)
+EXPORT_DATASETS = {
+    'prices': (ETFPrice, 'date'),
+    'weekly-prices': (ETFWeeklyPrice, 'date'),
+    'daily-prices': (ETFDailyPrice, 'date'),
+    'dividends': (ETFDividend, 'payment_date')
+}
 
 class DatabaseService:
     def __init__(self, api_service: APIService = None):
@@ -260,12 +279,31 @@ class DatabaseService:
             self._log_action('ERROR', f"Failed to delete ETF {ticker}: {str(e)}", 'ERROR')
             return False
     
-    def get_etf_prices(self, etf_id: int, limit: int = None) -> List[ETFPrice]:
+    def _date_range_filter(self, date_column, etf_id: int, start: date = None, end: date = None,
+                           after: date = None, descending: bool = True) -> list:
+        """
+        Warunki zakresu dat dla indeksu (etf_id, data) - from/to włącznie,
+        after = ostatnia data poprzedniej strony (kursor keyset w kierunku sortowania)
+        """
+        model = date_column.class_
+        conditions = [model.etf_id == etf_id]
+        if start is not None:
+            conditions.append(date_column >= start)
+        if end is not None:
+            conditions.append(date_column <= end)
+        if after is not None:
+            conditions.append(date_column < after if descending else date_column > after)
+        return conditions
+    
+    def get_etf_prices(self, etf_id: int, limit: int = None, start: date = None, end: date = None,
+                       after: date = None) -> List[ETFPrice]:
         """
-        Pobiera historię cen ETF
+        Pobiera historię cen ETF (od najnowszych), opcjonalnie w zakresie dat i od kursora after
         """
         try:
-            query = ETFPrice.query.filter_by(etf_id=etf_id).order_by(ETFPrice.date.desc())
+            query = ETFPrice.query.filter(
+                *self._date_range_filter(ETFPrice.date, etf_id, start, end, after)
+            ).order_by(ETFPrice.date.desc())
             if limit:
                 query = query.limit(limit)
             return query.all()
@@ -273,12 +311,15 @@ class DatabaseService:
             logger.error(f"Error fetching prices for ETF {etf_id}: {str(e)}")
             return []
     
-    def get_etf_dividends(self, etf_id: int, limit: int = None) -> List[ETFDividend]:
+    def get_etf_dividends(self, etf_id: int, limit: int = None, start: date = None, end: date = None,
+                          after: date = None) -> List[ETFDividend]:
         """
-        Pobiera historię dywidend ETF
+        Pobiera historię dywidend ETF (od najnowszych), opcjonalnie w zakresie dat wypłaty i od kursora after
         """
         try:
-            query = ETFDividend.query.filter_by(etf_id=etf_id).order_by(ETFDividend.payment_date.desc())
+            query = ETFDividend.query.filter(
+                *self._date_range_filter(ETFDividend.payment_date, etf_id, start, end, after)
+            ).order_by(ETFDividend.payment_date.desc())
             if limit:
                 query = query.limit(limit)
             return query.all()
@@ -286,71 +327,206 @@ class DatabaseService:
             logger.error(f"Error fetching dividends for ETF {etf_id}: {str(e)}")
             return []
     
+    def get_dividends_for_etfs(self, etf_ids: List[int]) -> List[tuple]:
+        """Dywidendy wielu ETF jednym zapytaniem: (etf_id, data wypłaty, kwota znormalizowana)"""
+        if not etf_ids:
+            return []
+        return db.session.execute(
+            select(ETFDividend.etf_id, ETFDividend.payment_date, ETFDividend.normalized_amount)
+            .where(ETFDividend.etf_id.in_(etf_ids))
+            .order_by(ETFDividend.etf_id, ETFDividend.payment_date)
+        ).all()
+    
+    def export_columns(self, dataset: str) -> List[str]:
+        """Kolumny eksportu zbioru danych (bez kluczy technicznych)"""
+        model, _ = EXPORT_DATASETS[dataset]
+        return [column.name for column in model.__table__.columns if column.name not in ('id', 'etf_id', 'created_at')]
+    
+    def iter_export_rows(self, dataset: str, etf_id: int, start: date = None, end: date = None,
+                         batch_size: int = 1000) -> Iterator[tuple]:
+        """
+        Generator wierszy eksportu (rosnąco po dacie) czytanych stronami po batch_size -
+        każda strona to zapytanie zakresowe po indeksie (etf_id, data) od ostatniej daty poprzedniej,
+        więc pamięć nie zależy od długości historii.
+        """
+        model, date_name = EXPORT_DATASETS[dataset]
+        date_column = getattr(model, date_name)
+        columns = [getattr(model, name) for name in self.export_columns(dataset)]
+        date_index = [column.name for column in columns].index(date_name)
+        
+        after = None
+        while True:
+            rows = db.session.execute(
+                select(*columns)
+                .where(*self._date_range_filter(date_column, etf_id, start, end, after, descending=False))
+                .order_by(date_column.asc())
+                .limit(batch_size)
+            ).all()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after = rows[-1][date_index]
+    
+    def _ranked_monthly_prices(self, etf_id: int):
+        """
+        Podzapytanie z numerem ceny w miesiącu (1 = ostatnia cena miesiąca), kończy się na ostatnio zakończonym miesiącu.
+        Funkcja okna + EXTRACT działa identycznie w SQLite i PostgreSQL.
+        """
+        today = date.today()
+        # Sprawdzamy czy mamy dane z bieżącego miesiąca
+        current_month_start = date(today.year, today.month, 1)
+        
+        # Sprawdź czy są ceny z bieżącego miesiąca
+        current_month_prices = ETFPrice.query.filter(
+            ETFPrice.etf_id == etf_id,
+            ETFPrice.date >= current_month_start
+        ).first()
+        
+        if current_month_prices:
+            # Mamy ceny z bieżącego miesiąca - używamy dzisiejszej daty
+            last_completed_month = today
+        else:
+            # Brak cen z bieżącego miesiąca - używamy poprzedniego miesiąca
+            if today.month == 1:
+                last_completed_month = date(today.year - 1, 12, 1)
+            else:
+                last_completed_month = date(today.year, today.month - 1, 1)
+        
+        ranked = select(
+            ETFPrice.id,
+            func.row_number().over(
+                partition_by=(extract('year', ETFPrice.date), extract('month', ETFPrice.date)),
+                order_by=ETFPrice.date.desc()
+            ).label('period_rank')
+        ).where(
+            ETFPrice.etf_id == etf_id,
+            ETFPrice.date <= last_completed_month
+        ).subquery()
+        return ranked, last_completed_month
+    
+    def _ranked_weekly_prices(self, etf_id: int):
+        """
+        Podzapytanie z numerem ceny w tygodniu (1 = ostatnia cena tygodnia), kończy się na ostatnio zakończonym tygodniu.
+        Funkcja okna działa identycznie w SQLite i PostgreSQL.
+        """
+        today = date.today()
+        # Sprawdzamy czy mamy dane z bieżącego tygodnia
+        current_week_start = today - timedelta(days=today.weekday())  # Poniedziałek tego tygodnia
+        
+        # Sprawdź czy są ceny z bieżącego tygodnia
+        current_week_prices = ETFWeeklyPrice.query.filter(
+            ETFWeeklyPrice.etf_id == etf_id,
+            ETFWeeklyPrice.date >= current_week_start
+        ).first()
+        
+        if current_week_prices:
+            # Mamy ceny z bieżącego tygodnia - używamy dzisiejszej daty
+            last_completed_week = today
+        else:
+            # Brak cen z bieżącego tygodnia - używamy poprzedniego tygodnia
+            last_completed_week = current_week_start - timedelta(days=1)  # Niedziela poprzedniego tygodnia
+        
+        ranked = select(
+            ETFWeeklyPrice.id,
+            func.row_number().over(
+                partition_by=(ETFWeeklyPrice.year, ETFWeeklyPrice.week_of_year),
+                order_by=ETFWeeklyPrice.date.desc()
+            ).label('period_rank')
+        ).where(
+            ETFWeeklyPrice.etf_id == etf_id,
+            ETFWeeklyPrice.date <= last_completed_week
+        ).subquery()
+        return ranked, last_completed_week
+    
+    def get_price_series(self, etf_id: int, timeframe: str) -> PriceSeries:
+        """
+        Zwraca szereg cen ETF jako tablice NumPy - z magazynu plików mapowanych w pamięci
+        (współdzielonego przez workery) lub, gdy magazyn jest wyłączony, z cache procesu.
+        
+        Args:
+            etf_id: ID ETF
+            timeframe: '1M' (ostatnia cena miesiąca), '1W' (ostatnia cena tygodnia) lub '1D' (okno DAILY_PRICES_WINDOW_DAYS)
+        """
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Nieznany timeframe: {timeframe}")
+        loader = lambda: self._load_price_series(etf_id, timeframe)
+        store = get_series_store()
+        if store is not None:
+            return store.get(etf_id, timeframe, loader)
+        return series_cache.get(etf_id, timeframe, loader)
+    
+    def publish_price_series(self) -> int:
+        """
+        Zapisuje do magazynu szeregi ETF zmienionych od ostatniej publikacji
+        (wywoływane po zatwierdzeniu zadania schedulera, aby workery nie czytały z bazy).
+        
+        Returns:
+            Liczba zapisanych plików
+        """
+        store = get_series_store()
+        if store is None:
+            return 0
+        
+        pending = store.take_pending()
+        if not pending:
+            return 0
+        
+        etf_ids = [etf.id for etf in self.get_all_etfs()] if None in pending else sorted(pending)
+        existing = set(db.session.execute(select(ETF.id).where(ETF.id.in_(etf_ids))).scalars())
+        written = 0
+        for etf_id in etf_ids:
+            if etf_id not in existing:
+                continue  # ETF usunięty - pliki zostały już skasowane
+            for timeframe in TIMEFRAMES:
+                version = store.version()
+                if store.write(self._load_price_series(etf_id, timeframe), expected_version=version):
+                    written += 1
+        
+        logger.info(f"Published {written} price series files for {len(existing)} ETFs")
+        return written
+    
+    def _load_price_series(self, etf_id: int, timeframe: str) -> PriceSeries:
+        """Ładuje szereg cen z bazy danych (tylko kolumny, bez obiektów ORM)"""
+        if timeframe == '1M':
+            ranked, _ = self._ranked_monthly_prices(etf_id)
+            query = select(
+                ETFPrice.date, ETFPrice.close_price, ETFPrice.normalized_close_price, ETFPrice.split_ratio_applied
+            ).join(ranked, ETFPrice.id == ranked.c.id).where(ranked.c.period_rank == 1).order_by(ETFPrice.date.asc())
+            extra_columns = ()
+        elif timeframe == '1W':
+            ranked, _ = self._ranked_weekly_prices(etf_id)
+            query = select(
+                ETFWeeklyPrice.date, ETFWeeklyPrice.close_price, ETFWeeklyPrice.normalized_close_price,
+                ETFWeeklyPrice.split_ratio_applied
+            ).join(ranked, ETFWeeklyPrice.id == ranked.c.id).where(ranked.c.period_rank == 1).order_by(ETFWeeklyPrice.date.asc())
+            extra_columns = ()
+        else:
+            cutoff_date = date.today() - timedelta(days=Config.DAILY_PRICES_WINDOW_DAYS)
+            query = select(
+                ETFDailyPrice.date, ETFDailyPrice.close_price, ETFDailyPrice.normalized_close_price,
+                ETFDailyPrice.split_ratio_applied, ETFDailyPrice.open_price, ETFDailyPrice.high_price,
+                ETFDailyPrice.low_price, ETFDailyPrice.volume
+            ).where(
+                ETFDailyPrice.etf_id == etf_id,
+                ETFDailyPrice.date >= cutoff_date
+            ).order_by(ETFDailyPrice.date.asc())
+            extra_columns = ('open', 'high', 'low', 'volume')
+        
+        rows = db.session.execute(query).all()
+        series = PriceSeries.from_rows(etf_id, timeframe, rows, extra_columns)
+        logger.info(f"Loaded {timeframe} price series for ETF ID {etf_id}: {len(series)} points, {series.nbytes} bytes")
+        return series
+    
     def get_monthly_prices(self, etf_id: int) -> List[ETFPrice]:
         """Pobiera ceny miesięczne ETF z bazy danych - jedna cena na miesiąc, kończy się na ostatnio zakończonym miesiącu"""
         try:
-            # Pobieranie cen miesięcznych, grupowane po roku i miesiącu
-            # Używamy raw SQL dla lepszej kontroli nad grupowaniem
-            # Wykres kończy się na ostatnio zakończonym miesiącu, nie na bieżącym
-            from sqlalchemy import text
-            from datetime import datetime, date
-            
-            # Obliczanie ostatniego miesiąca z danymi
-            today = date.today()
-            # Sprawdzamy czy mamy dane z bieżącego miesiąca
-            current_month_start = date(today.year, today.month, 1)
-            
-            # Sprawdź czy są ceny z bieżącego miesiąca
-            current_month_prices = ETFPrice.query.filter(
-                ETFPrice.etf_id == etf_id,
-                ETFPrice.date >= current_month_start
-            ).first()
-            
-            if current_month_prices:
-                # Mamy ceny z bieżącego miesiąca - używamy dzisiejszej daty
-                last_completed_month = today
-            else:
-                # Brak cen z bieżącego miesiąca - używamy poprzedniego miesiąca
-                if today.month == 1:
-                    last_completed_month = date(today.year - 1, 12, 1)
-                else:
-                    last_completed_month = date(today.year, today.month - 1, 1)
-            
-            query = text("""
-                SELECT 
-                    id, etf_id, date, close_price, normalized_close_price, split_ratio_applied
-                FROM etf_prices 
-                WHERE etf_id = :etf_id 
-                AND date <= :last_completed_month
-                AND date IN (
-                    SELECT MAX(date) 
-                    FROM etf_prices 
-                    WHERE etf_id = :etf_id 
-                    AND date <= :last_completed_month
-                    GROUP BY strftime('%Y-%m', date)
-                )
-                ORDER BY date ASC
-            """)
-            
-            result = db.session.execute(query, {
-                'etf_id': etf_id, 
-                'last_completed_month': last_completed_month.strftime('%Y-%m-%d')
-            })
-            prices = []
-            
-            for row in result:
-                price = ETFPrice()
-                price.id = row.id
-                price.etf_id = row.etf_id
-                # Konwersja stringa daty na datetime.date
-                if isinstance(row.date, str):
-                    price.date = datetime.strptime(row.date, '%Y-%m-%d').date()
-                else:
-                    price.date = row.date
-                price.close_price = row.close_price
-                price.normalized_close_price = row.normalized_close_price
-                price.split_ratio_applied = row.split_ratio_applied
-                prices.append(price)
+            ranked, last_completed_month = self._ranked_monthly_prices(etf_id)
+            prices = db.session.execute(
+                select(ETFPrice)
+                .join(ranked, ETFPrice.id == ranked.c.id)
+                .where(ranked.c.period_rank == 1)
+                .order_by(ETFPrice.date.asc())
+            ).scalars().all()
             
             logger.info(f"Retrieved {len(prices)} monthly prices (one per month, ending at {last_completed_month.strftime('%Y-%m')}) for ETF ID {etf_id}")
             return prices
@@ -362,67 +538,13 @@ class DatabaseService:
     def get_weekly_prices(self, etf_id: int) -> List[ETFWeeklyPrice]:
         """Pobiera ceny tygodniowe ETF z bazy danych - jedna cena na tydzień, kończy się na ostatnio zakończonym tygodniu"""
         try:
-            # Pobieranie cen tygodniowych, grupowane po roku i tygodniu
-            # Używamy raw SQL dla lepszej kontroli nad grupowaniem
-            # Wykres kończy się na ostatnio zakończonym tygodniu, nie na bieżącym
-            from sqlalchemy import text
-            from datetime import datetime, date
-            
-            # Obliczanie ostatniego tygodnia z danymi
-            today = date.today()
-            # Sprawdzamy czy mamy dane z bieżącego tygodnia
-            current_week_start = today - timedelta(days=today.weekday())  # Poniedziałek tego tygodnia
-            
-            # Sprawdź czy są ceny z bieżącego tygodnia
-            current_week_prices = ETFWeeklyPrice.query.filter(
-                ETFWeeklyPrice.etf_id == etf_id,
-                ETFWeeklyPrice.date >= current_week_start
-            ).first()
-            
-            if current_week_prices:
-                # Mamy ceny z bieżącego tygodnia - używamy dzisiejszej daty
-                last_completed_week = today
-            else:
-                # Brak cen z bieżącego tygodnia - używamy poprzedniego tygodnia
-                last_completed_week = current_week_start - timedelta(days=1)  # Niedziela poprzedniego tygodnia
-            
-            query = text("""
-                SELECT 
-                    id, etf_id, date, close_price, normalized_close_price, split_ratio_applied, year, week_of_year
-                FROM etf_weekly_prices 
-                WHERE etf_id = :etf_id 
-                AND date <= :last_completed_week
-                AND date IN (
-                    SELECT MAX(date) 
-                    FROM etf_weekly_prices 
-                    WHERE etf_id = :etf_id 
-                    AND date <= :last_completed_week
-                    GROUP BY year, week_of_year
-                )
-                ORDER BY date ASC
-            """)
-            
-            result = db.session.execute(query, {
-                'etf_id': etf_id, 
-                'last_completed_week': last_completed_week.strftime('%Y-%m-%d')
-            })
-            prices = []
-            
-            for row in result:
-                price = ETFWeeklyPrice()
-                price.id = row.id
-                price.etf_id = row.etf_id
-                # Konwersja stringa daty na datetime.date
-                if isinstance(row.date, str):
-                    price.date = datetime.strptime(row.date, '%Y-%m-%d').date()
-                else:
-                    price.date = row.date
-                price.close_price = row.close_price
-                price.normalized_close_price = row.normalized_close_price
-                price.split_ratio_applied = row.split_ratio_applied
-                price.year = row.year
-                price.week_of_year = row.week_of_year
-                prices.append(price)
+            ranked, last_completed_week = self._ranked_weekly_prices(etf_id)
+            prices = db.session.execute(
+                select(ETFWeeklyPrice)
+                .join(ranked, ETFWeeklyPrice.id == ranked.c.id)
+                .where(ranked.c.period_rank == 1)
+                .order_by(ETFWeeklyPrice.date.asc())
+            ).scalars().all()
             
             logger.info(f"Retrieved {len(prices)} weekly prices (one per week, ending at {last_completed_week.strftime('%Y-%m-%d')}) for ETF ID {etf_id}")
             return prices
@@ -796,9 +918,10 @@ class DatabaseService:
                         )
                         db.session.add(dividend)
                         added_count += 1
-                        logger.info(f"Added dividend for {ticker} on {dividend_data['payment_date']}: {dividend_data['original_amount']}")
+                        sampled_logger.info("Added dividend for %s on %s: %s",
+                                            ticker, dividend_data['payment_date'], dividend_data['original_amount'])
                     else:
-                        logger.info(f"Dividend for {ticker} on {dividend_data['payment_date']} already exists")
+                        sampled_logger.debug("Dividend for %s on %s already exists", ticker, dividend_data['payment_date'])
                         
                 except Exception as e:
                     logger.error(f"Error adding dividend for {ticker} on {dividend_data['payment_date']}: {str(e)}")
@@ -929,8 +1052,7 @@ class DatabaseService:
             # Data structure validation
             if historical_prices:
                 sample_price = historical_prices[0]
-                logger.info(f"Sample price data structure for {ticker}: {list(sample_price.keys())}")
-                logger.info(f"Sample price data: {sample_price}")
+                logger.debug("Sample price data for %s: %s", ticker, sample_price)
             
             # Upewniam się, że wszystkie ceny mają wymagane klucze
             processed_prices = []
@@ -971,9 +1093,10 @@ class DatabaseService:
                         )
                         db.session.add(new_price)
                         added_count += 1
-                        logger.info(f"Added price for {ticker} on {price_data['date']}: {price_data['original_close']}")
+                        sampled_logger.info("Added price for %s on %s: %s",
+                                            ticker, price_data['date'], price_data['original_close'])
                     else:
-                        logger.info(f"Price for {ticker} on {price_data['date']} already exists")
+                        sampled_logger.debug("Price for %s on %s already exists", ticker, price_data['date'])
                         
                 except Exception as e:
                     logger.error(f"Error adding price for {ticker} on {price_data['date']}: {str(e)}")
@@ -1260,6 +1383,81 @@ class DatabaseService:
             logger.error(f"Error in cache-only update for {ticker}: {str(e)}")
             return False
 
+    def get_dividend_yearly(self, etf_id: int) -> List[ETFDividendYearly]:
+        """Pobiera roczne agregaty dywidend ETF (rosnąco po roku)"""
+        return ETFDividendYearly.query.filter_by(etf_id=etf_id).order_by(ETFDividendYearly.year.asc()).all()
+    
+    def ensure_dividend_yearly(self) -> int:
+        """
+        Wypełnia tabelę agregatów rocznych dla baz sprzed jej wprowadzenia (pusta tabela, są dywidendy).
+        Zwraca liczbę zapisanych wierszy.
+        """
+        try:
+            if db.session.execute(select(ETFDividendYearly.etf_id).limit(1)).first() is not None:
+                return 0
+            if db.session.execute(select(ETFDividend.id).limit(1)).first() is None:
+                return 0
+            written = rebuild_dividend_yearly(db.session)
+            db.session.commit()
+            logger.info(f"Dividend yearly aggregates initialized: {written} rows")
+            return written
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error initializing dividend yearly aggregates: {str(e)}")
+            return 0
+    
+    def _recent_dividend_sum(self, dividends: List[ETFDividend], frequency: str = None) -> float:
+        """Suma ostatnich dywidend (lista od najnowszej, wystarczy 12 ostatnich) wg częstotliwości"""
+        if not dividends:
+            return 0.0
+        
+        # Określenie liczby ostatnich dywidend do zsumowania
+        if frequency == 'monthly':
+            num_dividends = 12  # 12 ostatnich miesięcznych
+        elif frequency == 'quarterly':
+            num_dividends = 4   # 4 ostatnie kwartalne
+        elif frequency == 'annual':
+            num_dividends = 1   # 1 ostatnia roczna
+        else:
+            # Jeśli nie określono częstotliwości, spróbuj odgadnąć na podstawie danych
+            if len(dividends) >= 12:
+                # Sprawdzanie czy to miesięczne (12 dywidend w roku)
+                recent_12 = dividends[:12]
+                dates = [div.payment_date for div in recent_12]
+                if self._is_monthly_frequency(dates):
+                    num_dividends = 12
+                else:
+                    num_dividends = 4  # Domyślnie kwartalne
+            else:
+                num_dividends = min(4, len(dividends))  # Maksymalnie 4 lub wszystkie dostępne
+        
+        # Pobranie ostatnich N dywidend
+        recent_dividends = dividends[:num_dividends]
+        
+        # Sumowanie znormalizowanych kwot
+        total_sum = sum(div.normalized_amount for div in recent_dividends)
+        
+        return round(total_sum, 5)  # 5 miejsc po przecinku
+    
+    def _dividend_growth_forecast(self, recent_sum: float, yearly_totals: Dict[int, float]) -> float:
+        """Prognoza wzrostu: suma ostatnich dywidend względem sumy z ostatniego zakończonego roku"""
+        if recent_sum == 0.0:
+            return 0.0
+        
+        # Ostatni zakończony rok kalendarzowy, a gdy brak z niego dywidend - rok bieżący
+        current_year = datetime.now().year
+        yearly_total = yearly_totals.get(current_year - 1)
+        if yearly_total is None:
+            yearly_total = yearly_totals.get(current_year)
+        
+        if not yearly_total:
+            return 0.0
+        
+        # Obliczenie wzrostu w procentach
+        growth_percentage = ((recent_sum - yearly_total) / yearly_total) * 100
+        
+        return round(growth_percentage, 2)  # 2 miejsca po przecinku
+    
     def calculate_recent_dividend_sum(self, etf_id: int, frequency: str = None) -> float:
         """
         Oblicza sumę ostatnich dywidend w zależności od częstotliwości
@@ -1272,39 +1470,8 @@ class DatabaseService:
             Suma ostatnich dywidend lub 0.0 jeśli brak danych
         """
         try:
-            # Pobieranie dywidend posortowanych od najnowszej
-            dividends = ETFDividend.query.filter_by(etf_id=etf_id).order_by(ETFDividend.payment_date.desc()).all()
-            
-            if not dividends:
-                return 0.0
-            
-            # Określenie liczby ostatnich dywidend do zsumowania
-            if frequency == 'monthly':
-                num_dividends = 12  # 12 ostatnich miesięcznych
-            elif frequency == 'quarterly':
-                num_dividends = 4   # 4 ostatnie kwartalne
-            elif frequency == 'annual':
-                num_dividends = 1   # 1 ostatnia roczna
-            else:
-                # Jeśli nie określono częstotliwości, spróbuj odgadnąć na podstawie danych
-                if len(dividends) >= 12:
-                    # Sprawdzanie czy to miesięczne (12 dywidend w roku)
-                    recent_12 = dividends[:12]
-                    dates = [div.payment_date for div in recent_12]
-                    if self._is_monthly_frequency(dates):
-                        num_dividends = 12
-                    else:
-                        num_dividends = 4  # Domyślnie kwartalne
-                else:
-                    num_dividends = min(4, len(dividends))  # Maksymalnie 4 lub wszystkie dostępne
-            
-            # Pobranie ostatnich N dywidend
-            recent_dividends = dividends[:num_dividends]
-            
-            # Sumowanie znormalizowanych kwot
-            total_sum = sum(div.normalized_amount for div in recent_dividends)
-            
-            return round(total_sum, 5)  # 5 miejsc po przecinku
+            # Najwyżej 12 ostatnich dywidend (zapytanie po indeksie etf_id, payment_date)
+            return self._recent_dividend_sum(self.get_etf_dividends(etf_id, 12), frequency)
             
         except Exception as e:
             logger.error(f"Error calculating dividend sum for ETF {etf_id}: {str(e)}")
@@ -1322,44 +1489,61 @@ class DatabaseService:
             Prognozowany wzrost w procentach lub 0.0 jeśli brak danych
         """
         try:
-            # Pobieranie dywidend posortowanych od najnowszej
-            dividends = ETFDividend.query.filter_by(etf_id=etf_id).order_by(ETFDividend.payment_date.desc()).all()
-            
-            if not dividends:
-                return 0.0
-            
-            # Obliczenie sumy ostatnich dywidend
             recent_sum = self.calculate_recent_dividend_sum(etf_id, frequency)
             if recent_sum == 0.0:
                 return 0.0
             
-            # Znalezienie ostatniego zakończonego roku kalendarzowego
-            current_year = datetime.now().year
-            last_completed_year = current_year - 1
-            
-            # Pobieranie dywidend z ostatniego zakończonego roku
-            yearly_dividends = [div for div in dividends if div.payment_date.year == last_completed_year]
-            
-            if not yearly_dividends:
-                # Jeśli brak danych z poprzedniego roku, spróbuj z roku bieżącego
-                yearly_dividends = [div for div in dividends if div.payment_date.year == current_year]
-                if not yearly_dividends:
-                    return 0.0
-            
-            # Sumowanie dywidend z roku
-            yearly_total = sum(div.normalized_amount for div in yearly_dividends)
-            
-            if yearly_total == 0.0:
-                return 0.0
-            
-            # Obliczenie wzrostu w procentach
-            growth_percentage = ((recent_sum - yearly_total) / yearly_total) * 100
-            
-            return round(growth_percentage, 2)  # 2 miejsca po przecinku
+            # Sumy roczne z tabeli agregatów zamiast całej historii dywidend
+            yearly_totals = {row.year: row.normalized_sum for row in self.get_dividend_yearly(etf_id)}
+            return self._dividend_growth_forecast(recent_sum, yearly_totals)
             
         except Exception as e:
             logger.error(f"Error calculating dividend growth forecast for ETF {etf_id}: {str(e)}")
             return 0.0
+    
+    def get_dividend_summaries(self) -> Dict[int, Dict]:
+        """
+        Dane dywidendowe wszystkich ETF naraz (dashboard): średnie roczne (DSG), suma ostatnich
+        dywidend i prognoza wzrostu - dwa zapytania niezależnie od liczby ETF.
+        
+        Returns:
+            {etf_id: {'yearly_averages': {rok: średnia}, 'last_dividends_sum': float, 'dividend_growth_forecast': float}}
+        """
+        etfs = {etf.id: etf for etf in self.get_all_etfs()}
+        
+        yearly = {}
+        for row in ETFDividendYearly.query.order_by(ETFDividendYearly.etf_id, ETFDividendYearly.year).all():
+            yearly.setdefault(row.etf_id, []).append(row)
+        
+        # 12 ostatnich dywidend każdego ETF (funkcja okna - SQLite i PostgreSQL)
+        ranked = select(
+            ETFDividend.id,
+            func.row_number().over(
+                partition_by=ETFDividend.etf_id,
+                order_by=ETFDividend.payment_date.desc()
+            ).label('recent_rank')
+        ).subquery()
+        recent = {}
+        for dividend in db.session.execute(
+            select(ETFDividend)
+            .join(ranked, ETFDividend.id == ranked.c.id)
+            .where(ranked.c.recent_rank <= 12)
+            .order_by(ETFDividend.etf_id, ETFDividend.payment_date.desc())
+        ).scalars():
+            recent.setdefault(dividend.etf_id, []).append(dividend)
+        
+        summaries = {}
+        for etf_id, etf in etfs.items():
+            rows = yearly.get(etf_id, [])
+            recent_sum = self._recent_dividend_sum(recent.get(etf_id, []), etf.frequency)
+            summaries[etf_id] = {
+                'yearly_averages': {row.year: row.normalized_average for row in rows},
+                'last_dividends_sum': recent_sum,
+                'dividend_growth_forecast': self._dividend_growth_forecast(
+                    recent_sum, {row.year: row.normalized_sum for row in rows}
+                )
+            }
+        return summaries
 
     def _is_monthly_frequency(self, dates: List[date]) -> bool:
         """
@@ -1541,6 +1725,7 @@ class DatabaseService:
         
         return original_yield * (1 - tax_rate / 100)
 
+    @traced()
     def verify_data_completeness(self, etf_id: int, ticker: str) -> Dict:
         """
         Sprawdza kompletność danych historycznych ETF względem rzeczywistego wieku ETF
@@ -1796,6 +1981,7 @@ class DatabaseService:
                 'expected_years': 0
             }
 
+    @traced()
     def verify_daily_completeness(self, etf_id: int, ticker: str) -> Dict:
         """
         Sprawdza kompletność danych dziennych ETF (365±5 dni)
@@ -2316,34 +2502,20 @@ class DatabaseService:
             return False
     
     def add_price_history_record(self, etf_id: int, price: float) -> bool:
-        """Dodaje rekord do historii cen ETF"""
+        """Dodaje rekord do historii cen ETF (upsert po stronie serwera - jeden rekord na dzień)"""
         try:
-            # Sprawdź czy już mamy cenę na dzisiaj
             today = date.today()
-            existing_record = ETFPrice.query.filter_by(
-                etf_id=etf_id,
-                date=today
-                ).first()
-            
-            if existing_record:
-                # Aktualizuj istniejący rekord
-                existing_record.close_price = price
-                existing_record.normalized_close_price = price
-                existing_record.last_updated = datetime.now(timezone.utc)
-                logger.info(f"Updated existing price record for ETF ID {etf_id} on {today}")
-            else:
-                # Dodaj nowy rekord
-                new_record = ETFPrice(
-                    etf_id=etf_id,
-                    date=today,
-                    close_price=price,
-                    normalized_close_price=price,
-                    split_ratio_applied=1.0
-                )
-                db.session.add(new_record)
-                logger.info(f"Added new price record for ETF ID {etf_id} on {today}: ${price}")
+            upsert_rows(db.session, ETFPrice, [{
+                'etf_id': etf_id,
+                'date': today,
+                'close_price': price,
+                'normalized_close_price': price,
+                'split_ratio_applied': 1.0,
+                'last_updated': datetime.now(timezone.utc)
+            }], index_elements=['etf_id', 'date'], update_columns=['close_price', 'normalized_close_price', 'last_updated'])
             
             db.session.commit()
+            logger.info(f"Upserted price record for ETF ID {etf_id} on {today}: ${price}")
             return True
             
         except Exception as e:
@@ -2352,37 +2524,23 @@ class DatabaseService:
             return False
     
     def add_daily_price_record(self, etf_id: int, price: float) -> bool:
-        """Dodaje rekord do historii cen dziennych ETF (ETFDailyPrice)"""
+        """Dodaje rekord do historii cen dziennych ETF (ETFDailyPrice) - upsert po stronie serwera"""
         try:
-            # Sprawdź czy już mamy cenę na dzisiaj
             today = date.today()
-            existing_record = ETFDailyPrice.query.filter_by(
-                etf_id=etf_id,
-                date=today
-            ).first()
-            
-            if existing_record:
-                # Aktualizuj istniejący rekord
-                existing_record.close_price = price
-                existing_record.normalized_close_price = price
-                existing_record.last_updated = datetime.now(timezone.utc)
-                logger.info(f"Updated existing daily price record for ETF ID {etf_id} on {today}")
-            else:
-                # Dodaj nowy rekord
-                new_record = ETFDailyPrice(
-                    etf_id=etf_id,
-                    date=today,
-                    close_price=price,
-                    normalized_close_price=price,
-                    split_ratio_applied=1.0,
-                    year=today.year,
-                    month=today.month,
-                    day=today.day
-                )
-                db.session.add(new_record)
-                logger.info(f"Added new daily price record for ETF ID {etf_id} on {today}: ${price}")
+            upsert_rows(db.session, ETFDailyPrice, [{
+                'etf_id': etf_id,
+                'date': today,
+                'close_price': price,
+                'normalized_close_price': price,
+                'split_ratio_applied': 1.0,
+                'year': today.year,
+                'month': today.month,
+                'day': today.day,
+                'last_updated': datetime.now(timezone.utc)
+            }], index_elements=['etf_id', 'date'], update_columns=['close_price', 'normalized_close_price', 'last_updated'])
             
             db.session.commit()
+            logger.info(f"Upserted daily price record for ETF ID {etf_id} on {today}: ${price}")
             return True
             
         except Exception as e:
@@ -2479,6 +2637,7 @@ class DatabaseService:
             logger.error(f"Error in cleanup_old_job_logs: {str(e)}")
             return 0
 
+    @traced()
     def get_missing_daily_prices(self, etf_id: int, days_back: int = 250) -> List[str]:
         """Sprawdza jakie daty cen dziennych brakują dla danego ETF w ostatnich X dniach roboczych"""
         try:
@@ -2516,6 +2675,7 @@ class DatabaseService:
             logger.error(f"Błąd podczas sprawdzania brakujących cen dziennych: {str(e)}")
             return []
 
+    @traced()
     def check_historical_completeness(self, etf_id: int, days_back: int = 365) -> Dict:
         """Sprawdza kompletność danych historycznych dla danego ETF"""
         try:
@@ -2588,6 +2748,7 @@ class DatabaseService:
             db.session.rollback()
             return 0
 
+    @traced()
     def get_historical_daily_prices_intelligent(self, ticker: str, days: int = 250) -> List[Dict]:
         """Inteligentnie pobiera ceny historyczne z różnych API z fallbackami i ZAPISUJE je w bazie"""
         try:
@@ -2665,52 +2826,50 @@ class DatabaseService:
             return []
 
     def _save_historical_prices_to_db(self, etf_id: int, historical_data: List[Dict]) -> int:
-        """Zapisuje pobrane ceny historyczne w bazie danych"""
+        """Zapisuje pobrane ceny historyczne w bazie danych (jedno zapytanie o istniejące daty + bulk insert)"""
         try:
-            added_count = 0
+            rows = {}
             
             for price_data in historical_data:
-                try:
-                    # Sprawdź typ daty - może być string lub datetime.date
-                    from datetime import datetime, date
-                    price_date = price_data['date']
-                    if isinstance(price_date, str):
-                        # Konwertuj string na datetime.date
+                # Sprawdź typ daty - może być string lub datetime.date
+                price_date = price_data['date']
+                if isinstance(price_date, str):
+                    try:
                         price_date = datetime.strptime(price_date, '%Y-%m-%d').date()
-                    elif isinstance(price_date, date):
-                        # To już datetime.date - użyj bezpośrednio
-                        pass
-                    else:
-                        logger.warning(f"Nieznany format daty: {price_date} (typ: {type(price_date)})")
+                    except ValueError as e:
+                        logger.warning(f"Błąd podczas zapisywania ceny {price_data['date']}: {str(e)}")
                         continue
-                    
-                    # Sprawdź czy cena już istnieje
-                    existing_price = ETFDailyPrice.query.filter_by(
-                        etf_id=etf_id,
-                        date=price_date
-                    ).first()
-                    
-                    if not existing_price:
-                        # Dodaj nową cenę historyczną bezpośrednio
-                        new_record = ETFDailyPrice(
-                            etf_id=etf_id,
-                            date=price_date,
-                            close_price=price_data['close'],
-                            normalized_close_price=price_data['close'],
-                            split_ratio_applied=1.0,
-                            year=price_date.year,
-                            month=price_date.month,
-                            day=price_date.day
-                        )
-                        db.session.add(new_record)
-                        added_count += 1
-                        logger.debug(f"Dodano cenę historyczną: {price_date} - ${price_data['close']}")
-                    else:
-                        logger.debug(f"Cena już istnieje: {price_date} - ${price_data['close']}")
-                        
-                except Exception as e:
-                    logger.warning(f"Błąd podczas zapisywania ceny {price_data['date']}: {str(e)}")
+                elif not isinstance(price_date, date):
+                    logger.warning(f"Nieznany format daty: {price_date} (typ: {type(price_date)})")
                     continue
+                
+                rows[price_date] = {
+                    'etf_id': etf_id,
+                    'date': price_date,
+                    'close_price': price_data['close'],
+                    'normalized_close_price': price_data['close'],
+                    'split_ratio_applied': 1.0,
+                    'year': price_date.year,
+                    'month': price_date.month,
+                    'day': price_date.day
+                }
+            
+            if not rows:
+                return 0
+            
+            # Istniejące daty w zakresie - jedno zapytanie zamiast zapytania na każdy dzień
+            existing_dates = {
+                row.date for row in db.session.query(ETFDailyPrice.date).filter(
+                    ETFDailyPrice.etf_id == etf_id,
+                    ETFDailyPrice.date >= min(rows),
+                    ETFDailyPrice.date <= max(rows)
+                )
+            }
+            new_rows = [row for price_date, row in sorted(rows.items()) if price_date not in existing_dates]
+            
+            # ON CONFLICT DO NOTHING chroni przed równoległym zapisem tej samej daty
+            upsert_rows(db.session, ETFDailyPrice, new_rows, index_elements=['etf_id', 'date'])
+            added_count = len(new_rows)
             
             # Commit wszystkich zmian
             db.session.commit()
@@ -0,0 +1,138 @@
+"""
+Roczne agregaty dywidend ETF (tabela etf_dividend_yearly)
+
+Agregaty przeliczane są w tej samej transakcji co zmiana dywidend (ingest, renormalizacja
+po splitach, usunięcie ETF) - tylko dla zmienionych par (ETF, rok), a gdy rok nie jest znany
+(zmiana istniejącej dywidendy, renormalizacja) - dla wszystkich lat ETF. DSG i prognoza wzrostu
+dywidendy czytają kilkanaście wierszy rocznych zamiast całej historii dywidend.
+"""
+
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import and_, delete, event, extract, func, inspect, or_, select
+from sqlalchemy.sql.expression import UpdateBase
+
+from services.storage_service import StorageSession, register_transaction_markers, upsert_rows
+
+logger = logging.getLogger(__name__)
+
+# (etf_id, rok); rok None = wszystkie lata ETF, etf_id None = wszystkie ETF
+DirtyKeys = Set[Tuple[Optional[int], Optional[int]]]
+
+KEY_CONDITIONS_CHUNK = 200
+
+# Rollback SAVEPOINT przywraca znaczniki z jego początku (commity paczki writer_job zostają)
+register_transaction_markers('dividend_yearly_dirty')
+
+
+def _mark(session, etf_id: Optional[int], year: Optional[int] = None):
+    session.info.setdefault('dividend_yearly_dirty', set()).add((etf_id, year))
+
+
+@event.listens_for(StorageSession, 'after_flush')
+def _collect_changed_dividends(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        if table == 'etfs' and instance in session.deleted:
+            _mark(session, inspect(instance).dict.get('id'))
+        elif table == 'etf_dividends':
+            values = inspect(instance).dict
+            payment_date = values.get('payment_date')
+            # Zmieniona dywidenda mogła zmienić rok wypłaty - przeliczamy wszystkie lata ETF
+            year = payment_date.year if payment_date is not None and instance not in session.dirty else None
+            _mark(session, values.get('etf_id'), year)
+
+
+@event.listens_for(StorageSession, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    statement = orm_execute_state.statement
+    if not isinstance(statement, UpdateBase):
+        return
+    table = getattr(statement, 'table', None)
+    if table is None or getattr(table, 'name', None) != 'etf_dividends':
+        return
+    # Upserty niosą etf_id i datę wypłaty w parametrach; Query.delete()/update() - nie wiadomo, czego dotyczą
+    parameters = orm_execute_state.parameters
+    rows = parameters if isinstance(parameters, (list, tuple)) else [parameters or {}]
+    keys = {(row.get('etf_id'), getattr(row.get('payment_date'), 'year', None)) for row in rows if isinstance(row, dict)}
+    if orm_execute_state.is_insert and keys and all(etf_id is not None for etf_id, _ in keys):
+        for etf_id, year in keys:
+            _mark(orm_execute_state.session, etf_id, year)
+    else:
+        _mark(orm_execute_state.session, None)
+
+
+@event.listens_for(StorageSession, 'before_commit')
+def _update_aggregates(session):
+    if session.info.get('dividend_yearly_dirty') is None and not (session.new or session.dirty or session.deleted):
+        return
+    session.flush()
+    dirty = session.info.pop('dividend_yearly_dirty', None)
+    if dirty:
+        rebuild_dividend_yearly(session, dirty)
+
+
+def rebuild_dividend_yearly(session, keys: Optional[DirtyKeys] = None) -> int:
+    """
+    Przelicza agregaty roczne dla podanych par (ETF, rok) - None = cała tabela.
+    Zwraca liczbę zapisanych wierszy.
+    """
+    from models import ETFDividend, ETFDividendYearly
+
+    engine = session.get_bind(mapper=ETFDividendYearly, clause=ETFDividendYearly.__table__.insert())
+    bind_arguments = {'bind': engine}
+
+    year = extract('year', ETFDividend.payment_date)
+    grouped = []
+    for dividend_conditions, aggregate_conditions in _key_conditions(ETFDividend, ETFDividendYearly, keys):
+        session.execute(delete(ETFDividendYearly).where(*aggregate_conditions), bind_arguments=bind_arguments)
+        grouped += session.execute(
+            select(
+                ETFDividend.etf_id, year.label('year'), func.count(ETFDividend.id),
+                func.sum(ETFDividend.amount), func.sum(ETFDividend.normalized_amount)
+            ).where(*dividend_conditions).group_by(ETFDividend.etf_id, year),
+            bind_arguments=bind_arguments
+        ).all()
+
+    now = datetime.now(timezone.utc)
+    rows = [{
+        'etf_id': etf_id, 'year': int(row_year), 'dividend_count': count,
+        'amount_sum': amount_sum or 0.0, 'normalized_sum': normalized_sum or 0.0, 'updated_at': now
+    } for etf_id, row_year, count, amount_sum, normalized_sum in grouped]
+    if rows:
+        upsert_rows(session, ETFDividendYearly, rows, ['etf_id', 'year'],
+                    ['dividend_count', 'amount_sum', 'normalized_sum', 'updated_at'])
+
+    logger.debug("Dividend yearly aggregates rebuilt: %s rows for %s keys", len(rows), len(keys) if keys else 'all')
+    return len(rows)
+
+
+def _key_conditions(dividend_model, aggregate_model, keys: Optional[DirtyKeys]):
+    """
+    Warunki WHERE dla dywidend (zakres dat - indeks etf_id, payment_date) i agregatów, po
+    KEY_CONDITIONS_CHUNK ETF na zapytanie (SQLite: głębokość wyrażenia najwyżej 1000).
+    """
+    if not keys or any(etf_id is None for etf_id, _ in keys):
+        return [([], [])]
+
+    years_by_etf: Dict[int, Optional[Set[int]]] = {}
+    for etf_id, year in keys:
+        if year is None or years_by_etf.get(etf_id, set()) is None:
+            years_by_etf[etf_id] = None
+        else:
+            years_by_etf.setdefault(etf_id, set()).add(year)
+
+    dividend_terms, aggregate_terms = [], []
+    for etf_id, years in years_by_etf.items():
+        if years is None:
+            dividend_terms.append(dividend_model.etf_id == etf_id)
+            aggregate_terms.append(aggregate_model.etf_id == etf_id)
+            continue
+        dividend_terms.append(and_(dividend_model.etf_id == etf_id, or_(*[
+            dividend_model.payment_date.between(date(year, 1, 1), date(year, 12, 31)) for year in sorted(years)
+        ])))
+        aggregate_terms.append(and_(aggregate_model.etf_id == etf_id, aggregate_model.year.in_(sorted(years))))
+    return [([or_(*dividend_terms[i:i + KEY_CONDITIONS_CHUNK])], [or_(*aggregate_terms[i:i + KEY_CONDITIONS_CHUNK])])
+            for i in range(0, len(dividend_terms), KEY_CONDITIONS_CHUNK)]
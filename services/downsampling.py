@@ -0,0 +1,99 @@
+"""
+Zmniejszanie liczby punktów szeregów wykresów (Largest-Triangle-Three-Buckets)
+
+Wariant wektorowy LTTB: punkty wewnętrzne dzielone są na równe kubełki, a z każdego
+kubełka wybierany jest punkt tworzący największy trójkąt ze średnią poprzedniego
+i następnego kubełka. Klasyczny LTTB bierze jako wierzchołek punkt wybrany w poprzednim
+kubełku (pętla sekwencyjna) - średnia pozwala policzyć wszystkie kubełki naraz w NumPy,
+a kształt wykresu jest praktycznie ten sam.
+
+Dodatkowo zachowywane są zawsze: pierwszy i ostatni punkt, globalne minimum i maksimum
+oraz punkty przecięć linii wskaźników (MACD/sygnał, %K/%D) - po obu stronach przecięcia,
+żeby sygnał był widoczny na wykresie. Wynik może więc mieć nieco więcej punktów niż zadano.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+MIN_POINTS = 3
+
+
+def lttb_indices(y: np.ndarray, points: int, x: Optional[np.ndarray] = None) -> np.ndarray:
+    """Indeksy punktów wybranych przez LTTB (rosnąco); NaN nie są wybierane, gdy kubełek ma inne punkty"""
+    n = len(y)
+    if points >= n or points < MIN_POINTS:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64) if x is None else np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    filled = np.where(np.isnan(y), np.nanmean(y) if not np.all(np.isnan(y)) else 0.0, y)
+
+    # Kubełki punktów wewnętrznych 1..n-2: [edges[b], edges[b + 1])
+    buckets = points - 2
+    edges = np.floor(np.linspace(1, n - 1, buckets + 1)).astype(np.int64)
+    edges[-1] = n - 1
+    sizes = np.diff(edges)
+
+    sum_x = np.concatenate(([0.0], np.cumsum(x)))
+    sum_y = np.concatenate(([0.0], np.cumsum(filled)))
+    mean_x = (sum_x[edges[1:]] - sum_x[edges[:-1]]) / sizes
+    mean_y = (sum_y[edges[1:]] - sum_y[edges[:-1]]) / sizes
+
+    # Wierzchołki trójkątów: średnia kubełka poprzedniego (A) i następnego (C)
+    a_x = np.concatenate(([x[0]], mean_x[:-1]))
+    a_y = np.concatenate(([filled[0]], mean_y[:-1]))
+    c_x = np.concatenate((mean_x[1:], [x[-1]]))
+    c_y = np.concatenate((mean_y[1:], [filled[-1]]))
+
+    inner = np.arange(1, n - 1)
+    bucket = np.repeat(np.arange(buckets), sizes)
+    area = np.abs((a_x[bucket] - c_x[bucket]) * (filled[inner] - a_y[bucket])
+                  - (a_x[bucket] - x[inner]) * (c_y[bucket] - a_y[bucket]))
+    area[np.isnan(y[inner])] = -1.0
+
+    # Pierwszy punkt o maksymalnym polu w każdym kubełku
+    best = np.maximum.reduceat(area, edges[:-1] - 1)
+    candidates = np.flatnonzero(area == best[bucket])
+    _, first = np.unique(bucket[candidates], return_index=True)
+    selected = inner[candidates[first]]
+
+    return np.concatenate(([0], selected, [n - 1]))
+
+
+def crossover_indices(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Indeksy punktów po obu stronach zmiany znaku first - second (NaN pomijane)"""
+    diff = np.asarray(first, dtype=np.float64) - np.asarray(second, dtype=np.float64)
+    sign = np.sign(diff)
+    valid = ~np.isnan(diff[1:]) & ~np.isnan(diff[:-1])
+    crossed = np.flatnonzero(valid & (sign[1:] != sign[:-1]) & (sign[1:] != 0)) + 1
+    return np.union1d(crossed - 1, crossed)
+
+
+def extreme_indices(y: np.ndarray) -> np.ndarray:
+    """Indeksy globalnego minimum i maksimum (puste, gdy same NaN)"""
+    y = np.asarray(y, dtype=np.float64)
+    if len(y) == 0 or np.all(np.isnan(y)):
+        return np.array([], dtype=np.int64)
+    return np.array([np.nanargmin(y), np.nanargmax(y)], dtype=np.int64)
+
+
+def downsample_columns(columns: Dict[str, List], points: int, value_key: str,
+                       crossover: Optional[Sequence[str]] = None) -> Dict[str, List]:
+    """
+    Zmniejsza kolumny szeregu ({'dates': [...], kolumna: [...]}) do ok. points punktów.
+    value_key - kolumna wyznaczająca kształt (LTTB i ekstrema), crossover - para kolumn,
+    których przecięcia są zachowywane.
+    """
+    count = len(columns['dates'])
+    if points >= count:
+        return columns
+
+    values = np.array(columns[value_key], dtype=np.float64)
+    keep = [lttb_indices(values, points), extreme_indices(values)]
+    if crossover:
+        keep.append(crossover_indices(np.array(columns[crossover[0]], dtype=np.float64),
+                                      np.array(columns[crossover[1]], dtype=np.float64)))
+    indices = np.unique(np.concatenate(keep)).tolist()
+
+    return {key: [column[i] for i in indices] for key, column in columns.items()}
@@ -0,0 +1,269 @@
+"""
+Strumień zdarzeń Server-Sent Events (/api/events/stream): zmiany cen i postęp zadań schedulera
+
+Zdarzenia zapisywane są w tabeli stream_events w transakcji zadania (db.session, bez osobnego
+commitu), więc klient dostaje zmianę ceny dopiero po zatwierdzeniu danych, których dotyczy,
+a zdarzenia z dowolnego workera trafiają do klientów wszystkich workerów.
+
+Każdy proces ma jeden wątek odpytujący tabelę (id > kursor) co EVENT_STREAM_POLL_SECONDS,
+uruchamiany tylko, gdy są podłączeni klienci. Nowe zdarzenia rozsyłane są do kolejek klientów,
+więc liczba zapytań nie zależy od liczby otwartych stron, a bez zmian klient nie dostaje nic
+poza komentarzem keepalive.
+
+Otwarty strumień zajmuje wątek workera gthread na czas połączenia (do EVENT_STREAM_MAX_SECONDS),
+więc liczba strumieni na proces jest ograniczona do EVENT_STREAM_MAX_SUBSCRIBERS - kolejny klient
+dostaje 503 z Retry-After / retry: i łączy się ponownie później. Przy --workers 4 --threads 16
+i domyślnym limicie 4 strumienie zajmują najwyżej 16 z 64 wątków, a reszta obsługuje zwykłe żądania.
+
+SQLite ma jednego pisarza naraz, więc identyfikatory zdarzeń stają się widoczne rosnąco i kursor
+nie pomija zdarzeń. Po zerwaniu połączenia EventSource wysyła Last-Event-ID, a serwer odtwarza
+zdarzenia, które klienta ominęły (przy zbyt dużej zaległości - zdarzenie reset: pełne przeładowanie).
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import delete, func, select
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('price', 'job')
+
+
+class StreamCapacityError(Exception):
+    """Osiągnięty limit strumieni procesu (EVENT_STREAM_MAX_SUBSCRIBERS)"""
+
+    def __init__(self, retry_seconds: int):
+        super().__init__(f'Osiągnięto limit otwartych strumieni zdarzeń - ponów za {retry_seconds} s')
+        self.retry_seconds = retry_seconds
+
+
+class Subscription:
+    """Podłączony klient: kolejka zdarzeń, filtry i zdarzenia do odtworzenia"""
+
+    def __init__(self, queue_size: int, cursor: int, types: Optional[Iterable[str]] = None,
+                 tickers: Optional[Iterable[str]] = None):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.last_id = cursor
+        self.types = set(types) if types else None
+        self.tickers = set(tickers) if tickers else None
+        self.backlog: List[Dict] = []
+        self.reset = False
+        self.overflowed = False
+
+    def accepts(self, event: Dict) -> bool:
+        # Zdarzenia bez tickera (start/koniec zadania) trafiają do wszystkich klientów danego typu
+        return ((self.types is None or event['event'] in self.types) and
+                (self.tickers is None or event['ticker'] is None or event['ticker'] in self.tickers))
+
+    def offer(self, event: Dict):
+        if self.overflowed or not self.accepts(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Wolny klient - strumień zostanie zamknięty, a klient odtworzy zdarzenia po Last-Event-ID
+            self.overflowed = True
+
+
+class JobProgress:
+    """Postęp zadania schedulera w strumieniu: started, progress (po każdym ETF), finished"""
+
+    def __init__(self, events: 'EventStreamService', job_name: str, total: int):
+        self.events = events
+        self.job_name = job_name
+        self.total = total
+        self.done = 0
+        events.publish_job(job_name, 'started', total=total)
+
+    def step(self, ticker: str, status: str = 'ok'):
+        self.done += 1
+        self.events.publish_job(self.job_name, 'progress', ticker=ticker, done=self.done, total=self.total,
+                                status=status)
+
+    def finish(self, success: bool, records: Optional[int] = None):
+        self.events.publish_job(self.job_name, 'finished', done=self.done, total=self.total, success=success,
+                                records=records)
+
+
+class EventStreamService:
+    """Publikacja zdarzeń (w transakcji zadania) i rozsyłanie ich do klientów SSE procesu"""
+
+    def __init__(self, config):
+        self.poll_seconds = config.EVENT_STREAM_POLL_SECONDS
+        self.heartbeat_seconds = config.EVENT_STREAM_HEARTBEAT_SECONDS
+        self.max_seconds = config.EVENT_STREAM_MAX_SECONDS
+        self.queue_size = config.EVENT_STREAM_QUEUE_SIZE
+        self.replay_limit = config.EVENT_STREAM_REPLAY_LIMIT
+        self.retention_hours = config.EVENT_STREAM_RETENTION_HOURS
+        self.max_subscribers = config.EVENT_STREAM_MAX_SUBSCRIBERS
+        self.busy_retry_seconds = config.EVENT_STREAM_BUSY_RETRY_SECONDS
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._cursor = 0
+        self._thread = None
+        self._app = None
+        self._db = None
+        self._stats = {'published': 0, 'polls': 0, 'delivered': 0, 'connections': 0, 'replayed': 0,
+                       'overflows': 0, 'rejected': 0}
+
+    def init_app(self, app, db):
+        self._app = app
+        self._db = db
+        app.extensions['etf_events'] = self
+
+    def publish(self, event_type: str, payload: Dict, ticker: Optional[str] = None):
+        """Dodaje zdarzenie do bieżącej transakcji - klienci zobaczą je po commicie"""
+        from models import StreamEvent
+        self._db.session.add(StreamEvent(event_type=event_type, ticker=ticker, payload=payload))
+        with self._lock:
+            self._stats['published'] += 1
+
+    def publish_price(self, ticker: str, price: float, previous: Optional[float]):
+        change = round((price / previous - 1) * 100, 4) if previous else None
+        self.publish('price', {'price': price, 'previous': previous, 'change_percent': change}, ticker)
+
+    def publish_job(self, job_name: str, phase: str, ticker: Optional[str] = None, **fields):
+        self.publish('job', {'job': job_name, 'phase': phase, **fields}, ticker)
+
+    def job_progress(self, job_name: str, total: int) -> JobProgress:
+        return JobProgress(self, job_name, total)
+
+    def subscribe(self, last_event_id: Optional[int] = None, types: Optional[Iterable[str]] = None,
+                  tickers: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        Rejestruje klienta (wywoływane w żądaniu). Z last_event_id - zdarzenia po tym id
+        trafiają do backlogu (najwyżej EVENT_STREAM_REPLAY_LIMIT, inaczej reset).
+        Przy EVENT_STREAM_MAX_SUBSCRIBERS otwartych strumieni - StreamCapacityError.
+        """
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                raise StreamCapacityError(self.busy_retry_seconds)
+            self._ensure_poller()
+            subscription = Subscription(self.queue_size, self._cursor, types, tickers)
+            self._subscribers.add(subscription)
+            self._stats['connections'] += 1
+
+        if last_event_id is not None and last_event_id < subscription.last_id:
+            events = self._read_events(last_event_id, self.replay_limit + 1)
+            if len(events) > self.replay_limit:
+                subscription.reset = True
+            else:
+                subscription.backlog = [event for event in events if subscription.accepts(event)]
+                subscription.last_id = last_event_id
+                with self._lock:
+                    self._stats['replayed'] += len(subscription.backlog)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers and subscription.overflowed:
+                self._stats['overflows'] += 1
+            self._subscribers.discard(subscription)
+
+    def stream(self, subscription: Subscription) -> Iterator[str]:
+        """Generator odpowiedzi text/event-stream (zamykany po EVENT_STREAM_MAX_SECONDS)"""
+        try:
+            yield f"retry: {int(self.poll_seconds * 1000) + 1000}\n\n"
+            if subscription.reset:
+                yield format_event({'id': subscription.last_id, 'event': 'reset', 'ticker': None, 'data': {},
+                                    'created_at': None})
+            sent = subscription.last_id
+            for event in subscription.backlog:
+                yield format_event(event)
+                sent = event['id']
+            subscription.backlog = []
+
+            deadline = time.monotonic() + self.max_seconds
+            while not subscription.overflowed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = subscription.queue.get(timeout=min(self.heartbeat_seconds, remaining))
+                except queue.Empty:
+                    yield ': keepalive\n\n'
+                    continue
+                if event['id'] <= sent:
+                    continue  # już wysłane z backlogu
+                yield format_event(event)
+                sent = event['id']
+        finally:
+            self.unsubscribe(subscription)
+
+    def _ensure_poller(self):
+        """Uruchamia wątek odpytujący (wywoływane pod blokadą); kursor startowy - ostatnie zdarzenie"""
+        if self._thread is not None:
+            return
+        from models import StreamEvent
+        self._cursor = self._db.session.execute(select(func.max(StreamEvent.id))).scalar() or 0
+        self._thread = threading.Thread(target=self._poll_loop, name='event-stream-poller', daemon=True)
+        self._thread.start()
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            with self._lock:
+                if not self._subscribers:
+                    self._thread = None
+                    return
+                cursor = self._cursor
+            try:
+                with self._app.app_context():
+                    events = self._read_events(cursor, self.replay_limit)
+            except Exception as e:
+                logger.error(f"Error polling stream events: {str(e)}")
+                continue
+
+            with self._lock:
+                self._stats['polls'] += 1
+                if not events:
+                    continue
+                self._cursor = events[-1]['id']
+                subscribers = list(self._subscribers)
+                self._stats['delivered'] += len(events) * len(subscribers)
+            for subscription in subscribers:
+                for event in events:
+                    subscription.offer(event)
+
+    def _read_events(self, after_id: int, limit: int) -> List[Dict]:
+        from models import StreamEvent
+        rows = self._db.session.execute(
+            select(StreamEvent.id, StreamEvent.event_type, StreamEvent.ticker, StreamEvent.payload,
+                   StreamEvent.created_at)
+            .where(StreamEvent.id > after_id)
+            .order_by(StreamEvent.id)
+            .limit(limit)
+        ).all()
+        return [{'id': row.id, 'event': row.event_type, 'ticker': row.ticker, 'data': row.payload,
+                 'created_at': row.created_at} for row in rows]
+
+    def cleanup(self) -> int:
+        """Usuwa zdarzenia starsze niż EVENT_STREAM_RETENTION_HOURS (bez commitu)"""
+        from models import StreamEvent
+        cutoff = datetime.now(timezone.utc) - timedelta(hours=self.retention_hours)
+        return self._db.session.execute(delete(StreamEvent).where(StreamEvent.created_at < cutoff)).rowcount
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'max_subscribers': self.max_subscribers,
+                'poller_running': self._thread is not None,
+                'cursor': self._cursor,
+                **self._stats
+            }
+
+
+def format_event(event: Dict) -> str:
+    """Zdarzenie w formacie SSE (id, event, data - JSON w jednej linii)"""
+    created_at = event['created_at']
+    data = {**event['data'], 'ticker': event['ticker'],
+            'time': created_at.replace(tzinfo=created_at.tzinfo or timezone.utc).isoformat() if created_at else None}
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
@@ -0,0 +1,229 @@
+"""
+Rejestr wskaźników technicznych: nazwa -> kernel wektorowy + schemat parametrów
+
+Specyfikacja wskaźników w zapytaniu to lista 'nazwa:parametry' rozdzielona średnikami,
+np. 'macd:12,26,9;stoch:9,3,3;rsi:14;bb:20,2'. Brakujące parametry z końca listy przyjmują
+wartości domyślne ('macd' = 'macd:8,17,9').
+
+Wszystkie wskaźniki jednego zapytania liczone są na jednej tablicy cen (1-D lub macierz
+okresy x szeregi - patrz services/indicators.py) przez wspólny KernelCache: EMA, SMA
+i ekstrema okna o tych samych parametrach liczone są raz, np. 'macd:12,26,9;ema:26'
+lub 'stoch:14,3,3;stoch:14,5,5' współdzielą obliczenia pośrednie.
+
+Nowy wskaźnik to funkcja kernela z dekoratorem @register - bez nowych endpointów.
+"""
+
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from services.indicators import (ema, macd_from_emas, rolling_extremes, rolling_mean, rolling_std, rsi,
+                                 stochastic_from_extremes, valid_counts)
+
+MAX_INDICATORS = 20
+
+
+class IndicatorError(Exception):
+    """Błąd specyfikacji wskaźników zwracany klientowi jako {'success': False, 'error': ...}"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class Param(NamedTuple):
+    name: str
+    default: Union[int, float]
+    minimum: Union[int, float] = 1
+
+    @property
+    def kind(self):
+        return type(self.default)
+
+
+class Indicator(NamedTuple):
+    name: str
+    description: str
+    params: Tuple[Param, ...]
+    outputs: Dict[str, int]         # kolumna wyniku -> liczba miejsc po przecinku
+    kernel: Callable
+    validate: Optional[Callable] = None  # dodatkowa walidacja parametrów (komunikat błędu lub None)
+
+    def schema(self) -> Dict:
+        return {
+            'name': self.name,
+            'description': self.description,
+            'parameters': [{'name': p.name, 'default': p.default, 'minimum': p.minimum} for p in self.params],
+            'outputs': list(self.outputs)
+        }
+
+
+class IndicatorSpec(NamedTuple):
+    """Wskaźnik z parametrami z zapytania"""
+    indicator: Indicator
+    values: Tuple
+
+    @property
+    def label(self) -> str:
+        return f"{self.indicator.name}:{','.join(format(value, 'g') for value in self.values)}"
+
+    def parameters(self) -> Dict:
+        return {param.name: value for param, value in zip(self.indicator.params, self.values)}
+
+
+INDICATORS: Dict[str, Indicator] = {}
+ALIASES: Dict[str, str] = {}
+
+
+def register(name: str, description: str, params: Sequence[Param], outputs: Dict[str, int],
+             aliases: Sequence[str] = (), validate: Optional[Callable] = None):
+    """Dekorator rejestrujący kernel wskaźnika: kernel(cache, *parametry) -> {kolumna: tablica}"""
+    def decorator(kernel):
+        INDICATORS[name] = Indicator(name, description, tuple(params), outputs, kernel, validate)
+        for alias in aliases:
+            ALIASES[alias] = name
+        return kernel
+    return decorator
+
+
+class KernelCache:
+    """Wspólne obliczenia pośrednie wskaźników dla jednej tablicy cen"""
+
+    def __init__(self, close: np.ndarray):
+        self.close = np.asarray(close, dtype=np.float64)
+        self._values = {}
+
+    def get(self, key: Tuple, compute: Callable):
+        if key not in self._values:
+            self._values[key] = compute()
+        return self._values[key]
+
+    def counts(self) -> np.ndarray:
+        return self.get(('counts',), lambda: valid_counts(self.close))
+
+    def ema(self, span: int) -> np.ndarray:
+        return self.get(('ema', span), lambda: ema(self.close, span))
+
+    def sma(self, period: int) -> np.ndarray:
+        return self.get(('sma', period), lambda: rolling_mean(self.close, period))
+
+    def std(self, period: int) -> np.ndarray:
+        return self.get(('std', period), lambda: rolling_std(self.close, period))
+
+    def extremes(self, period: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.get(('extremes', period), lambda: rolling_extremes(self.close, period))
+
+
+@register('macd', 'MACD (szybka EMA, wolna EMA, sygnał)',
+          (Param('fast', 8), Param('slow', 17), Param('signal', 9)),
+          {'macd_line': 4, 'signal_line': 4, 'histogram': 4},
+          validate=lambda fast, slow, signal: 'Parametr fast musi być mniejszy niż slow' if fast >= slow else None)
+def _macd(cache: KernelCache, fast: int, slow: int, signal: int) -> Dict[str, np.ndarray]:
+    return macd_from_emas(cache.ema(fast), cache.ema(slow), signal, cache.counts() >= slow)
+
+
+@register('stoch', 'Stochastic Oscillator (okres, wygładzanie %K, SMA %D)',
+          (Param('lookback', 36), Param('smoothing', 12), Param('sma', 12)),
+          {'k_percent': 2, 'd_percent': 2}, aliases=('stochastic',))
+def _stochastic(cache: KernelCache, lookback: int, smoothing: int, sma: int) -> Dict[str, np.ndarray]:
+    highest, lowest = cache.extremes(lookback)
+    values = stochastic_from_extremes(cache.close, highest, lowest, smoothing, sma)
+    return {'k_percent': values['k_percent'], 'd_percent': values['d_percent']}
+
+
+@register('rsi', 'RSI Wildera', (Param('period', 14),), {'rsi': 2})
+def _rsi(cache: KernelCache, period: int) -> Dict[str, np.ndarray]:
+    return {'rsi': rsi(cache.close, period)}
+
+
+@register('bb', 'Wstęgi Bollingera (okres, szerokość w odchyleniach standardowych)',
+          (Param('period', 20), Param('width', 2.0, 0.1)),
+          {'middle': 4, 'upper': 4, 'lower': 4, 'percent_b': 4}, aliases=('bollinger',))
+def _bollinger(cache: KernelCache, period: int, width: float) -> Dict[str, np.ndarray]:
+    middle = cache.sma(period)
+    band = width * cache.std(period)
+    upper, lower = middle + band, middle - band
+    with np.errstate(invalid='ignore', divide='ignore'):
+        percent_b = np.where(upper > lower, (cache.close - lower) / (upper - lower), np.nan)
+    return {'middle': middle, 'upper': upper, 'lower': lower, 'percent_b': percent_b}
+
+
+@register('sma', 'Średnia krocząca prosta', (Param('period', 20),), {'sma': 4})
+def _sma(cache: KernelCache, period: int) -> Dict[str, np.ndarray]:
+    return {'sma': cache.sma(period)}
+
+
+@register('ema', 'Średnia krocząca wykładnicza (od okresu period)', (Param('period', 20),), {'ema': 4})
+def _ema(cache: KernelCache, period: int) -> Dict[str, np.ndarray]:
+    return {'ema': np.where(cache.counts() >= period, cache.ema(period), np.nan)}
+
+
+@register('sma_cross', 'Przecięcia średnich SMA (1 - szybka przecina wolną w górę, -1 - w dół, 0 - brak)',
+          (Param('fast', 50), Param('slow', 200)), {'sma_fast': 4, 'sma_slow': 4, 'cross': 0},
+          validate=lambda fast, slow: 'Parametr fast musi być mniejszy niż slow' if fast >= slow else None)
+def _sma_cross(cache: KernelCache, fast: int, slow: int) -> Dict[str, np.ndarray]:
+    fast_sma, slow_sma = cache.sma(fast), cache.sma(slow)
+    difference = fast_sma - slow_sma
+    cross = np.full(difference.shape, np.nan)
+    with np.errstate(invalid='ignore'):
+        before, after = difference[:-1], difference[1:]
+        cross[1:] = np.where((before <= 0) & (after > 0), 1.0, np.where((before >= 0) & (after < 0), -1.0, 0.0))
+    cross[1:][np.isnan(difference[:-1]) | np.isnan(difference[1:])] = np.nan
+    return {'sma_fast': fast_sma, 'sma_slow': slow_sma, 'cross': cross}
+
+
+def get_indicator(name: str) -> Indicator:
+    key = ALIASES.get(name.strip().lower(), name.strip().lower())
+    if key not in INDICATORS:
+        raise IndicatorError(f'Nieznany wskaźnik: {name} (dostępne: {", ".join(INDICATORS)})')
+    return INDICATORS[key]
+
+
+def make_spec(indicator: Indicator, raw_values: Sequence) -> IndicatorSpec:
+    """Parametry wskaźnika z walidacją (brakujące z końca - domyślne)"""
+    if len(raw_values) > len(indicator.params):
+        raise IndicatorError(f'Wskaźnik {indicator.name} przyjmuje co najwyżej {len(indicator.params)} parametry')
+    values = []
+    for param, raw in zip(indicator.params, list(raw_values) + [None] * (len(indicator.params) - len(raw_values))):
+        if raw is None or raw == '':
+            values.append(param.default)
+            continue
+        try:
+            value = float(raw) if param.kind is float else int(str(raw))
+        except (TypeError, ValueError):
+            raise IndicatorError(f'Parametr {param.name} wskaźnika {indicator.name} musi być liczbą'
+                                 f'{" całkowitą" if param.kind is int else ""}: {raw}')
+        if value < param.minimum:
+            raise IndicatorError(f'Parametr {param.name} wskaźnika {indicator.name} musi wynosić co najmniej '
+                                 f'{param.minimum}')
+        values.append(value)
+    if indicator.validate is not None:
+        error = indicator.validate(*values)
+        if error:
+            raise IndicatorError(f'{indicator.name}: {error}')
+    return IndicatorSpec(indicator, tuple(values))
+
+
+def parse_indicator_spec(spec: str) -> List[IndicatorSpec]:
+    """Lista wskaźników z 'macd:12,26,9;stoch:9,3,3;rsi:14' (duplikaty pomijane)"""
+    specs = {}
+    for part in (spec or '').split(';'):
+        if not part.strip():
+            continue
+        name, _, raw = part.partition(':')
+        indicator = get_indicator(name)
+        parsed = make_spec(indicator, [value.strip() for value in raw.split(',')] if raw.strip() else [])
+        specs.setdefault(parsed.label, parsed)
+    if not specs:
+        raise IndicatorError('Parametr spec jest wymagany (np. macd:12,26,9;stoch:9,3,3;rsi:14)')
+    if len(specs) > MAX_INDICATORS:
+        raise IndicatorError(f'Maksymalnie {MAX_INDICATORS} wskaźników w jednym zapytaniu')
+    return list(specs.values())
+
+
+def compute_indicators(close: np.ndarray, specs: Sequence[IndicatorSpec],
+                       cache: Optional[KernelCache] = None) -> Dict[str, Dict[str, np.ndarray]]:
+    """Wyniki wskaźników (etykieta -> kolumny) liczone na jednej tablicy cen ze wspólnym cache"""
+    cache = cache or KernelCache(close)
+    return {spec.label: spec.indicator.kernel(cache, *spec.values) for spec in specs}
@@ -0,0 +1,203 @@
+"""
+Wektorowe wskaźniki techniczne dla wielu szeregów naraz
+
+Wejściem jest macierz cen (okresy x szeregi) wyrównana do końca: ostatni wiersz to ostatnia
+cena każdego szeregu, a krótsze szeregi mają NaN na początku. Każdy szereg liczony jest
+wyłącznie na własnych cenach, więc ostatnie wartości są takie same jak z
+APIService.calculate_macd / calculate_stochastic_oscillator dla pojedynczego ETF
+(łącznie z wygładzaniem pierwszych punktów surowym %K).
+"""
+
+from typing import Dict, List, Sequence
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+OVERSOLD_LEVEL = 20.0
+OVERBOUGHT_LEVEL = 80.0
+
+# Zdarzenia linii wskaźnika względem linii sygnału / poziomu (typy alertów z Config.TECHNICAL_INDICATORS)
+SIGNAL_TYPES = ('level_below', 'level_above', 'crossover_in_oversold', 'crossover_in_overbought',
+                'crossover_general', 'crossover_bullish', 'crossover_bearish')
+
+
+def align_right(series: Sequence[np.ndarray]) -> np.ndarray:
+    """Macierz (okresy x szeregi) z szeregów różnej długości wyrównanych do ostatniego wiersza"""
+    length = max((len(values) for values in series), default=0)
+    matrix = np.full((length, len(series)), np.nan)
+    for column, values in enumerate(series):
+        if len(values):
+            matrix[length - len(values):, column] = values
+    return matrix
+
+
+def valid_counts(values: np.ndarray) -> np.ndarray:
+    """Liczba wartości od początku szeregu (dla NaN na początku - 0)"""
+    return np.cumsum(~np.isnan(values), axis=0)
+
+
+def ema(values: np.ndarray, span) -> np.ndarray:
+    """
+    EMA jak pandas ewm(span, adjust=False) - start od pierwszej wartości każdej kolumny.
+    span może być wektorem (osobny okres dla każdej kolumny macierzy).
+    """
+    alpha = 2.0 / (np.asarray(span, dtype=np.float64) + 1)
+    result = np.empty_like(values, dtype=np.float64)
+    previous = np.full(values.shape[1:], np.nan)
+    for row in range(len(values)):
+        current = values[row]
+        previous = np.where(np.isnan(previous), current, alpha * current + (1 - alpha) * previous)
+        result[row] = previous
+    return result
+
+
+def rolling_extremes(values: np.ndarray, period: int):
+    """Maksimum i minimum okna period (NaN, gdy okno niepełne)"""
+    highest = np.full(values.shape, np.nan)
+    lowest = np.full(values.shape, np.nan)
+    if len(values) >= period:
+        windows = sliding_window_view(values, period, axis=0)
+        highest[period - 1:] = windows.max(axis=-1)
+        lowest[period - 1:] = windows.min(axis=-1)
+    return highest, lowest
+
+
+def _shifted_sums(sums: np.ndarray, period) -> np.ndarray:
+    """Sumy skumulowane przesunięte o period wierszy (period - liczba lub wektor okresów kolumn)"""
+    period = np.asarray(period)
+    if period.ndim == 0:
+        shifted = np.zeros_like(sums)
+        shifted[period:] = sums[:-period]
+        return shifted
+    rows = np.arange(len(sums))[:, None] - period[None, :]
+    return np.where(rows >= 0, np.take_along_axis(sums, np.clip(rows, 0, None), axis=0), 0.0)
+
+
+def smoothed(values: np.ndarray, period) -> np.ndarray:
+    """
+    SMA okna period; pierwsze period - 1 wartości szeregu bez wygładzania (jak w APIService).
+    period może być wektorem (osobny okres dla każdej kolumny macierzy).
+    """
+    counts = valid_counts(values)
+    sums = np.cumsum(np.nan_to_num(values), axis=0)
+    return np.where(counts >= period, (sums - _shifted_sums(sums, period)) / period, values)
+
+
+def rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    """SMA okna period (NaN, gdy okno niepełne)"""
+    counts = valid_counts(values)
+    sums = np.cumsum(np.nan_to_num(values), axis=0)
+    return np.where(counts >= period, (sums - _shifted_sums(sums, period)) / period, np.nan)
+
+
+def rolling_std(values: np.ndarray, period: int) -> np.ndarray:
+    """Odchylenie standardowe (populacyjne) okna period (NaN, gdy okno niepełne)"""
+    mean = rolling_mean(values, period)
+    squares = rolling_mean(values * values, period)
+    return np.sqrt(np.clip(squares - mean * mean, 0.0, None))
+
+
+def wilder(values: np.ndarray, period: int) -> np.ndarray:
+    """Średnia Wildera (RMA): start od SMA pierwszych period wartości, potem (prev * (period - 1) + x) / period"""
+    counts = valid_counts(values)
+    result = np.full(values.shape, np.nan)
+    total = np.zeros(values.shape[1:])
+    previous = np.full(values.shape[1:], np.nan)
+    for row in range(len(values)):
+        count = counts[row]
+        current = np.nan_to_num(values[row])
+        total = np.where(count <= period, total + current, total)
+        previous = np.where(count == period, total / period,
+                            np.where(count > period, (previous * (period - 1) + current) / period, np.nan))
+        result[row] = previous
+    return result
+
+
+def macd_from_emas(fast_ema: np.ndarray, slow_ema: np.ndarray, signal: int, enough: np.ndarray) -> Dict[str, np.ndarray]:
+    """MACD z gotowych EMA (wspólnych dla wielu wskaźników); enough - wiersze z co najmniej slow cenami"""
+    macd_line = fast_ema - slow_ema
+    signal_line = ema(macd_line, signal)
+    macd_line = np.where(enough, macd_line, np.nan)
+    signal_line = np.where(enough, signal_line, np.nan)
+    return {'macd_line': macd_line, 'signal_line': signal_line, 'histogram': macd_line - signal_line}
+
+
+def macd(close: np.ndarray, fast: int = 8, slow: int = 17, signal: int = 9) -> Dict[str, np.ndarray]:
+    """Linia MACD, sygnał i histogram (NaN, gdy szereg ma mniej niż slow cen)"""
+    return macd_from_emas(ema(close, fast), ema(close, slow), signal, valid_counts(close) >= slow)
+
+
+def raw_k_percent(close: np.ndarray, highest: np.ndarray, lowest: np.ndarray) -> np.ndarray:
+    """Surowe %K (50, gdy okno płaskie; NaN, gdy okno niepełne)"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        k_percent = np.where(highest == lowest, 50.0, (close - lowest) / (highest - lowest) * 100)
+    return np.where(np.isnan(highest), np.nan, k_percent)
+
+
+def stochastic_from_extremes(close: np.ndarray, highest: np.ndarray, lowest: np.ndarray, smoothing: int,
+                             sma: int) -> Dict[str, np.ndarray]:
+    """%K wygładzone i %D z gotowych ekstremów okna (wspólnych dla wskaźników o tym samym lookback)"""
+    k_smoothed = smoothed(raw_k_percent(close, highest, lowest), smoothing)
+    return {'k_percent': k_smoothed, 'd_percent': smoothed(k_smoothed, sma),
+            'highest_high': highest, 'lowest_low': lowest}
+
+
+def stochastic(close: np.ndarray, lookback: int = 36, smoothing: int = 12, sma: int = 12) -> Dict[str, np.ndarray]:
+    """%K wygładzone i %D (NaN, gdy szereg ma mniej niż lookback cen)"""
+    highest, lowest = rolling_extremes(close, lookback)
+    return stochastic_from_extremes(close, highest, lowest, smoothing, sma)
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI Wildera (NaN, gdy szereg ma mniej niż period + 1 cen)"""
+    change = np.full(close.shape, np.nan)
+    change[1:] = close[1:] - close[:-1]
+    average_gain = wilder(np.where(np.isnan(change), np.nan, np.clip(change, 0, None)), period)
+    average_loss = wilder(np.where(np.isnan(change), np.nan, np.clip(-change, 0, None)), period)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        values = 100 - 100 / (1 + average_gain / average_loss)
+    return np.where(average_loss == 0, np.where(np.isnan(average_gain), np.nan, 100.0), values)
+
+
+def last_cross(first: np.ndarray, second: np.ndarray) -> List[str]:
+    """Przecięcie w ostatnim wierszu: 'bullish_cross', 'bearish_cross' lub None dla każdej kolumny"""
+    if len(first) < 2:
+        return [None] * first.shape[1]
+    before = first[-2] - second[-2]
+    after = first[-1] - second[-1]
+    return ['bullish_cross' if b <= 0 < a else 'bearish_cross' if b >= 0 > a else None
+            for b, a in zip(before.tolist(), after.tolist())]
+
+
+def signal_events(signal_type: str, line: np.ndarray, signal: np.ndarray, threshold=np.nan) -> np.ndarray:
+    """
+    Okresy, w których zaszło zdarzenie signal_type (pierwszy wiersz - False): przecięcie linii
+    sygnału lub przejście przez poziom threshold (liczba lub wektor poziomów kolumn). NaN - brak zdarzenia.
+    """
+    events = np.zeros(line.shape, dtype=bool)
+    if len(line) < 2:
+        return events
+    line_before, line_after = line[:-1], line[1:]
+    with np.errstate(invalid='ignore'):
+        before = line_before - signal[:-1]
+        after = line_after - signal[1:]
+        bullish = (before <= 0) & (after > 0)
+        bearish = (before >= 0) & (after < 0)
+        if signal_type == 'level_below':
+            result = (line_before >= threshold) & (line_after < threshold)
+        elif signal_type == 'level_above':
+            result = (line_before <= threshold) & (line_after > threshold)
+        elif signal_type == 'crossover_in_oversold':
+            result = (bullish | bearish) & (np.maximum(line_after, signal[1:]) < OVERSOLD_LEVEL)
+        elif signal_type == 'crossover_in_overbought':
+            result = (bullish | bearish) & (np.minimum(line_after, signal[1:]) > OVERBOUGHT_LEVEL)
+        elif signal_type == 'crossover_general':
+            result = bullish | bearish
+        elif signal_type == 'crossover_bullish':
+            result = bullish
+        elif signal_type == 'crossover_bearish':
+            result = bearish
+        else:
+            raise ValueError(f"Nieznany typ sygnału: {signal_type}")
+    events[1:] = result
+    return events
@@ -0,0 +1,296 @@
+"""
+Śledzenie zadań schedulera (update_all_timeframes, scheduled_daily_price_update)
+
+Zadanie uruchomione w JobTraceService.trace() buduje drzewo spanów: ticker -> etap
+(sprawdzenie kompletności, pobranie historii, zapis ceny, ...) -> zapytanie do dostawcy
+(MeteredSession) / commit paczki zapisów (StorageSession). Każdy span ma czas startu
+i trwania oraz liczniki - zapytania SQL i ich czas (zdarzenia silnika w metrics_service),
+commity odroczone przez paczkę zapisów.
+
+Przebieg zapisywany jest jako jeden wiersz job_traces: spany w układzie kolumnowym
+(indeks rodzica, indeks nazwy, start i czas w mikrosekundach, atrybuty) jako JSON
+skompresowany zlib. Poza aktywnym przebiegiem span() nic nie robi, więc wywołania
+w kodzie wspólnym z endpointami nie kosztują nic.
+
+Przebieg jest powiązany z wątkiem zadania - spany z innych wątków nie są zapisywane.
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import delete, select
+
+logger = logging.getLogger(__name__)
+
+# Przebieg zadania bieżącego wątku
+_active = threading.local()
+
+TRACE_FORMAT_VERSION = 1
+ROOT_SPAN = 'job'
+
+
+class JobTrace:
+    """Drzewo spanów jednego przebiegu zadania (tylko wątek zadania - bez blokad)"""
+
+    def __init__(self, job_name: str, max_spans: int):
+        self.run_id = uuid.uuid4().hex[:16]
+        self.job_name = job_name
+        self.started_at = datetime.now(timezone.utc)
+        self.max_spans = max_spans
+        self.success = True
+        self.dropped_spans = 0
+        self._origin = time.perf_counter()
+        self._names: List[str] = []
+        self._name_index: Dict[str, int] = {}
+        # [rodzic, nazwa, start_us, czas_us, atrybuty]
+        self._spans: List[list] = []
+        self._stack: List[int] = []
+        self.open(ROOT_SPAN, {'job': job_name})
+
+    def _now_us(self) -> int:
+        return int((time.perf_counter() - self._origin) * 1_000_000)
+
+    def _recorded_parent(self) -> int:
+        for index in reversed(self._stack):
+            if index >= 0:
+                return index
+        return -1
+
+    def open(self, name: str, attrs: Optional[Dict] = None) -> int:
+        if len(self._spans) >= self.max_spans:
+            # Ponad limit - czas i liczniki trafiają do najbliższego zapisanego przodka
+            self.dropped_spans += 1
+            self._stack.append(-1)
+            return -1
+        name_index = self._name_index.get(name)
+        if name_index is None:
+            name_index = self._name_index[name] = len(self._names)
+            self._names.append(name)
+        index = len(self._spans)
+        self._spans.append([self._recorded_parent(), name_index, self._now_us(), None, dict(attrs) if attrs else None])
+        self._stack.append(index)
+        return index
+
+    def close(self):
+        index = self._stack.pop()
+        if index >= 0:
+            span = self._spans[index]
+            span[3] = self._now_us() - span[2]
+
+    def annotate(self, **attrs):
+        index = self._recorded_parent()
+        if index >= 0:
+            span = self._spans[index]
+            span[4] = {**(span[4] or {}), **attrs}
+
+    def count(self, key: str, value: float = 1):
+        index = self._recorded_parent()
+        if index >= 0:
+            span = self._spans[index]
+            attrs = span[4] = span[4] or {}
+            attrs[key] = attrs.get(key, 0) + value
+
+    def finish(self):
+        while self._stack:
+            self.close()
+
+    @property
+    def duration_ms(self) -> int:
+        root_duration = self._spans[0][3]
+        return int((root_duration if root_duration is not None else self._now_us()) / 1000)
+
+    def encode(self) -> bytes:
+        for span in self._spans:
+            attrs = span[4]
+            if attrs and 'sql_ms' in attrs:
+                attrs['sql_ms'] = round(attrs['sql_ms'], 3)
+        payload = {'v': TRACE_FORMAT_VERSION, 'names': self._names, 'spans': self._spans}
+        return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+
+
+def decode_spans(payload: bytes) -> List[Dict]:
+    """Spany zapisanego przebiegu jako lista słowników (id = pozycja, parent = -1 dla korzenia)"""
+    data = json.loads(zlib.decompress(payload).decode('utf-8'))
+    names = data['names']
+    return [{
+        'id': index,
+        'parent': parent,
+        'name': names[name_index],
+        'start_ms': round(start_us / 1000, 3),
+        'duration_ms': round((duration_us or 0) / 1000, 3),
+        'attrs': attrs or {}
+    } for index, (parent, name_index, start_us, duration_us, attrs) in enumerate(data['spans'])]
+
+
+def summarize_stages(spans: List[Dict]) -> List[Dict]:
+    """Czas i liczniki według nazwy spanu (gdzie poszedł czas całego przebiegu)"""
+    stages: Dict[str, Dict] = {}
+    for span in spans:
+        if span['parent'] < 0:
+            continue
+        stage = stages.setdefault(span['name'], {'name': span['name'], 'count': 0, 'total_ms': 0.0,
+                                                 'max_ms': 0.0, 'sql_queries': 0, 'sql_ms': 0.0})
+        stage['count'] += 1
+        stage['total_ms'] += span['duration_ms']
+        stage['max_ms'] = max(stage['max_ms'], span['duration_ms'])
+        stage['sql_queries'] += span['attrs'].get('sql_queries', 0)
+        stage['sql_ms'] += span['attrs'].get('sql_ms', 0.0)
+    for stage in stages.values():
+        stage['total_ms'] = round(stage['total_ms'], 3)
+        stage['sql_ms'] = round(stage['sql_ms'], 3)
+    return sorted(stages.values(), key=lambda stage: stage['total_ms'], reverse=True)
+
+
+def current_trace() -> Optional[JobTrace]:
+    return getattr(_active, 'trace', None)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Optional[JobTrace]]:
+    """Span w aktywnym przebiegu zadania (bez przebiegu - nic nie robi)"""
+    trace = getattr(_active, 'trace', None)
+    if trace is None:
+        yield None
+        return
+    trace.open(name, attrs)
+    try:
+        yield trace
+    except Exception as e:
+        trace.annotate(error=type(e).__name__)
+        raise
+    finally:
+        trace.close()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """Dekorator: wywołanie metody jako span aktywnego przebiegu (nazwa - nazwa funkcji)"""
+    def decorator(function):
+        span_name = name or function.__name__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if getattr(_active, 'trace', None) is None:
+                return function(*args, **kwargs)
+            with span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**attrs):
+    trace = getattr(_active, 'trace', None)
+    if trace is not None:
+        trace.annotate(**attrs)
+
+
+def count(key: str, value: float = 1):
+    trace = getattr(_active, 'trace', None)
+    if trace is not None:
+        trace.count(key, value)
+
+
+def record_sql(seconds: float):
+    """Zapytanie SQL wątku zadania - liczniki bieżącego spanu"""
+    trace = getattr(_active, 'trace', None)
+    if trace is not None:
+        trace.count('sql_queries')
+        trace.count('sql_ms', seconds * 1000)
+
+
+class JobTraceService:
+    """Zapis i odczyt przebiegów zadań (tabela job_traces)"""
+
+    def __init__(self, config):
+        self.enabled = config.JOB_TRACE_ENABLED
+        self.max_spans = config.JOB_TRACE_MAX_SPANS
+        self.retention_days = config.JOB_TRACE_RETENTION_DAYS
+        self._db = None
+
+    def init_app(self, app, db):
+        self._db = db
+        app.extensions['etf_job_traces'] = self
+
+    @contextmanager
+    def trace(self, job_name: str) -> Iterator[Optional[JobTrace]]:
+        """
+        Przebieg zadania w bieżącym wątku; zapisywany po zakończeniu w db.session zadania
+        (commit w ramach writer_job). Zagnieżdżone wywołanie nie tworzy nowego przebiegu.
+        """
+        if not self.enabled or current_trace() is not None:
+            yield current_trace()
+            return
+        trace = JobTrace(job_name, self.max_spans)
+        _active.trace = trace
+        try:
+            yield trace
+        except Exception:
+            trace.success = False
+            raise
+        finally:
+            _active.trace = None
+            trace.finish()
+            self._save(trace)
+
+    def _save(self, trace: JobTrace):
+        from models import JobTraceRecord
+        session = self._db.session
+        try:
+            session.add(JobTraceRecord(
+                run_id=trace.run_id,
+                job_name=trace.job_name,
+                started_at=trace.started_at,
+                duration_ms=trace.duration_ms,
+                success=trace.success,
+                span_count=len(trace._spans),
+                dropped_spans=trace.dropped_spans,
+                payload=trace.encode()
+            ))
+            session.commit()
+            logger.info(f"Job trace {trace.run_id} saved for {trace.job_name}: {len(trace._spans)} spans, "
+                        f"{trace.duration_ms}ms")
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error saving job trace {trace.run_id} for {trace.job_name}: {str(e)}")
+
+    def list(self, job_name: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        from models import JobTraceRecord
+        query = select(JobTraceRecord).order_by(JobTraceRecord.started_at.desc()).limit(limit)
+        if job_name:
+            query = query.where(JobTraceRecord.job_name == job_name)
+        return [record.to_dict() for record in self._db.session.execute(query).scalars()]
+
+    def get(self, run_id: str) -> Optional[Dict]:
+        """Przebieg ze spanami i podsumowaniem etapów (None gdy nie istnieje)"""
+        from models import JobTraceRecord
+        record = self._db.session.execute(
+            select(JobTraceRecord).where(JobTraceRecord.run_id == run_id)
+        ).scalar_one_or_none()
+        if record is None:
+            return None
+        spans = decode_spans(record.payload)
+        return {**record.to_dict(), 'stages': summarize_stages(spans), 'spans': spans}
+
+    def cleanup(self) -> int:
+        """Usuwa przebiegi starsze niż JOB_TRACE_RETENTION_DAYS"""
+        from models import JobTraceRecord
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.retention_days)
+        try:
+            deleted = self._db.session.execute(
+                delete(JobTraceRecord).where(JobTraceRecord.started_at < cutoff)
+            ).rowcount
+            self._db.session.commit()
+            if deleted:
+                logger.info(f"Cleaned up {deleted} old job traces")
+            return deleted
+        except Exception as e:
+            logger.error(f"Error during job trace cleanup: {str(e)}")
+            self._db.session.rollback()
+            return 0
@@ -0,0 +1,143 @@
+"""
+Logowanie aplikacji: zapis w tle, poziomy per moduł i próbkowanie zdarzeń per wiersz
+
+- QueueHandler wkłada rekord do kolejki w pamięci, a formatowanie i zapis na stderr wykonuje
+  wątek QueueListener - wątek żądania lub zadania nie czeka na I/O logów
+- komunikaty w stylu %: logger.info('Updated %s: %.2f', ticker, price) - tekst budowany jest
+  dopiero w wątku zapisu i tylko dla rekordów, które przeszły próg poziomu
+- poziomy z DEBUG_LEVEL: "INFO" albo "INFO,services.api_service=WARNING,apscheduler=WARNING"
+  (element bez '=' to poziom główny); ENABLE_DEBUG_LOGS=true - poziom główny DEBUG
+- SampledLogger dla zdarzeń per wiersz (cena, dywidenda): najwyżej `burst` rekordów danego
+  komunikatu na `interval_seconds`, liczba pominiętych dopisywana do następnego rekordu
+
+Jak logging.basicConfig: gdy główny logger ma już handlery (np. pytest), ustawiane są tylko poziomy.
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_lock = threading.Lock()
+
+
+class _InProcessQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler bez formatowania w wątku wywołującym (kolejka w tym samym procesie, bez pickle)"""
+
+    def prepare(self, record):
+        return record
+
+
+def parse_levels(spec: str, debug: bool = False) -> Tuple[int, Dict[str, int]]:
+    """(poziom główny, {logger: poziom}) z DEBUG_LEVEL; nieznane poziomy są pomijane"""
+    root_level = logging.DEBUG if debug else logging.INFO
+    modules: Dict[str, int] = {}
+    for item in (spec or '').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, level_name = item.rpartition('=')
+        level = logging.getLevelName(level_name.strip().upper())
+        if not isinstance(level, int):
+            continue
+        if name.strip():
+            modules[name.strip()] = level
+        elif not debug:
+            root_level = level
+    return root_level, modules
+
+
+def configure_logging(config) -> Optional[logging.handlers.QueueListener]:
+    """Konfiguruje logger główny (raz na proces) i poziomy modułów"""
+    global _listener
+    root_level, modules = parse_levels(config.DEBUG_LEVEL, config.ENABLE_DEBUG_LOGS)
+    root = logging.getLogger()
+    with _lock:
+        root.setLevel(root_level)
+        for name, level in modules.items():
+            logging.getLogger(name).setLevel(level)
+        if _listener is not None or root.handlers:
+            return _listener
+
+        stream_handler = logging.StreamHandler(sys.stderr)
+        stream_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        log_queue = queue.SimpleQueue()
+        root.addHandler(_InProcessQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        # Zapis rekordów z kolejki przy zamknięciu procesu
+        atexit.register(_listener.stop)
+    return _listener
+
+
+def _restart_listener_after_fork():
+    # Wątek zapisu nie przeżywa fork() - nowy wątek w procesie potomnym (ta sama kolejka i handlery)
+    global _listener
+    if _listener is not None:
+        _listener = logging.handlers.QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+class SampledLogger:
+    """Logger zdarzeń per wiersz: najwyżej `burst` rekordów komunikatu na `interval_seconds`"""
+
+    def __init__(self, logger: logging.Logger, burst: int = 5, interval_seconds: float = 60.0):
+        self.logger = logger
+        self.burst = burst
+        self.interval_seconds = interval_seconds
+        self._lock = threading.Lock()
+        # komunikat -> [początek okna, wysłane w oknie, pominięte]
+        self._windows: Dict[str, list] = {}
+
+    def _suppressed(self, msg: str) -> Optional[int]:
+        """Liczba wcześniej pominiętych rekordów, gdy rekord można wysłać (None - pominąć)"""
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(msg)
+            if window is None:
+                window = self._windows[msg] = [now, 0, 0]
+            elif now - window[0] >= self.interval_seconds:
+                window[0], window[1] = now, 0
+            if window[1] >= self.burst:
+                window[2] += 1
+                return None
+            window[1] += 1
+            suppressed, window[2] = window[2], 0
+            return suppressed
+
+    def log(self, level: int, msg: str, *args):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self._suppressed(msg)
+        if suppressed is None:
+            return
+        if suppressed:
+            self.logger.log(level, msg + ' (+%d podobnych pominiętych)', *args, suppressed, stacklevel=3)
+        else:
+            self.logger.log(level, msg, *args, stacklevel=3)
+
+    def debug(self, msg: str, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg: str, *args):
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg: str, *args):
+        self.log(logging.WARNING, msg, *args)
+
+
+def get_sampled_logger(name: str, burst: int = 5, interval_seconds: float = 60.0) -> SampledLogger:
+    return SampledLogger(logging.getLogger(name), burst, interval_seconds)
@@ -0,0 +1,379 @@
+"""
+Metryki wydajności żądań (/api/system/metrics w formacie tekstowym Prometheus)
+
+- histogram czasu odpowiedzi według reguły routingu Flask, metody i statusu
+- liczba i czas zapytań SQL na żądanie (zdarzenia before/after_cursor_execute wszystkich
+  silników SQLAlchemy); to samo zapytanie SELECT wykonane w jednym żądaniu co najmniej
+  METRICS_N_PLUS_ONE_THRESHOLD razy oznaczane jest jako wzorzec N+1 (ostrzeżenie w logach)
+- czas zapytań do dostawców danych (FMP, EODHD, Tiingo) według endpointu i statusu
+  (MeteredSession w APIService)
+
+Metryki są liczone w pamięci procesu - każdy worker gunicorn raportuje własne liczniki.
+Zapytania SQL poza żądaniem HTTP (zadania schedulera) trafiają do osobnych liczników.
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from flask import request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import Config
+from services.job_trace_service import (annotate as annotate_job_span, current_trace, record_sql as record_job_sql,
+                                        span as job_span)
+from services.storage_service import release_write_lock
+
+logger = logging.getLogger(__name__)
+
+# Zakres bieżącego żądania (wątek workera gthread obsługuje jedno żądanie naraz)
+_request_state = threading.local()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+N_PLUS_ONE_HISTORY = 20
+STATEMENT_PREVIEW_LENGTH = 200
+UNMATCHED_ROUTE = 'unmatched'
+
+# Segment ścieżki z tickerem (SPY, SPY.US) - jedna seria metryk na endpoint, nie na ETF
+_TICKER_SEGMENT = re.compile(r'^(?=[A-Z0-9.\-]*[A-Z])[A-Z0-9.\-]+$')
+
+
+class Histogram:
+    """Histogram kumulatywny w stylu Prometheus (bez własnej blokady - chroni go rejestr)"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[int]:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+    def merge(self, other: 'Histogram'):
+        self.count += other.count
+        self.sum += other.sum
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Górna granica kubełka z kwantylem q (None powyżej ostatniego kubełka)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, total in zip(self.buckets, self.cumulative()):
+            if total >= rank:
+                return bound
+        return None
+
+
+class _RequestScope:
+    """Zapytania SQL jednego żądania HTTP"""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.status = None
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements: Dict[str, int] = {}
+
+
+class RequestMetrics:
+    """Rejestr metryk procesu (bezpieczny wątkowo)"""
+
+    def __init__(self, enabled: bool, n_plus_one_threshold: int):
+        self.enabled = enabled
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._lock = threading.Lock()
+        self.started_at = datetime.now(timezone.utc)
+        self._routes: Dict[Tuple[str, str, str], Histogram] = {}
+        self._route_queries: Dict[Tuple[str, str], Histogram] = {}
+        self._route_sql_seconds: Dict[Tuple[str, str], float] = {}
+        self._route_n_plus_one: Dict[Tuple[str, str], int] = {}
+        self._providers: Dict[Tuple[str, str, str], Histogram] = {}
+        self._background = {'queries': 0, 'seconds': 0.0}
+        self._n_plus_one = deque(maxlen=N_PLUS_ONE_HISTORY)
+
+    def init_app(self, app):
+        app.extensions['etf_request_metrics'] = self
+        if not self.enabled:
+            return
+        app.before_request(self._start_request)
+        app.after_request(self._set_status)
+        app.teardown_request(self._finish_request)
+
+    # --- żądania HTTP ---
+
+    def _start_request(self):
+        _request_state.scope = _RequestScope()
+
+    def _set_status(self, response):
+        scope = getattr(_request_state, 'scope', None)
+        if scope is not None:
+            scope.status = response.status_code
+        return response
+
+    def _finish_request(self, exception=None):
+        scope = getattr(_request_state, 'scope', None)
+        if scope is None:
+            return
+        _request_state.scope = None
+        rule = request.url_rule.rule if request.url_rule is not None else UNMATCHED_ROUTE
+        status = scope.status if scope.status is not None else 500
+        self.record_request(rule, request.method, status, time.perf_counter() - scope.started_at, scope)
+
+    def record_request(self, route: str, method: str, status: int, seconds: float, scope: _RequestScope):
+        repeated = [(statement, count) for statement, count in scope.statements.items()
+                    if count >= self.n_plus_one_threshold and statement.lstrip()[:6].upper() == 'SELECT']
+        with self._lock:
+            self._routes.setdefault((route, method, str(status)), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self._route_queries.setdefault((route, method), Histogram(QUERY_COUNT_BUCKETS)).observe(scope.queries)
+            self._route_sql_seconds[(route, method)] = self._route_sql_seconds.get((route, method), 0.0) + scope.sql_seconds
+            for statement, count in repeated:
+                self._route_n_plus_one[(route, method)] = self._route_n_plus_one.get((route, method), 0) + 1
+                self._n_plus_one.appendleft({
+                    'route': route,
+                    'method': method,
+                    'count': count,
+                    'statement': ' '.join(statement.split())[:STATEMENT_PREVIEW_LENGTH],
+                    'at': datetime.now(timezone.utc).isoformat()
+                })
+        for statement, count in repeated:
+            logger.warning(f"Possible N+1 query pattern: {method} {route} executed the same query {count} times: "
+                           f"{' '.join(statement.split())[:STATEMENT_PREVIEW_LENGTH]}")
+
+    # --- SQL ---
+
+    def record_query(self, statement: str, seconds: float):
+        if not self.enabled:
+            record_job_sql(seconds)
+            return
+        scope = getattr(_request_state, 'scope', None)
+        if scope is not None:
+            scope.queries += 1
+            scope.sql_seconds += seconds
+            scope.statements[statement] = scope.statements.get(statement, 0) + 1
+            return
+        with self._lock:
+            self._background['queries'] += 1
+            self._background['seconds'] += seconds
+        record_job_sql(seconds)
+
+    # --- dostawcy danych ---
+
+    def record_provider_call(self, provider: str, endpoint: str, status: str, seconds: float):
+        with self._lock:
+            self._providers.setdefault((provider, endpoint, status), Histogram(LATENCY_BUCKETS)).observe(seconds)
+
+    # --- eksport ---
+
+    def render_prometheus(self) -> str:
+        """Metryki w formacie tekstowym Prometheus 0.0.4"""
+        lines: List[str] = []
+        with self._lock:
+            _render_histograms(lines, 'etf_http_request_duration_seconds',
+                               'Czas odpowiedzi HTTP według reguły routingu', ('route', 'method', 'status'),
+                               self._routes)
+            _render_histograms(lines, 'etf_http_request_sql_queries', 'Liczba zapytań SQL w jednym żądaniu',
+                               ('route', 'method'), self._route_queries)
+            _render_counters(lines, 'etf_http_request_sql_seconds_total', 'Łączny czas zapytań SQL żądań',
+                             ('route', 'method'), self._route_sql_seconds)
+            _render_counters(lines, 'etf_http_request_n_plus_one_total',
+                             'Żądania z powtórzonym zapytaniem SELECT (wzorzec N+1)', ('route', 'method'),
+                             self._route_n_plus_one)
+            _render_counters(lines, 'etf_background_sql_queries_total', 'Zapytania SQL poza żądaniami HTTP', (),
+                             {(): self._background['queries']})
+            _render_counters(lines, 'etf_background_sql_seconds_total', 'Czas zapytań SQL poza żądaniami HTTP',
+                             (), {(): self._background['seconds']})
+            _render_histograms(lines, 'etf_provider_request_duration_seconds',
+                               'Czas zapytań do dostawców danych według endpointu', ('provider', 'endpoint', 'status'),
+                               self._providers)
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, limit: int = 10) -> Dict:
+        """Podsumowanie dla strony statusu: najwolniejsze trasy, trasy z dużą liczbą zapytań, N+1, dostawcy"""
+        with self._lock:
+            routes: Dict[Tuple[str, str], Dict] = {}
+            for (route, method, status), histogram in self._routes.items():
+                entry = routes.setdefault((route, method), {'errors': 0, 'histogram': Histogram(LATENCY_BUCKETS)})
+                if status.startswith('5'):
+                    entry['errors'] += histogram.count
+                entry['histogram'].merge(histogram)
+
+            route_rows = []
+            for (route, method), entry in routes.items():
+                latency, queries = entry['histogram'], self._route_queries.get((route, method))
+                route_rows.append({
+                    'route': route,
+                    'method': method,
+                    'requests': latency.count,
+                    'errors': entry['errors'],
+                    'avg_ms': round(latency.sum / latency.count * 1000, 1),
+                    'p95_ms': _bound_ms(latency.quantile(0.95)),
+                    'total_seconds': round(latency.sum, 3),
+                    'avg_sql_queries': round(queries.sum / queries.count, 1) if queries and queries.count else 0.0,
+                    'avg_sql_ms': round(self._route_sql_seconds.get((route, method), 0.0) / latency.count * 1000, 1),
+                    'n_plus_one': self._route_n_plus_one.get((route, method), 0)
+                })
+
+            provider_rows: Dict[Tuple[str, str], Dict] = {}
+            for (provider, endpoint, status), histogram in self._providers.items():
+                entry = provider_rows.setdefault((provider, endpoint), {'provider': provider, 'endpoint': endpoint,
+                                                                        'errors': 0,
+                                                                        'histogram': Histogram(LATENCY_BUCKETS)})
+                if not status.startswith('2'):
+                    entry['errors'] += histogram.count
+                entry['histogram'].merge(histogram)
+            providers = [{
+                'provider': entry['provider'],
+                'endpoint': entry['endpoint'],
+                'calls': entry['histogram'].count,
+                'errors': entry['errors'],
+                'avg_ms': round(entry['histogram'].sum / entry['histogram'].count * 1000, 1),
+                'p95_ms': _bound_ms(entry['histogram'].quantile(0.95))
+            } for entry in provider_rows.values()]
+
+            background = dict(self._background)
+            n_plus_one = list(self._n_plus_one)
+
+        return {
+            'enabled': self.enabled,
+            'since': self.started_at.isoformat(),
+            'n_plus_one_threshold': self.n_plus_one_threshold,
+            'slowest_routes': sorted(route_rows, key=lambda row: row['total_seconds'], reverse=True)[:limit],
+            'sql_heavy_routes': sorted((row for row in route_rows if row['avg_sql_queries']),
+                                       key=lambda row: row['avg_sql_queries'], reverse=True)[:limit],
+            'providers': sorted(providers, key=lambda row: row['calls'], reverse=True),
+            'background_sql': {'queries': background['queries'], 'seconds': round(background['seconds'], 3)},
+            'n_plus_one': n_plus_one
+        }
+
+
+def _bound_ms(bound: Optional[float]) -> Optional[float]:
+    return round(bound * 1000, 1) if bound is not None else None
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _le(bound) -> str:
+    return f'le="{bound}"'
+
+
+def _format_number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _render_histograms(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+                       series: Dict[Tuple, Histogram]):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for values, histogram in sorted(series.items()):
+        for bound, total in zip(histogram.buckets, histogram.cumulative()):
+            lines.append(f'{name}_bucket{_labels(label_names, values, _le(bound))} {total}')
+        lines.append(f'{name}_bucket{_labels(label_names, values, _le("+Inf"))} {histogram.count}')
+        lines.append(f'{name}_sum{_labels(label_names, values)} {_format_number(histogram.sum)}')
+        lines.append(f'{name}_count{_labels(label_names, values)} {histogram.count}')
+
+
+def _render_counters(lines: List[str], name: str, help_text: str, label_names: Tuple[str, ...],
+                     series: Dict[Tuple, float]):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for values, value in sorted(series.items()):
+        lines.append(f'{name}{_labels(label_names, values)} {_format_number(value)}')
+
+
+def provider_endpoint(url: str, base_urls: Dict[str, str]) -> Tuple[str, str]:
+    """(dostawca, endpoint) dla adresu zapytania; segmenty z tickerem zastępowane przez {ticker}"""
+    path = url.split('?', 1)[0]
+    provider, relative = None, None
+    for name, base_url in base_urls.items():
+        if base_url and path.startswith(base_url.rstrip('/')):
+            provider, relative = name, path[len(base_url.rstrip('/')):]
+            break
+    if provider is None:
+        parts = urlsplit(path)
+        provider, relative = parts.hostname or 'unknown', parts.path
+    segments = ['{ticker}' if _TICKER_SEGMENT.match(segment) else segment for segment in relative.split('/')]
+    return provider, '/'.join(segments) or '/'
+
+
+class MeteredSession(requests.Session):
+    """requests.Session mierząca czas każdego zapytania do dostawcy (razem z pobraniem treści)"""
+
+    def __init__(self, base_urls: Callable[[], Dict[str, str]], metrics: Optional[RequestMetrics] = None):
+        super().__init__()
+        self.base_urls = base_urls
+        self.metrics = metrics or request_metrics
+
+    def request(self, method, url, *args, **kwargs):
+        provider, endpoint = provider_endpoint(url, self.base_urls())
+        # Zadanie pisarza nie trzyma blokady zapisu SQLite w czasie oczekiwania na dostawcę
+        release_write_lock()
+        # Span zapytania w śledzeniu zadania schedulera (poza zadaniem - bez kosztu)
+        with job_span('provider_call', provider=provider, endpoint=endpoint):
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                response = super().request(method, url, *args, **kwargs)
+                status = str(response.status_code)
+                return response
+            except requests.Timeout:
+                status = 'timeout'
+                raise
+            finally:
+                annotate_job_span(status=status)
+                if self.metrics.enabled:
+                    self.metrics.record_provider_call(provider, endpoint, status, time.perf_counter() - started)
+
+
+request_metrics = RequestMetrics(Config.METRICS_ENABLED, Config.METRICS_N_PLUS_ONE_THRESHOLD)
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    if request_metrics.enabled or current_trace() is not None:
+        connection.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+    starts = connection.info.get('metrics_query_start')
+    if starts:
+        request_metrics.record_query(statement, time.perf_counter() - starts.pop())
+
+
+@event.listens_for(Engine, 'handle_error')
+def _handle_error(exception_context):
+    # Nieudane zapytanie nie wywołuje after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('metrics_query_start'):
+        connection.info['metrics_query_start'].pop()
@@ -0,0 +1,305 @@
+"""
+Zbiorcza, asynchroniczna wysyłka powiadomień z kolejki notification_outbox
+
+Sprawdzanie alertów tylko dopisuje wpisy do kolejki (w tej samej transakcji co AlertHistory),
+a worker (zadanie schedulera co minutę):
+1. przejmuje oczekujące wpisy, których termin kolejnej próby minął (status sending, claimed_at) -
+   UPDATE ... WHERE status = 'pending' zatwierdzany przed wysyłką, więc scheduler każdego workera
+   gunicorna wysyła tylko wpisy, które sam przejął; wpisy w stanie sending dłużej niż
+   NOTIFICATION_CLAIM_TIMEOUT_SECONDS (worker przerwany w trakcie wysyłki) są przejmowane ponownie,
+2. łączy je w zbiorcze wiadomości (digest) per kanał - do NOTIFICATION_DIGEST_MAX_ALERTS alertów,
+3. wysyła wiadomości równolegle (pula wątków) z limitem tempa per webhook i respektowaniem
+   Retry-After przy HTTP 429,
+4. zapisuje wyniki zbiorczo w jednej transakcji: statusy kolejki, wiersze Notification
+   i notified_at alertów. Nieudane wpisy wracają do kolejki z wykładniczym backoffem,
+   po NOTIFICATION_MAX_ATTEMPTS próbach mają status failed.
+
+Wysyłka HTTP odbywa się poza transakcją, więc wolny webhook nie blokuje zadań pisarza.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import requests
+from sqlalchemy import and_, insert, or_, select, update
+
+from models import db, AlertHistory, Notification, NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+SEVERITY_ORDER = ('info', 'warning', 'error', 'critical')
+SEVERITY_COLORS = {
+    'info': '#36a64f',      # Zielony
+    'warning': '#ff8c00',   # Pomarańczowy
+    'error': '#ff0000',     # Czerwony
+    'critical': '#8b0000'   # Ciemny czerwony
+}
+
+
+class OutboxEntry(NamedTuple):
+    id: int
+    alert_id: int
+    channel: str
+    message: str
+    severity: str
+    attempts: int
+
+
+class Digest(NamedTuple):
+    """Jedna wiadomość zbiorcza - alerty z kolejki jednego kanału"""
+    channel: str
+    entries: List[OutboxEntry]
+    payload: Dict
+
+
+class DeliveryResult(NamedTuple):
+    digest: Digest
+    ok: bool
+    error: Optional[str] = None
+    retry_after: Optional[float] = None
+
+
+def slack_message(config, text: str, severity: str, title: Optional[str] = None) -> Dict:
+    """Wiadomość Slack (załącznik z kolorem wg severity)"""
+    now = datetime.now()
+    return {
+        "channel": config.SLACK_CHANNEL,
+        "username": config.SLACK_USERNAME,
+        "attachments": [
+            {
+                "color": SEVERITY_COLORS.get(severity, SEVERITY_COLORS['info']),
+                "title": title or f"ETF Analyzer Alert - {severity.upper()}",
+                "text": text,
+                "fields": [
+                    {"title": "Severity", "value": severity.upper(), "short": True},
+                    {"title": "Time", "value": now.strftime("%Y-%m-%d %H:%M:%S"), "short": True}
+                ],
+                "footer": "ETF Analyzer v1.9.20",
+                "ts": int(now.timestamp())
+            }
+        ]
+    }
+
+
+def enqueue_notifications(alerts: Iterable[AlertHistory], channel: str = 'slack') -> int:
+    """Dopisuje alerty do kolejki powiadomień w bieżącej transakcji (commit po stronie wywołującego)"""
+    count = 0
+    for alert in alerts:
+        db.session.add(NotificationOutbox(alert=alert, channel=channel, message=alert.message,
+                                          severity=alert.severity or 'info'))
+        count += 1
+    return count
+
+
+class RateLimiter:
+    """Minimalny odstęp między wiadomościami do jednego webhooka (współdzielony przez wątki)"""
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def defer(self, seconds: float):
+        """Przesuwa kolejne wysyłki (np. po HTTP 429 z Retry-After)"""
+        with self._lock:
+            self._next_slot = max(self._next_slot, time.monotonic() + seconds)
+
+
+class NotificationDelivery:
+    """Worker kolejki powiadomień - digest per kanał, wysyłka równoległa, zapis wyników zbiorczo"""
+
+    def __init__(self, config, post=None):
+        self.config = config
+        self.post = post or requests.post
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def deliver_pending(self, write_scope=None) -> Dict[str, int]:
+        """
+        Wysyła zaległe wpisy kolejki.
+
+        Args:
+            write_scope: funkcja zwracająca kontekst zapisu wyników (np. zadanie pisarza storage_service)
+
+        Returns:
+            Liczba wiadomości i wpisów wysłanych, ponawianych i nieudanych
+        """
+        entries = self.claim_entries(write_scope)
+        if not entries:
+            return {'messages': 0, 'sent': 0, 'retrying': 0, 'failed': 0}
+        results = self.send_all(self.build_digests(entries))
+        with (write_scope or nullcontext)():
+            return self.record_results(results)
+
+    def claim_entries(self, write_scope=None) -> List[OutboxEntry]:
+        """
+        Przejmuje wpisy do wysyłki: oczekujące z minionym terminem próby oraz porzucone w stanie sending.
+        Zwraca tylko wpisy, których przejęcie się powiodło (zatwierdzone przed wysyłką).
+        """
+        now = datetime.now(timezone.utc)
+        claimable = or_(
+            and_(NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now),
+            and_(NotificationOutbox.status == 'sending',
+                 NotificationOutbox.claimed_at <= now - timedelta(seconds=self.config.NOTIFICATION_CLAIM_TIMEOUT_SECONDS))
+        )
+        with (write_scope or nullcontext)():
+            try:
+                ids = db.session.execute(
+                    select(NotificationOutbox.id).where(claimable)
+                    .order_by(NotificationOutbox.id).limit(self.config.NOTIFICATION_BATCH_SIZE)
+                ).scalars().all()
+                if not ids:
+                    db.session.rollback()
+                    return []
+                # Warunek powtórzony w UPDATE - wpis przejęty w międzyczasie przez inny worker jest pomijany
+                rows = db.session.execute(
+                    update(NotificationOutbox)
+                    .where(NotificationOutbox.id.in_(ids), claimable)
+                    .values(status='sending', claimed_at=now)
+                    .returning(NotificationOutbox.id, NotificationOutbox.alert_id, NotificationOutbox.channel,
+                               NotificationOutbox.message, NotificationOutbox.severity, NotificationOutbox.attempts)
+                ).all()
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"Błąd przejmowania wpisów kolejki powiadomień: {str(e)}")
+                db.session.rollback()
+                raise
+        return sorted((OutboxEntry(*row) for row in rows), key=lambda entry: entry.id)
+
+    def build_digests(self, entries: List[OutboxEntry]) -> List[Digest]:
+        """Łączy wpisy w wiadomości per kanał (po NOTIFICATION_DIGEST_MAX_ALERTS alertów)"""
+        by_channel = defaultdict(list)
+        for entry in entries:
+            by_channel[entry.channel].append(entry)
+
+        size = max(1, self.config.NOTIFICATION_DIGEST_MAX_ALERTS)
+        digests = []
+        for channel, channel_entries in by_channel.items():
+            for start in range(0, len(channel_entries), size):
+                chunk = channel_entries[start:start + size]
+                digests.append(Digest(channel, chunk, self._payload(chunk)))
+        return digests
+
+    def _payload(self, entries: List[OutboxEntry]) -> Dict:
+        severity = max((entry.severity for entry in entries),
+                       key=lambda value: SEVERITY_ORDER.index(value) if value in SEVERITY_ORDER else 0)
+        if len(entries) == 1:
+            return slack_message(self.config, entries[0].message, severity)
+        text = '\n'.join(f"• [{entry.severity.upper()}] {entry.message}" for entry in entries)
+        return slack_message(self.config, text, severity, title=f"ETF Analyzer - {len(entries)} alertów")
+
+    def _webhook(self, channel: str) -> Optional[str]:
+        return self.config.SLACK_WEBHOOK_URL if channel == 'slack' else None
+
+    def _limiter(self, url: str) -> RateLimiter:
+        with self._lock:
+            if url not in self._limiters:
+                self._limiters[url] = RateLimiter(self.config.SLACK_MIN_INTERVAL_SECONDS)
+            return self._limiters[url]
+
+    def send_all(self, digests: List[Digest]) -> List[DeliveryResult]:
+        """Wysyła wiadomości równolegle (kolejność wyników jak digests)"""
+        if not digests:
+            return []
+        workers = max(1, min(self.config.NOTIFICATION_WORKERS, len(digests)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notify') as executor:
+            return list(executor.map(self._send, digests))
+
+    def _send(self, digest: Digest) -> DeliveryResult:
+        url = self._webhook(digest.channel)
+        if not url:
+            return DeliveryResult(digest, False, f'Brak konfiguracji webhooka dla kanału {digest.channel}')
+
+        limiter = self._limiter(url)
+        limiter.wait()
+        try:
+            response = self.post(url, json=digest.payload, timeout=self.config.NOTIFICATION_TIMEOUT_SECONDS)
+        except requests.RequestException as e:
+            return DeliveryResult(digest, False, str(e))
+
+        if 200 <= response.status_code < 300:
+            return DeliveryResult(digest, True)
+        retry_after = None
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.headers.get('Retry-After', 1))
+            except (TypeError, ValueError):
+                retry_after = 1.0
+            limiter.defer(retry_after)
+        return DeliveryResult(digest, False, f"HTTP {response.status_code}: {response.text[:200]}", retry_after)
+
+    def record_results(self, results: List[DeliveryResult]) -> Dict[str, int]:
+        """Zapisuje wyniki wysyłki zbiorczo (jedna transakcja)"""
+        now = datetime.now(timezone.utc)
+        max_attempts = self.config.NOTIFICATION_MAX_ATTEMPTS
+        sent, failed = [], []
+        retrying = defaultdict(list)  # (liczba prób, opóźnienie) -> id wpisów
+        notifications = []
+
+        for result in results:
+            for entry in result.digest.entries:
+                if result.ok:
+                    sent.append(entry)
+                    notifications.append({'alert_id': entry.alert_id, 'channel': entry.channel,
+                                          'status': 'sent', 'sent_at': now, 'error_message': None})
+                elif entry.attempts + 1 >= max_attempts:
+                    failed.append((entry, result.error))
+                    notifications.append({'alert_id': entry.alert_id, 'channel': entry.channel,
+                                          'status': 'failed', 'sent_at': now, 'error_message': result.error})
+                else:
+                    delay = self.config.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** entry.attempts
+                    retrying[(entry.attempts + 1, max(delay, result.retry_after or 0), result.error)].append(entry.id)
+
+        try:
+            if sent:
+                db.session.execute(
+                    update(NotificationOutbox).where(NotificationOutbox.id.in_([e.id for e in sent]))
+                    .values(status='sent', sent_at=now, attempts=NotificationOutbox.attempts + 1, error_message=None)
+                )
+                db.session.execute(
+                    update(AlertHistory).where(AlertHistory.id.in_({e.alert_id for e in sent})).values(notified_at=now)
+                )
+            errors = defaultdict(list)
+            for entry, error in failed:
+                errors[error].append(entry.id)
+            for error, ids in errors.items():
+                db.session.execute(
+                    update(NotificationOutbox).where(NotificationOutbox.id.in_(ids))
+                    .values(status='failed', attempts=NotificationOutbox.attempts + 1, error_message=error)
+                )
+            for (attempts, delay, error), ids in retrying.items():
+                db.session.execute(
+                    update(NotificationOutbox).where(NotificationOutbox.id.in_(ids))
+                    .values(status='pending', claimed_at=None, attempts=attempts,
+                            next_attempt_at=now + timedelta(seconds=delay), error_message=error)
+                )
+            if notifications:
+                db.session.execute(insert(Notification), notifications)
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"Błąd zapisu wyników wysyłki powiadomień: {str(e)}")
+            db.session.rollback()
+            raise
+
+        summary = {
+            'messages': sum(1 for result in results if result.ok),
+            'sent': len(sent),
+            'retrying': sum(len(ids) for ids in retrying.values()),
+            'failed': len(failed)
+        }
+        logger.info("Notification delivery: %s", summary)
+        return summary
@@ -1,14 +1,31 @@
 import logging
 import requests
 import json
-from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Any
-from models import db, AlertConfig, AlertHistory, Notification, ETF
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+
+from models import db, AlertConfig, AlertHistory, Notification, ETF, SystemLog
 from services.api_service import APIService
+from services.chart_data_service import INDICATOR_PRICE_COLUMN
 from services.database_service import DatabaseService
+from services.indicators import SIGNAL_TYPES, align_right, macd, signal_events, stochastic
+from services.notification_delivery import enqueue_notifications, slack_message
+from services.series_cache import TIMEFRAMES
 
 logger = logging.getLogger(__name__)
 
+# Typy reguł (AlertConfig.type) z formularza alertów
+TECHNICAL_ALERT = 'technical_indicator'
+PRICE_ALERT = 'price'
+SCHEDULER_ALERT = 'scheduler'
+LOG_ALERT = 'log_error'
+
+LOG_LOOKBACK_HOURS = 24  # zakres logów dla reguły bez wcześniejszych alertów
+
 class NotificationService:
     """Serwis do zarządzania powiadomieniami i alertami"""
     
@@ -18,53 +35,19 @@ class NotificationService:
         self.db_service = DatabaseService()
         
     def send_slack_notification(self, alert_id: int, message: str, severity: str):
-        """Wysyła powiadomienie na Slack"""
+        """Wysyła powiadomienie na Slack od razu (test webhooka - alerty idą przez kolejkę notification_outbox)"""
         try:
             if not self.config.SLACK_WEBHOOK_URL:
                 logger.warning("Brak konfiguracji Slack webhook")
                 return
             
-            # Kolor wiadomości na podstawie severity
-            color_map = {
-                'info': '#36a64f',      # Zielony
-                'warning': '#ff8c00',   # Pomarańczowy
-                'error': '#ff0000',     # Czerwony
-                'critical': '#8b0000'   # Ciemny czerwony
-            }
-            color = color_map.get(severity, '#36a64f')
-            
-            # Przygotowanie wiadomości Slack
-            slack_message = {
-                "channel": self.config.SLACK_CHANNEL,
-                "username": self.config.SLACK_USERNAME,
-                "attachments": [
-                    {
-                        "color": color,
-                        "title": f"ETF Analyzer Alert - {severity.upper()}",
-                        "text": message,
-                        "fields": [
-                            {
-                                "title": "Severity",
-                                "value": severity.upper(),
-                                "short": True
-                            },
-                            {
-                                "title": "Time",
-                                "value": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                                "short": True
-                            }
-                        ],
-                        "footer": "ETF Analyzer v1.9.20",
-                        "ts": int(datetime.now().timestamp())
-                    }
-                ]
-            }
+            slack_message_payload = slack_message(self.config, message, severity)
             
             # Wysyłanie na Slack
             response = requests.post(
                 self.config.SLACK_WEBHOOK_URL,
-                json=slack_message,
-                timeout=10
+                json=slack_message_payload,
+                timeout=self.config.NOTIFICATION_TIMEOUT_SECONDS
             )
             
             if response.status_code == 200:
@@ -107,257 +90,218 @@ class NotificationService:
             except:
                 pass
 
-    def check_alerts(self):
-        """Sprawdza wszystkie aktywne alerty i wysyła powiadomienia"""
-        try:
-            # Pobieranie wszystkich aktywnych konfiguracji alertów
-            alert_configs = AlertConfig.query.filter_by(enabled=True).all()
-            
-            for alert_config in alert_configs:
-                try:
-                    self._check_single_alert(alert_config)
-                except Exception as e:
-                    logger.error(f"Błąd sprawdzania alertu {alert_config.id}: {str(e)}")
-                    
-        except Exception as e:
-            logger.error(f"Błąd sprawdzania alertów: {str(e)}")
+    def check_alerts(self) -> int:
+        """Sprawdza wszystkie aktywne alerty (wskaźniki, ceny, zadania, logi). Zwraca liczbę wyzwolonych"""
+        return (self.check_technical_alerts() + self.check_price_alerts()
+                + self.check_scheduler_alerts() + self.check_log_alerts())
 
-    def _check_single_alert(self, alert_config: AlertConfig):
-        """Sprawdza pojedynczy alert"""
-        alert_type = alert_config.alert_type
-        
-        if alert_type == 'price_change':
-            self._check_price_change_alert(alert_config)
-        elif alert_type == 'dividend_change':
-            self._check_dividend_change_alert(alert_config)
-        elif alert_type == 'technical_indicator':
-            self._check_technical_indicator_alert(alert_config)
-        elif alert_type == 'scheduler_status':
-            self._check_scheduler_status_alert(alert_config)
-        elif alert_type == 'log_errors':
-            self._check_log_errors_alert(alert_config)
-        else:
-            logger.warning(f"Nieznany typ alertu: {alert_type}")
-
-    def _check_price_change_alert(self, alert_config: AlertConfig):
-        """Sprawdza alerty zmian cen"""
-        try:
-            conditions = alert_config.conditions
-            threshold = conditions.get('threshold', 5.0)  # 5% domyślnie
-            timeframe = conditions.get('timeframe', '1d')  # 1 dzień domyślnie
-            
-            # TODO: Implementacja sprawdzania zmiany procentowej
-            # Na razie symulujemy sprawdzenie
-            current_time = datetime.now(timezone.utc)
-            current_hour = current_time.hour
-            
-            # Sprawdzanie czy jest odpowiednia pora na powiadomienia
-            if 9 <= current_hour <= 21:  # 9:00-21:00 CET
-                # Wysyłanie natychmiast
-                message = f"Alert cenowy: Zmiana {threshold}% w {timeframe}"
-                self._create_price_alert(alert_config, None, message, 'warning')
-            else:
-                # Oczekiwanie do rana
-                message = f"Alert cenowy (oczekuje): Zmiana {threshold}% w {timeframe}"
-                self._create_technical_alert(alert_config, None, message, 'warning')
-                
-        except Exception as e:
-            logger.error(f"Błąd sprawdzania alertu cenowego: {str(e)}")
+    def check_technical_alerts(self) -> int:
+        """
+        Sprawdza alerty wskaźników technicznych (raz dziennie po zamknięciu sesji).
 
-    def _check_dividend_change_alert(self, alert_config: AlertConfig):
-        """Sprawdza alerty zmian dywidend"""
-        try:
-            conditions = alert_config.conditions
-            threshold = conditions.get('threshold', 10.0)  # 10% domyślnie
-            
-            # TODO: Implementacja sprawdzania zmian dywidend
-            message = f"Alert dywidendowy: Zmiana {threshold}%"
-            self._create_technical_alert(alert_config, None, message, 'info')
-            
-        except Exception as e:
-            logger.error(f"Błąd sprawdzania alertu dywidendowego: {str(e)}")
+        Reguły grupowane są po (wskaźnik, timeframe, parametry) - każdy szereg wskaźnika liczony
+        jest raz dla wszystkich ETF grupy na macierzy cen, a warunki oceniane naraz na dwóch
+        ostatnich okresach. Alerty czekają na powiadomienie o 10:00 CET.
+        """
+        configs = AlertConfig.query.filter_by(enabled=True, type=TECHNICAL_ALERT).all()
+        etfs = {etf.ticker: etf for etf in self.db_service.get_all_etfs()}
 
-    def _check_technical_indicator_alert(self, alert_config: AlertConfig):
-        """Sprawdza alerty wskaźników technicznych"""
-        try:
-            conditions = alert_config.conditions
-            indicator = conditions.get('indicator', 'stochastic')
-            timeframe = conditions.get('timeframe', '1w')
-            
-            # TODO: Implementacja sprawdzania MACD, Stochastic, RSI
-            message = f"Alert wskaźnika {indicator}: Sygnał na {timeframe}"
-            self._create_technical_alert(alert_config, None, message, 'info')
-            
-        except Exception as e:
-            logger.error(f"Błąd sprawdzania alertu wskaźnika: {str(e)}")
+        groups = defaultdict(list)
+        for alert_config in configs:
+            spec = self._technical_spec(alert_config)
+            if spec is None or alert_config.etf_ticker not in etfs:
+                logger.warning(f"Pominięto nieprawidłową regułę alertu {alert_config.id}: {alert_config.name}")
+                continue
+            groups[spec].append(alert_config)
 
-    def _check_scheduler_status_alert(self, alert_config: AlertConfig):
-        """Sprawdza status schedulera"""
-        try:
-            # TODO: Implementacja sprawdzania ostatniego wykonania zadania
-            message = "Alert schedulera: Zadanie nie wykonało się w czasie"
-            self._create_immediate_alert(alert_config, None, message, 'error')
-            
-        except Exception as e:
-            logger.error(f"Błąd sprawdzania alertu schedulera: {str(e)}")
+        series = {}  # (ticker, timeframe) -> PriceSeries - każdy szereg cen czytany raz
+        triggered = []
+        for (indicator, timeframe, parameters), group in groups.items():
+            tickers = sorted({alert_config.etf_ticker for alert_config in group})
+            for ticker in tickers:
+                if (ticker, timeframe) not in series:
+                    series[(ticker, timeframe)] = self.db_service.get_price_series(etfs[ticker].id, timeframe)
+            closes = align_right([getattr(series[(ticker, timeframe)], INDICATOR_PRICE_COLUMN[timeframe])
+                                  for ticker in tickers])
+            if len(closes) < 2:
+                continue
 
-    def _check_log_errors_alert(self, alert_config: AlertConfig):
-        """Sprawdza błędy w logach"""
-        try:
-            # TODO: Implementacja sprawdzania logów pod kątem błędów
-            message = "Alert logów: Wykryto błędy w systemie"
-            self._create_immediate_alert(alert_config, None, message, 'error')
-            
-        except Exception as e:
-            logger.error(f"Błąd sprawdzania alertu logów: {str(e)}")
+            line, signal = indicator_lines(indicator, closes, parameters)
+            columns = np.array([tickers.index(alert_config.etf_ticker) for alert_config in group])
+            hits = evaluate_technical(
+                np.array([alert_config.alert_type for alert_config in group]),
+                np.array([_threshold(alert_config) for alert_config in group]),
+                line[-2:, columns], signal[-2:, columns]
+            )
 
-    def _create_technical_alert(self, alert_config: AlertConfig, ticker: Optional[str], message: str, severity: str):
-        """Tworzy alert techniczny (oczekuje na powiadomienie o 10:00 CET)"""
-        try:
-            # Sprawdzanie czy alert już istnieje
-            existing_alert = AlertHistory.query.filter_by(
-                alert_config_id=alert_config.id,
-                etf_ticker=ticker,
-                status='active'
-            ).first()
-            
-            if existing_alert:
-                # Aktualizacja istniejącego alertu
-                existing_alert.message = message
-                existing_alert.severity = severity
-                existing_alert.triggered_at = datetime.now(timezone.utc)
-            else:
-                # Tworzenie nowego alertu (bez wysyłania powiadomienia)
-                new_alert = AlertHistory(
-                    alert_config_id=alert_config.id,
-                    etf_ticker=ticker,
-                    message=message,
-                    severity=severity,
-                    priority=1,
-                    status='active'
+            names = self.config.TECHNICAL_INDICATORS[indicator]
+            labels = ('%K', '%D') if indicator == 'stochastic' else ('MACD', 'sygnał')
+            for alert_config, column, hit in zip(group, columns, hits):
+                if not hit:
+                    continue
+                s = series[(alert_config.etf_ticker, timeframe)]
+                message = (
+                    f"{alert_config.etf_ticker}: {names['name']} ({','.join(map(str, parameters))}) {timeframe} - "
+                    f"{names['alert_types'][alert_config.alert_type]['name']} "
+                    f"({labels[0]} {line[-1, column]:.2f}, {labels[1]} {signal[-1, column]:.2f}) "
+                    f"na {s.dates()[-1].astype(object).isoformat()}"
                 )
-                db.session.add(new_alert)
-                # NIE WYSYŁAMY powiadomienia - czeka na 10:00 CET
-            
-            db.session.commit()
-            logger.info(f"Alert utworzony (oczekuje na powiadomienie): {message}")
-            
-        except Exception as e:
-            logger.error(f"Błąd tworzenia alertu: {str(e)}")
-            db.session.rollback()
+                triggered.append((alert_config, alert_config.etf_ticker, message, 'info'))
+
+        return self._store_alerts(triggered, notify=False)
+
+    def check_price_alerts(self) -> int:
+        """Sprawdza alerty cenowe (bieżąca cena ETF poniżej/powyżej progu) - powiadomienie natychmiast"""
+        configs = [alert_config for alert_config in AlertConfig.query.filter_by(enabled=True, type=PRICE_ALERT).all()
+                   if alert_config.etf_ticker]
+        if not configs:
+            return 0
+        prices = dict(db.session.execute(
+            select(ETF.ticker, ETF.current_price).where(ETF.ticker.in_({c.etf_ticker for c in configs}))
+        ).all())
 
-    def _create_price_alert(self, alert_config: AlertConfig, ticker: Optional[str], message: str, severity: str):
-        """Tworzy alert cenowy i wysyła powiadomienie natychmiast"""
+        current = np.array([prices.get(c.etf_ticker) for c in configs], dtype=np.float64)
+        thresholds = np.array([_threshold(c) for c in configs])
+        below = np.array([(c.conditions or {}).get('condition', 'below') == 'below' for c in configs])
+        with np.errstate(invalid='ignore'):
+            hits = np.where(below, current < thresholds, current > thresholds)
+
+        today = date.today().isoformat()
+        triggered = [
+            (c, c.etf_ticker, f"{c.etf_ticker}: cena {'poniżej' if is_below else 'powyżej'} progu "
+                              f"{threshold:.2f} ({today})", 'warning')
+            for c, hit, is_below, threshold in zip(configs, hits, below, thresholds) if hit
+        ]
+        return self._store_alerts(triggered, notify=True)
+
+    def check_scheduler_alerts(self) -> int:
+        """Sprawdza nieudane zadania schedulera od ostatniego alertu reguły (opcjonalnie conditions.job_name)"""
+        return self._check_system_logs(
+            SCHEDULER_ALERT,
+            lambda query: query.where(SystemLog.job_name.isnot(None), SystemLog.success.is_(False)),
+            lambda log, conditions: conditions.get('job_name') in (None, '', log.job_name),
+            'Nieudane zadania schedulera'
+        )
+
+    def check_log_alerts(self) -> int:
+        """Sprawdza błędy w logach systemowych od ostatniego alertu reguły"""
+        return self._check_system_logs(
+            LOG_ALERT,
+            lambda query: query.where(SystemLog.level == 'ERROR'),
+            lambda log, conditions: True,
+            'Błędy w logach systemowych'
+        )
+
+    def _check_system_logs(self, alert_type: str, restrict, matches, title: str) -> int:
+        """Alert reguły z wpisami SystemLog nowszymi niż jej ostatni alert (jedno zapytanie na typ)"""
+        configs = AlertConfig.query.filter_by(enabled=True, type=alert_type).all()
+        if not configs:
+            return 0
+        last_alerts = dict(db.session.execute(
+            select(AlertHistory.alert_config_id, func.max(AlertHistory.triggered_at))
+            .where(AlertHistory.alert_config_id.in_([c.id for c in configs]))
+            .group_by(AlertHistory.alert_config_id)
+        ).all())
+        default_since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(hours=LOG_LOOKBACK_HOURS)
+        since = {c.id: _naive(last_alerts.get(c.id)) or default_since for c in configs}
+
+        logs = db.session.execute(
+            restrict(select(SystemLog).where(SystemLog.timestamp > min(since.values())))
+            .order_by(SystemLog.timestamp)
+        ).scalars().all()
+
+        triggered = []
+        for alert_config in configs:
+            conditions = alert_config.conditions or {}
+            matching = [log for log in logs if _naive(log.timestamp) > since[alert_config.id]
+                        and matches(log, conditions)]
+            if matching:
+                latest = matching[-1]
+                details = latest.error_message or latest.details or latest.action
+                triggered.append((alert_config, None,
+                                  f"{title}: {len(matching)} (ostatni: {latest.job_name or latest.action} "
+                                  f"{_naive(latest.timestamp):%Y-%m-%d %H:%M} UTC - {details})", 'error'))
+        return self._store_alerts(triggered, notify=True)
+
+    def _technical_spec(self, alert_config: AlertConfig) -> Optional[Tuple[str, str, Tuple[int, ...]]]:
+        """(wskaźnik, timeframe, parametry) reguły; parametry domyślne z pierwszego presetu wskaźnika"""
+        settings = self.config.TECHNICAL_INDICATORS.get(alert_config.indicator)
+        if settings is None or alert_config.alert_type not in settings['alert_types']:
+            return None
+        conditions = alert_config.conditions or {}
+        timeframe = str(conditions.get('timeframe', '1W')).upper()
+        if timeframe not in TIMEFRAMES:
+            return None
+        defaults = {name: value for name, value in settings['preset_parameters'][0].items() if name != 'name'}
+        parameters = {**defaults, **(conditions.get('parameters') or {})}
         try:
-            # Sprawdzanie czy alert już istnieje
-            existing_alert = AlertHistory.query.filter_by(
-                alert_config_id=alert_config.id,
-                etf_ticker=ticker,
-                status='active'
-            ).first()
-            
-            if existing_alert:
-                # Aktualizacja istniejącego alertu
-                existing_alert.message = message
-                existing_alert.severity = severity
-                existing_alert.triggered_at = datetime.now(timezone.utc)
-                existing_alert.status = 'notified'
-                existing_alert.notified_at = datetime.now(timezone.utc)
-            else:
-                # Tworzenie nowego alertu
-                new_alert = AlertHistory(
-                    alert_config_id=alert_config.id,
-                    etf_ticker=ticker,
-                    message=message,
-                    severity=severity,
-                    priority=1,
-                    status='notified'
-                )
-                db.session.add(new_alert)
-                db.session.flush()  # Aby uzyskać ID
-                
-                # Wysyłanie powiadomienia natychmiast
-                self.send_slack_notification(new_alert.id, message, severity)
-                
-                # Oznaczenie jako wysłane
-                new_alert.notified_at = datetime.now(timezone.utc)
-            
-            db.session.commit()
-            logger.info(f"Alert cenowy utworzony i powiadomienie wysłane: {message}")
-            
-        except Exception as e:
-            logger.error(f"Błąd tworzenia alertu cenowego: {str(e)}")
-            db.session.rollback()
+            return alert_config.indicator, timeframe, tuple(int(parameters[name]) for name in defaults)
+        except (TypeError, ValueError):
+            return None
+
+    def _store_alerts(self, triggered: List[Tuple], notify: bool) -> int:
+        """
+        Zapisuje wyzwolone alerty w jednej transakcji: ten sam komunikat dla reguły i ETF nie jest
+        powtarzany, aktywny alert reguły jest aktualizowany, pozostałe tworzone. Przy notify
+        alerty trafiają w tej samej transakcji do kolejki powiadomień (wysyłka przez worker).
+        Zwraca liczbę nowych/zaktualizowanych alertów.
+        """
+        if not triggered:
+            return 0
+        existing = AlertHistory.query.filter(
+            AlertHistory.alert_config_id.in_({alert_config.id for alert_config, _, _, _ in triggered})
+        ).all()
+        messages = {(alert.alert_config_id, alert.etf_ticker, alert.message) for alert in existing}
+        active = {(alert.alert_config_id, alert.etf_ticker): alert for alert in existing if alert.status == 'active'}
 
-    def _create_immediate_alert(self, alert_config: AlertConfig, ticker: Optional[str], message: str, severity: str):
-        """Tworzy alert i wysyła powiadomienie natychmiast (dla logów i schedulera)"""
+        now = datetime.now(timezone.utc)
+        saved = []
         try:
-            # Sprawdzanie czy alert już istnieje
-            existing_alert = AlertHistory.query.filter_by(
-                alert_config_id=alert_config.id,
-                etf_ticker=ticker,
-                status='active'
-            ).first()
-            
-            if existing_alert:
-                # Aktualizacja istniejącego alertu
-                existing_alert.message = message
-                existing_alert.severity = severity
-                existing_alert.triggered_at = datetime.now(timezone.utc)
-                existing_alert.status = 'notified'
-                existing_alert.notified_at = datetime.now(timezone.utc)
-            else:
-                # Tworzenie nowego alertu
-                new_alert = AlertHistory(
-                    alert_config_id=alert_config.id,
-                    etf_ticker=ticker,
-                    message=message,
-                    severity=severity,
-                    priority=1,
-                    status='notified'
-                )
-                db.session.add(new_alert)
-                db.session.flush()  # Aby uzyskać ID
-                
-                # Wysyłanie powiadomienia natychmiast
-                self.send_slack_notification(new_alert.id, message, severity)
-                
-                # Oznaczenie jako wysłane
-                new_alert.notified_at = datetime.now(timezone.utc)
-            
+            for alert_config, ticker, message, severity in triggered:
+                if (alert_config.id, ticker, message) in messages:
+                    continue
+                alert = active.get((alert_config.id, ticker))
+                if alert is None:
+                    alert = AlertHistory(alert_config_id=alert_config.id, etf_ticker=ticker, priority=1,
+                                         status='active')
+                    db.session.add(alert)
+                alert.message = message
+                alert.severity = severity
+                alert.triggered_at = now
+                if notify:
+                    alert.status = 'notified'
+                saved.append(alert)
+            if notify:
+                enqueue_notifications(saved)
             db.session.commit()
-            logger.info(f"Alert natychmiastowy utworzony i powiadomienie wysłane: {message}")
-            
         except Exception as e:
-            logger.error(f"Błąd tworzenia alertu natychmiastowego: {str(e)}")
+            logger.error(f"Błąd zapisu alertów: {str(e)}")
             db.session.rollback()
+            raise
+
+        if saved:
+            logger.info(f"Zapisano {len(saved)} alertów ({'w kolejce powiadomień' if notify else 'oczekują na powiadomienie'})")
+        return len(saved)
+
+    def send_pending_technical_notifications(self):
+        """Wysyła oczekujące powiadomienia alertów technicznych (zadanie o 10:00 CET)"""
+        self.send_technical_notifications()
 
-    def send_technical_notifications(self):
-        """Wysyła wszystkie oczekujące powiadomienia techniczne o 10:00 CET"""
+    def send_technical_notifications(self) -> int:
+        """Przekazuje wszystkie oczekujące alerty techniczne do kolejki powiadomień (10:00 CET)"""
         try:
-            # Pobieranie wszystkich aktywnych alertów oczekujących na powiadomienie
-            pending_alerts = AlertHistory.query.filter_by(
-                status='active'
-            ).all()
-            
+            pending_alerts = AlertHistory.query.filter_by(status='active').all()
             for alert in pending_alerts:
-                try:
-                    # Wysyłanie powiadomienia
-                    self.send_slack_notification(alert.id, alert.message, alert.severity)
-                    
-                    # Aktualizacja statusu
-                    alert.status = 'notified'
-                    alert.notified_at = datetime.now(timezone.utc)
-                    
-                except Exception as e:
-                    logger.error(f"Błąd wysyłania powiadomienia dla alertu {alert.id}: {str(e)}")
-            
+                alert.status = 'notified'
+            enqueue_notifications(pending_alerts)
             db.session.commit()
-            logger.info(f"Wysłano {len(pending_alerts)} powiadomień technicznych")
+            logger.info(f"Dodano {len(pending_alerts)} powiadomień technicznych do kolejki")
+            return len(pending_alerts)
             
         except Exception as e:
-            logger.error(f"Błąd wysyłania powiadomień technicznych: {str(e)}")
+            logger.error(f"Błąd kolejkowania powiadomień technicznych: {str(e)}")
             db.session.rollback()
+            return 0
 
     def resolve_alert(self, alert_id: int):
         """Oznacza alert jako rozwiązany"""
@@ -466,3 +410,40 @@ class NotificationService:
         except Exception as e:
             logger.error(f"Błąd czyszczenia starych alertów: {str(e)}")
             db.session.rollback()
+
+
+def indicator_lines(indicator: str, closes: np.ndarray, parameters: Tuple[int, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """Linia wskaźnika i linia sygnału (okresy x szeregi): %K/%D stochastic lub MACD/sygnał"""
+    if indicator == 'stochastic':
+        k, d, smooth = parameters
+        values = stochastic(closes, lookback=k, smoothing=smooth, sma=d)
+        return values['k_percent'], values['d_percent']
+    values = macd(closes, *parameters)
+    return values['macd_line'], values['signal_line']
+
+
+def evaluate_technical(alert_types: np.ndarray, thresholds: np.ndarray, line: np.ndarray,
+                       signal: np.ndarray) -> np.ndarray:
+    """
+    Warunki alertów dla wielu reguł naraz. line/signal to dwa ostatnie okresy (2 x reguły);
+    poziomy i przecięcia liczą się tylko, gdy zaszły w ostatnim okresie (NaN - brak alertu).
+    """
+    hits = np.zeros(len(alert_types), dtype=bool)
+    for alert_type in set(alert_types.tolist()) & set(SIGNAL_TYPES):
+        rules = alert_types == alert_type
+        hits[rules] = signal_events(alert_type, line[:, rules], signal[:, rules], thresholds[rules])[-1]
+    return hits
+
+
+def _threshold(alert_config: AlertConfig) -> float:
+    try:
+        return float((alert_config.conditions or {}).get('threshold'))
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Czas UTC bez strefy (SQLite zwraca daty bez strefy, PostgreSQL ze strefą)"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
@@ -0,0 +1,276 @@
+"""
+Wyrównane panele cen całego uniwersum ETF (okresy x tickery) do analiz przekrojowych
+
+Dla każdego timeframe budowana jest jedna macierz znormalizowanych cen zamknięcia:
+- wiersze to okresy (miesiąc, tydzień od poniedziałku lub dzień) - szeregi różnych ETF
+  łączone są po okresie, a nie po dacie, bo ostatni dzień notowań tygodnia/miesiąca
+  może się różnić między ETF,
+- luki uzupełniane są ostatnią znaną ceną; przed pierwszą ceną ETF zostaje NaN,
+- first/last to indeksy pierwszego i ostatniego okresu z ceną dla każdej kolumny.
+
+Panel budowany jest z szeregów cen (magazyn plików/cache procesu) i zapisywany atomowo
+jako plik npz. Panel jest aktualny, gdy jego wersja (skrót wersji danych wszystkich ETF
+i dzień budowy) zgadza się z bieżącą - po zadaniu schedulera zmienione panele są
+przebudowywane, a workery wczytują nowy plik przy następnym odczycie.
+"""
+
+import logging
+import os
+import threading
+from datetime import date
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from services.series_cache import TIMEFRAMES
+
+logger = logging.getLogger(__name__)
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+class PanelError(Exception):
+    """Brak tickera w panelu lub brak cen"""
+
+
+class Panel:
+    """Panel cen jednego timeframe (tablice tylko do odczytu)"""
+
+    __slots__ = ('timeframe', 'version', 'etf_ids', 'tickers', 'periods', 'days', 'close', 'first', 'last',
+                 '_columns')
+
+    def __init__(self, timeframe: str, version: str, etf_ids: np.ndarray, tickers: List[str],
+                 periods: np.ndarray, days: np.ndarray, close: np.ndarray, first: np.ndarray, last: np.ndarray):
+        self.timeframe = timeframe
+        self.version = version
+        self.etf_ids = etf_ids      # int64 (tickery)
+        self.tickers = tickers
+        self.periods = periods      # int64 - numer miesiąca/tygodnia/dnia od 1970-01-01
+        self.days = days            # int32 - ostatni dzień notowań okresu (dowolnego ETF)
+        self.close = close          # float64 (okresy x tickery), uzupełnione wprzód
+        self.first = first          # int64 (tickery) - pierwszy okres z ceną, -1 gdy brak cen
+        self.last = last            # int64 (tickery) - ostatni okres z ceną, -1 gdy brak cen
+        self._columns = {ticker: column for column, ticker in enumerate(tickers)}
+        for array in (etf_ids, periods, days, close, first, last):
+            array.setflags(write=False)
+
+    def __len__(self):
+        return len(self.periods)
+
+    def dates(self) -> np.ndarray:
+        return _EPOCH + self.days.astype('timedelta64[D]')
+
+    def date_strings(self, fmt: str = '%Y-%m-%d') -> List[str]:
+        if fmt == '%Y-%m':
+            return np.datetime_as_string(self.dates(), unit='M').tolist()
+        return np.datetime_as_string(self.dates(), unit='D').tolist()
+
+    def columns(self, tickers: Sequence[str]) -> np.ndarray:
+        """Indeksy kolumn tickerów; PanelError gdy któregoś brak w panelu"""
+        missing = [ticker for ticker in tickers if ticker not in self._columns]
+        if missing:
+            raise PanelError(f'ETF {", ".join(missing)} nie został znaleziony')
+        return np.array([self._columns[ticker] for ticker in tickers], dtype=np.int64)
+
+    def common_range(self, columns: np.ndarray) -> slice:
+        """Okresy, w których wszystkie kolumny mają cenę (od najmłodszego ETF do najświeższej ceny)"""
+        if len(columns) == 0:
+            return slice(0, 0)
+        empty = [self.tickers[column] for column in columns if self.first[column] < 0]
+        if empty:
+            raise PanelError(f'Brak cen dla {", ".join(empty)}')
+        return slice(int(self.first[columns].max()), int(self.last[columns].max()) + 1)
+
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (self.etf_ids, self.periods, self.days, self.close,
+                                              self.first, self.last))
+
+
+class PanelService:
+    """Panele cen uniwersum ETF - budowa, zapis npz i odczyt z cache procesu"""
+
+    def __init__(self, db_service, data_versions=None, directory: Optional[str] = None):
+        self.db_service = db_service
+        self.data_versions = data_versions
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._panels = {}  # timeframe -> (sygnatura pliku, Panel)
+        self._stats = {'hits': 0, 'loads': 0, 'builds': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def init_app(self, app):
+        app.extensions['etf_panels'] = self
+
+    def current_version(self) -> str:
+        """Wersja uniwersum: wersje danych wszystkich ETF i dzień (szeregi 1M/1W zależą od dnia)"""
+        universe = self.data_versions.universe_version() if self.data_versions is not None else ''
+        return f"{universe}|{date.today().isoformat()}"
+
+    def get(self, timeframe: str) -> Panel:
+        """Zwraca aktualny panel timeframe (cache procesu, plik npz lub przebudowa)"""
+        if timeframe not in TIMEFRAMES:
+            raise ValueError(f"Nieznany timeframe: {timeframe}")
+        version = self.current_version()
+        signature = self._signature(timeframe)
+
+        with self._lock:
+            cached = self._panels.get(timeframe)
+        if cached is not None and cached[1].version == version and (signature is None or cached[0] == signature):
+            self._count('hits')
+            return cached[1]
+
+        if signature is not None:
+            panel = self._read(timeframe)
+            if panel is not None and panel.version == version:
+                with self._lock:
+                    self._panels[timeframe] = (signature, panel)
+                self._count('loads')
+                return panel
+
+        with self._build_lock:
+            # Inny wątek mógł już przebudować panel
+            with self._lock:
+                cached = self._panels.get(timeframe)
+            if cached is not None and cached[1].version == version:
+                return cached[1]
+            return self._publish(self.build(timeframe, version))
+
+    def refresh(self) -> int:
+        """Przebudowuje nieaktualne panele (po zadaniu schedulera). Zwraca liczbę przebudowanych"""
+        version = self.current_version()
+        rebuilt = 0
+        with self._build_lock:
+            for timeframe in TIMEFRAMES:
+                with self._lock:
+                    cached = self._panels.get(timeframe)
+                if cached is not None and cached[1].version == version:
+                    continue
+                if self._signature(timeframe) is not None:
+                    panel = self._read(timeframe)
+                    if panel is not None and panel.version == version:
+                        continue
+                self._publish(self.build(timeframe, version))
+                rebuilt += 1
+        if rebuilt:
+            logger.info(f"Rebuilt {rebuilt} price panels")
+        return rebuilt
+
+    def build(self, timeframe: str, version: str = '') -> Panel:
+        """Buduje panel z szeregów cen wszystkich ETF"""
+        etfs = self.db_service.get_all_etfs()
+        series = [self.db_service.get_price_series(etf.id, timeframe) for etf in etfs]
+        series_periods = [_periods(s.days, timeframe) for s in series]
+
+        periods = np.unique(np.concatenate(series_periods)) if series_periods else np.array([], dtype=np.int64)
+        close = np.full((len(periods), len(etfs)), np.nan)
+        days = np.full(len(periods), np.iinfo(np.int32).min, dtype=np.int32)
+        first = np.full(len(etfs), -1, dtype=np.int64)
+        last = np.full(len(etfs), -1, dtype=np.int64)
+
+        for column, (s, s_periods) in enumerate(zip(series, series_periods)):
+            if len(s_periods) == 0:
+                continue
+            rows = np.searchsorted(periods, s_periods)
+            close[rows, column] = s.normalized
+            np.maximum.at(days, rows, s.days)
+            first[column], last[column] = rows[0], rows[-1]
+
+        self._count('builds')
+        return Panel(
+            timeframe, version,
+            np.array([etf.id for etf in etfs], dtype=np.int64), [etf.ticker for etf in etfs],
+            periods.astype(np.int64), days, forward_fill(close), first, last
+        )
+
+    def _publish(self, panel: Panel) -> Panel:
+        signature = self._write(panel) if self.directory else None
+        with self._lock:
+            self._panels[panel.timeframe] = (signature, panel)
+        return panel
+
+    def _path(self, timeframe: str) -> str:
+        return os.path.join(self.directory, f"panel_{timeframe}.npz")
+
+    def _signature(self, timeframe: str):
+        if not self.directory:
+            return None
+        try:
+            stat = os.stat(self._path(timeframe))
+        except FileNotFoundError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _write(self, panel: Panel):
+        path = self._path(panel.timeframe)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(
+                f, version=np.array(panel.version), etf_ids=panel.etf_ids, tickers=np.array(panel.tickers, dtype=str),
+                periods=panel.periods, days=panel.days, close=panel.close, first=panel.first, last=panel.last
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return self._signature(panel.timeframe)
+
+    def _read(self, timeframe: str) -> Optional[Panel]:
+        try:
+            with np.load(self._path(timeframe), allow_pickle=False) as data:
+                return Panel(
+                    timeframe, str(data['version']), data['etf_ids'], data['tickers'].tolist(), data['periods'],
+                    data['days'], data['close'], data['first'], data['last']
+                )
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable panel file for {timeframe}: {str(e)}")
+            return None
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            panels = {timeframe: {'periods': len(panel), 'tickers': len(panel.tickers), 'bytes': panel.nbytes()}
+                      for timeframe, (_, panel) in self._panels.items()}
+        return {**stats, 'directory': self.directory, 'panels': panels}
+
+
+def _periods(days: np.ndarray, timeframe: str) -> np.ndarray:
+    """Numery okresów dla dni od 1970-01-01 (1970-01-01 to czwartek - tygodnie od poniedziałku)"""
+    days = np.asarray(days, dtype=np.int64)
+    if timeframe == '1M':
+        return (_EPOCH + days.astype('timedelta64[D]')).astype('datetime64[M]').astype(np.int64)
+    if timeframe == '1W':
+        return (days + 3) // 7
+    return days
+
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    """Uzupełnia NaN ostatnią znaną wartością w kolumnie (NaN przed pierwszą wartością zostają)"""
+    if values.size == 0:
+        return values
+    index = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(index, axis=0, out=index)
+    return values[index, np.arange(values.shape[1])[None, :]]
+
+
+def get_panel_service() -> Optional[PanelService]:
+    """Zwraca PanelService bieżącej aplikacji"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('etf_panels')
+
+
+def create_panel_service(app, config, db_service, data_versions) -> PanelService:
+    """Tworzy serwis paneli (pliki npz wyłączone dla bazy w pamięci)"""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    directory = None
+    if uri not in ('sqlite://', 'sqlite:///:memory:'):
+        directory = config.PANEL_STORE_DIR or os.path.join(app.instance_path, 'panels')
+    service = PanelService(db_service, data_versions, directory)
+    service.init_app(app)
+    return service
@@ -0,0 +1,154 @@
+"""
+Serializacja i kompresja odpowiedzi API
+
+- ORJSONProvider: szybki serializer JSON (orjson) z obsługą tablic i skalarów NumPy,
+  zgodny z domyślnym providerem Flask (sortowanie kluczy, daty w formacie HTTP)
+- ResponseCompression: kompresja gzip/brotli odpowiedzi tekstowych wg Accept-Encoding
+- format kolumnowy (?format=columnar): {dates: [...], close: [...]} zamiast listy słowników
+"""
+
+import gzip
+import logging
+from typing import Dict, List
+
+import numpy as np
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # fallback na standardowy json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli opcjonalne - tylko gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/css', 'text/plain', 'text/csv',
+                          'application/javascript', 'application/x-ndjson')
+
+# Kolumny wskaźników: klucz w odpowiedzi -> (klucz w wyniku obliczeń, liczba miejsc po przecinku)
+MACD_FIELDS = {
+    'macd_line': ('macd_line', 4),
+    'signal_line': ('signal_line', 4),
+    'histogram': ('histogram', 4),
+    'current_price': ('current_price', 2)
+}
+STOCHASTIC_FIELDS = {
+    'k_percent': ('k_percent_smoothed', 2),
+    'd_percent': ('d_percent', 2),
+    'current_price': ('current_price', 2),
+    'highest_high': ('highest_high', 2),
+    'lowest_low': ('lowest_low', 2)
+}
+
+
+def _numpy_default(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    return DefaultJSONProvider.default(o)
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Domyślny provider Flask rozszerzony o typy NumPy (gdy orjson niedostępny)"""
+
+    default = staticmethod(_numpy_default)
+
+
+class ORJSONProvider(NumpyJSONProvider):
+    """Provider JSON oparty o orjson (bytes bez pośredniego str, natywne NumPy)"""
+
+    OPTIONS = 0
+    if orjson is not None:
+        OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS |
+                   orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_SORT_KEYS)
+
+    def _dumps_bytes(self, obj, indent: bool = False) -> bytes:
+        options = self.OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, default=_numpy_default, option=options)
+        except (orjson.JSONEncodeError, TypeError) as e:
+            # np. liczby całkowite > 64 bit - standardowy json
+            logger.debug("orjson fallback to json: %s", e)
+            return super().dumps(obj).encode('utf-8')
+
+    def dumps(self, obj, **kwargs) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self._dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self._dumps_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
+
+
+class ResponseCompression:
+    """Kompresja odpowiedzi (brotli gdy dostępne i akceptowane, w przeciwnym razie gzip)"""
+
+    def __init__(self, config):
+        self.min_bytes = config.COMPRESSION_MIN_BYTES
+        self.gzip_level = config.COMPRESSION_GZIP_LEVEL
+        self.brotli_quality = config.COMPRESSION_BROTLI_QUALITY
+
+    def init_app(self, app):
+        app.after_request(self.compress)
+
+    def compress(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 304)
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        accept = request.accept_encodings
+        if brotli is not None and accept['br']:
+            encoding = 'br'
+        elif accept['gzip']:
+            encoding = 'gzip'
+        else:
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+
+        if encoding == 'br':
+            body = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            body = gzip.compress(data, compresslevel=self.gzip_level)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
+
+
+def init_responses(app, config):
+    """Podpina serializer JSON i kompresję odpowiedzi"""
+    app.json = ORJSONProvider(app) if orjson is not None else NumpyJSONProvider(app)
+    if config.COMPRESSION_ENABLED:
+        ResponseCompression(config).init_app(app)
+    logger.info(f"JSON serializer: {'orjson' if orjson is not None else 'json'}, "
+                f"compression: {'br+gzip' if brotli is not None else 'gzip'}"
+                f"{'' if config.COMPRESSION_ENABLED else ' (disabled)'}")
+
+
+def wants_columnar() -> bool:
+    """Czy klient zażądał formatu kolumnowego (?format=columnar)"""
+    return request.args.get('format') == 'columnar'
+
+
+def columns_to_records(columns: Dict[str, List]) -> List[Dict]:
+    """Kolumny jako lista słowników (format domyślny, 'dates' -> 'date')"""
+    keys = ['date' if key == 'dates' else key for key in columns]
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
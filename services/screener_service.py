@@ -0,0 +1,231 @@
+"""
+Screener ETF na tabeli ostatnich wartości wskaźników (etf_indicator_snapshots)
+
+Po każdym zadaniu schedulera przeliczane są migawki ETF, których wersja danych zmieniła się
+od ostatnich obliczeń (lub które liczone były poprzedniego dnia - szeregi 1M/1W kończą się
+na ostatnim zakończonym okresie). Wskaźniki wszystkich nieaktualnych ETF liczone są naraz
+na macierzy cen (services.indicators) z tymi samymi parametrami i kolumną ceny co wykresy.
+
+Zapytanie screenera to jeden SELECT po indeksowanej tabeli migawek, niezależnie od liczby ETF.
+Warunki podawane są w adresie wprost: /api/screener?stoch_k<20&timeframe=1W&macd=bullish_cross
+"""
+
+import logging
+import operator
+import re
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote_plus
+
+import numpy as np
+from sqlalchemy import delete, select
+
+from models import db, ETF, ETFDataVersion, ETFIndicatorSnapshot
+from services.chart_data_service import INDICATOR_PRICE_COLUMN, INDICATOR_SECTIONS
+from services.indicators import align_right, last_cross, macd, stochastic
+from services.series_cache import TIMEFRAMES
+from services.storage_service import upsert_rows
+
+logger = logging.getLogger(__name__)
+
+MACD_PARAMS = INDICATOR_SECTIONS['weekly-macd'][2]
+STOCHASTIC_PARAMS = INDICATOR_SECTIONS['weekly-stochastic'][2]
+STOCHASTIC_SHORT_PARAMS = INDICATOR_SECTIONS['weekly-stochastic-short'][2]
+
+NUMERIC_FIELDS = ('close_price', 'macd_line', 'signal_line', 'histogram', 'stoch_k', 'stoch_d', 'stoch_short_k',
+                  'stoch_short_d', 'high_52w', 'distance_from_high', 'dividend_yield', 'dsg_streak')
+MACD_STATES = {'bullish_cross': 'macd_cross', 'bearish_cross': 'macd_cross', 'bullish': 'macd_trend',
+               'bearish': 'macd_trend'}
+OPTION_KEYS = ('timeframe', 'sort', 'order', 'limit')
+OPERATORS = {'<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge, '=': operator.eq,
+             '!=': operator.ne}
+DEFAULT_LIMIT = 500
+
+_CONDITION = re.compile(r'^\s*([A-Za-z_][A-Za-z0-9_]*)\s*(<=|>=|!=|<|>|=)\s*(.*?)\s*$')
+
+Condition = Tuple[str, str, object]
+
+
+class ScreenerError(Exception):
+    """Błąd parametrów screenera zwracany klientowi jako {'success': False, 'error': ...}"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class ScreenerService:
+    """Migawki wskaźników ETF i zapytania screenera"""
+
+    def __init__(self, db_service, api_service):
+        self.db_service = db_service
+        self.api_service = api_service
+
+    def ensure(self) -> int:
+        """Wypełnia pustą tabelę migawek (baza sprzed screenera)"""
+        if db.session.execute(select(ETFIndicatorSnapshot.etf_id).limit(1)).first() is not None:
+            return 0
+        return self.refresh()
+
+    def refresh(self, force: bool = False) -> int:
+        """
+        Przelicza migawki ETF o zmienionej wersji danych lub z poprzedniego dnia i usuwa migawki
+        usuniętych ETF. Zwraca liczbę zapisanych wierszy.
+        """
+        etfs = self.db_service.get_all_etfs()
+        versions = dict(db.session.execute(select(ETFDataVersion.ticker, ETFDataVersion.version)).all())
+        built = {(row.etf_id, row.timeframe): (row.data_version, row.built_on) for row in db.session.execute(
+            select(ETFIndicatorSnapshot.etf_id, ETFIndicatorSnapshot.timeframe,
+                   ETFIndicatorSnapshot.data_version, ETFIndicatorSnapshot.built_on)
+        )}
+        today = date.today()
+
+        etf_ids = {etf.id for etf in etfs}
+        removed = {etf_id for etf_id, _ in built if etf_id not in etf_ids}
+        if removed:
+            db.session.execute(delete(ETFIndicatorSnapshot).where(ETFIndicatorSnapshot.etf_id.in_(removed)))
+
+        stale = [etf for etf in etfs if force or any(
+            built.get((etf.id, timeframe)) != (versions.get(etf.ticker, 0), today) for timeframe in TIMEFRAMES
+        )]
+        rows = []
+        if stale:
+            summaries = self.db_service.get_dividend_summaries()
+            streaks = {
+                etf.id: self.api_service.calculate_dividend_streak_growth(
+                    etf.ticker, yearly_averages=summaries.get(etf.id, {}).get('yearly_averages', {})
+                ).get('current_streak', 0)
+                for etf in stale
+            }
+            for timeframe in TIMEFRAMES:
+                rows.extend(self._snapshot_rows(stale, timeframe, versions, streaks, today))
+            upsert_rows(db.session, ETFIndicatorSnapshot, rows, ['etf_id', 'timeframe'],
+                        [column for column in rows[0] if column not in ('etf_id', 'timeframe')])
+
+        if rows or removed:
+            db.session.commit()
+            logger.info(f"Indicator snapshots refreshed: {len(stale)} ETFs, {len(rows)} rows, {len(removed)} removed")
+        return len(rows)
+
+    def _snapshot_rows(self, etfs, timeframe: str, versions: Dict[str, int], streaks: Dict[int, int],
+                       today: date) -> List[Dict]:
+        """Ostatnie wartości wskaźników ETF w timeframe - obliczenia na macierzy wszystkich szeregów"""
+        series = [self.db_service.get_price_series(etf.id, timeframe) for etf in etfs]
+        column = INDICATOR_PRICE_COLUMN[timeframe]
+        closes = align_right([getattr(s, column) for s in series])
+
+        macd_values = macd(closes, *MACD_PARAMS)
+        long_values = stochastic(closes, *STOCHASTIC_PARAMS)
+        short_values = stochastic(closes, *STOCHASTIC_SHORT_PARAMS)
+        crosses = last_cross(macd_values['macd_line'], macd_values['signal_line'])
+        latest = {name: values[-1] if len(values) else np.full(len(etfs), np.nan) for name, values in (
+            ('macd_line', macd_values['macd_line']), ('signal_line', macd_values['signal_line']),
+            ('histogram', macd_values['histogram']),
+            ('stoch_k', long_values['k_percent']), ('stoch_d', long_values['d_percent']),
+            ('stoch_short_k', short_values['k_percent']), ('stoch_short_d', short_values['d_percent'])
+        )}
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for index, (etf, s) in enumerate(zip(etfs, series)):
+            row = {
+                'etf_id': etf.id, 'timeframe': timeframe, 'ticker': etf.ticker,
+                'as_of': None, 'close_price': None, 'high_52w': None, 'distance_from_high': None,
+                'dividend_yield': etf.current_yield, 'dsg_streak': streaks.get(etf.id, 0),
+                'data_version': versions.get(etf.ticker, 0), 'built_on': today, 'updated_at': now
+            }
+            for name, values in latest.items():
+                row[name] = _rounded(values[index], 4 if name in ('macd_line', 'signal_line', 'histogram') else 2)
+            row['macd_trend'] = None if row['histogram'] is None else ('bullish' if row['histogram'] > 0 else 'bearish')
+            row['macd_cross'] = crosses[index]
+
+            if len(s):
+                row['as_of'] = s.dates()[-1].astype(object)
+                row['close_price'] = _rounded(s.close[-1], 2)
+                year = s.normalized[s.days >= s.days[-1] - 364]
+                if not np.all(np.isnan(year)):
+                    high = float(np.nanmax(year))
+                    row['high_52w'] = round(high, 2)
+                    row['distance_from_high'] = _rounded((s.normalized[-1] / high - 1) * 100, 2)
+            rows.append(row)
+        return rows
+
+    def screen(self, timeframe: str = '1W', conditions: Optional[List[Condition]] = None,
+               sort: str = 'ticker', order: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict:
+        """Migawki spełniające wszystkie warunki - jedno zapytanie"""
+        if timeframe not in TIMEFRAMES:
+            raise ScreenerError(f'Nieznany timeframe: {timeframe} (dostępne: {", ".join(TIMEFRAMES)})')
+        if sort not in NUMERIC_FIELDS + ('ticker',):
+            raise ScreenerError(f'Nieznane pole sortowania: {sort}')
+        order = order or ('asc' if sort == 'ticker' else 'desc')
+        if order not in ('asc', 'desc'):
+            raise ScreenerError('Parametr order musi mieć wartość asc lub desc')
+        if limit < 1:
+            raise ScreenerError('Parametr limit musi być dodatni')
+
+        query = (
+            select(ETFIndicatorSnapshot, ETF.name)
+            .join(ETF, ETF.id == ETFIndicatorSnapshot.etf_id)
+            .where(ETFIndicatorSnapshot.timeframe == timeframe)
+        )
+        for field, op, value in conditions or []:
+            column = getattr(ETFIndicatorSnapshot, MACD_STATES[value] if field == 'macd' else field)
+            query = query.where(OPERATORS[op](column, value))
+
+        sort_column = getattr(ETFIndicatorSnapshot, sort)
+        query = query.order_by(
+            sort_column.is_(None),  # brak wartości na końcu (SQLite i PostgreSQL)
+            sort_column.asc() if order == 'asc' else sort_column.desc(),
+            ETFIndicatorSnapshot.ticker
+        ).limit(limit)
+
+        results = []
+        for snapshot, name in db.session.execute(query).all():
+            results.append({**snapshot.to_dict(), 'name': name})
+        return {
+            'timeframe': timeframe,
+            'conditions': [f"{field}{op}{value}" for field, op, value in conditions or []],
+            'sort': sort,
+            'order': order,
+            'count': len(results),
+            'results': results
+        }
+
+
+def parse_screener_query(query_string: str) -> Tuple[Dict[str, str], List[Condition]]:
+    """
+    Rozbiera surowy query string na opcje (timeframe, sort, order, limit) i warunki
+    pole<operator>wartość, np. 'stoch_k<20&macd=bullish_cross&timeframe=1W'.
+    """
+    options, conditions = {}, []
+    for part in query_string.split('&'):
+        part = unquote_plus(part)
+        if not part.strip():
+            continue
+        match = _CONDITION.match(part)
+        if not match:
+            raise ScreenerError(f'Nieprawidłowy warunek: {part}')
+        field, op, value = match.groups()
+
+        if field in OPTION_KEYS:
+            if op != '=':
+                raise ScreenerError(f'Parametr {field} wymaga operatora =')
+            options[field] = value
+        elif field == 'macd':
+            if op != '=' or value not in MACD_STATES:
+                raise ScreenerError(f'Warunek macd przyjmuje wartości: {", ".join(MACD_STATES)}')
+            conditions.append((field, op, value))
+        elif field in NUMERIC_FIELDS:
+            try:
+                conditions.append((field, op, float(value)))
+            except ValueError:
+                raise ScreenerError(f'Warunek {field} wymaga liczby: {value}')
+        else:
+            raise ScreenerError(f'Nieznane pole: {field} (dostępne: {", ".join(NUMERIC_FIELDS + ("macd",))})')
+    return options, conditions
+
+
+def _rounded(value, decimals: int) -> Optional[float]:
+    value = float(value)
+    return None if np.isnan(value) else round(value, decimals)
@@ -0,0 +1,250 @@
+"""
+Procesowy cache szeregów czasowych cen ETF
+
+Każdy szereg (ETF + timeframe) przechowywany jest jako zwarte tablice NumPy:
+- days: int32, liczba dni od 1970-01-01
+- close / normalized: float64, cena oryginalna i znormalizowana po splitach
+- split_ratio: float64, współczynnik splitu
+
+Cache jest ograniczony rozmiarem w bajtach (LRU) i unieważniany po commicie,
+który zmienił ceny, splity lub usunął ETF.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import event
+from sqlalchemy.sql.expression import UpdateBase
+
+from config import Config
+from services.storage_service import StorageSession
+
+logger = logging.getLogger(__name__)
+
+TIMEFRAMES = ('1M', '1W', '1D')
+
+# Tabele, których zmiana unieważnia szeregi danego ETF
+SERIES_TABLES = ('etf_prices', 'etf_weekly_prices', 'etf_daily_prices', 'etf_splits', 'etfs')
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def nan_to_none(array: np.ndarray) -> List[Optional[float]]:
+    """Tablica float jako lista Pythona z None w miejscu NaN (poprawny JSON)"""
+    result = array.tolist()
+    if np.isnan(array).any():
+        result = [None if value != value else value for value in result]
+    return result
+
+
+class PriceSeries:
+    """Szereg cen jednego ETF w jednym timeframe (tablice kolumnowe, tylko do odczytu)"""
+
+    __slots__ = ('etf_id', 'timeframe', 'days', 'close', 'normalized', 'split_ratio', 'extra', '_date_strings',
+                 'build_day', 'data_version')
+
+    def __init__(self, etf_id: int, timeframe: str, days: np.ndarray, close: np.ndarray,
+                 normalized: np.ndarray, split_ratio: np.ndarray, extra: Optional[Dict[str, np.ndarray]] = None):
+        self.etf_id = etf_id
+        self.timeframe = timeframe
+        self.days = days
+        self.close = close
+        self.normalized = normalized
+        self.split_ratio = split_ratio
+        self.extra = extra or {}
+        self._date_strings = None
+        self.build_day = (date.today() - date(1970, 1, 1)).days
+        self.data_version = None
+        for array in self._arrays():
+            array.setflags(write=False)
+
+    @classmethod
+    def from_rows(cls, etf_id: int, timeframe: str, rows: List[Tuple], extra_columns: Tuple[str, ...] = ()):
+        """Buduje szereg z wierszy (date, close, normalized, split_ratio, *extra) posortowanych rosnąco"""
+        count = len(rows)
+        days = np.empty(count, dtype=np.int32)
+        close = np.empty(count, dtype=np.float64)
+        normalized = np.empty(count, dtype=np.float64)
+        split_ratio = np.empty(count, dtype=np.float64)
+        extra = {name: np.empty(count, dtype=np.float64) for name in extra_columns}
+
+        for i, row in enumerate(rows):
+            days[i] = (row[0] - date(1970, 1, 1)).days
+            close[i] = row[1] if row[1] is not None else np.nan
+            normalized[i] = row[2] if row[2] is not None else np.nan
+            split_ratio[i] = row[3] if row[3] is not None else 1.0
+            for offset, name in enumerate(extra_columns):
+                value = row[4 + offset]
+                extra[name][i] = value if value is not None else np.nan
+
+        return cls(etf_id, timeframe, days, close, normalized, split_ratio, extra)
+
+    def _arrays(self):
+        return [self.days, self.close, self.normalized, self.split_ratio, *self.extra.values()]
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays())
+
+    def dates(self) -> np.ndarray:
+        """Daty jako datetime64[D]"""
+        return _EPOCH + self.days.astype('timedelta64[D]')
+
+    def date_strings(self, fmt: str = '%Y-%m-%d') -> List[str]:
+        """Daty jako stringi ('%Y-%m-%d' lub '%Y-%m')"""
+        if self._date_strings is None:
+            self._date_strings = np.datetime_as_string(self.dates(), unit='D').tolist()
+        if fmt == '%Y-%m':
+            return [value[:7] for value in self._date_strings]
+        return self._date_strings
+
+    def values(self, column: str, decimals: Optional[int] = None) -> List[Optional[float]]:
+        """Kolumna jako lista Pythona (NaN -> None), opcjonalnie zaokrąglona"""
+        array = getattr(self, column) if column in ('close', 'normalized', 'split_ratio') else self.extra[column]
+        if decimals is not None:
+            array = np.round(array, decimals)
+        return nan_to_none(array)
+
+    def to_price_data(self, column: str = 'normalized') -> List[Dict]:
+        """Lista {'date', 'close'} w formacie oczekiwanym przez obliczenia wskaźników"""
+        return [{'date': d, 'close': c} for d, c in zip(self.date_strings(), self.values(column))]
+
+
+class SeriesCache:
+    """Cache LRU szeregów ograniczony rozmiarem w bajtach (bezpieczny wątkowo)"""
+
+    def __init__(self, max_bytes: int, ttl_seconds: int):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # klucz -> (series, loaded_at)
+        self._bytes = 0
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0, 'stale_loads': 0}
+        # Licznik unieważnień: wszystkich ETF i per ETF (szereg wczytany przed unieważnieniem nie trafia do cache)
+        self._generation = 0
+        self._etf_generations: Dict[int, int] = {}
+
+    def _generation_of(self, etf_id: int) -> Tuple[int, int]:
+        return self._generation, self._etf_generations.get(etf_id, 0)
+
+    def get(self, etf_id: int, timeframe: str, loader: Callable[[], PriceSeries]) -> PriceSeries:
+        """Zwraca szereg z cache lub ładuje go przez loader()"""
+        key = (etf_id, timeframe, date.today())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[1] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+                return entry[0]
+            self._stats['misses'] += 1
+            generation = self._generation_of(etf_id)
+
+        series = loader()
+
+        with self._lock:
+            if self._generation_of(etf_id) != generation:
+                # invalidate() w trakcie ładowania - szereg może sprzed commitu, zwracany bez zapisu
+                self._stats['stale_loads'] += 1
+                return series
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[0].nbytes
+            if series.nbytes <= self.max_bytes:
+                self._entries[key] = (series, now)
+                self._bytes += series.nbytes
+                self._evict()
+        return series
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._entries:
+            _, (series, _) = self._entries.popitem(last=False)
+            self._bytes -= series.nbytes
+            self._stats['evictions'] += 1
+
+    def invalidate(self, etf_id: Optional[int] = None):
+        """Usuwa szeregi danego ETF (lub wszystkie gdy etf_id=None)"""
+        with self._lock:
+            if etf_id is None:
+                self._generation += 1
+            else:
+                self._etf_generations[etf_id] = self._etf_generations.get(etf_id, 0) + 1
+            keys = [key for key in self._entries if etf_id is None or key[0] == etf_id]
+            for key in keys:
+                series, _ = self._entries.pop(key)
+                self._bytes -= series.nbytes
+            self._stats['invalidations'] += 1
+        if keys:
+            logger.debug("Series cache invalidated for ETF %s: %s entries", etf_id if etf_id is not None else 'ALL', len(keys))
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self._stats,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl_seconds
+            }
+
+
+series_cache = SeriesCache(Config.SERIES_CACHE_MAX_BYTES, Config.SERIES_CACHE_TTL_SECONDS)
+
+
+def mark_series_dirty(session, etf_id: Optional[int] = None):
+    """Oznacza szeregi ETF do unieważnienia po commicie (None = wszystkie)"""
+    session.info.setdefault('series_dirty', set()).add(etf_id)
+
+
+@event.listens_for(StorageSession, 'after_flush')
+def _collect_dirty_series(session, flush_context):
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(instance, '__tablename__', None)
+        if table not in SERIES_TABLES:
+            continue
+        mark_series_dirty(session, instance.id if table == 'etfs' else getattr(instance, 'etf_id', None))
+
+
+@event.listens_for(StorageSession, 'do_orm_execute')
+def _collect_bulk_changes(orm_execute_state):
+    # Query.delete()/update() i upserty (insert na tabeli) omijają flush
+    statement = orm_execute_state.statement
+    if not isinstance(statement, UpdateBase):
+        return
+    table = getattr(statement, 'table', None)
+    if table is None or getattr(table, 'name', None) not in SERIES_TABLES:
+        return
+
+    parameters = orm_execute_state.parameters
+    rows = parameters if isinstance(parameters, (list, tuple)) else [parameters or {}]
+    etf_ids = {row.get('etf_id') for row in rows if isinstance(row, dict)}
+    if orm_execute_state.is_insert and etf_ids and None not in etf_ids:
+        for etf_id in etf_ids:
+            mark_series_dirty(orm_execute_state.session, etf_id)
+    else:
+        mark_series_dirty(orm_execute_state.session)
+
+
+@event.listens_for(StorageSession, 'after_commit')
+def _invalidate_after_commit(session):
+    dirty = session.info.pop('series_dirty', None)
+    if not dirty:
+        return
+    if None in dirty:
+        series_cache.invalidate()
+    else:
+        for etf_id in dirty:
+            series_cache.invalidate(etf_id)
+
+    from services.series_store import get_series_store
+    store = get_series_store()
+    if store is not None:
+        store.invalidate(dirty)
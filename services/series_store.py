@@ -0,0 +1,260 @@
+"""
+Współdzielony między procesami magazyn szeregów cen (pliki mapowane w pamięci)
+
+Każdy szereg (ETF + timeframe) zapisywany jest jako jeden plik binarny o stałym układzie:
+- nagłówek (32 bajty): magic, wersja układu, liczba kolumn, dzień budowy, liczba punktów, wersja danych
+- tabela nazw kolumn (16 bajtów na kolumnę)
+- kolumna days (int32) wyrównana do 8 bajtów, następnie kolumny float64
+
+Pliki zapisywane są atomowo (plik tymczasowy + os.replace) przez proces ingestu,
+a workery webowe mapują je tylko do odczytu (np.memmap) - strony pamięci są
+współdzielone przez system, więc każdy worker nie trzyma własnej kopii historii.
+
+Licznik wersji magazynu rośnie przy każdym unieważnieniu. Szereg zbudowany z bazy
+zapisywany jest tylko wtedy, gdy licznik nie zmienił się od rozpoczęcia odczytu,
+dzięki czemu spóźniony odczyt nie nadpisze świeższych danych.
+"""
+
+import logging
+import os
+import struct
+import threading
+from contextlib import contextmanager
+from datetime import date
+from typing import Callable, Dict, Iterable, Optional, Set
+
+import numpy as np
+from flask import current_app, has_app_context
+
+from services.series_cache import PriceSeries
+
+try:
+    import fcntl
+except ImportError:  # Windows - brak blokad między procesami
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'ETFS'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<4sHHiQQ')  # magic, layout, ncols, build_day, count, data_version
+HEADER_SIZE = 32
+COLUMN_NAME_SIZE = 16
+BASE_COLUMNS = ('close', 'normalized', 'split_ratio')
+
+
+class SeriesStore:
+    """Magazyn plików szeregów cen mapowanych tylko do odczytu"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._version_path = os.path.join(directory, 'VERSION')
+        self._lock_path = os.path.join(directory, '.lock')
+        self._lock = threading.Lock()
+        self._mapped = {}  # (etf_id, timeframe) -> (sygnatura pliku, PriceSeries)
+        self._pending = set()  # ETF do ponownej publikacji po zadaniu pisarza
+        self._stats = {'hits': 0, 'remaps': 0, 'misses': 0, 'writes': 0, 'skipped_writes': 0, 'invalidations': 0}
+        os.makedirs(directory, exist_ok=True)
+
+    def init_app(self, app):
+        app.extensions['etf_series_store'] = self
+
+    def _path(self, etf_id: int, timeframe: str) -> str:
+        return os.path.join(self.directory, f"{etf_id}_{timeframe}.bin")
+
+    @contextmanager
+    def _file_lock(self):
+        """Blokada między procesami (zapis pliku i zmiana licznika wersji)"""
+        with open(self._lock_path, 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def version(self) -> int:
+        """Bieżąca wartość licznika wersji magazynu"""
+        try:
+            with open(self._version_path, 'rb') as f:
+                return struct.unpack('<Q', f.read(8))[0]
+        except (FileNotFoundError, struct.error):
+            return 0
+
+    def _bump_version(self) -> int:
+        version = self.version() + 1
+        self._atomic_write(self._version_path, [struct.pack('<Q', version)])
+        return version
+
+    def _atomic_write(self, path: str, chunks: Iterable[bytes]):
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def get(self, etf_id: int, timeframe: str, loader: Callable[[], PriceSeries]) -> PriceSeries:
+        """
+        Zwraca szereg z pliku mapowanego w pamięci.
+        Gdy pliku brak lub jest z poprzedniego dnia - ładuje z bazy przez loader() i publikuje.
+        """
+        key = (etf_id, timeframe)
+        path = self._path(etf_id, timeframe)
+        try:
+            stat = os.stat(path)
+            signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            signature = None
+
+        if signature is not None:
+            with self._lock:
+                mapped = self._mapped.get(key)
+            if mapped is not None and mapped[0] == signature and self._is_current(mapped[1]):
+                self._count('hits')
+                return mapped[1]
+
+            series = self._map(etf_id, timeframe, path)
+            if series is not None and self._is_current(series):
+                with self._lock:
+                    self._mapped[key] = (signature, series)
+                self._count('remaps')
+                return series
+
+        self._count('misses')
+        version = self.version()
+        series = loader()
+        self.write(series, expected_version=version)
+        return series
+
+    def _is_current(self, series: PriceSeries) -> bool:
+        # Szeregi 1M/1W kończą się na ostatnio zakończonym okresie - zależą od dnia budowy
+        return series.build_day == (date.today() - date(1970, 1, 1)).days
+
+    def _map(self, etf_id: int, timeframe: str, path: str) -> Optional[PriceSeries]:
+        """Mapuje plik szeregu tylko do odczytu (widoki bez kopiowania)"""
+        try:
+            data = np.memmap(path, dtype=np.uint8, mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+
+        magic, layout, ncols, build_day, count, data_version = HEADER.unpack_from(data[:HEADER.size].tobytes())
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            logger.warning(f"Ignoring series file with unknown layout: {path}")
+            return None
+
+        offset = HEADER_SIZE
+        names = []
+        for _ in range(ncols):
+            names.append(data[offset:offset + COLUMN_NAME_SIZE].tobytes().rstrip(b'\0').decode('ascii'))
+            offset += COLUMN_NAME_SIZE
+
+        days = data[offset:offset + count * 4].view(np.int32)
+        offset += _padded(count * 4)
+        columns = {}
+        for name in names:
+            columns[name] = data[offset:offset + count * 8].view(np.float64)
+            offset += count * 8
+
+        series = PriceSeries(
+            etf_id, timeframe, days,
+            columns.pop('close'), columns.pop('normalized'), columns.pop('split_ratio'),
+            columns
+        )
+        series.build_day = build_day
+        series.data_version = data_version
+        return series
+
+    def write(self, series: PriceSeries, expected_version: Optional[int] = None) -> bool:
+        """
+        Zapisuje szereg atomowo.
+        Gdy podano expected_version, a licznik wersji zmienił się w międzyczasie - zapis jest pomijany.
+        """
+        names = list(BASE_COLUMNS) + list(series.extra.keys())
+        count = len(series)
+        build_day = (date.today() - date(1970, 1, 1)).days
+
+        with self._file_lock():
+            version = self.version()
+            if expected_version is not None and version != expected_version:
+                self._count('skipped_writes')
+                return False
+
+            chunks = [
+                HEADER.pack(MAGIC, LAYOUT_VERSION, len(names), build_day, count, version).ljust(HEADER_SIZE, b'\0'),
+                b''.join(name.encode('ascii').ljust(COLUMN_NAME_SIZE, b'\0') for name in names),
+                np.ascontiguousarray(series.days, dtype='<i4').tobytes().ljust(_padded(count * 4), b'\0')
+            ]
+            for name in names:
+                array = getattr(series, name) if name in BASE_COLUMNS else series.extra[name]
+                chunks.append(np.ascontiguousarray(array, dtype='<f8').tobytes())
+            self._atomic_write(self._path(series.etf_id, series.timeframe), chunks)
+
+        self._count('writes')
+        return True
+
+    def invalidate(self, etf_ids: Set[Optional[int]]):
+        """Usuwa pliki szeregów (None = wszystkie) i zwiększa licznik wersji"""
+        with self._file_lock():
+            for name in os.listdir(self.directory):
+                if not name.endswith('.bin'):
+                    continue
+                if None in etf_ids or int(name.split('_', 1)[0]) in etf_ids:
+                    try:
+                        os.remove(os.path.join(self.directory, name))
+                    except FileNotFoundError:
+                        pass
+            self._bump_version()
+
+        with self._lock:
+            for key in [key for key in self._mapped if None in etf_ids or key[0] in etf_ids]:
+                del self._mapped[key]
+            self._pending.update(etf_ids)
+            self._stats['invalidations'] += 1
+
+    def take_pending(self) -> Set[Optional[int]]:
+        """Zwraca i czyści zbiór ETF unieważnionych od ostatniej publikacji"""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        return pending
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['mapped'] = len(self._mapped)
+        files = [name for name in os.listdir(self.directory) if name.endswith('.bin')]
+        return {
+            **stats,
+            'directory': self.directory,
+            'version': self.version(),
+            'files': len(files),
+            'bytes_on_disk': sum(os.path.getsize(os.path.join(self.directory, name)) for name in files)
+        }
+
+
+def _padded(size: int) -> int:
+    return (size + 7) // 8 * 8
+
+
+def get_series_store() -> Optional[SeriesStore]:
+    """Zwraca SeriesStore bieżącej aplikacji (jeśli włączony)"""
+    if not has_app_context():
+        return None
+    return current_app.extensions.get('etf_series_store')
+
+
+def create_series_store(app, config) -> Optional[SeriesStore]:
+    """Tworzy magazyn szeregów dla aplikacji (wyłączony dla bazy w pamięci)"""
+    uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+    if not config.SERIES_STORE_ENABLED or uri in ('sqlite://', 'sqlite:///:memory:'):
+        return None
+    store = SeriesStore(config.SERIES_STORE_DIR or os.path.join(app.instance_path, 'series_store'))
+    store.init_app(app)
+    logger.info(f"Series store enabled: {store.directory}")
+    return store
@@ -0,0 +1,506 @@
+"""
+Profil przechowywania danych dla SQLite (produkcja)
+
+- PRAGMA ustawiane przy tworzeniu każdego połączenia (WAL, synchronous=NORMAL,
+  busy_timeout, mmap_size, cache_size, temp_store)
+- osobna pula połączeń tylko do odczytu dla żądań GET
+- jeden pisarz: zadania schedulera wykonują zapisy po kolei (blokada wątków procesu i blokada
+  pliku obok bazy - każdy worker gunicorna ma własny scheduler), a ich commity są grupowane w paczki
+- paczka zatwierdzana jest przed zapytaniem do dostawcy (release_write_lock), więc blokada zapisu
+  SQLite nie czeka na HTTP, a zapisy z żądań web nie kończą się "database is locked"
+- metryki oczekiwania na blokady zapisu
+"""
+
+import copy
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from typing import Dict, List, Optional
+
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine, event
+from sqlalchemy.sql.expression import UpdateBase
+
+from services.job_trace_service import count as job_count, span as job_span
+
+try:
+    import fcntl
+except ImportError:  # Windows - brak blokad między procesami
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Stan paczki zapisów bieżącego wątku (aktywny tylko wewnątrz writer_job)
+_writer_state = threading.local()
+
+READ_ONLY_METHODS = ('GET', 'HEAD')
+
+# Klucze session.info ze zmianami zbieranymi do COMMIT (agregaty dywidend, wersje danych)
+_transaction_markers: List[str] = []
+
+
+class _WriteBatch:
+    """Paczka commitów zadania schedulera"""
+
+    def __init__(self, job_name: str, size: int, max_age_seconds: float, session=None):
+        self.job_name = job_name
+        self.size = size
+        self.max_age_seconds = max_age_seconds
+        self.session = session
+        self.pending = 0
+        self.started_at = time.perf_counter()
+        self.holds_lock = False   # zapisy w otwartej transakcji - blokada zapisu SQLite
+        self.open_writes = False  # zapisy po ostatnim commit() - niezatwierdzona jednostka pracy
+
+    def is_full(self) -> bool:
+        return (self.pending >= self.size or
+                time.perf_counter() - self.started_at >= self.max_age_seconds)
+
+    def reset(self):
+        self.pending = 0
+        self.started_at = time.perf_counter()
+        self.holds_lock = False
+
+
+class StorageMetrics:
+    """Liczniki oczekiwania na blokady SQLite (bezpieczne wątkowo)"""
+
+    def __init__(self, slow_threshold_ms: float):
+        self.slow_threshold_ms = slow_threshold_ms
+        self._lock = threading.Lock()
+        self._data = {
+            'write_statements': 0,
+            'write_wait_ms_total': 0.0,
+            'write_wait_ms_max': 0.0,
+            'slow_writes': 0,
+            'lock_errors': 0,
+            'writer_jobs': 0,
+            'writer_queue_wait_ms_total': 0.0,
+            'writer_queue_wait_ms_max': 0.0,
+            'batched_commits': 0,
+            'deferred_commits': 0,
+            'lock_releases': 0
+        }
+
+    def record_write(self, elapsed_ms: float):
+        with self._lock:
+            self._data['write_statements'] += 1
+            self._data['write_wait_ms_total'] += elapsed_ms
+            self._data['write_wait_ms_max'] = max(self._data['write_wait_ms_max'], elapsed_ms)
+            if elapsed_ms >= self.slow_threshold_ms:
+                self._data['slow_writes'] += 1
+
+    def record_lock_error(self):
+        with self._lock:
+            self._data['lock_errors'] += 1
+
+    def record_writer_wait(self, elapsed_ms: float):
+        with self._lock:
+            self._data['writer_jobs'] += 1
+            self._data['writer_queue_wait_ms_total'] += elapsed_ms
+            self._data['writer_queue_wait_ms_max'] = max(self._data['writer_queue_wait_ms_max'], elapsed_ms)
+
+    def record_commit(self, deferred: bool):
+        with self._lock:
+            self._data['deferred_commits' if deferred else 'batched_commits'] += 1
+
+    def record_lock_release(self):
+        with self._lock:
+            self._data['lock_releases'] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            data = dict(self._data)
+        statements = data['write_statements']
+        data['write_wait_ms_avg'] = round(data['write_wait_ms_total'] / statements, 2) if statements else 0.0
+        data['write_wait_ms_total'] = round(data['write_wait_ms_total'], 2)
+        data['write_wait_ms_max'] = round(data['write_wait_ms_max'], 2)
+        data['writer_queue_wait_ms_total'] = round(data['writer_queue_wait_ms_total'], 2)
+        data['writer_queue_wait_ms_max'] = round(data['writer_queue_wait_ms_max'], 2)
+        data['slow_threshold_ms'] = self.slow_threshold_ms
+        return data
+
+
+class StorageSession(Session):
+    """
+    Sesja Flask-SQLAlchemy z routingiem odczytów i grupowaniem commitów.
+
+    - w żądaniach GET/HEAD zapytania (poza flush i DML) trafiają do puli tylko do odczytu
+    - wewnątrz StorageService.writer_job() commit() zwalnia tylko SAVEPOINT,
+      a prawdziwy COMMIT wykonywany jest co SQLITE_WRITER_BATCH_SIZE commitów
+      (lub po SQLITE_WRITER_BATCH_MAX_AGE_SECONDS); rollback() cofa tylko
+      zmiany od ostatniego commit(), więc semantyka kodu serwisów się nie zmienia
+    - release_write_lock() zatwierdza paczkę wcześniej (przed operacją sieciową)
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or self._flushing or isinstance(clause, UpdateBase):
+            return engine
+        if not has_request_context() or request.method not in READ_ONLY_METHODS:
+            return engine
+
+        storage = current_app.extensions.get('etf_storage')
+        if storage is not None and storage.read_engine is not None and engine is self._db.engine:
+            return storage.read_engine
+        return engine
+
+    def commit(self):
+        batch = getattr(_writer_state, 'batch', None)
+        if batch is None:
+            return super().commit()
+
+        nested = self.get_nested_transaction()
+        if nested is not None:
+            nested.commit()
+        else:
+            self.flush()
+        batch.pending += 1
+        batch.open_writes = False
+
+        if batch.is_full():
+            self._commit_batch(batch)
+        else:
+            job_count('deferred_commits')
+            storage = current_app.extensions.get('etf_storage')
+            if storage is not None:
+                storage.metrics.record_commit(deferred=True)
+
+        self.begin_nested()
+
+    def _commit_batch(self, batch: _WriteBatch):
+        """Prawdziwy COMMIT paczki (zwalnia blokadę zapisu SQLite)"""
+        with job_span('db_commit', commits=batch.pending):
+            super().commit()
+        batch.reset()
+        storage = current_app.extensions.get('etf_storage')
+        if storage is not None:
+            storage.metrics.record_commit(deferred=False)
+
+    def rollback(self):
+        batch = getattr(_writer_state, 'batch', None)
+        nested = self.get_nested_transaction()
+        if batch is None or nested is None:
+            return super().rollback()
+
+        nested.rollback()
+        batch.open_writes = False
+        self.begin_nested()
+
+    def release_write_lock(self) -> bool:
+        """
+        Zatwierdza paczkę, gdy jej transakcja trzyma blokadę zapisu, a od ostatniego commit()
+        nie ma zapisów ani zmian w sesji (jednostka pracy w toku nie jest zatwierdzana)
+        """
+        batch = getattr(_writer_state, 'batch', None)
+        if batch is None or not batch.holds_lock or batch.open_writes or self.new or self.dirty or self.deleted:
+            return False
+        nested = self.get_nested_transaction()
+        if nested is not None:
+            nested.commit()
+        self._commit_batch(batch)
+        self.begin_nested()
+        storage = current_app.extensions.get('etf_storage')
+        if storage is not None:
+            storage.metrics.record_lock_release()
+        return True
+
+
+def register_transaction_markers(*keys: str):
+    """
+    Rejestruje klucze session.info ze znacznikami zmian obsługiwanymi przy COMMIT.
+    Rollback SAVEPOINT (np. w paczce writer_job) przywraca stan znaczników z początku
+    SAVEPOINT - znaczniki wcześniejszych commitów paczki zostają; rollback całej transakcji je usuwa.
+    """
+    for key in keys:
+        if key not in _transaction_markers:
+            _transaction_markers.append(key)
+
+
+@event.listens_for(StorageSession, 'after_transaction_create')
+def _save_markers(session, transaction):
+    if not transaction.nested:
+        return
+    snapshots = session.info.setdefault('savepoint_markers', weakref.WeakKeyDictionary())
+    snapshots[transaction] = {key: copy.copy(session.info[key]) for key in _transaction_markers if key in session.info}
+
+
+@event.listens_for(StorageSession, 'after_soft_rollback')
+def _restore_markers(session, previous_transaction):
+    snapshots = session.info.get('savepoint_markers')
+    snapshot = snapshots.pop(previous_transaction, None) if snapshots is not None else None
+    if session.get_transaction() is None or snapshot is None:
+        # Rollback całej transakcji - żadna zmiana nie została zapisana
+        for key in _transaction_markers:
+            session.info.pop(key, None)
+        return
+    for key in _transaction_markers:
+        if key in snapshot:
+            session.info[key] = snapshot[key]
+        else:
+            session.info.pop(key, None)
+
+
+def release_write_lock() -> bool:
+    """
+    Wywoływane przed zapytaniem sieciowym (MeteredSession): w zadaniu pisarza zatwierdza paczkę
+    zapisów, aby blokada zapisu SQLite nie była trzymana w czasie oczekiwania na dostawcę
+    """
+    batch = getattr(_writer_state, 'batch', None)
+    if batch is None or batch.session is None:
+        return False
+    return batch.session.release_write_lock()
+
+
+class StorageService:
+    """Konfiguracja silnika SQLite, pula odczytów i pisarz zadań schedulera"""
+
+    def __init__(self, config):
+        self.config = config
+        self.metrics = StorageMetrics(config.SQLITE_LOCK_WAIT_WARN_MS)
+        self.read_engine = None
+        self.is_sqlite = False
+        self._writer_lock = threading.RLock()
+        self._writer_lock_path = None  # blokada pisarza między procesami (plik obok bazy SQLite)
+        self._db = None
+        self._job_callbacks = []
+
+    def init_app(self, app, db):
+        """Podpina PRAGMA i metryki do silnika oraz tworzy pulę tylko do odczytu"""
+        self._db = db
+        app.extensions['etf_storage'] = self
+
+        with app.app_context():
+            engine = db.engine
+            self.is_sqlite = engine.dialect.name == 'sqlite'
+            if not self.is_sqlite:
+                logger.info(f"{engine.dialect.name} storage: pool_size={engine.pool.size() if hasattr(engine.pool, 'size') else 'n/a'}, "
+                            f"server-side upserts enabled")
+                return
+
+            self._apply_profile(engine, read_only=False)
+
+            database = engine.url.database
+            if database and database != ':memory:':
+                self._writer_lock_path = f"{database}.writer.lock"
+            if database and database != ':memory:' and self.config.SQLITE_READ_POOL_SIZE > 0:
+                self.read_engine = create_engine(
+                    f"sqlite:///file:{database}?mode=ro&uri=true",
+                    pool_size=self.config.SQLITE_READ_POOL_SIZE,
+                    max_overflow=self.config.SQLITE_READ_POOL_SIZE,
+                    pool_pre_ping=False
+                )
+                self._apply_profile(self.read_engine, read_only=True)
+
+            with engine.connect() as connection:
+                journal_mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+            logger.info(f"SQLite storage profile applied: journal_mode={journal_mode}, "
+                        f"read pool={'on' if self.read_engine is not None else 'off'}")
+
+    def _apply_profile(self, engine, read_only: bool):
+        config = self.config
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            # Własne zarządzanie transakcjami - wymagane przez SAVEPOINT (grupowanie commitów)
+            dbapi_connection.isolation_level = None
+            cursor = dbapi_connection.cursor()
+            try:
+                cursor.execute(f"PRAGMA busy_timeout = {int(config.SQLITE_BUSY_TIMEOUT_MS)}")
+                if read_only:
+                    cursor.execute("PRAGMA query_only = ON")
+                else:
+                    cursor.execute("PRAGMA journal_mode = WAL")
+                    cursor.execute(f"PRAGMA synchronous = {config.SQLITE_SYNCHRONOUS}")
+                cursor.execute(f"PRAGMA mmap_size = {int(config.SQLITE_MMAP_SIZE)}")
+                cursor.execute(f"PRAGMA cache_size = {-int(config.SQLITE_CACHE_SIZE_KB)}")
+                cursor.execute(f"PRAGMA temp_store = {config.SQLITE_TEMP_STORE}")
+            finally:
+                cursor.close()
+
+        @event.listens_for(engine, 'begin')
+        def do_begin(connection):
+            connection.exec_driver_sql('BEGIN')
+
+        if read_only:
+            return
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+            connection.info['storage_query_start'] = time.perf_counter()
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+            start = connection.info.pop('storage_query_start', None)
+            if start is None or not _is_write_statement(statement):
+                return
+            batch = getattr(_writer_state, 'batch', None)
+            if batch is not None:
+                batch.holds_lock = batch.open_writes = True
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.metrics.record_write(elapsed_ms)
+            if elapsed_ms >= config.SQLITE_LOCK_WAIT_WARN_MS:
+                logger.warning(f"Slow SQLite write ({elapsed_ms:.0f}ms) - probable lock wait")
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(exception_context):
+            if 'database is locked' in str(exception_context.original_exception):
+                self.metrics.record_lock_error()
+
+    @contextmanager
+    def writer_job(self, job_name: str):
+        """
+        Uruchamia zadanie schedulera jako jedynego pisarza (wątki procesu i procesy gunicorna).
+        Commity wewnątrz zadania są grupowane w paczki (patrz StorageSession).
+        """
+        wait_start = time.perf_counter()
+        with self._writer_lock:
+            outermost = getattr(_writer_state, 'depth', 0) == 0
+            with (self._process_lock() if outermost else nullcontext()):
+                self.metrics.record_writer_wait((time.perf_counter() - wait_start) * 1000)
+
+                _writer_state.depth = getattr(_writer_state, 'depth', 0) + 1
+                try:
+                    if not self.is_sqlite or getattr(_writer_state, 'batch', None) is not None:
+                        yield
+                    else:
+                        yield from self._run_batched(job_name)
+                finally:
+                    _writer_state.depth -= 1
+
+            if outermost:
+                self._run_job_callbacks(job_name)
+
+    @contextmanager
+    def _process_lock(self):
+        """Blokada pisarza między procesami (każdy worker gunicorna uruchamia własny scheduler)"""
+        if self._writer_lock_path is None or fcntl is None:
+            yield
+            return
+        with open(self._writer_lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _run_batched(self, job_name: str):
+        session = self._db.session()
+        _writer_state.batch = _WriteBatch(
+            job_name,
+            self.config.SQLITE_WRITER_BATCH_SIZE,
+            self.config.SQLITE_WRITER_BATCH_MAX_AGE_SECONDS,
+            session
+        )
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            _writer_state.batch = None
+            self._finish_batch(session, job_name, failed)
+
+    def after_writer_job(self, callback):
+        """Rejestruje funkcję wywoływaną po zatwierdzeniu zadania pisarza (np. publikacja szeregów)"""
+        self._job_callbacks.append(callback)
+
+    def _run_job_callbacks(self, job_name: str):
+        for callback in self._job_callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Error in post-commit callback of job {job_name}: {str(e)}")
+
+    def _finish_batch(self, session, job_name: str, failed: bool):
+        """Zatwierdza zmiany zatwierdzone logicznie przez zadanie"""
+        try:
+            nested = session.get_nested_transaction()
+            if nested is not None:
+                if failed:
+                    nested.rollback()
+                else:
+                    nested.commit()
+            session.commit()
+            self.metrics.record_commit(deferred=False)
+        except Exception as e:
+            logger.error(f"Error committing write batch for job {job_name}: {str(e)}")
+            session.rollback()
+
+    def get_status(self) -> Dict:
+        """Zwraca konfigurację i metryki warstwy przechowywania"""
+        status = {
+            'backend': 'sqlite' if self.is_sqlite else (self._db.engine.dialect.name if self._db else None),
+            'read_pool_enabled': self.read_engine is not None,
+            'metrics': self.metrics.snapshot()
+        }
+        if self.is_sqlite:
+            status['pragmas'] = {
+                'journal_mode': 'WAL',
+                'synchronous': self.config.SQLITE_SYNCHRONOUS,
+                'busy_timeout_ms': self.config.SQLITE_BUSY_TIMEOUT_MS,
+                'mmap_size': self.config.SQLITE_MMAP_SIZE,
+                'cache_size_kb': self.config.SQLITE_CACHE_SIZE_KB,
+                'temp_store': self.config.SQLITE_TEMP_STORE
+            }
+            status['writer_batch_size'] = self.config.SQLITE_WRITER_BATCH_SIZE
+        return status
+
+
+def _is_write_statement(statement: str) -> bool:
+    keyword = statement.lstrip()[:6].upper()
+    return keyword in ('INSERT', 'UPDATE', 'DELETE')
+
+
+def dialect_insert(session, model):
+    """INSERT z obsługą ON CONFLICT dla dialektu bazy modelu (SQLite i PostgreSQL)"""
+    dialect = session.get_bind(mapper=model, clause=model.__table__.insert()).dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"Upsert nie jest obsługiwany dla dialektu {dialect}")
+    return insert(model.__table__)
+
+
+def upsert_rows(session, model, rows: List[Dict], index_elements: List[str],
+                update_columns: Optional[List[str]] = None) -> int:
+    """
+    Wstawia wiersze z obsługą konfliktu po stronie serwera (SQLite i PostgreSQL).
+
+    Args:
+        session: sesja SQLAlchemy
+        model: model ORM (np. ETFDailyPrice)
+        rows: lista słowników kolumna -> wartość
+        index_elements: kolumny unikalnego ograniczenia (np. ['etf_id', 'date'])
+        update_columns: kolumny aktualizowane przy konflikcie; None = pomiń istniejące wiersze
+
+    Returns:
+        Liczba przekazanych wierszy
+    """
+    if not rows:
+        return 0
+
+    session.execute(upsert_statement(session, model, index_elements, update_columns), rows)
+    return len(rows)
+
+
+def upsert_statement(session, model, index_elements: List[str], update_columns: Optional[List[str]] = None):
+    """INSERT ... ON CONFLICT dla dialektu bazy modelu (bez wierszy - parametry przy wykonaniu)"""
+    statement = dialect_insert(session, model)
+    if update_columns:
+        return statement.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={column: statement.excluded[column] for column in update_columns}
+        )
+    return statement.on_conflict_do_nothing(index_elements=index_elements)
+
+
+def get_storage() -> Optional[StorageService]:
+    """Zwraca StorageService bieżącej aplikacji (jeśli skonfigurowany)"""
+    return current_app.extensions.get('etf_storage')
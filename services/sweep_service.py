@@ -0,0 +1,247 @@
+"""
+Przegląd siatki parametrów wskaźników (sweep) - dobór parametrów i progów alertów
+
+Wszystkie kombinacje parametrów liczone są naraz jako macierze okresy x kombinacje:
+- Stochastic: ekstrema okna liczone raz dla każdego lookback, wygładzanie %K i %D jednym
+  przebiegiem z wektorem okresów (osobny okres dla każdej kolumny),
+- MACD: EMA wszystkich okresów fast/slow jednym przebiegiem (macierz szeregów x okresy),
+  linie sygnału - drugim.
+
+Dla każdej kombinacji liczone są zdarzenia sygnału (typy alertów z Config.TECHNICAL_INDICATORS)
+i stopy zwrotu po horyzontach (okresy po sygnale) - liczba, średnia i odsetek dodatnich,
+sumowane po wszystkich ETF. Dla wielu ETF obliczenia rozdzielane są na pulę procesów.
+"""
+
+import itertools
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from services.chart_data_service import INDICATOR_PRICE_COLUMN
+from services.indicator_registry import IndicatorError, get_indicator, make_spec
+from services.indicators import (SIGNAL_TYPES, ema, macd_from_emas, raw_k_percent, rolling_extremes, signal_events,
+                                 smoothed, valid_counts)
+from services.series_cache import TIMEFRAMES
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INDICATORS = ('stoch', 'macd')
+DEFAULT_HORIZONS = (4, 12, 26)
+DEFAULT_SIGNALS = {'stoch': 'crossover_in_oversold', 'macd': 'crossover_bullish'}
+MAX_HORIZON = 520
+
+
+class SweepError(Exception):
+    """Błąd parametrów sweepu zwracany klientowi jako {'success': False, 'error': ...}"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class SweepService:
+    """Sweep parametrów Stochastic/MACD dla jednego ETF lub całego uniwersum"""
+
+    def __init__(self, db_service, max_combinations: int = 500, processes: int = 0, min_parallel: int = 16):
+        self.db_service = db_service
+        self.max_combinations = max_combinations
+        self.processes = processes
+        self.min_parallel = min_parallel
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def run(self, indicator: str, grid: Dict[str, Sequence], timeframe: str = '1W', signal: Optional[str] = None,
+            threshold: Optional[float] = None, horizons: Optional[Sequence[int]] = None,
+            tickers: Optional[List[str]] = None) -> Dict:
+        """
+        Statystyki sygnałów dla wszystkich kombinacji siatki.
+
+        Args:
+            indicator: 'stoch' lub 'macd'
+            grid: wartości parametrów, np. {'lookback': [9, 14, 36], 'smoothing': [3], 'sma': [3, 12]}
+                  (brakujące parametry - wartość domyślna z rejestru wskaźników)
+            signal: typ zdarzenia (typy alertów, np. crossover_bullish, level_below)
+            threshold: poziom dla level_below/level_above
+            horizons: horyzonty stóp zwrotu w okresach timeframe
+            tickers: ETF (domyślnie całe uniwersum)
+        """
+        try:
+            definition = get_indicator(indicator)
+        except IndicatorError as e:
+            raise SweepError(e.message)
+        if definition.name not in SWEEP_INDICATORS:
+            raise SweepError(f'Sweep obsługuje wskaźniki: {", ".join(SWEEP_INDICATORS)}')
+        if timeframe not in TIMEFRAMES:
+            raise SweepError(f'Nieznany timeframe: {timeframe} (dostępne: {", ".join(TIMEFRAMES)})')
+        signal = signal or DEFAULT_SIGNALS[definition.name]
+        if signal not in SIGNAL_TYPES:
+            raise SweepError(f'Nieznany sygnał: {signal} (dostępne: {", ".join(SIGNAL_TYPES)})')
+        if signal.startswith('level_') and threshold is None:
+            raise SweepError(f'Sygnał {signal} wymaga parametru threshold')
+        horizons = sorted({int(h) for h in (horizons or DEFAULT_HORIZONS)})
+        if not horizons or horizons[0] < 1 or horizons[-1] > MAX_HORIZON:
+            raise SweepError(f'Horyzonty muszą być z zakresu 1-{MAX_HORIZON}')
+
+        specs = self._combinations(definition, grid or {})
+        combos = np.array([spec.values for spec in specs], dtype=np.int64)
+        closes, used = self._load(timeframe, tickers)
+
+        task = partial(sweep_series, indicator=definition.name, combos=combos, signal=signal,
+                       threshold=np.nan if threshold is None else float(threshold), horizons=horizons)
+        pool = self._get_pool() if len(closes) >= self.min_parallel else None
+        if pool is not None:
+            chunksize = max(1, len(closes) // (self.processes * 4))
+            partials = list(pool.map(task, closes, chunksize=chunksize))
+        else:
+            partials = [task(close) for close in closes]
+
+        totals = {key: np.sum([p[key] for p in partials], axis=0) if partials else np.zeros(len(specs))
+                  for key in _stat_keys(horizons)}
+        logger.info(f"Sweep {definition.name} {timeframe}: {len(specs)} combinations x {len(closes)} ETFs "
+                    f"({'process pool' if pool is not None else 'in process'})")
+
+        results = []
+        for index, spec in enumerate(specs):
+            forward = {}
+            for h in horizons:
+                count = int(totals[f'count_{h}'][index])
+                forward[str(h)] = {
+                    'count': count,
+                    'mean': round(float(totals[f'sum_{h}'][index]) / count * 100, 4) if count else None,
+                    'hit_rate': round(float(totals[f'positive_{h}'][index]) / count * 100, 2) if count else None
+                }
+            results.append({
+                'label': spec.label,
+                'parameters': spec.parameters(),
+                'signals': int(totals['signals'][index]),
+                'forward_returns': forward
+            })
+
+        return {
+            'indicator': definition.name,
+            'timeframe': timeframe,
+            'signal': signal,
+            'threshold': threshold,
+            'horizons': horizons,
+            'tickers': used,
+            'combinations': len(specs),
+            'results': results
+        }
+
+    def _combinations(self, definition, grid: Dict[str, Sequence]):
+        """Iloczyn kartezjański siatki (kombinacje nieprawidłowe, np. fast >= slow, są pomijane)"""
+        names = [param.name for param in definition.params]
+        unknown = [name for name in grid if name not in names]
+        if unknown:
+            raise SweepError(f'Nieznane parametry {definition.name}: {", ".join(unknown)} (dostępne: {", ".join(names)})')
+        axes = []
+        for param in definition.params:
+            values = grid.get(param.name, [param.default])
+            values = values if isinstance(values, (list, tuple)) else [values]
+            if not values:
+                raise SweepError(f'Pusta lista wartości parametru {param.name}')
+            axes.append(values)
+
+        count = int(np.prod([len(values) for values in axes]))
+        if count > self.max_combinations:
+            raise SweepError(f'Za dużo kombinacji parametrów ({count} > {self.max_combinations})')
+
+        specs, errors = {}, []
+        for values in itertools.product(*axes):
+            try:
+                spec = make_spec(definition, values)
+            except IndicatorError as e:
+                errors.append(e.message)
+                continue
+            specs.setdefault(spec.label, spec)
+        if not specs:
+            raise SweepError(errors[0] if errors else 'Brak prawidłowych kombinacji parametrów')
+        return list(specs.values())
+
+    def _load(self, timeframe: str, tickers: Optional[List[str]]):
+        etfs = self.db_service.get_all_etfs()
+        if tickers:
+            by_ticker = {etf.ticker: etf for etf in etfs}
+            missing = [ticker for ticker in tickers if ticker not in by_ticker]
+            if missing:
+                raise SweepError(f'ETF {", ".join(missing)} nie został znaleziony', 404)
+            etfs = [by_ticker[ticker] for ticker in dict.fromkeys(tickers)]
+
+        closes, used = [], []
+        column = INDICATOR_PRICE_COLUMN[timeframe]
+        for etf in etfs:
+            series = self.db_service.get_price_series(etf.id, timeframe)
+            if len(series) >= 2:
+                closes.append(np.ascontiguousarray(getattr(series, column), dtype=np.float64))
+                used.append(etf.ticker)
+        if not closes:
+            raise SweepError('Brak cen dla wybranych ETF', 404)
+        return closes, used
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        """Pula procesów tworzona przy pierwszym użyciu (spawn - bez kopiowania wątków aplikacji)"""
+        if self.processes < 2:
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.processes,
+                                                 mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def sweep_lines(indicator: str, close: np.ndarray, combos: np.ndarray):
+    """Linia wskaźnika i linia sygnału wszystkich kombinacji (okresy x kombinacje) dla jednego szeregu"""
+    close = np.asarray(close, dtype=np.float64)
+    if indicator == 'stoch':
+        lookbacks = combos[:, 0]
+        raw = np.empty((len(close), len(combos)))
+        for lookback in np.unique(lookbacks):
+            highest, lowest = rolling_extremes(close, int(lookback))
+            raw[:, lookbacks == lookback] = raw_k_percent(close, highest, lowest)[:, None]
+        k_percent = smoothed(raw, combos[:, 1])
+        return k_percent, smoothed(k_percent, combos[:, 2])
+
+    spans = np.unique(combos[:, :2])
+    emas = ema(np.repeat(close[:, None], len(spans), axis=1), spans)
+    values = macd_from_emas(
+        emas[:, np.searchsorted(spans, combos[:, 0])], emas[:, np.searchsorted(spans, combos[:, 1])],
+        combos[:, 2], valid_counts(close)[:, None] >= combos[:, 1][None, :]
+    )
+    return values['macd_line'], values['signal_line']
+
+
+def sweep_series(close: np.ndarray, indicator: str, combos: np.ndarray, signal: str, threshold: float,
+                 horizons: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    Liczba sygnałów oraz suma, liczba i liczba dodatnich stóp zwrotu po horyzontach dla każdej
+    kombinacji (funkcja modułu - wykonywana także w procesach puli).
+    """
+    line, signal_line = sweep_lines(indicator, close, combos)
+    events = signal_events(signal, line, signal_line, threshold)
+    stats = {'signals': events.sum(axis=0)}
+    for h in horizons:
+        forward = np.full(len(close), np.nan)
+        if h < len(close):
+            with np.errstate(invalid='ignore', divide='ignore'):
+                forward[:-h] = close[h:] / close[:-h] - 1
+        valid = events & ~np.isnan(forward)[:, None]
+        stats[f'count_{h}'] = valid.sum(axis=0)
+        stats[f'sum_{h}'] = np.where(valid, forward[:, None], 0.0).sum(axis=0)
+        stats[f'positive_{h}'] = (valid & (forward[:, None] > 0)).sum(axis=0)
+    return stats
+
+
+def _stat_keys(horizons: Sequence[int]) -> List[str]:
+    return ['signals'] + [f'{name}_{h}' for h in horizons for name in ('count', 'sum', 'positive')]
@@ -6,7 +6,7 @@ Testuje kluczowe funkcje bez zewnętrznych zależności
 
 import unittest
 from unittest.mock import Mock, patch, MagicMock
-from datetime import datetime, date, timezone
+from datetime import datetime, date, timedelta, timezone
 import sys
 import os
 
@@ -77,6 +77,26 @@ class TestAPIService(unittest.TestCase):
             self.assertEqual(self.api_service.api_calls['fmp']['count'], 1)
             self.assertEqual(self.api_service.api_calls['fmp']['minute_count'], 1)
 
+    def test_break_even_dividends_vectorized(self):
+        """Test break-even dla wielu celów i kwot (bez dostępu do bazy)"""
+        from services.series_cache import PriceSeries
+        prices = PriceSeries.from_rows(1, '1M', [(date(2024, month, 28), 100.0, 100.0, 1.0) for month in (1, 2, 3)])
+        dividends = [Mock(payment_date=date(2024, month, 10), amount=1.0, normalized_amount=None)
+                     for month in (2, 3, 4, 5)]
+
+        result = self.api_service.calculate_break_even_dividends(
+            'tst', dividends, prices, target_percentage=[2.0, 3.0], tax_rate=50.0, investment_amount=[1000, 2000]
+        )
+
+        # 10 jednostek * 0.5 netto = 5 na miesiąc; cel 20 osiągnięty w 4. miesiącu z dywidendą
+        self.assertEqual([row['months_to_break_even'] for row in result['data']], [3, 3, None])
+        self.assertEqual(result['data'][0]['cumulative_dividends'], 20.0)
+        self.assertEqual(result['data'][2]['cumulative_dividends'], 15.0)
+        self.assertEqual(result['target_return'], 20.0)
+        self.assertEqual(len(result['scenarios']), 4)
+        self.assertEqual(result['scenarios'][2]['months_to_break_even'], [None, None, None])
+        self.assertEqual(result['scenarios'][0]['months_to_break_even'], [3, 3, None])
+
 class TestDatabaseService(unittest.TestCase):
     """Testy dla DatabaseService"""
     
@@ -188,6 +208,1484 @@ class TestUtilityFunctions(unittest.TestCase):
         expected_cest = datetime(2024, 7, 1, 14, 0, 0, tzinfo=cest_time.tzinfo)
         self.assertEqual(cest_time, expected_cest)
 
+class TestSeriesCache(unittest.TestCase):
+    """Testy cache szeregów cen"""
+
+    def _series(self, etf_id, points):
+        from services.series_cache import PriceSeries
+        rows = [(date(2024, 1, 1) + timedelta(days=i), 10.0 + i, 5.0 + i, 2.0) for i in range(points)]
+        return PriceSeries.from_rows(etf_id, '1W', rows)
+
+    def test_lru_eviction_by_bytes(self):
+        """Test usuwania najdawniej używanych szeregów po przekroczeniu limitu bajtów"""
+        from services.series_cache import SeriesCache
+        series_size = self._series(1, 100).nbytes
+        cache = SeriesCache(max_bytes=series_size * 2, ttl_seconds=60)
+
+        cache.get(1, '1W', lambda: self._series(1, 100))
+        cache.get(2, '1W', lambda: self._series(2, 100))
+        cache.get(1, '1W', lambda: self._series(1, 100))  # ETF 1 staje się najnowszy
+        cache.get(3, '1W', lambda: self._series(3, 100))  # usuwa ETF 2
+
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 2)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertLessEqual(stats['bytes'], series_size * 2)
+        loader = Mock(return_value=self._series(2, 100))
+        cache.get(2, '1W', loader)
+        loader.assert_called_once()
+
+    def test_invalidate_during_load(self):
+        """Test pominięcia zapisu szeregu wczytanego przed unieważnieniem (commit w trakcie ładowania)"""
+        from services.series_cache import SeriesCache
+        cache = SeriesCache(max_bytes=10 ** 6, ttl_seconds=60)
+        stale = self._series(1, 10)
+
+        def load_then_commit():
+            cache.invalidate(1)
+            return stale
+
+        self.assertIs(cache.get(1, '1W', load_then_commit), stale)
+        self.assertEqual(cache.stats()['entries'], 0)
+        self.assertEqual(cache.stats()['stale_loads'], 1)
+        fresh = self._series(1, 11)
+        self.assertIs(cache.get(1, '1W', lambda: fresh), fresh)
+        self.assertIs(cache.get(1, '1W', Mock()), fresh)
+
+    def test_series_columns(self):
+        """Test konwersji kolumn szeregu (NaN -> None, format dat)"""
+        from services.series_cache import PriceSeries
+        series = PriceSeries.from_rows(1, '1M', [(date(2024, 1, 31), 10.0, None, 1.0), (date(2024, 2, 29), 11.0, 5.5, 2.0)])
+        self.assertEqual(series.date_strings('%Y-%m'), ['2024-01', '2024-02'])
+        self.assertEqual(series.values('normalized'), [None, 5.5])
+        self.assertEqual(series.to_price_data('close'), [{'date': '2024-01-31', 'close': 10.0},
+                                                          {'date': '2024-02-29', 'close': 11.0}])
+        self.assertEqual(series.days.dtype.name, 'int32')
+        self.assertFalse(series.close.flags.writeable)
+
+class TestSeriesStore(unittest.TestCase):
+    """Testy magazynu szeregów mapowanych w pamięci"""
+
+    def setUp(self):
+        import tempfile
+        from services.series_store import SeriesStore
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SeriesStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _series(self, etf_id, timeframe='1D', offset=0.0):
+        from services.series_cache import PriceSeries
+        rows = [(date(2024, 1, 1) + timedelta(days=i), 10.0 + i + offset, None if i == 0 else 5.0 + i, 2.0, 100.0 * i)
+                for i in range(5)]
+        return PriceSeries.from_rows(etf_id, timeframe, rows, ('volume',))
+
+    def test_write_and_map_roundtrip(self):
+        """Test zapisu i odczytu szeregu bez kopiowania (np.memmap)"""
+        import numpy as np
+        original = self._series(1)
+        loader = Mock(return_value=original)
+        self.store.get(1, '1D', loader)  # brak pliku - ładowanie z bazy i zapis
+        series = self.store.get(1, '1D', loader)
+
+        loader.assert_called_once()
+        self.assertIsInstance(series.close.base, np.memmap)
+        self.assertEqual(series.date_strings(), original.date_strings())
+        self.assertEqual(series.values('normalized'), original.values('normalized'))
+        self.assertEqual(series.values('volume'), original.values('volume'))
+        self.assertFalse(series.close.flags.writeable)
+
+    def test_stale_write_skipped_after_invalidation(self):
+        """Test pominięcia zapisu, gdy dane unieważniono w trakcie odczytu z bazy"""
+        version = self.store.version()
+        self.store.invalidate({1})
+        self.assertFalse(self.store.write(self._series(1), expected_version=version))
+        self.assertTrue(self.store.write(self._series(1)))
+
+    def test_invalidate_removes_files_and_remaps(self):
+        """Test unieważnienia - workery widzą nową wersję pliku"""
+        self.store.write(self._series(1))
+        self.store.write(self._series(2))
+        self.store.invalidate({1})
+
+        self.assertEqual(self.store.take_pending(), {1})
+        self.assertEqual(self.store.stats()['files'], 1)
+        series = self.store.get(1, '1D', lambda: self._series(1, offset=1.0))
+        self.assertEqual(series.values('close')[0], 11.0)
+        self.assertEqual(self.store.get(1, '1D', Mock()).data_version, self.store.version())
+
+class TestResponseFormatting(unittest.TestCase):
+    """Testy serializacji, formatu kolumnowego i kompresji odpowiedzi"""
+
+    def setUp(self):
+        from flask import Flask, jsonify
+        from config import Config
+        from services.response_service import init_responses
+        import numpy as np
+
+        self.app = Flask(__name__)
+        init_responses(self.app, Config)
+
+        @self.app.route('/numpy')
+        def numpy_values():
+            return jsonify({'values': np.arange(3), 'mean': np.float64(1.5), 'day': date(2024, 1, 1)})
+
+        self.client = self.app.test_client()
+
+    def test_numpy_and_dates_serialization(self):
+        """Test serializacji typów NumPy i dat (format HTTP jak w domyślnym providerze Flask)"""
+        data = self.client.get('/numpy').get_json()
+        self.assertEqual(data['values'], [0, 1, 2])
+        self.assertEqual(data['mean'], 1.5)
+        self.assertEqual(data['day'], 'Mon, 01 Jan 2024 00:00:00 GMT')
+
+    def test_gzip_compression(self):
+        """Test kompresji gzip dla dużych odpowiedzi i nagłówka Vary"""
+        import gzip
+        import json
+        from config import Config
+
+        @self.app.route('/large')
+        def large():
+            from flask import jsonify
+            return jsonify({'items': list(range(Config.COMPRESSION_MIN_BYTES))})
+
+        response = self.client.get('/large', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(len(json.loads(gzip.decompress(response.data))['items']), Config.COMPRESSION_MIN_BYTES)
+
+        plain = self.client.get('/numpy', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', plain.headers)
+
+class TestStorageWriter(unittest.TestCase):
+    """Testy pisarza zadań schedulera (paczki commitów, blokada zapisu SQLite, blokada między procesami)"""
+
+    def setUp(self):
+        import tempfile
+        from types import SimpleNamespace
+        from flask import Flask
+        from config import Config
+        from models import db
+        from services.storage_service import StorageService
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.database = os.path.join(self.directory.name, 'writer.db')
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.database}'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        config = SimpleNamespace(**{key: getattr(Config, key) for key in dir(Config) if key.isupper()})
+        config.SQLITE_WRITER_BATCH_SIZE = 1000
+        config.SQLITE_WRITER_BATCH_MAX_AGE_SECONDS = 3600
+        config.SQLITE_READ_POOL_SIZE = 0
+        self.storage = StorageService(config)
+        self.storage.init_app(self.app, db)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        from models import db
+        db.session.remove()
+        db.engine.dispose()
+        self.ctx.pop()
+        self.directory.cleanup()
+
+    def _other_process_write(self) -> bool:
+        import sqlite3
+        connection = sqlite3.connect(self.database, timeout=0)
+        try:
+            connection.execute("INSERT INTO etfs (ticker, name) VALUES ('WEB', 'Web ETF')")
+            connection.commit()
+            return True
+        except sqlite3.OperationalError as e:
+            self.assertIn('locked', str(e))
+            return False
+        finally:
+            connection.close()
+
+    def test_batch_released_before_network_call(self):
+        """Test zatwierdzenia paczki przed zapytaniem do dostawcy (tylko bez niezatwierdzonych zmian)"""
+        from models import db, ETF
+        from services.storage_service import release_write_lock
+
+        with self.storage.writer_job('test_job'):
+            db.session.add(ETF(ticker='AAA', name='Test ETF'))
+            db.session.commit()  # odroczony - blokada zapisu trzymana przez paczkę
+            self.assertFalse(self._other_process_write())
+
+            db.session.add(ETF(ticker='BBB', name='Test ETF'))
+            db.session.flush()
+            self.assertFalse(release_write_lock())  # jednostka pracy w toku
+            db.session.rollback()
+
+            self.assertTrue(release_write_lock())
+            self.assertTrue(self._other_process_write())
+            self.assertFalse(release_write_lock())
+        self.assertEqual(sorted(etf.ticker for etf in ETF.query.all()), ['AAA', 'WEB'])
+        self.assertEqual(self.storage.metrics.snapshot()['lock_releases'], 1)
+
+    def test_rollback_inside_batch_keeps_deferred_commits(self):
+        """Test rollback() w paczce: odroczone commity i ich znaczniki zostają, cofany jest tylko SAVEPOINT"""
+        from models import db, ETF
+        from services.storage_service import register_transaction_markers
+        register_transaction_markers('test_writer_marker')
+
+        with self.storage.writer_job('test_job'):
+            db.session.add(ETF(ticker='AAA', name='Test ETF'))
+            db.session.info.setdefault('test_writer_marker', set()).add('AAA')
+            db.session.commit()  # odroczony
+
+            db.session.add(ETF(ticker='BBB', name='Test ETF'))
+            db.session.info['test_writer_marker'].add('BBB')
+            db.session.flush()
+            db.session.rollback()
+            self.assertEqual(db.session.info['test_writer_marker'], {'AAA'})
+        self.assertEqual([etf.ticker for etf in ETF.query.all()], ['AAA'])
+
+        db.session.info['test_writer_marker'] = {'CCC'}
+        db.session.rollback()  # rollback całej transakcji - znaczniki usunięte
+        self.assertNotIn('test_writer_marker', db.session.info)
+
+    def test_dividend_aggregates_after_rollback_inside_batch(self):
+        """Test agregatów rocznych dywidend zatwierdzonych w paczce przed rollback() innej jednostki pracy"""
+        import services.dividend_aggregates  # noqa: F401 - rejestracja listenerów
+        from models import db, ETF, ETFDividend, ETFDividendYearly
+        etf = ETF(ticker='AAA', name='Test ETF')
+        db.session.add(etf)
+        db.session.commit()
+
+        with self.storage.writer_job('test_job'):
+            db.session.add(ETFDividend(etf_id=etf.id, payment_date=date(2024, 3, 1), amount=1.0, normalized_amount=1.0))
+            db.session.commit()  # odroczony
+            db.session.add(ETFDividend(etf_id=etf.id, payment_date=date(2024, 6, 1), amount=2.0, normalized_amount=2.0))
+            db.session.flush()
+            db.session.rollback()
+
+        aggregates = ETFDividendYearly.query.all()
+        self.assertEqual([(row.year, row.dividend_count, row.amount_sum) for row in aggregates], [(2024, 1, 1.0)])
+
+    def test_data_version_after_rollback_inside_batch(self):
+        """Test wersji danych ETF zmienionego w paczce przed rollback() innej jednostki pracy"""
+        import services.data_version_service  # noqa: F401 - rejestracja listenerów
+        from models import db, ETF, ETFDataVersion, ETFDailyPrice
+        etf = ETF(ticker='AAA', name='Test ETF')
+        db.session.add(etf)
+        db.session.commit()
+        self.assertEqual(db.session.get(ETFDataVersion, 'AAA').version, 1)
+
+        with self.storage.writer_job('test_job'):
+            db.session.add(ETFDailyPrice(etf_id=etf.id, date=date(2024, 1, 2), close_price=10.0,
+                                         normalized_close_price=10.0, year=2024, month=1, day=2))
+            db.session.commit()  # odroczony
+            db.session.get(ETF, etf.id).current_price = 11.0
+            db.session.flush()
+            db.session.rollback()
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(ETFDataVersion, 'AAA').version, 2)
+
+    def test_writer_lock_between_processes(self):
+        """Test blokady pliku pisarza trzymanej przez zadanie (inny proces czeka)"""
+        import fcntl
+        with self.storage.writer_job('test_job'):
+            with open(f'{self.database}.writer.lock', 'a') as lock_file:
+                with self.assertRaises(BlockingIOError):
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        with open(f'{self.database}.writer.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+class TestDataVersions(unittest.TestCase):
+    """Testy wersji danych ETF i warunkowych GET (ETag / 304)"""
+
+    def setUp(self):
+        from flask import Flask, jsonify
+        from models import db, ETF
+        from config import Config
+        from services.data_version_service import DataVersionService
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.versions = DataVersionService(Config)
+        self.versions.init_app(self.app, db)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.drop_all()
+        db.create_all()
+
+        etf = ETF(ticker='TST', name='Test ETF')
+        db.session.add(etf)
+        db.session.commit()
+        self.etf_id = etf.id
+        self.calls = 0
+
+        @self.app.route('/api/etfs/<ticker>/prices')
+        def prices(ticker):
+            self.calls += 1
+            return jsonify({'success': True})
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        from models import db
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_version_bumped_on_price_change_and_delete(self):
+        """Test zwiększania wersji przy zapisie cen i usunięciu ETF"""
+        from models import db, ETF, ETFDataVersion, ETFDailyPrice
+        self.assertEqual(db.session.get(ETFDataVersion, 'TST').version, 1)
+
+        db.session.add(ETFDailyPrice(etf_id=self.etf_id, date=date(2024, 1, 2), close_price=10.0,
+                                     normalized_close_price=10.0, year=2024, month=1, day=2))
+        db.session.commit()
+        self.assertEqual(db.session.get(ETFDataVersion, 'TST').version, 2)
+
+        db.session.delete(db.session.get(ETF, self.etf_id))
+        db.session.commit()
+        self.assertEqual(db.session.get(ETFDataVersion, 'TST').version, 3)
+
+    def test_version_incremented_in_sql(self):
+        """Test inkrementacji wersji w bazie (wersja zapisana przez inny proces nie jest nadpisywana)"""
+        from models import db, ETF, ETFDataVersion
+        # Commit innego workera - wersja w bazie wyższa niż znana tej sesji
+        db.session.execute(ETFDataVersion.__table__.update().values(version=7))
+        db.session.get(ETF, self.etf_id).current_price = 12.5
+        db.session.commit()
+        db.session.expire_all()
+        self.assertEqual(db.session.get(ETFDataVersion, 'TST').version, 8)
+        self.assertEqual(self.versions.get('TST')[0], 8)
+
+    def test_not_modified_before_handler(self):
+        """Test odpowiedzi 304 bez wywołania endpointu i nowego ETag po zmianie danych"""
+        from models import db, ETF
+        response = self.client.get('/api/etfs/tst/prices')
+        etag = response.headers['ETag']
+        self.assertEqual(self.calls, 1)
+
+        cached = self.client.get('/api/etfs/tst/prices', headers={'If-None-Match': etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.calls, 1)
+
+        db.session.get(ETF, self.etf_id).current_price = 12.5
+        db.session.commit()
+        fresh = self.client.get('/api/etfs/tst/prices', headers={'If-None-Match': etag})
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh.headers['ETag'], etag)
+
+class TestChartDataService(unittest.TestCase):
+    """Testy budowania sekcji wykresów (endpointy cen/wskaźników i /bundle)"""
+
+    def setUp(self):
+        from services.series_cache import PriceSeries
+        from services.chart_data_service import ChartDataService
+        rows = [(date(2024, 1, 5) + timedelta(weeks=i), 10.0 + i, 10.0 + i, 1.0) for i in range(60)]
+        self.db_service = Mock()
+        self.db_service.get_price_series.side_effect = lambda etf_id, timeframe: (
+            PriceSeries.from_rows(etf_id, timeframe, rows if timeframe == '1W' else []))
+        self.service = ChartDataService(self.db_service)
+        self.etf = Mock(id=1, ticker='TST')
+
+    def test_bundle_loads_each_timeframe_once(self):
+        """Test współdzielenia szeregu między sekcjami jednego timeframe"""
+        sections = ['weekly-prices', 'weekly-macd', 'weekly-stochastic', 'weekly-stochastic-short']
+        results = list(self.service.build_many(self.etf, 'TST', sections, columnar=True))
+
+        self.assertEqual([section for section, _, _ in results], sections)
+        self.assertTrue(all(status == 200 for _, _, status in results))
+        self.db_service.get_price_series.assert_called_once_with(1, '1W')
+        macd = results[1][1]['data']['macd']
+        self.assertEqual(len(macd['dates']), len(macd['macd_line']))
+
+    def test_indicators_match_api_service(self):
+        """Test zgodności MACD i Stochastic z tablic szeregu z APIService (ten sam format odpowiedzi)"""
+        import numpy as np
+        from services.series_cache import PriceSeries
+        from services.chart_data_service import ChartDataService
+        from services.response_service import MACD_FIELDS, STOCHASTIC_FIELDS
+        closes = 50 + 10 * np.sin(np.arange(120) / 7) + np.arange(120) / 10
+        rows = [(date(2020, 1, 3) + timedelta(weeks=i), float(close), float(close), 1.0) for i, close in enumerate(closes)]
+        rows[40] = (rows[40][0], rows[40][1], None, 1.0)  # okres bez ceny znormalizowanej
+        series = PriceSeries.from_rows(1, '1W', rows)
+        db_service = Mock()
+        db_service.get_price_series.return_value = series
+        service = ChartDataService(db_service)
+        with patch('services.api_service.db'):
+            from services.api_service import APIService
+            api_service = APIService()
+        price_data = [point for point in series.to_price_data('normalized') if point['close'] is not None]
+
+        def expected_columns(records, fields):
+            columns = {'dates': [record['date'] for record in records]}
+            for key, (source, decimals) in fields.items():
+                columns[key] = [None if np.isnan(record[source]) else float(np.round(record[source], decimals))
+                                for record in records]
+            return columns
+
+        macd = service.build(self.etf, 'TST', 'weekly-macd', columnar=True)['data']['macd']
+        self.assertEqual(macd, expected_columns(api_service.calculate_macd(price_data), MACD_FIELDS))
+        stochastic = service.build(self.etf, 'TST', 'weekly-stochastic-short', columnar=True)['data']['stochastic']
+        expected = api_service.calculate_stochastic_oscillator(price_data, 9, 3, 3)
+        self.assertEqual(stochastic, expected_columns(expected, STOCHASTIC_FIELDS))
+
+    def test_columnar_and_records_formats(self):
+        """Test formatu domyślnego (lista słowników) i kolumnowego sekcji wskaźnika"""
+        columns = self.service.build(self.etf, 'TST', 'weekly-macd', columnar=True)['data']['macd']
+        records = self.service.build(self.etf, 'TST', 'weekly-macd', columnar=False)['data']['macd']
+
+        self.assertEqual(len(records), len(columns['dates']))
+        self.assertEqual(set(records[0]), {'date', 'macd_line', 'signal_line', 'histogram', 'current_price'})
+        self.assertEqual(records[-1]['date'], columns['dates'][-1])
+        self.assertEqual(records[-1]['macd_line'], columns['macd_line'][-1])
+        self.assertEqual(records[-1]['macd_line'], round(records[-1]['macd_line'], 4))
+
+    def test_section_error_does_not_stop_bundle(self):
+        """Test błędu jednej sekcji (brak danych) bez przerywania pozostałych"""
+        results = {section: (body, status) for section, body, status in
+                   self.service.build_many(self.etf, 'tst', ['daily-macd', 'weekly-prices'])}
+
+        self.assertEqual(results['daily-macd'][1], 404)
+        self.assertEqual(results['daily-macd'][0]['error'], 'Brak danych cen dziennych dla tst')
+        self.assertEqual(results['weekly-prices'][1], 200)
+        self.assertEqual(results['weekly-prices'][0]['data']['prices'][0],
+                         {'date': '2024-01-05', 'close_price': 10.0, 'volume': None})
+
+    def test_window_slice_and_cursor(self):
+        """Test wycinania zakresu dat i kursora następnej strony (rosnąco, od najnowszej, miesiące)"""
+        from services.chart_data_service import DateWindow, _window_slice
+        dates = [(date(2024, 1, 1) + timedelta(days=i)).isoformat() for i in range(10)]
+
+        window = DateWindow(start=date(2024, 1, 3), limit=3)
+        self.assertEqual(_window_slice(dates, window), (2, 5, '2024-01-05'))
+        self.assertEqual(_window_slice(dates, window._replace(after=date(2024, 1, 8))), (8, 10, None))
+
+        newest_first = dates[::-1]
+        begin, stop, cursor = _window_slice(newest_first, DateWindow(end=date(2024, 1, 8), limit=2), True)
+        self.assertEqual((newest_first[begin:stop], cursor), (['2024-01-08', '2024-01-07'], '2024-01-07'))
+        begin, stop, cursor = _window_slice(newest_first, DateWindow(after=date(2024, 1, 7)), True)
+        self.assertEqual(newest_first[begin:stop][0], '2024-01-06')
+
+        months = ['2024-01', '2024-02', '2024-03', '2024-04']
+        self.assertEqual(_window_slice(months, DateWindow(start=date(2024, 2, 20), end=date(2024, 3, 1))),
+                         (1, 3, None))
+
+class TestDownsampling(unittest.TestCase):
+    """Testy zmniejszania szeregów wykresów (LTTB)"""
+
+    def test_lttb_keeps_endpoints_and_extremes(self):
+        """Test liczby punktów, końców szeregu i ekstremów"""
+        import numpy as np
+        from services.downsampling import lttb_indices, downsample_columns
+        values = np.sin(np.linspace(0, 12, 2000)) * np.linspace(1, 2, 2000)
+        indices = lttb_indices(values, 100)
+
+        self.assertEqual(len(indices), 100)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual((indices[0], indices[-1]), (0, 1999))
+        self.assertEqual(list(lttb_indices(values[:50], 100)), list(range(50)))
+
+        columns = downsample_columns({'dates': list(range(2000)), 'close': values.tolist()}, 100, 'close')
+        self.assertIn(int(np.argmax(values)), columns['dates'])
+        self.assertIn(int(np.argmin(values)), columns['dates'])
+
+    def test_crossovers_preserved(self):
+        """Test zachowania punktów przecięcia linii MACD i sygnału"""
+        import numpy as np
+        from services.downsampling import downsample_columns
+        macd = [None] * 10 + [float(v) for v in np.sin(np.arange(990) / 50)]
+        signal = [None] * 10 + [0.0] * 990
+        columns = downsample_columns({'dates': list(range(1000)), 'macd_line': macd, 'signal_line': signal},
+                                     20, 'macd_line', ('macd_line', 'signal_line'))
+
+        dates = set(columns['dates'])
+        crossings = [i for i in range(11, 1000) if np.sign(macd[i]) != np.sign(macd[i - 1]) and macd[i] != 0]
+        self.assertTrue(crossings)
+        for i in crossings:
+            self.assertTrue({i - 1, i} <= dates)
+        self.assertEqual(len(columns['macd_line']), len(columns['dates']))
+
+class TestBacktest(unittest.TestCase):
+    """Testy backtestu portfeli DCA"""
+
+    def setUp(self):
+        import numpy as np
+        from services.series_cache import PriceSeries
+        from services.backtest_service import BacktestService
+        from services.panel_service import PanelService
+        rng = np.random.default_rng(7)
+        closes = {
+            1: 20 * np.cumprod(1 + rng.normal(0.005, 0.04, 36)),
+            2: 50 * np.cumprod(1 + rng.normal(0.003, 0.02, 30))
+        }
+        starts = {1: date(2020, 1, 31), 2: date(2020, 7, 31)}
+
+        def series(etf_id, timeframe):
+            rows = [(date(starts[etf_id].year + (starts[etf_id].month + i - 1) // 12,
+                          (starts[etf_id].month + i - 1) % 12 + 1, 28), float(c), float(c), 1.0)
+                    for i, c in enumerate(closes[etf_id])]
+            return PriceSeries.from_rows(etf_id, timeframe, rows)
+
+        self.db_service = Mock()
+        self.db_service.get_all_etfs.return_value = [Mock(id=1, ticker='AAA'), Mock(id=2, ticker='BBB')]
+        self.db_service.get_price_series.side_effect = series
+        self.db_service.get_dividends_for_etfs.return_value = [
+            (etf_id, date(2020 + m // 12, m % 12 + 1, 10), 0.15 * etf_id) for etf_id in (1, 2) for m in range(2, 36, 3)
+        ]
+        self.service = BacktestService(self.db_service, PanelService(self.db_service))
+
+    def test_vectorized_run_matches_loop(self):
+        """Test zgodności symulacji wektorowej z pętlą miesiąc po miesiącu"""
+        import numpy as np
+        panel = self.service.load_panel(['AAA', 'BBB'])
+        self.assertEqual(panel.month_strings()[0], '2020-07')
+        self.assertEqual(len(panel), 30)
+        weights = np.array([[1, 0], [0.6, 0.4], [1, 3]])
+
+        for reinvest in (True, False):
+            result = self.service.run(panel, weights, 500, reinvest, tax_rate=19)
+            for p, row in enumerate(weights / weights.sum(axis=1, keepdims=True)):
+                units, cash = np.zeros(2), 0.0
+                for t in range(len(panel)):
+                    paid = units * panel.dividends[t] * 0.81
+                    if reinvest:
+                        units = units + paid / panel.prices[t]
+                    else:
+                        cash += paid.sum()
+                    units = units + 500 * row / panel.prices[t]
+                self.assertAlmostEqual(result['equity'][-1, p], (units * panel.prices[-1]).sum() + cash, places=6)
+
+    def test_irr_and_window(self):
+        """Test IRR (zerowe przy stałej wartości, dodatnie przy zysku) i wycinka okresu"""
+        import numpy as np
+        from services.backtest_service import dca_irr, BacktestError
+        irr = dca_irr(100, np.array([1200.0, 1300.0]), 12)
+        self.assertAlmostEqual(irr[0], 0.0, places=6)
+        self.assertGreater(irr[1], 0.1)
+
+        panel = self.service.load_panel(['AAA', 'BBB']).window(date(2021, 1, 1), date(2021, 12, 31))
+        self.assertEqual((panel.month_strings()[0], len(panel)), ('2021-01', 12))
+        with self.assertRaises(BacktestError):
+            self.service.run(panel, np.array([[1, 0, 0]]))
+
+
+class TestIndicatorKernels(unittest.TestCase):
+    """Testy wektorowych wskaźników dla wielu szeregów naraz"""
+
+    def test_matches_single_series_calculations(self):
+        """Test zgodności MACD i Stochastic z obliczeniami APIService dla szeregów różnej długości"""
+        import numpy as np
+        from services.indicators import align_right, macd, stochastic, last_cross
+        with patch('services.api_service.db'):
+            from services.api_service import APIService
+            api_service = APIService()
+        rng = np.random.default_rng(11)
+        series = [50 * np.cumprod(1 + rng.normal(0, 0.03, n)) for n in (10, 40, 150)]
+        closes = align_right(series)
+        macd_values = macd(closes, 8, 17, 9)
+        stochastic_values = stochastic(closes, 36, 12, 12)
+
+        for column, values in enumerate(series):
+            prices = [{'date': (date(2020, 1, 3) + timedelta(weeks=i)).isoformat(), 'close': float(v)}
+                      for i, v in enumerate(values)]
+            expected_macd = api_service.calculate_macd(prices, 8, 17, 9)
+            expected_stochastic = api_service.calculate_stochastic_oscillator(prices, 36, 12, 12)
+            if not expected_macd:
+                self.assertTrue(np.isnan(macd_values['macd_line'][-1, column]))
+                continue
+            self.assertAlmostEqual(macd_values['signal_line'][-1, column], expected_macd[-1]['signal_line'], places=10)
+            if expected_stochastic:
+                count = len(expected_stochastic)
+                np.testing.assert_allclose(stochastic_values['d_percent'][-count:, column],
+                                           [point['d_percent'] for point in expected_stochastic], atol=1e-9)
+            else:
+                self.assertTrue(np.isnan(stochastic_values['k_percent'][-1, column]))
+
+        self.assertEqual(last_cross(np.array([[1.0, -1.0, 0.0], [2.0, 1.0, -1.0]]), np.zeros((2, 3))),
+                         [None, 'bullish_cross', 'bearish_cross'])
+
+    def test_indicator_registry_spec(self):
+        """Test specyfikacji wskaźników rejestru i wspólnych obliczeń pośrednich"""
+        import numpy as np
+        from services.indicators import macd
+        from services.indicator_registry import (IndicatorError, KernelCache, compute_indicators,
+                                                 parse_indicator_spec)
+        specs = parse_indicator_spec('macd:12,26,9; stochastic:9,3,3 ;rsi;bb:20,2.5;ema:26;macd:12,26,9')
+        self.assertEqual([spec.label for spec in specs], ['macd:12,26,9', 'stoch:9,3,3', 'rsi:14', 'bb:20,2.5', 'ema:26'])
+        self.assertEqual(specs[3].parameters(), {'period': 20, 'width': 2.5})
+        for invalid in ('', 'foo:1', 'macd:26,12', 'rsi:0', 'rsi:1.5', 'sma:1,2'):
+            with self.assertRaises(IndicatorError):
+                parse_indicator_spec(invalid)
+
+        close = 50 * np.cumprod(1 + np.random.default_rng(3).normal(0, 0.02, 120))
+        cache = KernelCache(close)
+        results = compute_indicators(close, specs, cache)
+        np.testing.assert_array_equal(results['macd:12,26,9']['signal_line'], macd(close, 12, 26, 9)['signal_line'])
+        self.assertEqual(results['ema:26']['ema'][-1], cache.ema(26)[-1])
+        self.assertEqual(sorted(key for key in cache._values if key[0] == 'ema'), [('ema', 12), ('ema', 26)])
+        rsi = results['rsi:14']['rsi']
+        self.assertTrue(np.isnan(rsi[13]) and 0 <= rsi[14] <= 100)
+        bands = results['bb:20,2.5']
+        self.assertTrue(np.all(bands['upper'][19:] >= bands['lower'][19:]))
+
+    def test_parameter_sweep(self):
+        """Test sweepu parametrów: kolumny jednego przebiegu równe pojedynczym wskaźnikom, statystyki sygnałów"""
+        import numpy as np
+        from models import ETF
+        from services.indicators import macd, signal_events, stochastic
+        from services.series_cache import PriceSeries
+        from services.sweep_service import SweepError, SweepService, sweep_lines
+        rng = np.random.default_rng(5)
+        closes = [50 * np.cumprod(1 + rng.normal(0, 0.03, n)) for n in (60, 200)]
+        close = closes[1]
+
+        combos = np.array([[9, 3, 3], [14, 3, 5], [9, 5, 3]])
+        k_percent, d_percent = sweep_lines('stoch', close, combos)
+        for column, params in enumerate(combos):
+            np.testing.assert_allclose(k_percent[:, column], stochastic(close, *params)['k_percent'], atol=1e-9)
+            np.testing.assert_allclose(d_percent[:, column], stochastic(close, *params)['d_percent'], atol=1e-9)
+        combos = np.array([[8, 17, 9], [12, 26, 9], [12, 17, 5]])
+        macd_line, signal_line = sweep_lines('macd', close, combos)
+        for column, params in enumerate(combos):
+            np.testing.assert_allclose(signal_line[:, column], macd(close, *params)['signal_line'], atol=1e-12)
+
+        db_service = Mock()
+        db_service.get_all_etfs.return_value = [ETF(id=1, ticker='AAA'), ETF(id=2, ticker='BBB')]
+        db_service.get_price_series.side_effect = lambda etf_id, timeframe: PriceSeries.from_rows(etf_id, timeframe, [
+            (date(2020, 1, 3) + timedelta(weeks=i), float(v), float(v), 1.0) for i, v in enumerate(closes[etf_id - 1])
+        ])
+        result = SweepService(db_service).run('macd', {'fast': [8, 12, 30], 'slow': [26]}, horizons=[4])
+        self.assertEqual(result['tickers'], ['AAA', 'BBB'])
+        self.assertEqual([r['label'] for r in result['results']], ['macd:8,26,9', 'macd:12,26,9'])
+        expected = 0
+        for values in closes:
+            lines = macd(values, 12, 26, 9)
+            events = signal_events('crossover_bullish', lines['macd_line'], lines['signal_line'])
+            expected += int(events[:-4].sum())
+        self.assertEqual(result['results'][1]['forward_returns']['4']['count'], expected)
+
+        for arguments in (('rsi', {}), ('stoch', {'foo': [1]}), ('stoch', {'lookback': list(range(1, 600))})):
+            with self.assertRaises(SweepError):
+                SweepService(db_service).run(*arguments)
+        with self.assertRaises(SweepError) as error:
+            SweepService(db_service).run('stoch', {}, tickers=['XXX'])
+        self.assertEqual(error.exception.status_code, 404)
+
+
+class TestPanelService(unittest.TestCase):
+    """Testy paneli cen uniwersum (okresy x tickery)"""
+
+    def setUp(self):
+        from services.series_cache import PriceSeries
+        # AAA notuje w piątki, BBB w czwartki (święto) i zaczyna później, z luką w jednym tygodniu
+        aaa = [(date(2024, 1, 5) + timedelta(weeks=i), 10.0 + i, 10.0 + i, 1.0) for i in range(8)]
+        bbb = [(date(2024, 1, 18) + timedelta(weeks=i), 50.0 + i, 50.0 + i, 1.0) for i in (0, 1, 3, 4)]
+        rows = {1: aaa, 2: bbb, 3: []}
+        self.db_service = Mock()
+        self.db_service.get_all_etfs.return_value = [Mock(id=1, ticker='AAA'), Mock(id=2, ticker='BBB'),
+                                                     Mock(id=3, ticker='CCC')]
+        self.db_service.get_price_series.side_effect = lambda etf_id, timeframe: (
+            PriceSeries.from_rows(etf_id, timeframe, rows[etf_id] if timeframe == '1W' else []))
+        self.versions = Mock()
+        self.versions.universe_version.return_value = 'v1'
+
+    def test_weekly_panel_aligned_by_period(self):
+        """Test wyrównania tygodni o różnych dniach notowań, uzupełniania luk i zakresu wspólnego"""
+        import numpy as np
+        from services.panel_service import PanelService, PanelError
+        panel = PanelService(self.db_service, self.versions).get('1W')
+
+        self.assertEqual(len(panel), 8)
+        self.assertEqual(panel.date_strings()[2], '2024-01-19')
+        close = panel.close[:, panel.columns(['BBB'])[0]]
+        self.assertTrue(np.isnan(close[:2]).all())
+        self.assertEqual(close[2:7].tolist(), [50.0, 51.0, 51.0, 53.0, 54.0])
+        self.assertEqual(panel.common_range(panel.columns(['AAA', 'BBB'])), slice(2, 8))
+        with self.assertRaises(PanelError):
+            panel.common_range(panel.columns(['CCC']))
+        with self.assertRaises(PanelError):
+            panel.columns(['XXX'])
+
+    def test_panel_file_shared_and_rebuilt_on_new_version(self):
+        """Test odczytu panelu z pliku npz przez inny proces i przebudowy po zmianie wersji danych"""
+        import tempfile
+        import numpy as np
+        from services.panel_service import PanelService
+        with tempfile.TemporaryDirectory() as directory:
+            writer = PanelService(self.db_service, self.versions, directory)
+            self.assertEqual(writer.refresh(), 3)
+            self.assertEqual(writer.refresh(), 0)
+
+            reader = PanelService(Mock(), self.versions, directory)
+            panel = reader.get('1W')
+            self.assertEqual(reader.stats()['loads'], 1)
+            self.assertEqual(panel.tickers, ['AAA', 'BBB', 'CCC'])
+            np.testing.assert_array_equal(panel.close, writer.get('1W').close)
+
+            self.versions.universe_version.return_value = 'v2'
+            self.assertEqual(writer.refresh(), 3)
+            reader.get('1W')
+            self.assertEqual(reader.stats()['loads'], 2)
+
+
+class TestCorrelationAnalytics(unittest.TestCase):
+    """Testy macierzy korelacji uniwersum ETF"""
+
+    def test_pairwise_matrices_match_pandas(self):
+        """Test korelacji/kowariancji par z obserwacjami wspólnymi (jak pandas) i kolejności klastrowej"""
+        import numpy as np
+        import pandas as pd
+        from services.analytics_service import correlation_matrices, cluster_order
+        rng = np.random.default_rng(3)
+        factors = rng.normal(size=(300, 2))
+        # Dwie grupy ETF sterowane różnymi czynnikami, przeplecione kolumnami
+        returns = np.column_stack([factors[:, i % 2] + rng.normal(scale=0.3, size=300) for i in range(6)])
+        returns[:120, 1] = np.nan
+
+        correlation, covariance, observations = correlation_matrices(returns)
+        frame = pd.DataFrame(returns)
+        np.testing.assert_allclose(correlation, frame.corr().values, atol=1e-12)
+        np.testing.assert_allclose(covariance, frame.cov().values, atol=1e-12)
+        self.assertEqual(observations[0, 1], 180)
+
+        order = cluster_order(correlation).tolist()
+        self.assertEqual(sorted(order[:3]), [0, 2, 4])
+        self.assertEqual(sorted(order[3:]), [1, 3, 5])
+
+    def test_service_cached_until_panel_version_changes(self):
+        """Test okna kroczącego, błędów parametrów i cache do zmiany wersji panelu"""
+        from services.panel_service import PanelService
+        from services.series_cache import PriceSeries
+        from services.analytics_service import AnalyticsService, AnalyticsError
+        rows = {etf_id: [(date(2023, 1, 6) + timedelta(weeks=i), 10.0 + etf_id * ((i * 7) % 5) + i,
+                          10.0 + etf_id * ((i * 7) % 5) + i, 1.0) for i in range(60)] for etf_id in (1, 2, 3)}
+        db_service = Mock()
+        db_service.get_all_etfs.return_value = [Mock(id=i, ticker=t) for i, t in ((1, 'AAA'), (2, 'BBB'), (3, 'CCC'))]
+        db_service.get_price_series.side_effect = lambda etf_id, timeframe: PriceSeries.from_rows(
+            etf_id, timeframe, rows[etf_id])
+        versions = Mock()
+        versions.universe_version.return_value = 'v1'
+        service = AnalyticsService(PanelService(db_service, versions))
+
+        result = service.correlation('1W', window=26, step=4, order='cluster')
+        self.assertEqual(result['periods'], 59)
+        self.assertEqual(sorted(result['tickers']), ['AAA', 'BBB', 'CCC'])
+        self.assertEqual(result['rolling']['dates'][-1], result['end'])
+        self.assertEqual(len(result['rolling']['average_correlation']), len(result['rolling']['dates']))
+        self.assertIs(service.correlation('1W', window=26, step=4, order='cluster'), result)
+
+        versions.universe_version.return_value = 'v2'
+        self.assertIsNot(service.correlation('1W', window=26, step=4, order='cluster'), result)
+        with self.assertRaises(AnalyticsError):
+            service.correlation('1D')
+        with self.assertRaises(AnalyticsError) as error:
+            service.correlation('1W', tickers=['AAA', 'XXX'])
+        self.assertEqual(error.exception.status_code, 404)
+
+
+class TestDialectNeutralQueries(unittest.TestCase):
+    """Testy zapytań przenośnych między SQLite i PostgreSQL"""
+
+    DATABASE_URL = 'sqlite://'
+
+    def setUp(self):
+        """Przygotowanie bazy testowej"""
+        from flask import Flask
+        from models import db, ETF
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = self.DATABASE_URL
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.drop_all()
+        db.create_all()
+
+        etf = ETF(ticker='TST', name='Test ETF')
+        db.session.add(etf)
+        db.session.commit()
+        self.etf_id = etf.id
+
+        with patch('services.database_service.APIService'):
+            from services.database_service import DatabaseService
+            self.db_service = DatabaseService()
+
+    def tearDown(self):
+        """Sprzątanie bazy testowej"""
+        from models import db
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_monthly_prices_last_price_per_month(self):
+        """Test wyboru ostatniej ceny w miesiącu"""
+        from models import db, ETFPrice
+        for day, price in [(date(2024, 1, 10), 10.0), (date(2024, 1, 31), 11.0),
+                           (date(2024, 2, 15), 12.0), (date(2024, 2, 29), 13.0),
+                           (date(2024, 3, 1), 14.0)]:
+            db.session.add(ETFPrice(etf_id=self.etf_id, date=day, close_price=price, normalized_close_price=price))
+        db.session.commit()
+
+        prices = self.db_service.get_monthly_prices(self.etf_id)
+        self.assertEqual([p.date for p in prices], [date(2024, 1, 31), date(2024, 2, 29), date(2024, 3, 1)])
+        self.assertEqual([p.close_price for p in prices], [11.0, 13.0, 14.0])
+
+    def test_weekly_prices_last_price_per_week(self):
+        """Test wyboru ostatniej ceny w tygodniu"""
+        from models import db, ETFWeeklyPrice
+        for day, price in [(date(2024, 1, 1), 10.0), (date(2024, 1, 5), 11.0), (date(2024, 1, 12), 12.0)]:
+            db.session.add(ETFWeeklyPrice(etf_id=self.etf_id, date=day, close_price=price,
+                                          normalized_close_price=price, year=day.isocalendar()[0],
+                                          week_of_year=day.isocalendar()[1]))
+        db.session.commit()
+
+        prices = self.db_service.get_weekly_prices(self.etf_id)
+        self.assertEqual([p.date for p in prices], [date(2024, 1, 5), date(2024, 1, 12)])
+
+    def test_upsert_daily_price(self):
+        """Test upsertu ceny dziennej po stronie serwera"""
+        from models import ETFDailyPrice
+        self.assertTrue(self.db_service.add_daily_price_record(self.etf_id, 10.0))
+        self.assertTrue(self.db_service.add_daily_price_record(self.etf_id, 12.5))
+
+        records = ETFDailyPrice.query.filter_by(etf_id=self.etf_id).all()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0].close_price, 12.5)
+
+    def test_upsert_refreshes_last_updated(self):
+        """Test odświeżenia last_updated przy aktualizacji ceny dnia przez upsert"""
+        from models import db, ETFPrice, ETFDailyPrice
+        stale = datetime(2020, 1, 1)
+        for model, add_record in ((ETFPrice, self.db_service.add_price_history_record),
+                                  (ETFDailyPrice, self.db_service.add_daily_price_record)):
+            self.assertTrue(add_record(self.etf_id, 10.0))
+            db.session.execute(model.__table__.update().values(last_updated=stale))
+            db.session.commit()
+            self.assertTrue(add_record(self.etf_id, 12.5))
+            db.session.expire_all()
+            record = model.query.filter_by(etf_id=self.etf_id).one()
+            self.assertEqual(record.close_price, 12.5)
+            self.assertGreater(record.last_updated, stale)
+
+    def test_upsert_statement_postgresql(self):
+        """Test instrukcji upsert skompilowanej dla dialektu PostgreSQL"""
+        from sqlalchemy.dialects import postgresql
+        from models import ETFDailyPrice
+        from services.storage_service import upsert_statement
+        session = Mock()
+        session.get_bind.return_value.dialect.name = 'postgresql'
+
+        update = str(upsert_statement(session, ETFDailyPrice, ['etf_id', 'date'], ['close_price', 'last_updated'])
+                     .compile(dialect=postgresql.dialect()))
+        self.assertIn('INSERT INTO etf_daily_prices', update)
+        self.assertIn('ON CONFLICT (etf_id, date) DO UPDATE SET close_price = excluded.close_price, '
+                      'last_updated = excluded.last_updated', update)
+
+        skip = str(upsert_statement(session, ETFDailyPrice, ['etf_id', 'date'])
+                   .compile(dialect=postgresql.dialect()))
+        self.assertIn('ON CONFLICT (etf_id, date) DO NOTHING', skip)
+
+    def test_save_historical_prices_skips_existing(self):
+        """Test zapisu cen historycznych bez duplikatów"""
+        data = [{'date': '2024-01-02', 'close': 10.0}, {'date': date(2024, 1, 3), 'close': 11.0}]
+        self.assertEqual(self.db_service._save_historical_prices_to_db(self.etf_id, data), 2)
+        data.append({'date': '2024-01-04', 'close': 12.0})
+        self.assertEqual(self.db_service._save_historical_prices_to_db(self.etf_id, data), 1)
+
+    def test_price_series_cache_invalidated_on_commit(self):
+        """Test unieważnienia cache szeregów po zapisie nowej ceny"""
+        from models import db, ETFDailyPrice
+        from services.series_cache import series_cache
+        series_cache.invalidate()
+        self.assertEqual(len(self.db_service.get_price_series(self.etf_id, '1D')), 0)
+
+        today = date.today()
+        db.session.add(ETFDailyPrice(etf_id=self.etf_id, date=today, close_price=10.0, normalized_close_price=10.0,
+                                     year=today.year, month=today.month, day=today.day))
+        db.session.commit()
+
+        series = self.db_service.get_price_series(self.etf_id, '1D')
+        self.assertEqual(series.values('close'), [10.0])
+        self.assertEqual(series.date_strings(), [today.strftime('%Y-%m-%d')])
+
+    def test_job_log_metadata_json(self):
+        """Test przenośnego typu JSON w SystemLog"""
+        from models import db, SystemLog
+        log = SystemLog.create_job_log('test_job', True, metadata={'etfs': 3, 'nested': {'a': [1, 2]}})
+        db.session.add(log)
+        db.session.commit()
+        self.assertEqual(db.session.get(SystemLog, log.id).metadata_json['nested']['a'], [1, 2])
+
+    def test_date_range_keyset_and_export(self):
+        """Test zakresu dat, stronicowania keyset dywidend i eksportu stronami"""
+        from models import db, ETFDividend
+        for month in range(1, 13):
+            day = date(2024, month, 15)
+            db.session.add(ETFDividend(etf_id=self.etf_id, payment_date=day, amount=0.1 * month,
+                                       normalized_amount=0.1 * month))
+        db.session.commit()
+
+        first = self.db_service.get_etf_dividends(self.etf_id, 5, start=date(2024, 3, 1))
+        self.assertEqual([d.payment_date.month for d in first], [12, 11, 10, 9, 8])
+        second = self.db_service.get_etf_dividends(self.etf_id, 5, start=date(2024, 3, 1),
+                                                   after=first[-1].payment_date)
+        self.assertEqual([d.payment_date.month for d in second], [7, 6, 5, 4, 3])
+
+        rows = list(self.db_service.iter_export_rows('dividends', self.etf_id, end=date(2024, 10, 31), batch_size=4))
+        columns = self.db_service.export_columns('dividends')
+        self.assertEqual([row[columns.index('payment_date')].month for row in rows], list(range(1, 11)))
+
+    def test_dividend_yearly_aggregates_maintained(self):
+        """Test agregatów rocznych dywidend przy dodaniu, upsercie, zmianie daty i usunięciu"""
+        from models import db, ETFDividend, ETFDividendYearly
+        from services.storage_service import upsert_rows
+        for payment_date, amount in [(date(2023, 3, 1), 0.4), (date(2023, 9, 1), 0.6), (date(2024, 3, 1), 0.5)]:
+            db.session.add(ETFDividend(etf_id=self.etf_id, payment_date=payment_date, amount=amount * 2,
+                                       normalized_amount=amount))
+        db.session.commit()
+        upsert_rows(db.session, ETFDividend, [{'etf_id': self.etf_id, 'payment_date': date(2024, 9, 1),
+                                              'amount': 1.4, 'normalized_amount': 0.7}],
+                    ['etf_id', 'payment_date'], ['amount', 'normalized_amount'])
+        db.session.commit()
+
+        yearly = {row.year: row for row in self.db_service.get_dividend_yearly(self.etf_id)}
+        self.assertEqual(sorted(yearly), [2023, 2024])
+        self.assertEqual(yearly[2023].dividend_count, 2)
+        self.assertAlmostEqual(yearly[2023].amount_sum, 2.0)
+        self.assertAlmostEqual(yearly[2024].normalized_average, 0.6)
+
+        # Zmiana roku wypłaty i usunięcie zbiorcze
+        dividend = ETFDividend.query.filter_by(etf_id=self.etf_id, payment_date=date(2023, 3, 1)).first()
+        dividend.payment_date = date(2022, 3, 1)
+        db.session.commit()
+        ETFDividend.query.filter(ETFDividend.payment_date >= date(2024, 1, 1)).delete()
+        db.session.commit()
+        yearly = {row.year: row.dividend_count for row in self.db_service.get_dividend_yearly(self.etf_id)}
+        self.assertEqual(yearly, {2022: 1, 2023: 1})
+
+        # Wypełnienie tabeli dla istniejącej bazy
+        ETFDividendYearly.query.delete()
+        db.session.commit()
+        self.assertEqual(self.db_service.ensure_dividend_yearly(), 2)
+
+    def test_dividend_yearly_aggregates_many_etfs(self):
+        """Test agregatów przy zmianie dywidend ponad 1000 ETF w jednej transakcji"""
+        from models import db, ETF, ETFDividend, ETFDividendYearly
+        etf_ids = [self.etf_id + i for i in range(1, 1201)]
+        db.session.execute(ETF.__table__.insert(), [{'id': etf_id, 'ticker': f'T{etf_id}', 'name': 'Test ETF'}
+                                                    for etf_id in etf_ids])
+        for etf_id in etf_ids:
+            db.session.add(ETFDividend(etf_id=etf_id, payment_date=date(2023, 3, 1), amount=1.0,
+                                       normalized_amount=1.0))
+        db.session.commit()
+        self.assertEqual(ETFDividendYearly.query.count(), len(etf_ids))
+
+    def test_dividend_summaries_from_aggregates(self):
+        """Test DSG, sumy ostatnich dywidend i prognozy wszystkich ETF z agregatów"""
+        from models import db, ETFDividend
+        last_year = datetime.now().year - 1
+        for year, amount in [(last_year - 2, 0.3), (last_year - 1, 0.4), (last_year, 0.5)]:
+            for month in (3, 6, 9, 12):
+                db.session.add(ETFDividend(etf_id=self.etf_id, payment_date=date(year, month, 15), amount=amount,
+                                           normalized_amount=amount))
+        db.session.add(ETFDividend(etf_id=self.etf_id, payment_date=date(last_year + 1, 3, 15), amount=0.6,
+                                   normalized_amount=0.6))
+        db.session.commit()
+
+        summary = self.db_service.get_dividend_summaries()[self.etf_id]
+        self.assertEqual(summary['last_dividends_sum'], 2.1)
+        self.assertEqual(summary['dividend_growth_forecast'], 5.0)
+        self.assertEqual(self.db_service.calculate_dividend_growth_forecast(self.etf_id), 5.0)
+
+        with patch('services.api_service.db'):
+            from services.api_service import APIService
+            dsg = APIService().calculate_dividend_streak_growth('TST', yearly_averages=summary['yearly_averages'])
+        self.assertEqual(dsg['current_streak'], 3)
+        self.assertEqual(dsg['streak_start_year'], last_year + 1)
+
+    def test_indicator_snapshots_and_screener(self):
+        """Test odświeżania migawek wskaźników tylko po zmianie danych i zapytań screenera"""
+        from models import db, ETF, ETFWeeklyPrice, ETFIndicatorSnapshot
+        from services.screener_service import ScreenerService, ScreenerError, parse_screener_query
+        import services.data_version_service  # noqa: F401 - wersje danych ETF (jak w aplikacji)
+        etf = db.session.get(ETF, self.etf_id)
+        etf.current_yield = 4.5
+        start = date.today() - timedelta(weeks=60)
+        start -= timedelta(days=start.weekday() - 4)
+        for i in range(55):
+            day = start + timedelta(weeks=i)
+            price = 100.0 - i if i < 50 else 50.0 + (i - 49) * 3
+            db.session.add(ETFWeeklyPrice(etf_id=self.etf_id, date=day, close_price=price,
+                                          normalized_close_price=price, year=day.year,
+                                          week_of_year=day.isocalendar()[1]))
+        db.session.commit()
+
+        with patch('services.api_service.db'):
+            from services.api_service import APIService
+            service = ScreenerService(self.db_service, APIService())
+        self.assertEqual(service.ensure(), 3)
+        self.assertEqual(service.refresh(), 0)
+
+        weekly = db.session.get(ETFIndicatorSnapshot, (self.etf_id, '1W'))
+        self.assertEqual(weekly.macd_trend, 'bullish')
+        self.assertAlmostEqual(weekly.distance_from_high, (65.0 / weekly.high_52w - 1) * 100, places=1)
+        self.assertIsNone(db.session.get(ETFIndicatorSnapshot, (self.etf_id, '1M')).as_of)
+
+        _, conditions = parse_screener_query('timeframe=1W&stoch_short_k%3E50&macd=bullish&dividend_yield>=4')
+        self.assertEqual([row['ticker'] for row in service.screen('1W', conditions)['results']], ['TST'])
+        _, conditions = parse_screener_query('stoch_k>90')
+        self.assertEqual(service.screen('1W', conditions, sort='dividend_yield')['count'], 0)
+        with self.assertRaises(ScreenerError):
+            parse_screener_query('unknown<1')
+
+        # Nowa cena zmienia wersję danych ETF - migawki są przeliczane
+        day = start + timedelta(weeks=55)
+        db.session.add(ETFWeeklyPrice(etf_id=self.etf_id, date=day, close_price=70.0, normalized_close_price=70.0,
+                                      year=day.year, week_of_year=day.isocalendar()[1]))
+        db.session.commit()
+        self.assertEqual(service.refresh(), 3)
+
+        db.session.delete(db.session.get(ETF, self.etf_id))
+        ETFWeeklyPrice.query.delete()
+        db.session.commit()
+        service.refresh()
+        self.assertEqual(ETFIndicatorSnapshot.query.count(), 0)
+
+
+    def test_batched_alert_evaluation(self):
+        """Test wspólnego liczenia wskaźników reguł alertów i zapisu bez powtórzeń"""
+        from types import SimpleNamespace
+        from config import Config
+        from models import db, ETF, ETFWeeklyPrice, AlertConfig, AlertHistory, SystemLog
+        from services.notification_service import NotificationService
+        start = date.today() - timedelta(weeks=60)
+        start -= timedelta(days=start.weekday() - 4)
+        for i in range(52):
+            day = start + timedelta(weeks=i)
+            price = 100.0 - i if i < 51 else 70.0
+            db.session.add(ETFWeeklyPrice(etf_id=self.etf_id, date=day, close_price=price,
+                                          normalized_close_price=price, year=day.year,
+                                          week_of_year=day.isocalendar()[1]))
+        db.session.get(ETF, self.etf_id).current_price = 70.0
+        rules = [
+            ('macd-up', 'technical_indicator', 'macd', 'crossover_bullish', {'timeframe': '1W'}),
+            ('macd-down', 'technical_indicator', 'macd', 'crossover_bearish', {'timeframe': '1W'}),
+            ('stoch-above', 'technical_indicator', 'stochastic', 'level_above',
+             {'timeframe': '1W', 'threshold': 20, 'parameters': {'k': 9, 'd': 3, 'smooth': 3}}),
+            ('stoch-below', 'technical_indicator', 'stochastic', 'level_below',
+             {'timeframe': '1W', 'threshold': 20, 'parameters': {'k': 9, 'd': 3, 'smooth': 3}}),
+            ('price-above', 'price', None, None, {'condition': 'above', 'threshold': 60}),
+            ('price-below', 'price', None, None, {'condition': 'below', 'threshold': 60}),
+            ('logs', 'log_error', None, None, {}),
+        ]
+        for name, alert_type, indicator, condition, conditions in rules:
+            db.session.add(AlertConfig(name=name, type=alert_type, indicator=indicator, alert_type=condition,
+                                       etf_ticker=None if alert_type == 'log_error' else 'TST',
+                                       conditions=conditions))
+        db.session.add(SystemLog(action='update_etf', level='ERROR', details='Timeout'))
+        db.session.commit()
+
+        config = SimpleNamespace(TECHNICAL_INDICATORS=Config.TECHNICAL_INDICATORS, SLACK_WEBHOOK_URL=None)
+        with patch('services.notification_service.APIService'), \
+                patch('services.notification_service.DatabaseService', return_value=self.db_service):
+            service = NotificationService(config)
+        self.assertEqual(service.check_alerts(), 4)
+        fired = {alert.alert_config.name: alert.status for alert in AlertHistory.query.all()}
+        self.assertEqual(fired, {'macd-up': 'active', 'stoch-above': 'active', 'price-above': 'notified',
+                                 'logs': 'notified'})
+
+        # Ten sam sygnał i ten sam dzień - bez nowych alertów
+        self.assertEqual(service.check_alerts(), 0)
+
+    def test_notification_outbox_delivery(self):
+        """Test zbiorczej wysyłki kolejki powiadomień z ponowieniem po błędzie"""
+        from types import SimpleNamespace
+        from models import db, AlertConfig, AlertHistory, Notification, NotificationOutbox
+        from services.notification_delivery import NotificationDelivery, enqueue_notifications
+        rule = AlertConfig(name='logs', type='log_error', conditions={})
+        alerts = [AlertHistory(alert_config=rule, message=f'Alert {i}', severity=severity, status='notified')
+                  for i, severity in enumerate(['info', 'error', 'warning'])]
+        db.session.add_all(alerts)
+        self.assertEqual(enqueue_notifications(alerts), 3)
+        db.session.commit()
+
+        responses = [SimpleNamespace(status_code=500, text='error', headers={})]
+        posted = []
+
+        def post(url, json, timeout):
+            posted.append(json)
+            return responses[0] if len(posted) <= 2 else SimpleNamespace(status_code=200, text='ok', headers={})
+
+        config = SimpleNamespace(SLACK_WEBHOOK_URL='https://hooks.example/test', SLACK_CHANNEL='#test',
+                                 SLACK_USERNAME='bot', NOTIFICATION_DIGEST_MAX_ALERTS=2, NOTIFICATION_BATCH_SIZE=100,
+                                 NOTIFICATION_MAX_ATTEMPTS=3, NOTIFICATION_RETRY_BASE_SECONDS=60,
+                                 NOTIFICATION_WORKERS=2, NOTIFICATION_TIMEOUT_SECONDS=1, SLACK_MIN_INTERVAL_SECONDS=0,
+                                 NOTIFICATION_CLAIM_TIMEOUT_SECONDS=300)
+        delivery = NotificationDelivery(config, post=post)
+        self.assertEqual(delivery.deliver_pending(), {'messages': 0, 'sent': 0, 'retrying': 3, 'failed': 0})
+        self.assertEqual(len(posted), 2)  # dwie wiadomości zbiorcze (2 + 1 alert)
+        self.assertEqual(delivery.deliver_pending()['retrying'], 0)  # backoff - jeszcze nie pora
+
+        NotificationOutbox.query.update({'next_attempt_at': datetime.now(timezone.utc) - timedelta(seconds=1)})
+        db.session.commit()
+        self.assertEqual(delivery.deliver_pending(), {'messages': 2, 'sent': 3, 'retrying': 0, 'failed': 0})
+        self.assertIn('[ERROR] Alert 1', posted[-2]['attachments'][0]['text'] + posted[-1]['attachments'][0]['text'])
+        self.assertEqual({row.status for row in NotificationOutbox.query.all()}, {'sent'})
+        self.assertEqual(Notification.query.filter_by(status='sent').count(), 3)
+        self.assertTrue(all(alert.notified_at for alert in AlertHistory.query.all()))
+
+    def test_notification_outbox_claim(self):
+        """Test przejmowania wpisów kolejki - wpis przejęty przez inny worker nie jest wysyłany ponownie"""
+        from types import SimpleNamespace
+        from models import db, AlertConfig, AlertHistory, NotificationOutbox
+        from services.notification_delivery import NotificationDelivery, enqueue_notifications
+        alert = AlertHistory(alert_config=AlertConfig(name='logs', type='log_error', conditions={}),
+                             message='Alert', severity='error', status='notified')
+        db.session.add(alert)
+        enqueue_notifications([alert])
+        db.session.commit()
+
+        config = SimpleNamespace(SLACK_WEBHOOK_URL='https://hooks.example/test', SLACK_CHANNEL='#test',
+                                 SLACK_USERNAME='bot', NOTIFICATION_DIGEST_MAX_ALERTS=20, NOTIFICATION_BATCH_SIZE=100,
+                                 NOTIFICATION_MAX_ATTEMPTS=3, NOTIFICATION_RETRY_BASE_SECONDS=60,
+                                 NOTIFICATION_WORKERS=1, NOTIFICATION_TIMEOUT_SECONDS=1, SLACK_MIN_INTERVAL_SECONDS=0,
+                                 NOTIFICATION_CLAIM_TIMEOUT_SECONDS=300)
+        posted = []
+        delivery = NotificationDelivery(config, post=lambda url, json, timeout: posted.append(json) or
+                                        SimpleNamespace(status_code=200, text='ok', headers={}))
+        claimed = delivery.claim_entries()
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(NotificationOutbox.query.one().status, 'sending')
+        # Drugi worker w trakcie wysyłki pierwszego - nic do przejęcia
+        self.assertEqual(delivery.deliver_pending()['sent'], 0)
+        self.assertEqual(posted, [])
+
+        # Worker przerwany w trakcie wysyłki - wpis przejmowany ponownie po NOTIFICATION_CLAIM_TIMEOUT_SECONDS
+        NotificationOutbox.query.update({'claimed_at': datetime.now(timezone.utc) - timedelta(seconds=301)})
+        db.session.commit()
+        self.assertEqual(delivery.deliver_pending()['sent'], 1)
+        self.assertEqual(len(posted), 1)
+        self.assertEqual(NotificationOutbox.query.one().status, 'sent')
+
+    def test_event_stream_replay_and_fanout(self):
+        """Test strumienia SSE: zdarzenia po commicie, filtry, odtworzenie po Last-Event-ID i reset"""
+        from types import SimpleNamespace
+        from models import db
+        from services.event_stream import EventStreamService, StreamCapacityError
+        config = SimpleNamespace(EVENT_STREAM_POLL_SECONDS=0.01, EVENT_STREAM_HEARTBEAT_SECONDS=0.05,
+                                 EVENT_STREAM_MAX_SECONDS=5, EVENT_STREAM_QUEUE_SIZE=10, EVENT_STREAM_REPLAY_LIMIT=3,
+                                 EVENT_STREAM_RETENTION_HOURS=24, EVENT_STREAM_MAX_SUBSCRIBERS=1,
+                                 EVENT_STREAM_BUSY_RETRY_SECONDS=30)
+        events = EventStreamService(config)
+        events.init_app(self.app, db)
+        progress = events.job_progress('update_etf_prices', 1)
+        events.publish_price('TST', 11.0, 10.0)
+        progress.step('TST')
+        db.session.commit()
+
+        subscription = events.subscribe(last_event_id=1, types=['price'], tickers=['TST'])
+        poller = events._thread
+        stream = (chunk for chunk in events.stream(subscription) if not chunk.startswith(':'))
+        self.assertTrue(next(stream).startswith('retry:'))
+        chunk = next(stream)
+        self.assertIn('id: 2\nevent: price\n', chunk)
+        self.assertIn('"change_percent":10.0', chunk)
+        # Limit strumieni procesu (EVENT_STREAM_MAX_SUBSCRIBERS=1)
+        with self.assertRaises(StreamCapacityError):
+            events.subscribe()
+        self.assertEqual(events.stats()['rejected'], 1)
+
+        events.publish_price('OTH', 5.0, None)
+        events.publish_price('TST', 12.0, 11.0)
+        db.session.commit()
+        self.assertIn('id: 5\nevent: price', next(stream))  # przez wątek odpytujący
+        stream.close()
+        self.assertEqual(events.stats()['subscribers'], 0)
+
+        reset = events.subscribe(last_event_id=0)  # 5 zaległych zdarzeń > EVENT_STREAM_REPLAY_LIMIT
+        chunks = events.stream(reset)
+        next(chunks)
+        self.assertIn('event: reset', next(chunks))
+        events.unsubscribe(reset)
+        poller.join(1)
+        self.assertFalse(poller.is_alive())
+
+@unittest.skipUnless(os.environ.get('TEST_POSTGRES_URL'), 'TEST_POSTGRES_URL nie ustawiony')
+class TestDialectNeutralQueriesPostgres(TestDialectNeutralQueries):
+    """Te same testy na lokalnym PostgreSQL (np. TEST_POSTGRES_URL=postgresql://localhost/etf_test)"""
+
+    DATABASE_URL = os.environ.get('TEST_POSTGRES_URL', '')
+
+
+class TestFakeProvider(unittest.TestCase):
+    """Testy APIService na lokalnym serwerze dostawców (benchmarks/fake_provider.py)"""
+
+    def setUp(self):
+        """Serwer dostawców w wątku i APIService skierowany na niego"""
+        import threading
+        from flask import Flask
+        from werkzeug.serving import make_server
+        from models import db
+        from benchmarks.fake_provider import FaultInjector, SyntheticMarket, create_fake_provider
+        from services.api_service import APIService
+
+        self.market = SyntheticMarket(date(2024, 6, 28))
+        self.faults = FaultInjector()
+        self.server = make_server('127.0.0.1', 0, create_fake_provider(self.market, self.faults), threaded=True)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.port}'
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        self.api = APIService()
+        for name, value in {'FMP_API_KEY': 'fake', 'EODHD_API_KEY': 'fake', 'TIINGO_API_KEY': 'fake',
+                            'FMP_BASE_URL': f'{self.url}/fmp/api/v3', 'EODHD_BASE_URL': f'{self.url}/eodhd/api',
+                            'TIINGO_BASE_URL': f'{self.url}/tiingo/tiingo/daily'}.items():
+            setattr(self.api.config, name, value)
+
+    def tearDown(self):
+        """Zatrzymanie serwera i sprzątanie bazy"""
+        from models import db
+        self.server.shutdown()
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_split_normalized_history(self):
+        """Test splitów, dywidend i cen syntetycznego ETF po normalizacji w APIService"""
+        ticker = next(f'FK{i:04d}' for i in range(100) if self.market.get(f'FK{i:04d}').split_date is not None
+                      and self.market.get(f'FK{i:04d}').dividends)
+        data = self.market.get(ticker)
+
+        splits = self.api.get_stock_splits(ticker)
+        self.assertEqual(splits[0]['date'], str(data.split_date))
+        self.assertEqual(splits[0]['ratio'], data.split_ratio)
+
+        dividends = self.api.get_dividend_history(ticker, years=30)
+        self.assertEqual(len(dividends), len(data.dividends))
+        expected = {dividend['ex_date']: dividend['adjusted'] for dividend in data.dividends}
+        for dividend in dividends:
+            self.assertAlmostEqual(dividend['normalized_amount'], expected[str(dividend['payment_date'])], places=3)
+
+        daily = self.api.get_historical_daily_prices(ticker, days=30, normalize_splits=False)
+        self.assertEqual(len(daily), 30)
+        self.assertEqual(daily[-1]['date'], date(2024, 6, 28))
+        self.assertEqual(self.api.get_current_price_tiingo(ticker), daily[-1]['close'])
+
+    def test_injected_faults(self):
+        """Test wstrzykiwanych 429 i liczników zapytań serwera"""
+        import requests
+        self.assertEqual(requests.get(f'{self.url}/fmp/api/v3/profile/SPY').status_code, 401)
+        self.assertEqual(self.api.get_etf_basic_info('SPY')['name'], 'SPY Synthetic ETF')
+
+        self.faults.rate_limit_rate = 1.0
+        self.assertEqual(self.api.get_etf_basic_info('SPY'), {})
+        stats = requests.get(f'{self.url}/_stats').json()['providers']['fmp']
+        self.assertEqual(stats['status'], {'200': 1, '401': 1, '429': 1})
+
+class TestRequestMetrics(unittest.TestCase):
+    """Testy metryk żądań (czas tras, zapytania SQL, N+1, endpointy dostawców)"""
+
+    def setUp(self):
+        from flask import Flask, jsonify
+        from sqlalchemy import select
+        from models import db, ETF
+        from services.metrics_service import RequestMetrics
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.metrics = RequestMetrics(enabled=True, n_plus_one_threshold=5)
+        self.metrics.init_app(self.app)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+        @self.app.route('/api/etfs/<ticker>/holdings')
+        def holdings(ticker):
+            # Jedno zapytanie na wiersz - wzorzec N+1
+            names = [db.session.execute(select(ETF.name).where(ETF.id == i)).scalar() for i in range(6)]
+            return jsonify({'success': True, 'count': len(names)})
+
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        from models import db
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_route_sql_and_n_plus_one(self):
+        """Test histogramu trasy, liczby zapytań SQL i oznaczenia N+1"""
+        self.assertEqual(self.client.get('/api/etfs/SPY/holdings').status_code, 200)
+        self.assertEqual(self.client.get('/missing').status_code, 404)
+
+        summary = self.metrics.summary()
+        route = next(row for row in summary['slowest_routes'] if row['route'] == '/api/etfs/<ticker>/holdings')
+        self.assertEqual(route['requests'], 1)
+        self.assertGreaterEqual(route['avg_sql_queries'], 6)
+        self.assertEqual(route['n_plus_one'], 1)
+        self.assertEqual(summary['n_plus_one'][0]['count'], 6)
+
+        text = self.metrics.render_prometheus()
+        self.assertIn('etf_http_request_duration_seconds_count{route="/api/etfs/<ticker>/holdings",method="GET",'
+                      'status="200"} 1', text)
+        self.assertIn('etf_http_request_duration_seconds_count{route="unmatched",method="GET",status="404"} 1', text)
+        self.assertIn('etf_http_request_n_plus_one_total{route="/api/etfs/<ticker>/holdings",method="GET"} 1', text)
+
+    def test_provider_endpoints(self):
+        """Test grupowania zapytań do dostawców według endpointu (bez tickera)"""
+        from services.metrics_service import provider_endpoint
+        base_urls = {'fmp': 'http://fake/fmp/api/v3', 'eodhd': 'http://fake/eodhd/api'}
+        self.assertEqual(provider_endpoint('http://fake/fmp/api/v3/historical-price-full/stock_dividend/SPY?apikey=x',
+                                           base_urls), ('fmp', '/historical-price-full/stock_dividend/{ticker}'))
+        self.assertEqual(provider_endpoint('http://fake/eodhd/api/eod/SPY.US', base_urls), ('eodhd', '/eod/{ticker}'))
+        self.assertEqual(provider_endpoint('https://api.tiingo.com/tiingo/daily/VOO/prices', base_urls),
+                         ('api.tiingo.com', '/tiingo/daily/{ticker}/prices'))
+
+        self.metrics.record_provider_call('fmp', '/quote/{ticker}', '200', 0.02)
+        self.metrics.record_provider_call('fmp', '/quote/{ticker}', '429', 0.01)
+        provider = self.metrics.summary()['providers'][0]
+        self.assertEqual((provider['calls'], provider['errors']), (2, 1))
+        self.assertIn('etf_provider_request_duration_seconds_bucket{provider="fmp",endpoint="/quote/{ticker}",'
+                      'status="429",le="0.01"} 1', self.metrics.render_prometheus())
+
+class TestJobTraces(unittest.TestCase):
+    """Testy śledzenia przebiegów zadań schedulera (spany, liczniki SQL, zapis skompresowany)"""
+
+    def setUp(self):
+        from types import SimpleNamespace
+        from flask import Flask
+        from models import db
+        from services.job_trace_service import JobTraceService
+
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'
+        self.app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+        db.init_app(self.app)
+        self.traces = JobTraceService(SimpleNamespace(JOB_TRACE_ENABLED=True, JOB_TRACE_MAX_SPANS=6,
+                                                      JOB_TRACE_RETENTION_DAYS=30))
+        self.traces.init_app(self.app, db)
+        self.ctx = self.app.app_context()
+        self.ctx.push()
+        db.create_all()
+
+    def tearDown(self):
+        from models import db
+        db.session.remove()
+        db.drop_all()
+        self.ctx.pop()
+
+    def test_span_tree_and_sql_counters(self):
+        """Test drzewa ticker -> etap -> wywołanie, liczników SQL i limitu spanów"""
+        from sqlalchemy import select
+        from models import db, ETF
+        import services.metrics_service  # noqa: F401 - zdarzenia silnika (liczniki SQL)
+        from services.job_trace_service import span, traced, count
+
+        @traced()
+        def load_etfs():
+            return db.session.execute(select(ETF)).all()
+
+        with self.traces.trace('test_job') as trace:
+            for ticker in ('AAA', 'BBB', 'CCC'):
+                with span('ticker', ticker=ticker):
+                    with span('stage'):
+                        load_etfs()
+                        count('prices_added', 2)
+        # Poza przebiegiem span() nic nie robi
+        with span('outside') as outside:
+            self.assertIsNone(outside)
+
+        saved = self.traces.get(trace.run_id)
+        self.assertEqual(saved['job_name'], 'test_job')
+        self.assertEqual(saved['span_count'], 6)
+        self.assertEqual(saved['dropped_spans'], 4)
+        spans = saved['spans']
+        self.assertEqual([span_['name'] for span_ in spans], ['job', 'ticker', 'stage', 'load_etfs', 'ticker', 'stage'])
+        self.assertEqual([span_['parent'] for span_ in spans], [-1, 0, 1, 2, 0, 4])
+        self.assertEqual(spans[1]['attrs']['ticker'], 'AAA')
+        self.assertEqual(spans[3]['attrs']['sql_queries'], 1)
+        self.assertEqual(spans[2]['attrs']['prices_added'], 2)
+        # Pominięty span load_etfs drugiego tickera - zapytanie w liczniku rodzica
+        self.assertEqual(spans[5]['attrs']['sql_queries'], 1)
+        stage = next(stage for stage in saved['stages'] if stage['name'] == 'stage')
+        self.assertEqual(stage['count'], 2)
+        self.assertEqual([item['run_id'] for item in self.traces.list('test_job')], [trace.run_id])
+        self.assertIsNone(self.traces.get('missing'))
+
+class TestLogging(unittest.TestCase):
+    """Testy logowania (poziomy z DEBUG_LEVEL, próbkowanie zdarzeń per wiersz, kolejka zapisu)"""
+
+    def setUp(self):
+        import logging
+        self.records = []
+        self.handler = logging.Handler()
+        self.handler.emit = self.records.append
+        self.logger = logging.getLogger('test_unit.sampled')
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def test_parse_levels(self):
+        """Test poziomu głównego i poziomów modułów z DEBUG_LEVEL"""
+        import logging
+        from services.logging_service import parse_levels
+
+        root, modules = parse_levels('WARNING, services.api_service=ERROR,apscheduler=bogus')
+        self.assertEqual(root, logging.WARNING)
+        self.assertEqual(modules, {'services.api_service': logging.ERROR})
+        self.assertEqual(parse_levels('WARNING', debug=True)[0], logging.DEBUG)
+
+    def test_sampled_logger(self):
+        """Test limitu rekordów komunikatu w oknie i liczby pominiętych"""
+        from services.logging_service import SampledLogger
+
+        sampled = SampledLogger(self.logger, burst=2, interval_seconds=60)
+        for i in range(5):
+            sampled.info('Added price for %s: %s', 'SPY', i)
+        sampled.debug('Below level %s', 'x')
+        self.assertEqual([record.getMessage() for record in self.records],
+                         ['Added price for SPY: 0', 'Added price for SPY: 1'])
+
+        sampled.interval_seconds = 0
+        sampled.info('Added price for %s: %s', 'SPY', 5)
+        self.assertEqual(self.records[-1].getMessage(), 'Added price for SPY: 5 (+3 podobnych pominiętych)')
+
+    def test_queue_handler_defers_formatting(self):
+        """Test przekazania rekordu do kolejki bez formatowania w wątku wywołującym"""
+        import logging
+        import queue
+        from services.logging_service import _InProcessQueueHandler
+
+        log_queue = queue.SimpleQueue()
+        queue_handler = _InProcessQueueHandler(log_queue)
+        self.logger.addHandler(queue_handler)
+        try:
+            self.logger.info('Prices %s', [1.0, 2.0])
+        finally:
+            self.logger.removeHandler(queue_handler)
+        record = log_queue.get_nowait()
+        self.assertIsInstance(record, logging.LogRecord)
+        self.assertEqual((record.msg, record.args), ('Prices %s', ([1.0, 2.0],)))
+        self.assertEqual(record.getMessage(), 'Prices [1.0, 2.0]')
+
 def run_tests():
     """Uruchamia wszystkie testy"""
     # Tworzenie test suite